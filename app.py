@@ -1,18 +1,46 @@
 from tkinter import *
-from home_page import HomePage
+from home_page import HomePage, SCAN_OUTPUT_FOLDERS
 from stats_page import StatsPage
 from ping_page import PingPage
+from functionalities.api import ApiServer
+from functionalities.archive import Archive
+from functionalities.jobs import JobManager
+from functionalities.liveness import LivenessCache
+from functionalities.timeseries import TimeSeriesStore
+import argparse
 import requests
+import threading
 import time
+import os
 
 # Function to handle GitHub version retrieval with error handling and caching
 class Application:
-    def __init__(self, root):
+    def __init__(self, root, compact=False):
         self.root = root
         
         # Define the directory for scan results (adjust this to the actual path)
         self.scan_results_dir = "scans"  # Replace this with the actual directory
 
+        # Latency/availability history shared by the Ping and Stats pages
+        self.history_store = TimeSeriesStore(os.path.join("resultat", "history"))
+
+        # Which hosts answered recently, shared by the pages, the scans and the command-line scripts
+        self.liveness = LivenessCache()
+
+        # Scans started from the pages run through one job manager (bounded, deduplicated, cancellable)
+        self.job_manager = JobManager(max_workers=2, liveness=self.liveness)
+
+        # Local HTTP API (127.0.0.1) sharing the job manager, for scripts and automation
+        self.api_server = ApiServer(self.job_manager, self.scan_results_dir)
+        try:
+            self.api_server.start_in_thread()
+        except OSError as e:
+            print(f"Local API not started: {e}")
+
+        # Archive old scans in the background, only when asked to (python app.py --compact)
+        if compact:
+            threading.Thread(target=self.compact_scans, daemon=True).start()
+
         # Initialize pages, including StatsPage, and pass scan_results_dir
         self.pages = {
             "home": HomePage(self.root, self),
@@ -25,6 +53,24 @@ class Application:
         # Display the home page by default
         self.show_page("home")
 
+    def compact_scans(self):
+        """
+        Move old scans of every output folder into their compressed archive (see functionalities/archive.py).
+
+        The default retention policy keeps every scan; thinning them is left to
+        'python -m functionalities.archive --daily ... --weekly ...'.
+        """
+        for folder in SCAN_OUTPUT_FOLDERS:
+            if not os.path.isdir(folder):
+                continue
+            try:
+                summary = Archive(folder).compact()
+            except (OSError, ValueError) as e:
+                print(f"Could not compact {folder}: {e}")
+                continue
+            if summary['archived'] or summary['deleted']:
+                print(f"{folder}: {summary['archived']} scans archived, {summary['deleted']} deleted.")
+
     # Function to get version from GitHub with caching
     def get_version(self):
         current_time = time.time()
@@ -84,9 +130,13 @@ class Application:
         button.bind("<Leave>", lambda e: button.config(bg="#ffffff"))
 
 # Running the Application
+parser = argparse.ArgumentParser(description="Network scanner GUI.")
+parser.add_argument('--compact', action='store_true',
+                    help="Archive the scans older than a day at start-up (nothing is deleted)")
+args = parser.parse_args()
 root = Tk()
 root.geometry("600x700")
 root.minsize(480, 360)
 root.config(background='#313438')  # Background color for the window
-app = Application(root)  # Create the application instance
+app = Application(root, compact=args.compact)  # Create the application instance
 root.mainloop()  # Run the application
@@ -0,0 +1,287 @@
+import argparse
+import ipaddress
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Make the project importable when the file is run directly
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.fleet import LoopbackFleet
+
+# Where benchmark runs are kept so that versions can be compared
+HISTORY_FILE = os.path.join(PROJECT_DIR, 'benchmarks', 'results', 'history.jsonl')
+
+# Relative change that is reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+# Runs shorter than this are too noisy to be compared
+MIN_COMPARABLE_SECONDS = 0.05
+
+
+def bench_icmp(spec):
+    """Native ICMP sweep (functionalities.icmp.ping_many) over live and unused addresses."""
+    from functionalities.icmp import ping_many
+    targets = spec['addresses'] + spec['unused_addresses']
+    ping_many(targets, timeout=spec['timeout'])
+    return len(targets), 0
+
+
+def bench_ping_probe(spec):
+    """Concurrent 'ping' processes (fonctions.ping.probe_latency, one echo per host)."""
+    from fonctions.ping import probe_latency
+    targets = spec['addresses'] + spec['unused_addresses']
+    probe_latency(targets, count=1, timeout=spec['timeout'])
+    return len(targets), 0
+
+
+def bench_fonctions_ping(spec):
+    """Host discovery of fonctions/scan.py (100 threads running fonctions.scan.ping)."""
+    from fonctions.scan import ping
+    targets = spec['addresses'] + spec['unused_addresses']
+    with ThreadPoolExecutor(max_workers=100) as executor:
+        list(executor.map(ping, targets))
+    return len(targets), 0
+
+
+def bench_fonctions_scan_ports(spec):
+    """Port scan of fonctions/scan.py (nmap -p 1-1024 -sV, 10 threads)."""
+    from fonctions.scan import scan_ports
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(scan_ports, spec['addresses']))
+    return len(spec['addresses']), 1024 * len(spec['addresses'])
+
+
+def bench_nmap_scan_network(spec):
+    """functionalities.scan.scan_network (nmap -T4 -p 1-65535 --open) writing to a temporary folder."""
+    from functionalities.scan import scan_network
+    with tempfile.TemporaryDirectory() as output_folder:
+        scan_network(spec['target_range'], output_folder, keep_results=False)
+    return len(spec['addresses']), 65535 * len(spec['addresses'])
+
+
+def _has_nmap():
+    try:
+        import nmap  # noqa: F401
+    except ImportError:
+        return "python-nmap is not installed"
+    if shutil.which('nmap') is None:
+        return "the nmap binary is not on PATH"
+    return None
+
+
+def _has_ping():
+    return None if shutil.which('ping') else "the ping command is not on PATH"
+
+
+def _has_icmp():
+    from functionalities.icmp import icmp_available
+    return None if icmp_available() else "ICMP sockets are not allowed for this user"
+
+
+# Benchmarked scanning paths: name -> (function, availability check)
+ENGINES = {
+    'icmp': (bench_icmp, _has_icmp),
+    'ping_probe': (bench_ping_probe, _has_ping),
+    'fonctions_ping': (bench_fonctions_ping, lambda: _has_ping() or _has_nmap()),
+    'fonctions_scan_ports': (bench_fonctions_scan_ports, _has_nmap),
+    'nmap_scan_network': (bench_nmap_scan_network, _has_nmap),
+}
+
+
+def _usage():
+    """Return (user CPU, system CPU, peak RSS in KiB) for this process and its finished children."""
+    if resource is None:
+        times = os.times()
+        return times.user + times.children_user, times.system + times.children_system, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1024 if sys.platform == 'darwin' else 1
+    peak = max(own.ru_maxrss, children.ru_maxrss) // scale
+    return own.ru_utime + children.ru_utime, own.ru_stime + children.ru_stime, peak
+
+
+def run_engine(name, spec):
+    """
+    Run one benchmark in the current process and measure it.
+
+    Args:
+        name (str): The ENGINES key.
+        spec (dict): The fleet description (addresses, ports, timeout...).
+
+    Returns:
+        dict: wall time, hosts/sec, ports/sec, CPU seconds and peak RSS.
+    """
+    function, _ = ENGINES[name]
+    user_before, system_before, _ = _usage()
+    start = time.perf_counter()
+    hosts, ports = function(spec)
+    wall = time.perf_counter() - start
+    user_after, system_after, peak = _usage()
+    return {
+        'wall_seconds': round(wall, 4),
+        'hosts': hosts,
+        'ports': ports,
+        'hosts_per_sec': round(hosts / wall, 2) if wall else None,
+        'ports_per_sec': round(ports / wall, 2) if wall and ports else 0,
+        'cpu_seconds': round((user_after - user_before) + (system_after - system_before), 4),
+        'peak_rss_kib': peak,
+    }
+
+
+def run_engine_isolated(name, spec):
+    """Run one benchmark in a fresh Python process so its CPU and peak RSS are not mixed with others."""
+    command = [sys.executable, '-m', 'benchmarks.bench_scan', '--child', name, '--spec', json.dumps(spec)]
+    result = subprocess.run(command, cwd=PROJECT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"benchmark {name} failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def project_version():
+    """Return the git revision of the project (or 'unknown')."""
+    try:
+        result = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=PROJECT_DIR,
+                                capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() or 'unknown'
+    except (OSError, subprocess.TimeoutExpired):
+        return 'unknown'
+
+
+def load_history(path=HISTORY_FILE):
+    """Return every stored benchmark record."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_record(record, path=HISTORY_FILE):
+    """Append a benchmark record to the history file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def compare(record, history, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare a run with the previous run of the same engine and fleet.
+
+    Args:
+        record (dict): The new benchmark record.
+        history (list): Earlier records.
+        threshold (float): Relative change reported as a regression.
+
+    Returns:
+        list: Human-readable regression messages (empty if none).
+    """
+    previous = [item for item in history
+                if item['engine'] == record['engine'] and item['params'] == record['params']]
+    if not previous:
+        return []
+    baseline = previous[-1]['metrics']
+    metrics = record['metrics']
+    if min(baseline['wall_seconds'], metrics['wall_seconds']) < MIN_COMPARABLE_SECONDS:
+        return []
+    messages = []
+    # Higher is better for throughput, lower is better for resources
+    for key, higher_is_better in (('hosts_per_sec', True), ('ports_per_sec', True),
+                                  ('cpu_seconds', False), ('peak_rss_kib', False)):
+        old, new = baseline.get(key), metrics.get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+            messages.append(f"{key}: {old} -> {new} ({change:+.0%}) vs {previous[-1]['version']}")
+    return messages
+
+
+def main():
+    """
+    Command-line entry point: start a loopback fleet and benchmark every available scanning path.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the scanners against a loopback fleet.")
+    parser.add_argument('--hosts', type=int, default=16, help="Number of fake hosts")
+    parser.add_argument('--unused', type=int, default=16, help="Extra addresses with nothing listening")
+    parser.add_argument('--tcp-ports', default='22,80,443', help="Open TCP ports on every host")
+    parser.add_argument('--udp-ports', default='53,161', help="Open UDP ports on every host")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="Comma-separated engines to run")
+    parser.add_argument('--timeout', type=float, default=1.0, help="Probe timeout in seconds")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Regression threshold (0.1 = 10%%)")
+    parser.add_argument('--no-save', action='store_true', help="Do not append the results to the history")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--spec', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child mode: run a single engine and print its metrics as JSON
+    if args.child:
+        print(json.dumps(run_engine(args.child, json.loads(args.spec))))
+        return
+
+    tcp_ports = [int(port) for port in args.tcp_ports.split(',') if port]
+    udp_ports = [int(port) for port in args.udp_ports.split(',') if port]
+    params = {'hosts': args.hosts, 'unused': args.unused, 'tcp_ports': tcp_ports, 'udp_ports': udp_ports}
+    version = project_version()
+    history = load_history()
+    regressions = 0
+
+    with LoopbackFleet(args.hosts, tcp_ports, udp_ports) as fleet:
+        # Addresses right after the fleet: routed to loopback but with every port closed
+        last = ipaddress.IPv4Address(fleet.addresses[-1])
+        spec = {
+            'addresses': fleet.addresses,
+            'unused_addresses': [str(last + index) for index in range(1, args.unused + 1)],
+            'tcp_ports': tcp_ports,
+            'udp_ports': udp_ports,
+            'target_range': fleet.target_range,
+            'timeout': args.timeout,
+        }
+        print(f"Fleet: {args.hosts} hosts ({fleet.target_range}), TCP {tcp_ports}, UDP {udp_ports}, "
+              f"{args.unused} unused addresses. Version {version}.\n")
+        for name in args.engines.split(','):
+            if name not in ENGINES:
+                print(f"{name:22} unknown engine")
+                continue
+            reason = ENGINES[name][1]()
+            if reason:
+                print(f"{name:22} skipped: {reason}")
+                continue
+            try:
+                metrics = run_engine_isolated(name, spec)
+            except RuntimeError as e:
+                print(f"{name:22} failed: {e}")
+                continue
+
+            record = {'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'), 'version': version,
+                      'engine': name, 'params': params, 'metrics': metrics}
+            print(f"{name:22} {metrics['wall_seconds']:8.3f}s  {metrics['hosts_per_sec'] or 0:10.1f} hosts/s  "
+                  f"{metrics['ports_per_sec']:12.1f} ports/s  cpu {metrics['cpu_seconds']:.3f}s  "
+                  f"peak RSS {metrics['peak_rss_kib']} KiB")
+            for message in compare(record, history, args.threshold):
+                regressions += 1
+                print(f"{'':22} REGRESSION {message}")
+            if not args.no_save:
+                save_record(record)
+
+    if not args.no_save:
+        print(f"\nResults appended to {HISTORY_FILE}.")
+    if regressions:
+        sys.exit(1)
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
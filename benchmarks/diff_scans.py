@@ -0,0 +1,140 @@
+import argparse
+import gc
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Make the project importable when the file is run directly
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.diff import diff_scan_files
+from functionalities.results import HostResult
+from functionalities.sinks import JsonSink
+
+# Services of the synthetic hosts: port -> (name, version)
+SERVICES = {
+    22: ('ssh', 'OpenSSH 8.9p1'),
+    53: ('domain', 'dnsmasq 2.86'),
+    80: ('http', 'nginx 1.18.0'),
+    135: ('msrpc', 'Microsoft Windows RPC'),
+    443: ('https', 'nginx 1.18.0'),
+    445: ('microsoft-ds', ''),
+    3306: ('mysql', 'MySQL 8.0.36'),
+    3389: ('ms-wbt-server', 'Microsoft Terminal Services'),
+    5432: ('postgresql', 'PostgreSQL DB 14.11'),
+    8080: ('http-proxy', ''),
+}
+
+
+def synthetic_host(address, rng, changed=False):
+    """A host with a few well-known services; 'changed' opens, closes or upgrades one of them."""
+    host = HostResult(address)
+    host.status = 'up'
+    host.os = 'Linux 5.X'
+    ports = sorted(rng.sample(list(SERVICES), 4))
+    change = rng.randrange(3) if changed else None
+    if changed:
+        if change == 0:
+            ports.append(rng.randint(10000, 65535))
+        elif change == 1:
+            ports.pop()
+    for port in ports:
+        name, version = SERVICES.get(port, ('unknown', ''))
+        if change == 2 and port == ports[0]:
+            version += ' (patched)'
+        host.set_port(port, 'open', name, version)
+    host.set_port(53, 'open', 'domain', 'dnsmasq 2.86', proto='udp')
+    return host
+
+
+def write_scan(path, network, seed, churn, newer):
+    """
+    Write a JSON scan of every address of a network, as JsonSink does.
+
+    Both scans draw the same host layouts and the same churn rolls: a quarter
+    of the churned hosts are only in the older scan, a quarter only in the
+    newer one, and the other half changed in the newer one.
+
+    Args:
+        path (str): The JSON file.
+        network (str): The scanned network.
+        seed (int): Random seed.
+        churn (float): Fraction of hosts that appear, disappear or change.
+        newer (bool): Write the newer scan.
+
+    Returns:
+        int: Number of hosts written.
+    """
+    rng = random.Random(seed)
+    rolls = random.Random(seed + 1)
+    written = 0
+    with JsonSink(path) as sink:
+        sink.open(time.strftime('%Y-%m-%d %H:%M:%S'), network)
+        for address in ipaddress.ip_network(network).hosts():
+            layout = random.Random(rng.random())
+            roll = rolls.random()
+            if (roll < churn / 4) if newer else (churn / 4 <= roll < churn / 2):
+                continue
+            sink.write_host(synthetic_host(str(address), layout, changed=newer and churn / 2 <= roll < churn))
+            written += 1
+    return written
+
+
+def measure(function, allocations):
+    """Run a phase; return its result, wall seconds and (with allocations) its peak MiB."""
+    gc.collect()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak = None
+    if allocations:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    """
+    Command-line entry point: diff two synthetic JSON scans of a network and report the time it takes.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark functionalities/diff.py on two JSON scans.")
+    parser.add_argument('--network', default='10.20.0.0/16', help="Network of the synthetic scans (default: a /16)")
+    parser.add_argument('--churn', type=float, default=0.02, help="Fraction of hosts that appear, disappear or change")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--allocations', action='store_true', help="Also measure the peak allocations (slower)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        old_path = os.path.join(folder, 'old_scan_results.json')
+        new_path = os.path.join(folder, 'new_scan_results.json')
+        start = time.perf_counter()
+        old_hosts = write_scan(old_path, args.network, args.seed, args.churn, False)
+        new_hosts = write_scan(new_path, args.network, args.seed, args.churn, True)
+        print(f"Wrote {old_hosts} and {new_hosts} hosts "
+              f"({(os.path.getsize(old_path) + os.path.getsize(new_path)) / 2 ** 20:.1f} MiB) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        scan_diff, seconds, peak = measure(lambda: diff_scan_files(old_path, new_path), args.allocations)
+        print(f"diff_scan_files: {seconds:.3f}s ({(old_hosts + new_hosts) / seconds:.0f} hosts/s)"
+              + (f", peak {peak:.1f} MiB" if peak is not None else ""))
+        print(f"  {len(scan_diff.hosts_added)} added, {len(scan_diff.hosts_removed)} removed, "
+              f"{len(scan_diff.hosts_changed)} changed")
+
+        start = time.perf_counter()
+        report = scan_diff.format_report()
+        print(f"format_report: {time.perf_counter() - start:.3f}s ({len(report.splitlines())} lines)")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import ipaddress
+import selectors
+import socket
+import threading
+
+
+class LoopbackFleet:
+    """
+    A fleet of fake hosts on 127.0.0.0/8 for benchmarking the scanners.
+
+    Every host gets the same set of listening TCP ports and answering UDP
+    ports; every other port is closed (the kernel answers with a RST or an
+    ICMP port unreachable). All sockets are served by one selector thread.
+
+    Linux routes the whole 127.0.0.0/8 block to the loopback interface, so
+    any address can be bound. On macOS and Windows only 127.0.0.1 works
+    unless extra loopback aliases are configured.
+
+    Args:
+        hosts (int): Number of hosts, starting at 'first_address'.
+        tcp_ports (list): TCP ports listening on every host.
+        udp_ports (list): UDP ports answering on every host.
+        first_address (str): Address of the first host.
+        banner (bytes): Sent to every accepted TCP connection.
+    """
+
+    def __init__(self, hosts=16, tcp_ports=(22, 80, 443), udp_ports=(53, 161), first_address='127.0.1.1',
+                 banner=b'SSH-2.0-OpenSSH_8.9p1 Ubuntu-3\r\n'):
+        start = ipaddress.IPv4Address(first_address)
+        self.addresses = [str(start + index) for index in range(hosts)]
+        self.tcp_ports = list(tcp_ports)
+        self.udp_ports = list(udp_ports)
+        self.banner = banner
+        self.selector = selectors.DefaultSelector()
+        self.sockets = []
+        self.thread = None
+        self.running = threading.Event()
+        self.connections = 0
+        self.datagrams = 0
+
+    @property
+    def target_range(self):
+        """Return the fleet as an nmap-style range (e.g. '127.0.1.1-16')."""
+        first = self.addresses[0]
+        last = self.addresses[-1].rsplit('.', 1)[1]
+        if first.rsplit('.', 1)[0] == self.addresses[-1].rsplit('.', 1)[0]:
+            return f"{first}-{last}"
+        return ' '.join(self.addresses)
+
+    def start(self):
+        """Open every socket and start serving them."""
+        for address in self.addresses:
+            for port in self.tcp_ports:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                sock.bind((address, port))
+                sock.listen(128)
+                sock.setblocking(False)
+                self.selector.register(sock, selectors.EVENT_READ, 'tcp')
+                self.sockets.append(sock)
+            for port in self.udp_ports:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.bind((address, port))
+                sock.setblocking(False)
+                self.selector.register(sock, selectors.EVENT_READ, 'udp')
+                self.sockets.append(sock)
+        self.running.set()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def _serve(self):
+        while self.running.is_set():
+            for key, _ in self.selector.select(timeout=0.2):
+                sock = key.fileobj
+                try:
+                    if key.data == 'tcp':
+                        connection, _ = sock.accept()
+                        self.connections += 1
+                        try:
+                            connection.send(self.banner)
+                        except OSError:
+                            pass
+                        connection.close()
+                    else:
+                        data, peer = sock.recvfrom(4096)
+                        self.datagrams += 1
+                        # Echo the request so that protocol probes get an answer
+                        sock.sendto(data, peer)
+                except (BlockingIOError, InterruptedError, ConnectionError):
+                    continue
+
+    def stop(self):
+        """Close every socket."""
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+        for sock in self.sockets:
+            self.selector.unregister(sock)
+            sock.close()
+        self.sockets = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
@@ -0,0 +1,269 @@
+import argparse
+import gc
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import nmap
+
+# Make the project importable when the file is run directly
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.results import ScanResult
+from functionalities.scan import format_scan_results_for_txt, scan_network
+from functionalities.transport import nmap_xml_footer, nmap_xml_header, nmap_xml_host
+from functionalities.sinks import TxtSink
+
+# Services used to populate the synthetic estate: port -> (name, product, version)
+SERVICES = {
+    21: ('ftp', 'vsftpd', '3.0.5'),
+    22: ('ssh', 'OpenSSH', '8.9p1 Ubuntu 3ubuntu0.6'),
+    25: ('smtp', 'Postfix smtpd', ''),
+    53: ('domain', 'dnsmasq', '2.86'),
+    80: ('http', 'nginx', '1.18.0'),
+    135: ('msrpc', 'Microsoft Windows RPC', ''),
+    139: ('netbios-ssn', 'Microsoft Windows netbios-ssn', ''),
+    443: ('https', 'Apache httpd', '2.4.52'),
+    445: ('microsoft-ds', '', ''),
+    902: ('vmware-auth', 'VMware Authentication Daemon', '1.10'),
+    3306: ('mysql', 'MySQL', '8.0.36'),
+    3389: ('ms-wbt-server', 'Microsoft Terminal Services', ''),
+    5432: ('postgresql', 'PostgreSQL DB', '14.11'),
+    8080: ('http-proxy', '', ''),
+}
+
+VULN_OUTPUT = "\n  VULNERABLE:\n  SSL/TLS MITM vulnerability (CCS Injection)\n    State: VULNERABLE\n    IDs:  CVE:CVE-2014-0224\n"
+
+
+def generate_nmap_xml(path, hosts=4096, open_ports=20, network='10.0.0.0/8', seed=0, scripts=0.05):
+    """
+    Write a synthetic nmap XML report, one host at a time.
+
+    Args:
+        path (str): The XML file to write.
+        hosts (int): Number of hosts that are up.
+        open_ports (int): Open ports per host (well-known services first, then random high ports).
+        network (str): The network the host addresses are taken from.
+        seed (int): Random seed, so that reports are reproducible.
+        scripts (float): Fraction of ports carrying vuln script output.
+
+    Returns:
+        str: The path of the report.
+    """
+    rng = random.Random(seed)
+    first = ipaddress.ip_network(network, strict=False).network_address + 1
+    now = int(time.time())
+    well_known = list(SERVICES)
+
+    with open(path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        f.write(nmap_xml_header(f"-T4 -p 1-65535 --open {network}", now))
+        for index in range(hosts):
+            ports = well_known[:min(open_ports, len(well_known))]
+            while len(ports) < open_ports:
+                port = rng.randint(1025, 65535)
+                if port not in ports:
+                    ports.append(port)
+            entries = []
+            for port in sorted(ports):
+                name, product, version = SERVICES.get(port, ('unknown', '', ''))
+                service = {'name': name, 'product': product, 'version': version}
+                if rng.random() < scripts:
+                    service['scripts'] = {'ssl-ccs-injection': VULN_OUTPUT}
+                entries.append((port, 'open', service))
+            f.write(nmap_xml_host(str(first + index), entries, f"host{index}.lab.local", 64, 'Linux 5.0 - 5.14', now))
+        f.write(nmap_xml_footer(hosts, hosts, 1.0, now))
+    return path
+
+
+class ReplayScanner(nmap.PortScanner):
+    """
+    An nmap.PortScanner that replays a recorded XML report instead of running nmap.
+
+    The report is parsed by python-nmap's own analyse_nmap_xml_scan on the
+    first call to scan() (or load()), so the result has exactly the shape the
+    live scanner returns. Later calls to scan() reuse it, whatever the target.
+
+    Args:
+        xml_path (str): The recorded nmap XML report.
+    """
+
+    def __init__(self, xml_path):
+        # The parent constructor looks for the nmap binary, which a replay does not need
+        self.xml_path = xml_path
+        self._scan_result = {}
+        self._nmap_last_output = ''
+        self.loaded = False
+
+    def load(self):
+        """Parse the recorded report."""
+        with open(self.xml_path, 'r', encoding='utf-8') as f:
+            self.analyse_nmap_xml_scan(f.read())
+        self.loaded = True
+        return self._scan_result
+
+    def scan(self, hosts='127.0.0.1', ports=None, arguments='-sV', sudo=False, timeout=0):
+        if not self.loaded:
+            self.load()
+        return self._scan_result
+
+
+def measure(name, function, allocations=True):
+    """
+    Run a phase, then run it again under tracemalloc if allocations are requested.
+
+    Returns:
+        dict: phase name, wall seconds, peak and net allocated MiB, and the phase's result.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = function()
+    wall = time.perf_counter() - start
+    phase = {'phase': name, 'seconds': round(wall, 3), 'peak_mib': None, 'net_mib': None, 'result': result}
+    if allocations:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        phase['peak_mib'] = round((peak - before) / 2 ** 20, 2)
+        phase['net_mib'] = round((current - before) / 2 ** 20, 2)
+        phase['result'] = result
+    return phase
+
+
+def run_replay(xml_path, allocations=True, cve_index_path=None):
+    """
+    Feed a recorded report through every post-processing path and measure each phase.
+
+    Args:
+        xml_path (str): The recorded nmap XML report.
+        allocations (bool): Also measure allocations with tracemalloc (slower).
+        cve_index_path (str): Also measure the CVE annotations with this index (functionalities/cpe.py).
+
+    Returns:
+        list: One dict per phase.
+    """
+    phases = []
+    with tempfile.TemporaryDirectory() as output_folder:
+        def parse_xml():
+            scanner = ReplayScanner(xml_path)
+            scanner.load()
+            return scanner
+
+        phase = measure('parse nmap XML (python-nmap)', parse_xml, allocations)
+        scanner = phase.pop('result')
+        phases.append(phase)
+        hosts = scanner.all_hosts()
+
+        # The replayed hosts do not exist: no TLS handshakes or OS probes
+        phase = measure('scan_network: result model only',
+                        lambda: scan_network('replay', output_folder, sinks=[], scanner=scanner, inspect_tls=False,
+                                             os_probes=False),
+                        allocations)
+        scan_results = phase.pop('result')
+        phases.append(phase)
+
+        phase = measure('scan_network: result model + JSON/TXT sinks',
+                        lambda: scan_network('replay', output_folder, keep_results=False, scanner=scanner,
+                                             inspect_tls=False, os_probes=False), allocations)
+        phase.pop('result')
+        phases.append(phase)
+
+        scan_dict = scan_results.to_dict() if isinstance(scan_results, ScanResult) else None
+        if scan_dict is not None:
+            phase = measure('format_scan_results_for_txt', lambda: len(format_scan_results_for_txt(scan_dict)), allocations)
+            phase.pop('result')
+            phases.append(phase)
+        del scan_dict, scan_results
+
+        # The fonctions/scan.py report writer: scan_ports per host, then the text report
+        try:
+            from fonctions.scan import format_machine_report, format_report_header, scan_ports
+        except ImportError as e:
+            print(f"Skipping the fonctions/scan.py phases: {e}")
+        else:
+            # Every host replays the same report: its TTLs are parsed once, as a caller reusing a report does
+            from functionalities.osfp import nmap_ttls
+            ttls = nmap_ttls(scanner.get_nmap_last_output())
+
+            def fonctions_scan_ports():
+                return [scan_ports(host, scanner=scanner, ttls=ttls) for host in hosts]
+
+            phase = measure('fonctions.scan_ports (result parsing)', fonctions_scan_ports, allocations)
+            host_results = phase.pop('result')
+            phases.append(phase)
+
+            if cve_index_path:
+                from functionalities.cpe import CveIndex
+                with CveIndex(cve_index_path) as cve_index:
+                    phase = measure('fonctions.scan_ports + CVE index',
+                                    lambda: [scan_ports(host, scanner=scanner, ttls=ttls, cve_index=cve_index)
+                                             for host in hosts], allocations)
+                host_results = phase.pop('result')
+                phases.append(phase)
+
+            def fonctions_report():
+                path = os.path.join(output_folder, 'last_scan.txt')
+                with TxtSink(path, format_machine_report, format_report_header(len(host_results))) as report:
+                    report.open(time.strftime('%Y-%m-%d %H:%M:%S'), 'replay')
+                    for host_result in host_results:
+                        report.write_host(host_result)
+                return os.path.getsize(path)
+
+            phase = measure('fonctions report writer', fonctions_report, allocations)
+            phase.pop('result')
+            phases.append(phase)
+
+    return phases
+
+
+def main():
+    """
+    Command-line entry point: generate (or load) an nmap XML report and profile its processing.
+    """
+    parser = argparse.ArgumentParser(description="Replay nmap XML through the result processing code.")
+    parser.add_argument('--xml', help="Replay this recorded nmap XML report instead of generating one")
+    parser.add_argument('--hosts', type=int, default=4096, help="Hosts in the generated report")
+    parser.add_argument('--open-ports', type=int, default=20, help="Open ports per generated host")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed of the generated report")
+    parser.add_argument('--save-xml', help="Keep the generated report at this path")
+    parser.add_argument('--no-allocations', action='store_true', help="Only measure time (skip tracemalloc)")
+    parser.add_argument('--cve-index', help="Also annotate the services with this CVE index (functionalities/cpe.py)")
+    args = parser.parse_args()
+
+    temp_xml = None
+    xml_path = args.xml or args.save_xml
+    if not args.xml:
+        if not xml_path:
+            handle, temp_xml = tempfile.mkstemp(suffix='.xml')
+            os.close(handle)
+            xml_path = temp_xml
+        start = time.perf_counter()
+        generate_nmap_xml(xml_path, args.hosts, args.open_ports, seed=args.seed)
+        print(f"Generated {args.hosts} hosts x {args.open_ports} open ports "
+              f"({os.path.getsize(xml_path) / 2 ** 20:.1f} MiB) in {time.perf_counter() - start:.2f}s.")
+
+    try:
+        phases = run_replay(xml_path, allocations=not args.no_allocations, cve_index_path=args.cve_index)
+    finally:
+        if temp_xml:
+            os.remove(temp_xml)
+
+    print(f"\n{'Phase':48} {'Time (s)':>10} {'Peak MiB':>10} {'Net MiB':>10}")
+    for phase in phases:
+        peak = '-' if phase['peak_mib'] is None else f"{phase['peak_mib']:.2f}"
+        net = '-' if phase['net_mib'] is None else f"{phase['net_mib']:.2f}"
+        print(f"{phase['phase']:48} {phase['seconds']:>10.3f} {peak:>10} {net:>10}")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the project importable when the file is run directly
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.transport import SimulatedNetwork, SimulatedTransport
+
+# The estate scanned when no model file is given: a /16 with a few kinds of hosts
+DEFAULT_ESTATE = {
+    'seed': 0,
+    'rtt_ms': 2.0,
+    'jitter_ms': 0.5,
+    'profiles': {
+        'linux': {'ports': {'22': ['ssh', 'OpenSSH', '8.9p1 Ubuntu 3ubuntu0.6'], '80': ['http', 'nginx', '1.18.0'],
+                            '443': ['https', 'nginx', '1.18.0']}, 'os': 'Linux 5.X', 'ttl': 64},
+        'windows': {'ports': {'135': ['msrpc', 'Microsoft Windows RPC', ''],
+                              '445': ['microsoft-ds', '', ''],
+                              '3389': ['ms-wbt-server', 'Microsoft Terminal Services', '']},
+                    'os': 'Windows 10', 'ttl': 128, 'rtt_ms': 4.0},
+        'printer': {'ports': {'9100': ['jetdirect', '', ''], '631': ['ipp', 'CUPS', '2.4']},
+                    'os': 'HP embedded', 'ttl': 255, 'rtt_ms': 15.0, 'loss': 0.05},
+    },
+    'segments': [
+        {'network': '10.0.0.0/16', 'density': 0.05, 'profiles': {'linux': 6, 'windows': 3, 'printer': 1},
+         'hostname': 'h{index}.lab.local'},
+    ],
+}
+
+
+def quiet(function, *args, **kwargs):
+    """Run a scanner function without its progress output."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def accuracy(expected, found):
+    """Return (recall, false positives) of a set of found items."""
+    recall = len(expected & found) / len(expected) if expected else 1.0
+    return recall, len(found - expected)
+
+
+def run_simulation(model, targets, time_scale=0.0, max_workers=100):
+    """
+    Scan a simulated estate with both scanners and check what they found against the model.
+
+    Args:
+        model (dict): The SimulatedNetwork model.
+        targets (str): The targets to scan.
+        time_scale (float): Fraction of the simulated delays actually waited (0: measure the code alone).
+        max_workers (int): Discovery threads of fonctions/scan.py.
+
+    Returns:
+        list: One dict per phase (name, seconds, items, recall, false positives).
+    """
+    from fonctions.scan import scan_network as fonctions_scan_network, scan_ports
+    from functionalities.metrics import Metrics
+    from functionalities.scan import scan_network
+
+    network = SimulatedNetwork(model)
+    expected_hosts = {host.address: host for host in network.hosts(targets)}
+    expected_ports = {(address, port) for address, host in expected_hosts.items() for port in host.ports}
+    phases = []
+
+    # fonctions/scan.py: one probe per address (100 threads), then nmap -p 1-1024 -sV per host (10 threads)
+    transport = SimulatedTransport(network, time_scale)
+    start = time.perf_counter()
+    online, target_set = quiet(fonctions_scan_network, targets, Metrics(targets), max_workers, transport=transport)
+    seconds = time.perf_counter() - start
+    recall, false_positives = accuracy(set(expected_hosts), set(online))
+    phases.append({'phase': 'fonctions discovery', 'seconds': seconds, 'items': target_set.size,
+                   'recall': recall, 'false_positives': false_positives})
+
+    def scan_all_ports():
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            return list(executor.map(lambda host: scan_ports(host, transport=transport), online))
+
+    start = time.perf_counter()
+    results = quiet(scan_all_ports)
+    seconds = time.perf_counter() - start
+    found = {(result.host, port) for result in results for port in result.ports('open')}
+    low_ports = {(address, port) for address, port in expected_ports if port <= 1024 and address in online}
+    recall, false_positives = accuracy(low_ports, found)
+    phases.append({'phase': 'fonctions port scans', 'seconds': seconds, 'items': len(online),
+                   'recall': recall, 'false_positives': false_positives})
+
+    # functionalities/scan.py: a single nmap run over every target and port
+    with tempfile.TemporaryDirectory() as output_folder:
+        start = time.perf_counter()
+        scan = quiet(scan_network, targets, output_folder, transport=SimulatedTransport(network, time_scale))
+        seconds = time.perf_counter() - start
+    found = {(host.host, port) for host in scan for port in host.ports('open')} if scan else set()
+    recall, false_positives = accuracy(expected_ports, found)
+    phases.append({'phase': 'functionalities scan_network', 'seconds': seconds, 'items': len(scan or ()),
+                   'recall': recall, 'false_positives': false_positives})
+    return phases
+
+
+def main():
+    """
+    Command-line entry point: scan a simulated estate and report throughput and accuracy.
+    """
+    parser = argparse.ArgumentParser(description="Scan a simulated network (functionalities/transport.py).")
+    parser.add_argument('--model', help="JSON model of the estate (default: a /16 with 5%% of hosts up)")
+    parser.add_argument('--targets', help="Targets to scan (default: the model's segments)")
+    parser.add_argument('--time-scale', type=float, default=0.0,
+                        help="Fraction of the simulated delays actually waited (default 0: code only)")
+    parser.add_argument('--workers', type=int, default=100, help="Discovery threads of fonctions/scan.py")
+    args = parser.parse_args()
+
+    model = DEFAULT_ESTATE
+    if args.model:
+        with open(args.model, 'r', encoding='utf-8') as f:
+            model = json.load(f)
+    targets = args.targets or ' '.join(SimulatedNetwork(model).networks())
+    phases = run_simulation(model, targets, args.time_scale, args.workers)
+
+    print(f"\n{'Phase':32} {'Time (s)':>10} {'Items':>8} {'Items/s':>10} {'Recall':>8} {'False +':>8}")
+    for phase in phases:
+        rate = phase['items'] / phase['seconds'] if phase['seconds'] else 0
+        print(f"{phase['phase']:32} {phase['seconds']:>10.3f} {phase['items']:>8} {rate:>10.0f} "
+              f"{phase['recall']:>8.1%} {phase['false_positives']:>8}")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
 import socket
 import platform
+import os
+import sys
+
+# Rendre les modules partagés du dossier 'functionalities' importables quand le script est lancé directement
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functionalities.interfaces import attached_networks
 
 # Fonction pour obtenir l'adresse IP locale
 def get_local_ip():
@@ -47,4 +53,10 @@ for key, value in system_info.items():
 
 # Appeler la fonction pour obtenir l'adresse IP locale
 ip_local = get_local_ip()
-print(f"Adresse IP locale : {ip_local}"'\n')
+print(f"Adresse IP locale : {ip_local}")
+
+# Réseaux des interfaces (adresse, préfixe réel et interface de chacun)
+print("Réseaux locaux : ")
+for entree in attached_networks():
+    print(f"{entree.interface}: {entree.address} sur {entree.network}")
+print()
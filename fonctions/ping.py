@@ -1,5 +1,20 @@
 import subprocess
 import platform
+import re
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Rendre les modules partagés du dossier 'functionalities' importables quand le script est lancé directement
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functionalities.liveness import LivenessCache
+
+# Temps de réponse dans la sortie de ping, quelle que soit la langue du système (time=, temps=, Zeit=, tiempo=...)
+RTT_PATTERN = re.compile(r'(?:time|temps|zeit|tiempo|tempo|durata)\s*[=<]\s*([\d.,]+)\s*ms', re.IGNORECASE)
+
+# Intervalle minimal autorisé par ping sous Linux sans droits administrateur
+MIN_INTERVAL = 0.2
 
 def ping(host):
     # Détecter le système d'exploitation
@@ -27,6 +42,101 @@ def ping(host):
         # Gestion des autres exceptions (par exemple, hôte invalide)
         print(f"Erreur: {str(e)}")
 
+def build_ping_command(host, count=4, interval=1.0, timeout=1):
+    """
+    Construit la commande ping adaptée au système d'exploitation.
+    """
+    if platform.system().lower() == "windows":
+        # Windows ne permet pas de choisir l'intervalle entre deux échos
+        return ['ping', '-n', str(count), '-w', str(int(timeout * 1000)), host]
+    interval = max(interval, MIN_INTERVAL)
+    return ['ping', '-n', '-c', str(count), '-i', f"{interval:g}", '-W', f"{max(1, math.ceil(timeout))}", host]
+
+def parse_ping_output(output):
+    """
+    Extrait les temps de réponse (en ms) de la sortie d'une commande ping.
+    """
+    return [float(value.replace(',', '.')) for value in RTT_PATTERN.findall(output)]
+
+def latency_stats(host, rtts, sent):
+    """
+    Calcule les statistiques de latence d'un hôte à partir des temps de réponse mesurés.
+
+    Retourne un dictionnaire avec min, avg, max, mdev (écart type, comme ping),
+    jitter (moyenne des écarts entre deux réponses successives) et loss (% de pertes).
+    Les valeurs de latence valent None si aucune réponse n'a été reçue.
+    """
+    received = min(len(rtts), sent)
+    stats = {
+        'host': host,
+        'sent': sent,
+        'received': received,
+        'loss': round(100.0 * (sent - received) / sent, 1) if sent else 100.0,
+        'min': None, 'avg': None, 'max': None, 'mdev': None, 'jitter': None,
+        'reachable': received > 0,
+    }
+    if rtts:
+        avg = sum(rtts) / len(rtts)
+        stats['min'] = min(rtts)
+        stats['max'] = max(rtts)
+        stats['avg'] = round(avg, 3)
+        stats['mdev'] = round(math.sqrt(sum((rtt - avg) ** 2 for rtt in rtts) / len(rtts)), 3)
+        diffs = [abs(b - a) for a, b in zip(rtts, rtts[1:])]
+        stats['jitter'] = round(sum(diffs) / len(diffs), 3) if diffs else 0.0
+    return stats
+
+def measure_latency(host, count=4, interval=1.0, timeout=1):
+    """
+    Envoie 'count' échos à un hôte et retourne ses statistiques de latence.
+    """
+    cmd = build_ping_command(host, count, interval, timeout)
+    try:
+        # Laisser à ping le temps d'envoyer tous ses échos avant d'abandonner
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                encoding='utf-8', errors='ignore',
+                                timeout=count * max(interval, MIN_INTERVAL) + timeout + 2)
+        stats = latency_stats(host, parse_ping_output(result.stdout), count)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        stats = latency_stats(host, [], count)
+        stats['error'] = str(e)
+    return stats
+
+def probe_latency(hosts, count=4, interval=1.0, timeout=1, max_workers=64, callback=None, liveness=None):
+    """
+    Mesure la latence de plusieurs hôtes en parallèle.
+
+    Chaque hôte est testé dans son propre thread : la durée totale est celle
+    de l'hôte le plus lent (environ count * interval secondes) et non la somme.
+    'callback' (optionnel) est appelé avec les statistiques de chaque hôte dès qu'il a fini.
+    'liveness' (optionnel, functionalities.liveness.LivenessCache) reçoit l'état mesuré de chaque hôte.
+
+    Retourne un dictionnaire {hôte: statistiques} dans l'ordre de la liste fournie.
+    """
+    hosts = list(hosts)
+    results = {}
+    if not hosts:
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(hosts))) as executor:
+        futures = {executor.submit(measure_latency, host, count, interval, timeout): host for host in hosts}
+        for future in as_completed(futures):
+            stats = future.result()
+            results[futures[future]] = stats
+            if callback:
+                callback(stats)
+    if liveness is not None:
+        liveness.record_many({host: stats['reachable'] for host, stats in results.items()}, source='ping',
+                             rtts={host: stats['avg'] for host, stats in results.items() if stats['reachable']})
+    return {host: results[host] for host in hosts}
+
+def format_latency(stats):
+    """
+    Met en forme les statistiques d'un hôte sur une ligne.
+    """
+    if not stats['reachable']:
+        return f"{stats['host']}: injoignable ({stats['loss']:g}% de pertes)"
+    return (f"{stats['host']}: min/moy/max/mdev = {stats['min']:g}/{stats['avg']:g}/{stats['max']:g}/{stats['mdev']:g} ms, "
+            f"jitter {stats['jitter']:g} ms, {stats['loss']:g}% de pertes")
+
 def select_ips(ip_list):
     """
     Permet à l'utilisateur de sélectionner une ou plusieurs IP à tester, ou de saisir une IP manuellement.
@@ -59,20 +169,33 @@ def select_ips(ip_list):
         print("Entrée invalide. Assurez-vous de saisir des numéros valides.")
         return []
 
-def ping_multiple_ips(ip_list):
+def ping_multiple_ips(ip_list, count=4, interval=1.0, liveness=None):
+    """
+    Fonction qui accepte une liste d'IP et les teste toutes en parallèle.
+    """
+    print(f"Test de {len(ip_list)} IP ({count} échos chacune)...")
+    results = probe_latency(ip_list, count=count, interval=interval, callback=lambda stats: print(format_latency(stats)),
+                            liveness=liveness)
+    reachable = sum(1 for stats in results.values() if stats['reachable'])
+    print(f"\n{reachable}/{len(results)} IP joignables.")
+    return results
+
+def known_ips(liveness):
     """
-    Fonction qui accepte une liste d'IP et les teste une par une.
+    Retourne les IP en ligne d'après le cache de disponibilité (découvertes récemment par un scan ou un ping),
+    ou à défaut celles du fichier './resultat/all_ips.txt' du dernier scan.
     """
-    for ip in ip_list:
-        print(f"Test de l'IP: {ip}")
-        ping(ip)
+    ip_dispo = liveness.live_hosts()
+    if ip_dispo:
+        return ip_dispo
+    with open('./resultat/all_ips.txt', 'r') as f:
+        return [line.strip() for line in f.readlines() if line.strip()]
 
-# Lire les IP depuis le fichier './resultat/all_ips.txt' et effectuer les pings
+# Lire les IP en ligne (cache de disponibilité ou './resultat/all_ips.txt') et effectuer les pings
 if __name__ == "__main__":
+    liveness = LivenessCache()
     try:
-        # Lire les IP depuis le fichier './resultat/all_ips.txt'
-        with open('./resultat/all_ips.txt', 'r') as f:
-            ip_dispo = [line.strip() for line in f.readlines()]
+        ip_dispo = known_ips(liveness)
 
         # Demander à l'utilisateur de sélectionner les IPs à tester ou d'en saisir une manuellement
         selected_ips = select_ips(ip_dispo)
@@ -82,9 +205,11 @@ if __name__ == "__main__":
             print("Processus annulé.")
         elif selected_ips:
             # Si l'utilisateur a sélectionné des IPs valides ou saisi une IP manuellement, effectuer les pings
-            ping_multiple_ips(selected_ips)
+            ping_multiple_ips(selected_ips, liveness=liveness)
         else:
             print("Aucune IP sélectionnée, le processus de ping est annulé.")
     
     except FileNotFoundError:
-        print("Le fichier 'all_ips.txt' n'a pas été trouvé. Assurez-vous que le fichier existe.")
+        print("Aucune IP en ligne connue et le fichier 'all_ips.txt' n'a pas été trouvé. Lancez d'abord un scan.")
+    finally:
+        liveness.close()
@@ -1,203 +1,529 @@
-import subprocess
-import platform
+import argparse
 import ipaddress
-import socket
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+import itertools
 import time
-import nmap
 import os
 import sys
 
-def ping(host):
-    # Détecter le système d'exploitation
-    system_platform = platform.system().lower()
-
-    # Choisir les arguments pour la commande ping en fonction du système d'exploitation
-    if system_platform == "windows":
-        cmd = ['ping', '-n', '1', '-w', '50', host]  # '-w' pour limiter le temps d'attente (50ms)
-    else:
-        cmd = ['ping', '-c', '1', '-W', '1', host]  # '-W' pour définir un délai d'attente plus court
-
-    try:
-        # Exécuter la commande ping et vérifier la réponse
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, timeout=1)
-        return host
-    except subprocess.CalledProcessError:
-        return None
-    except subprocess.TimeoutExpired:
-        return None
-
-def scan_ports(host):
-    # Créer une instance de scanner Nmap
-    nm = nmap.PortScanner()
+# Rendre les modules partagés du dossier 'functionalities' importables quand le script est lancé directement
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functionalities.cpe import DEFAULT_INDEX_PATH, format_cves, open_index
+from functionalities.interfaces import attached_networks
+from functionalities.ipv6 import expand_targets
+from functionalities.liveness import DEFAULT_LIVENESS_PATH, LivenessCache
+from functionalities.metrics import Metrics, MetricsServer, save_scan_metrics
+from functionalities.osfp import ESCALATION_CONFIDENCE, classify, fingerprint_hosts, nmap_banners, nmap_ttls
+from functionalities.results import HostResult
+from functionalities.sinks import SearchSink, SinkGroup, TxtSink
+from functionalities.targets import TargetSet
+from functionalities.tls import EXPIRY_WARNING_DAYS, CertificateCache, TlsInspector, expiry_inventory
+from functionalities.topology import format_path, map_topology, save_topology
+from functionalities.transport import SYSTEM_TRANSPORT, SimulatedNetwork, SimulatedTransport
+from functionalities.udp import DEFAULT_UDP_PORTS, UdpScanner, add_udp_results
+
+def ping(host, transport=SYSTEM_TRANSPORT):
+    # Une requête d'écho par le transport (par défaut le vrai réseau : socket ICMP ou commande ping du système) :
+    # renvoie l'adresse si la machine a répondu, None sinon
+    return host if transport.is_up(host) else None
+
+def scan_ports(host, scanner=None, metrics=None, tls_inspector=None, os_clues=None, cve_index=None,
+               vuln_scripts=False, confirm=False, transport=SYSTEM_TRANSPORT, ttls=None):
+    # Système d'exploitation : seul le classement passif (TTL, ports, bannières) est fait ici ; les indices des
+    # machines incertaines sont ajoutés à 'os_clues' ({ip: indices}) pour un seul appel à fingerprint_hosts
+    # (sonde SYN puis nmap -O) après le scan de toutes les machines. 'ttls' ({ip: TTL}) évite d'analyser à
+    # nouveau le rapport XML quand le scanner rejoue le même rapport pour chaque machine
+    # Utiliser le scanner fourni (par exemple un rejeu de XML enregistré), sinon celui du transport : nmap sur le
+    # vrai réseau par défaut, ou un réseau simulé (voir functionalities/transport.py)
+    nm = scanner if scanner is not None else transport.scanner()
+    # Les mesures sont facultatives : sans objet Metrics elles sont simplement ignorées
+    metrics = metrics if metrics is not None else Metrics(host)
 
     try:
-        # Scanner les ports et obtenir la version des services (-sV) et vérifier les vulnérabilités (--script=vuln)
-        nm.scan(hosts=host, arguments='-p 1-1024 -sV --script=vuln -T4')
-        open_ports = []
-        service_info = {}
-        vulnerabilities = {}
-
-        # Si des ports ouverts sont détectés, les ajouter à la liste
-        if 'tcp' in nm[host]:
-            for port in nm[host]['tcp']:
-                if nm[host]['tcp'][port]['state'] == 'open':
-                    service = nm[host]['tcp'][port].get('name', 'Inconnu')
-                    version = nm[host]['tcp'][port].get('version', 'Inconnue')
-                    open_ports.append(port)
-                    service_info[port] = {'service': service, 'version': version}
-                    
-                    # Recherche des vulnérabilités associées à ce port
-                    if 'script' in nm[host]['tcp'][port]:
-                        vuln_info = nm[host]['tcp'][port]['script']
-                        vulnerabilities[port] = vuln_info
-                    else:
-                        vulnerabilities[port] = 'Aucune vulnérabilité détectée'
-        
-        return host, open_ports, service_info, vulnerabilities
+        # Scanner les ports et obtenir la version des services (-sV) ; les scripts NSE 'vuln' (lents : ils attaquent
+        # chaque service) seulement si demandés, les CVE probables venant sinon de l'index local (functionalities/cpe.py)
+        arguments = '-p 1-1024 -sV --script=vuln -T4' if vuln_scripts else '-p 1-1024 -sV -T4'
+        # nmap ne mélange pas IPv4 et IPv6 : '-6' pour les adresses IPv6 (trouvées par functionalities/ipv6.py)
+        famille = ' -6' if ':' in host else ''
+        arguments += famille
+        metrics.add_gauge('port_scans_in_flight', 1)
+        try:
+            with metrics.span('port_scan'):
+                nm.scan(hosts=host, arguments=arguments)
+        finally:
+            metrics.add_gauge('port_scans_in_flight', -1)
+
+        with metrics.span('parsing'):
+            host_result = HostResult(host)
+            # TTL de la réponse, lu avant que la confirmation ne remplace le rapport du scanner
+            ttl = (ttls if ttls is not None else nmap_ttls(nm.get_nmap_last_output())).get(host)
+
+            # Si des ports ouverts sont détectés, les ajouter au résultat compact (bitmap + tables de services)
+            banners = []
+            if 'tcp' in nm[host]:
+                for port, port_data in nm[host]['tcp'].items():
+                    if port_data['state'] == 'open':
+                        service = port_data.get('name', 'Inconnu')
+                        version = port_data.get('version', 'Inconnue')
+
+                        # Recherche des vulnérabilités associées à ce port
+                        host_result.set_port(port, 'open', service, version, scripts=port_data.get('script'))
+                        banners.extend(nmap_banners(port_data))
+
+                        # CVE connues pour ce produit et cette version (recherche dans l'index, sans trafic réseau)
+                        if cve_index is not None:
+                            cves = cve_index.match_port(port_data)
+                            if cves:
+                                host_result.vulnerabilities[port] = cves
+
+        # Confirmation : les scripts 'vuln' ne tournent que sur les ports signalés par l'index
+        if confirm and not vuln_scripts and host_result.vulnerabilities:
+            flagged = ','.join(map(str, sorted(host_result.vulnerabilities)))
+            metrics.add_gauge('port_scans_in_flight', 1)
+            try:
+                with metrics.span('vuln_confirmation'):
+                    nm.scan(hosts=host, ports=flagged, arguments='-sV --script=vuln -T4' + famille)
+            finally:
+                metrics.add_gauge('port_scans_in_flight', -1)
+            if host in nm.all_hosts():
+                for port, port_data in nm[host].get('tcp', {}).items():
+                    if port_data.get('script'):
+                        host_result.scripts[port] = port_data['script']
+            metrics.inc('vuln_confirmations')
+
+        # Système d'exploitation : TTL des réponses, ports et bannières déjà collectés ; les machines avec des
+        # ports ouverts dont le classement est incertain sont gardées pour la sonde SYN puis nmap -O
+        with metrics.span('os_detection'):
+            ports = list(host_result.ports('open'))
+            clues = {'ttl': ttl, 'ports': ports, 'services': [host_result.service(port)[0] for port in ports],
+                     'banners': banners}
+            guess = classify(ttl, ports=ports, services=clues['services'], banners=banners)
+        host_result.os = [guess.to_osmatch()] if guess.family else []
+        if os_clues is not None and ports and guess.confidence < ESCALATION_CONFIDENCE:
+            os_clues[host] = clues
+        else:
+            metrics.inc('os_guesses', source=guess.source)
+
+        # Récupérer les certificats des ports TLS (HTTPS, STARTTLS, vmware-auth...) en parallèle
+        if tls_inspector is not None:
+            with metrics.span('tls'):
+                tls_inspector.inspect_host(host_result)
+
+        metrics.inc('ports_open', len(host_result.ports('open')))
+        metrics.inc('vuln_script_outputs', len(host_result.scripts))
+        metrics.inc('ports_with_cves', len(host_result.vulnerabilities))
+        return host_result
     except Exception as e:
         print(f"Erreur lors du scan des ports pour {host}: {e}")
-        return host, [], {}, {}
-
-def get_system_info(host):
-    """
-    Récupère les informations du système d'exploitation et de la version pour l'hôte local.
-    """
-    try:
-        # On utilise la machine locale pour obtenir ces infos (si la machine est distante, une connexion SSH serait nécessaire)
-        system_platform = platform.system()
-        system_version = platform.version()
-        
-        # Retourne les informations du système
-        return system_platform, system_version
-    except Exception as e:
-        return None, None
-
-def scan_network(network_ip):
-    # Scanner un réseau IP en envoyant des pings
-    network = ipaddress.ip_network(network_ip, strict=False)
+        metrics.inc('port_scan_errors')
+        return HostResult(host)
+
+def scan_network(network_ip, metrics=None, max_workers=100, transport=SYSTEM_TRANSPORT, liveness=None):
+    # Cibles : sous-réseau, adresses, plages, fichier '@chemin' et exclusions '!' (voir functionalities/targets.py)
+    targets = TargetSet.parse(network_ip)
+    # Sous-réseaux IPv4 : ignorer l'adresse du réseau et celle de diffusion de chacun (comme network.hosts())
+    for cible in network_ip.replace(',', ' ').split():
+        try:
+            network = ipaddress.ip_network(cible, strict=False)
+        except ValueError:
+            continue
+        if network.version == 4 and network.prefixlen < 31:
+            targets = targets - TargetSet([(4, int(network.network_address), int(network.network_address)),
+                                           (4, int(network.broadcast_address), int(network.broadcast_address))])
+    # Réseaux IPv6 : impossibles à balayer (2^64 adresses pour un /64), seules les machines qui répondent au
+    # multicast ff02::1 ou présentes dans la table des voisins sont sondées (voir functionalities/ipv6.py)
+    # Celles qui ont répondu aux sondes multicast sont en ligne sans autre sonde (la table des voisins peut
+    # contenir des machines parties depuis : elles sont sondées)
+    repondu = set()
+    if targets.has_version(6) and transport.live:
+        targets, voisins = expand_targets(targets)
+        repondu = {str(voisin.address) for voisin in voisins if voisin.sources - {'neighbour'}}
+        print(f"Machines IPv6 trouvées sur les liens: {len(voisins)}")
     online_hosts = []
-    total_ips = sum(1 for _ in network.hosts())  # Total d'IP à scanner
+    total_ips = targets.size  # Total d'IP à scanner
+    metrics = metrics if metrics is not None else Metrics(str(network_ip))
+
+    # Cache de disponibilité partagé (voir functionalities/liveness.py) : les adresses vues récemment, en ligne
+    # ou muettes, ne sont pas sondées à nouveau ; les autres résultats y sont enregistrés à la fin
+    known = liveness.lookup(targets) if liveness is not None else {}
+    observed = {}
+
+    def timed_ping(host):
+        if host in known:
+            metrics.inc('liveness_hits')
+            return host if known[host]['up'] else None
+        if host in repondu:
+            observed[host] = True
+            return host
+        # Compter les sondes envoyées et celles en cours pendant la découverte
+        metrics.inc('probes_sent')
+        metrics.add_gauge('probes_in_flight', 1)
+        try:
+            # Sonde du transport (réseau réel ou simulé)
+            result = ping(host, transport)
+            observed[host] = result is not None
+            return result
+        finally:
+            metrics.add_gauge('probes_in_flight', -1)
 
     # Utiliser ThreadPoolExecutor pour effectuer des pings en parallèle
-    with ThreadPoolExecutor(max_workers=100) as executor:  # Augmenter les threads à 100
-        # Soumettre les tâches de ping pour chaque IP dans le sous-réseau
-        futures = {executor.submit(ping, str(ip)): ip for ip in network.hosts()}
+    with metrics.span('discovery'), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Les adresses sont générées au fur et à mesure : seules quelques centaines de tâches existent à la fois
+        addresses = iter(targets)
+        pending = {executor.submit(timed_ping, ip) for ip in itertools.islice(addresses, 4 * max_workers)}
         
         # Parcourir les résultats avec une barre de progression
-        for i, future in enumerate(as_completed(futures), start=1):
-            ip = future.result()
-            if ip:  # Si l'IP est en ligne
-                online_hosts.append(ip)
+        i = 0
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending |= {executor.submit(timed_ping, ip) for ip in itertools.islice(addresses, len(finished))}
+            for future in finished:
+                i += 1
+                ip = future.result()
+                if ip:  # Si l'IP est en ligne
+                    online_hosts.append(ip)
+                    metrics.inc('replies')
+            # Sondes pas encore terminées (en attente dans la file ou en cours)
+            metrics.set_gauge('discovery_queue_depth', total_ips - i)
             # Mise à jour de la barre de progression
             sys.stdout.write(f"\rScan réseau : {i}/{total_ips} ({(i / total_ips) * 100:.2f}%)")
             sys.stdout.flush()
 
-    return online_hosts, network
+    if liveness is not None:
+        liveness.record_many(observed, source='ping')
+    return online_hosts, targets
+
+# Système d'exploitation d'une machine : correspondances 'nom (précision%)' (nmap -O ou classement passif),
+# ou le texte lu dans un ancien rapport
+def format_os(host_result):
+    if isinstance(host_result.os, str):
+        return host_result.os or 'Inconnu'
+    return ', '.join(f"{match['name']} ({match.get('accuracy', '?')}%)" for match in host_result.os) or 'Inconnu'
 
 # Fonction pour afficher les informations sur chaque machine
-def display_machine_info(ip, system_platform, system_version, open_ports, service_info, vulnerabilities):
-    print(f"\n--- Informations pour la machine {ip} ---")
-    print(f"Système d'exploitation: {system_platform} {system_version}")
+def display_machine_info(host_result):
+    print(f"\n--- Informations pour la machine {host_result.host} ---")
+    print(f"Système d'exploitation: {format_os(host_result)}")
+    open_ports = host_result.ports('open')
     if open_ports:
         print(f"Ports ouverts: {', '.join(map(str, open_ports))}")
         for port in open_ports:
-            service = service_info.get(port, {}).get('service', 'Inconnu')
-            version = service_info.get(port, {}).get('version', 'Inconnue')
-            print(f"  Port {port}: {service} {version}")
-            print(f"  Vulnérabilités: {vulnerabilities.get(port, 'Aucune vulnérabilité détectée')}")
+            service, version = host_result.service(port)
+            print(f"  Port {port}: {service or 'Inconnu'} {version}")
+            print(f"  Vulnérabilités: {host_result.scripts.get(port, 'Aucune vulnérabilité détectée')}")
+            if port in host_result.vulnerabilities:
+                print(f"  Vulnérabilités probables: {format_cves(host_result.vulnerabilities[port])}")
+            if port in host_result.certificates:
+                print(f"  Certificat: {format_certificate(host_result.certificates[port])}")
     else:
         print("Aucun port ouvert")
+    udp_ports = host_result.ports('open', 'udp')
+    if udp_ports:
+        print(f"Ports UDP ouverts: {', '.join(map(str, udp_ports))}")
     print("--------------------------")
 
-# Obtenez l'adresse IP locale de votre machine de manière plus fiable
-local_ip = socket.gethostbyname(socket.gethostname())
-
-# Trouver l'adresse du sous-réseau en utilisant la partie réseau de l'adresse IP locale
-network_ip = '.'.join(local_ip.split('.')[:-1]) + '.0/24'
-
-# Créer le dossier 'resultat' si il n'existe pas
-output_dir = "resultat"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-# Scanner le réseau
-start_time = time.time()
-ip_dispo, network = scan_network(network_ip)
-end_time = time.time()
-
-# Afficher les informations de sous-réseau et le nombre total de machines connectées
-print(f"\nSous-réseau scanné: {network_ip}")
-print(f"Nombre total de machines connectées: {len(ip_dispo)}")
-
-# Stocker les IP des machines connectées et leurs informations systèmes
-machine_info = []
-
-# Scanner les ports de toutes les machines en ligne sans barre de progression
-with ThreadPoolExecutor(max_workers=10) as executor:  # Utilisation de threads pour le scan de ports
-    futures = {executor.submit(scan_ports, ip): ip for ip in ip_dispo}
-    
-    # Parcourir les résultats avec une barre de progression
-    for i, future in enumerate(as_completed(futures), start=1):
-        ip, open_ports, service_info, vulnerabilities = future.result()
-
-        # Récupérer les informations système de la machine
-        system_platform, system_version = get_system_info(ip)
+def format_certificate(certificate):
+    # Sujet, noms alternatifs, émetteur, expiration et type de clé d'un certificat TLS
+    names = f" [{', '.join(certificate['sans'])}]" if certificate['sans'] else ''
+    issuer = 'auto-signé' if certificate['self_signed'] else certificate['issuer']
+    return (f"{certificate['subject']}{names}, émis par {issuer}, expire le {certificate['not_after'][:10]}, "
+            f"{certificate['key_type']}, SHA-256 {certificate['fingerprint_sha256']}")
+
+# Fonctions de mise en forme du rapport texte (utilisées par le TxtSink au fil du scan)
+def format_report_header(total_machines):
+    def format_header(scan_time, network_range):
+        # Écrire la date de création et le nombre total de machines
+        return (f"Date de création du fichier : {scan_time}\n"
+                f"\nTotal de machines connectées: {total_machines}\n")
+    return format_header
+
+def format_machine_report(host_result):
+    open_ports = host_result.ports('open')
+    lines = [
+        f"IP: {host_result.host}",
+        f"  Système d'exploitation: {format_os(host_result)}",
+        f"  Ports ouverts: {', '.join(map(str, open_ports)) if open_ports else 'Aucun port ouvert'}"
+    ]
+    for port in open_ports:
+        service, version = host_result.service(port)
+        lines.append(f"    Port {port}: {service or 'Inconnu'} {version}")
+        lines.append(f"    Vulnérabilités: {host_result.scripts.get(port, 'Aucune vulnérabilité détectée')}")
+        if port in host_result.vulnerabilities:
+            lines.append(f"    Vulnérabilités probables: {format_cves(host_result.vulnerabilities[port])}")
+        if port in host_result.certificates:
+            lines.append(f"    Certificat: {format_certificate(host_result.certificates[port])}")
+    udp_ports = host_result.ports('open', 'udp')
+    if udp_ports:
+        lines.append(f"  Ports UDP ouverts: {', '.join(map(str, udp_ports))}")
+        for port in udp_ports:
+            service, version = host_result.service(port, 'udp')
+            lines.append(f"    Port {port}/udp: {service or 'Inconnu'} {version}")
+    return "\n".join(lines) + "\n\n"
+
+def scan_udp(hosts, metrics=None):
+    """
+    Scanner les ports UDP courants (DNS, NTP, SNMP, NetBIOS...) de toutes les machines en ligne.
 
-        # Ajouter l'IP, les informations système, les ports ouverts, les versions de services et vulnérabilités à la liste
-        machine_info.append((ip, system_platform, system_version, open_ports, service_info, vulnerabilities))
+    Retourne:
+        dict: {ip: {port: (état, service, version)}}.
+    """
+    start = time.perf_counter()
+    results = UdpScanner(DEFAULT_UDP_PORTS).scan(hosts)
+    if metrics is not None:
+        metrics.observe('udp_scan', time.perf_counter() - start)
+        metrics.inc('udp_probes', len(hosts) * len(DEFAULT_UDP_PORTS))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan du sous-réseau local (découverte, ports, vulnérabilités).")
+    parser.add_argument('cibles', nargs='*',
+                        help="Cibles à scanner (CIDR, adresses, plages, noms, '@fichier') au lieu du sous-réseau local")
+    parser.add_argument('--exclure', action='append', default=[],
+                        help="Cibles à ne pas scanner (même syntaxe, par exemple '--exclure @sensibles.txt')")
+    parser.add_argument('--sans-udp', action='store_true',
+                        help=f"Ne pas scanner les ports UDP ({', '.join(map(str, DEFAULT_UDP_PORTS))})")
+    parser.add_argument('--sans-tls', action='store_true',
+                        help="Ne pas récupérer les certificats des ports TLS")
+    parser.add_argument('--scripts-vuln', action='store_true',
+                        help="Lancer les scripts NSE 'vuln' sur tous les services (lent) au lieu de l'index CVE local")
+    parser.add_argument('--confirmer', action='store_true',
+                        help="Lancer les scripts NSE 'vuln' seulement sur les ports signalés par l'index CVE")
+    parser.add_argument('--index-cve', default=DEFAULT_INDEX_PATH,
+                        help="Index des CVE construit par 'python -m functionalities.cpe import <flux NVD>' "
+                             f"(par défaut {DEFAULT_INDEX_PATH})")
+    parser.add_argument('--ipv6', action='store_true',
+                        help="Scanner aussi les réseaux IPv6 des interfaces (machines trouvées par multicast et dans "
+                             "la table des voisins, sans balayer les /64)")
+    parser.add_argument('--topologie', action='store_true',
+                        help="Tracer les routes vers les machines en ligne (toutes en même temps) et enregistrer le "
+                             "graphe des routeurs dans resultat/topology")
+    parser.add_argument('--simulation', metavar='MODELE.json',
+                        help="Scanner un réseau simulé décrit par un modèle JSON (machines, ports, latences, pertes, "
+                             "limites de débit ; voir functionalities/transport.py) au lieu du vrai réseau")
+    parser.add_argument('--echelle-temps', type=float, default=1.0,
+                        help="Avec --simulation : fraction des délais simulés réellement attendue (0 : aucune attente)")
+    parser.add_argument('--sans-cache', action='store_true',
+                        help="Sonder toutes les adresses, même celles dont l'état récent est connu "
+                             f"(cache de disponibilité {DEFAULT_LIVENESS_PATH})")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Exposer les mesures en direct sur http://127.0.0.1:<port>/metrics (format Prometheus)")
+    args = parser.parse_args()
+
+    # Réseau simulé : sondes et scans nmap répondus par le modèle (les sondes TLS, UDP et d'OS, réelles, sont désactivées)
+    transport = SYSTEM_TRANSPORT
+    if args.simulation:
+        transport = SimulatedTransport(SimulatedNetwork.load(args.simulation), args.echelle_temps)
+        args.sans_udp = args.sans_tls = True
+
+    # Par défaut : tous les réseaux des interfaces, avec leur vrai préfixe (lus dans le noyau, voir functionalities/interfaces.py)
+    if args.cibles:
+        network_ip = ' '.join(args.cibles)
+    elif args.simulation:
+        network_ip = ' '.join(transport.network.networks())
+        print(f"Réseau simulé: {network_ip}")
+    else:
+        reseaux = attached_networks() + (attached_networks(version=6) if args.ipv6 else [])
+        for entree in reseaux:
+            print(f"Réseau détecté: {entree.network} sur {entree.interface} ({entree.address})")
+        network_ip = ' '.join(str(entree.network) for entree in reseaux)
+        if not network_ip:
+            print("Aucun réseau trouvé sur les interfaces.")
+            return
+    if args.exclure:
+        network_ip += ' ' + ' '.join('!' + cible for exclusion in args.exclure for cible in exclusion.replace(',', ' ').split())
+
+    # Créer le dossier 'resultat' si il n'existe pas
+    output_dir = "resultat"
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # Mesures du scan (durées par phase et compteurs), éventuellement servies en HTTP pendant le scan
+    metrics = Metrics(network_ip)
+    metrics.info.update(profile='vuln_1024' if args.scripts_vuln else 'version_1024', ports_per_host=1024)
+    metrics_server = MetricsServer(metrics, port=args.metrics_port).start() if args.metrics_port else None
+
+    # Index local des CVE (fichier projeté en mémoire, partagé par les threads du scan des ports)
+    cve_index = open_index(args.index_cve)
+    if cve_index is None and not args.scripts_vuln:
+        print(f"Index CVE '{args.index_cve}' absent : pas de vulnérabilités probables "
+              f"(voir 'python -m functionalities.cpe import').")
+
+    # Cache de disponibilité partagé avec l'interface graphique et fonctions/ping.py (pas pour un réseau simulé :
+    # ses adresses ne sont pas celles du vrai réseau). Avec --sans-cache, il est seulement mis à jour.
+    liveness = LivenessCache() if transport.live else None
+    if liveness is not None and args.sans_cache:
+        liveness.invalidate(TargetSet.parse(network_ip))
+
+    # Scanner le réseau
+    start_time = time.time()
+    ip_dispo, targets = scan_network(network_ip, metrics, transport=transport, liveness=liveness)
+    end_time = time.time()
+    if liveness is not None:
+        liveness.close()
+
+    # Afficher les informations de sous-réseau et le nombre total de machines connectées
+    print(f"\nSous-réseau scanné: {network_ip}")
+    print(f"Nombre total de machines connectées: {len(ip_dispo)}")
+    print(f"Durée de la découverte: {end_time - start_time:.2f} s")
+    if metrics.counter('liveness_hits'):
+        print(f"Adresses connues du cache de disponibilité (non sondées): {metrics.counter('liveness_hits')}")
+
+    # Liste des IP en ligne pour les autres outils (le cache de disponibilité garde, lui, l'état de chaque adresse)
+    all_ips_file = os.path.join(output_dir, 'all_ips.txt')
+
+    # Créer ou écraser le fichier 'all_ips.txt' et y écrire les nouvelles IPs dès la fin de la découverte
+    with open(all_ips_file, 'w', encoding='utf-8') as f:
+        for ip in ip_dispo:
+            f.write(ip + '\n')
+
+    # Le rapport est écrit machine par machine pendant le scan des ports (fichier '.part' renommé à la fin)
+    file_path = os.path.join(output_dir, f'last_scan.txt')
+    # Les machines sont aussi ajoutées à l'index de recherche (scripts, CVE, services : voir functionalities/search.py)
+    report = SinkGroup([TxtSink(file_path, format_machine_report, format_report_header(len(ip_dispo))),
+                        SearchSink(os.path.join(output_dir, 'search'), 'last_scan.txt')])
+
+    # Certificats TLS : les certificats déjà vus (même empreinte) ne sont pas décodés à nouveau
+    tls_cache = CertificateCache(os.path.join(output_dir, 'tls', 'certificates.json'))
+    tls_inspector = None if args.sans_tls else TlsInspector(cache=tls_cache, metrics=metrics)
+    expiring_certificates = []
+
+    # Compteur des machines avec des ports ouverts (les résultats ne sont pas gardés en mémoire)
+    machines_scanned = 0
+    machines_with_open_ports = 0
+
+    # Machines dont l'OS est incertain : écrites après une seule passe de sondes SYN et de nmap -O pour toutes
+    os_probes = transport.live
+    os_clues = {} if os_probes else None
+    os_pending = []
+
+    def write_machine(host_result):
+        nonlocal machines_scanned, machines_with_open_ports
+        # Écrire immédiatement la machine dans le rapport
+        with metrics.span('output'):
+            report.write_host(host_result)
+        metrics.inc('hosts_written')
+        machines_scanned += 1
+        if host_result.ports('open'):
+            machines_with_open_ports += 1
+        expiring_certificates.extend(expiry_inventory([host_result], EXPIRY_WARNING_DAYS))
 
         # Afficher les informations de la machine dans la console
-        display_machine_info(ip, system_platform, system_version, open_ports, service_info, vulnerabilities)
-
-        # Mise à jour de la barre de progression pour le scan des ports
-        sys.stdout.write(f"\rScan des ports : {i}/{len(ip_dispo)} ({(i / len(ip_dispo)) * 100:.2f}%)")
-        sys.stdout.flush()
-
-# Calcul du pourcentage du scan du réseau
-total_ips_count = len(list(network.hosts()))  # Nombre total d'IP à scanner
-reachable_ips_count = len(ip_dispo)  # Nombre d'IP qui ont répondu au ping
-network_percentage = (reachable_ips_count / total_ips_count) * 100 if total_ips_count > 0 else 0
-
-# Calcul du pourcentage du scan des ports
-machines_with_open_ports = sum(1 for _, _, _, open_ports, _, _ in machine_info if open_ports)
-port_scan_percentage = (machines_with_open_ports / len(machine_info)) * 100 if len(machine_info) > 0 else 0
-
-# Générer un nom unique pour le fichier de scan
-timestamp = time.strftime('%Y%m%d_%H%M%S')
-file_path = os.path.join(output_dir, f'last_scan.txt')
-
-# Créer le fichier pour ce scan avec un nom unique
-with open(file_path, 'w', encoding='utf-8') as f:
-    # Écrire la date de création
-    f.write(f"Date de création du fichier : {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-
-    # Ajouter le nombre total de machines
-    f.write(f"\nTotal de machines connectées: {len(machine_info)}\n")
-    
-    # Enregistrer les informations de chaque machine dans le fichier
-    for ip, system_platform, system_version, open_ports, service_info, vulnerabilities in machine_info:
-        f.write(f"IP: {ip}\n")
-        f.write(f"  Système d'exploitation: {system_platform} {system_version}\n")
-        f.write(f"  Ports ouverts: {', '.join(map(str, open_ports)) if open_ports else 'Aucun port ouvert'}\n")
-        for port in open_ports:
-            service = service_info.get(port, {}).get('service', 'Inconnu')
-            version = service_info.get(port, {}).get('version', 'Inconnue')
-            f.write(f"    Port {port}: {service} {version}\n")
-            f.write(f"    Vulnérabilités: {vulnerabilities.get(port, 'Aucune vulnérabilité détectée')}\n")
-        f.write("\n")
-
-# Afficher le nombre total de machines connectées dans la console
-print(f"\nTotal de machines connectées: {len(machine_info)}")
-
-print(f"Les informations du dernier scan ont été sauvegardées dans '{file_path}'.")
+        display_machine_info(host_result)
+
+    # Ports UDP : les machines terminées avant la fin du scan UDP attendent ses résultats (sans bloquer la boucle)
+    udp_results = None
+    udp_pending = []
+
+    def udp_finished(wait=False):
+        nonlocal udp_results
+        if udp_results is None and udp_future is not None and (wait or udp_future.done()):
+            try:
+                udp_results = udp_future.result()
+            except Exception as e:
+                # Un échec du scan UDP ne doit pas faire perdre le rapport TCP
+                print(f"\nErreur lors du scan UDP: {e}")
+                metrics.inc('udp_scan_errors')
+                udp_results = {}
+        return udp_future is None or udp_results is not None
+
+    def finish_machine(host_result):
+        # Ajouter les ports UDP de la machine, puis l'écrire (ou la garder pour la détection d'OS groupée)
+        if udp_results:
+            add_udp_results(host_result, udp_results.get(host_result.host, {}))
+        if os_clues is not None and host_result.host in os_clues:
+            os_pending.append(host_result)
+        else:
+            write_machine(host_result)
+
+    # Le scan UDP (asynchrone, quelques secondes par port) tourne pendant le scan TCP des machines, dans son propre
+    # thread pour ne pas prendre la place d'un scan de ports
+    udp_executor = ThreadPoolExecutor(max_workers=1)
+    udp_future = None if args.sans_udp else udp_executor.submit(scan_udp, ip_dispo, metrics)
+
+    # Scanner les ports de toutes les machines en ligne
+    with report, udp_executor, ThreadPoolExecutor(max_workers=10) as executor:  # Threads pour le scan de ports
+        report.open(time.strftime('%Y-%m-%d %H:%M:%S'), network_ip)
+        futures = {executor.submit(scan_ports, ip, metrics=metrics, tls_inspector=tls_inspector, cve_index=cve_index,
+                                   vuln_scripts=args.scripts_vuln, confirm=args.confirmer, transport=transport,
+                                   os_clues=os_clues): ip for ip in ip_dispo}
+        
+        # Parcourir les résultats avec une barre de progression
+        for i, future in enumerate(as_completed(futures), start=1):
+            host_result = future.result()
+            metrics.set_gauge('port_scan_queue_depth', len(ip_dispo) - i)
 
-# Ouvrir le fichier 'all_ips.txt' en mode 'w' pour écraser les informations précédentes
-all_ips_file = os.path.join(output_dir, 'all_ips.txt')
+            udp_pending.append(host_result)
+            if udp_finished():
+                for pending in udp_pending:
+                    finish_machine(pending)
+                udp_pending.clear()
 
-# Créer ou écraser le fichier 'all_ips.txt' et y écrire les nouvelles IPs
-with open(all_ips_file, 'w', encoding='utf-8') as f:
-    for ip in ip_dispo:
-        f.write(ip + '\n')
+            # Mise à jour de la barre de progression pour le scan des ports
+            sys.stdout.write(f"\rScan des ports : {i}/{len(ip_dispo)} ({(i / len(ip_dispo)) * 100:.2f}%)")
+            sys.stdout.flush()
 
-print(f"Les adresses IP ont été ajoutées à '{all_ips_file}'.")
+        # Machines qui attendaient la fin du scan UDP
+        udp_finished(wait=True)
+        for pending in udp_pending:
+            finish_machine(pending)
+
+        # OS incertains : un seul appel pour toutes les machines (sondes SYN en parallèle, puis un seul nmap -O)
+        if os_pending:
+            with metrics.span('os_detection'):
+                guesses = fingerprint_hosts(os_clues, probe=os_probes, escalate=os_probes)
+            for host_result in os_pending:
+                guess = guesses[host_result.host]
+                host_result.os = [guess.to_osmatch()] if guess.family else []
+                metrics.inc('os_guesses', source=guess.source)
+                write_machine(host_result)
+
+    # Calcul du pourcentage du scan du réseau
+    total_ips_count = targets.size  # Nombre total d'IP à scanner
+    reachable_ips_count = len(ip_dispo)  # Nombre d'IP qui ont répondu au ping
+    network_percentage = (reachable_ips_count / total_ips_count) * 100 if total_ips_count > 0 else 0
+
+    # Calcul du pourcentage du scan des ports
+    port_scan_percentage = (machines_with_open_ports / machines_scanned) * 100 if machines_scanned > 0 else 0
+
+    # Afficher le nombre total de machines connectées dans la console
+    print(f"\nTotal de machines connectées: {machines_scanned}")
+
+    if cve_index is not None:
+        cve_index.close()
+
+    # Routes vers les machines en ligne : une passe de sondes à TTL limité pour toutes (voir functionalities/topology.py)
+    topology_path = None
+    if args.topologie and transport.live:
+        with metrics.span('topology'):
+            topology = map_topology(ip_dispo, metrics=metrics)
+        if topology is not None:
+            print("\nRoutes:")
+            for path in topology.paths:
+                print(f"  {format_path(path)}")
+            topology_path = save_topology(topology, output_dir, time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime(start_time)))
+        else:
+            print("\nTopologie indisponible (Linux seulement, IP_RECVERR).")
+
+    # Certificats qui expirent bientôt (ou déjà expirés)
+    tls_cache.save()
+    if expiring_certificates:
+        print(f"\nCertificats expirant dans moins de {EXPIRY_WARNING_DAYS} jours:")
+        for days, ip, port, common_name, not_after in sorted(expiring_certificates):
+            print(f"  {ip}:{port} {common_name or '?'} - {not_after[:10]} ({days:.0f} jours)")
+
+    # Enregistrer le résumé des mesures avec les résultats (resultat/metrics)
+    metrics.inc('bytes_written', os.path.getsize(file_path) + os.path.getsize(all_ips_file))
+    metrics.finish()
+    summary_path = save_scan_metrics(metrics, output_dir, time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime(start_time)))
+    print(metrics.format_summary())
+    if metrics_server is not None:
+        metrics_server.stop()
+
+    print(f"Les informations du dernier scan ont été sauvegardées dans '{file_path}'.")
+    print(f"Les adresses IP ont été ajoutées à '{all_ips_file}'.")
+    print(f"Les mesures du scan ont été sauvegardées dans '{summary_path}'.")
+    if topology_path:
+        print(f"Le graphe des routes a été sauvegardé dans '{topology_path}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,681 @@
+import argparse
+import asyncio
+import ipaddress
+import itertools
+import json
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from functionalities.jobs import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, JobManager
+from functionalities.targets import TargetSet
+
+DEFAULT_API_HOST = '127.0.0.1'
+DEFAULT_API_PORT = 8765
+
+# Request limits: the API is local, these only protect it from broken clients
+MAX_BODY_SIZE = 64 * 1024
+MAX_HEADERS = 64
+REQUEST_TIMEOUT = 30
+
+# Pending connections the kernel queues before the loop accepts them (bursts of clients)
+BACKLOG = 1024
+
+# Seconds between keep-alive comments on an idle event stream
+KEEPALIVE_INTERVAL = 15
+
+# Largest ping job (addresses); sweeps belong to the scanner
+MAX_PING_TARGETS = 4096
+
+PRIORITIES = {'high': PRIORITY_HIGH, 'normal': PRIORITY_NORMAL, 'low': PRIORITY_LOW}
+
+STATUS_TEXT = {
+    200: 'OK', 201: 'Created', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+
+class HttpError(Exception):
+    """An error answered to the client as {'error': message} with the given status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ResultFeed:
+    """
+    Results of one job, kept in order and followed by any number of clients.
+
+    Worker threads push results with push() and close(); clients iterate with
+    follow() on the event loop and wake up as results arrive.
+
+    Args:
+        loop (asyncio.AbstractEventLoop): The loop of the API server.
+        on_drained (function): Called on the loop once the feed is closed and
+            no client follows it any more (e.g. to forget it).
+    """
+
+    def __init__(self, loop, on_drained=None):
+        self.loop = loop
+        self.items = []
+        self.closed = False
+        self.changed = asyncio.Event()
+        self.followers = 0
+        self.on_drained = on_drained
+
+    def push(self, item):
+        """Add a result (thread-safe)."""
+        self._call(self._append, item)
+
+    def close(self):
+        """Mark the feed as complete (thread-safe)."""
+        self._call(self._close)
+
+    def _call(self, function, *args):
+        try:
+            self.loop.call_soon_threadsafe(function, *args)
+        except RuntimeError:
+            pass  # The server was stopped: nobody is listening any more
+
+    def _append(self, item):
+        self.items.append(item)
+        self._wake()
+
+    def _close(self):
+        self.closed = True
+        self._wake()
+        self._check_drained()
+
+    def _check_drained(self):
+        if self.closed and not self.followers and self.on_drained is not None:
+            on_drained, self.on_drained = self.on_drained, None
+            on_drained()
+
+    def _wake(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def follow(self, start=0, keepalive=None):
+        """
+        Yield (index, item) for every result from 'start', waiting for new ones until the feed is closed.
+
+        With 'keepalive', (index, None) is yielded after that many idle seconds.
+        """
+        index = start
+        self.followers += 1
+        try:
+            while True:
+                while index < len(self.items):
+                    yield index, self.items[index]
+                    index += 1
+                if self.closed:
+                    return
+                changed = self.changed
+                try:
+                    await asyncio.wait_for(changed.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield index, None
+        finally:
+            self.followers -= 1
+            self._check_drained()
+
+
+class PingJob:
+    """
+    A latency measurement of a list of hosts (fonctions.ping.probe_latency), run by the API.
+
+    States: 'queued', 'running', 'done', 'failed'.
+    """
+
+    def __init__(self, job_id, targets, hosts, count, interval, timeout):
+        self.id = job_id
+        self.targets = targets
+        self.hosts = hosts
+        self.count = count
+        self.interval = interval
+        self.timeout = timeout
+        self.state = 'queued'
+        self.results = {}
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def __repr__(self):
+        return f"<PingJob #{self.id} {self.targets} {self.state}>"
+
+
+def scan_job_status(job):
+    """Return the JSON description of a ScanJob."""
+    result = job.result
+    return {
+        'id': job.id,
+        'target': str(job.target),
+        'interface': job.interface,
+        'trace_routes': job.trace_routes,
+        'state': job.state,
+        'priority': job.priority,
+        'progress': round(job.progress, 1),
+        'hosts': len(result) if result is not None else None,
+        'merged_into': job.merged_into.id if job.merged_into is not None else None,
+        'error': str(job.error) if job.error else None,
+        'submitted_at': job.submitted_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def ping_job_status(job):
+    """Return the JSON description of a PingJob."""
+    return {
+        'id': job.id,
+        'targets': job.targets,
+        'state': job.state,
+        'count': job.count,
+        'hosts': len(job.hosts),
+        'finished': len(job.results),
+        'reachable': sum(1 for stats in job.results.values() if stats['reachable']),
+        'error': job.error,
+        'submitted_at': job.submitted_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+
+    def __init__(self, method, target, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.path = [part for part in url.path.split('/') if part]
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Return the body as a JSON object ({} if empty)."""
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError as e:
+            raise HttpError(400, f"Invalid JSON body: {e}")
+        if not isinstance(data, dict):
+            raise HttpError(400, "The body must be a JSON object")
+        return data
+
+    def wants_events(self):
+        """True if the client asked for Server-Sent Events rather than JSON Lines."""
+        if 'format' in self.query:
+            return self.query['format'] == 'sse'
+        return 'text/event-stream' in self.headers.get('accept', '')
+
+
+class ApiServer:
+    """
+    Local HTTP API to drive scans and pings from other programs.
+
+    One asyncio event loop serves every client: requests are parsed and
+    answered on the loop, scans run on the JobManager's workers and pings on
+    a small thread pool, and their results are handed to the loop as they
+    finish. Results of a job can be followed while it runs, as Server-Sent
+    Events ('Accept: text/event-stream' or ?format=sse) or as chunked JSON
+    Lines (default); '?from=N' (or SSE's Last-Event-ID) resumes a stream.
+
+    There is no authentication: the server only listens on a loopback
+    address or on a Unix socket readable by its owner.
+
+    Endpoints:
+        GET    /health
+        GET    /scans                      Scan jobs of the JobManager
+        POST   /scans                      {"target": "192.168.1.0/24", "priority": "normal", "interface": null,
+                                            "trace_routes": false}
+        GET    /scans/{id}
+        DELETE /scans/{id}?keep_partial=1  Cancel
+        GET    /scans/{id}/hosts           Hosts as they are finished
+        GET    /pings
+        POST   /pings                      {"targets": "192.168.1.1-20", "count": 4, "interval": 1.0, "timeout": 1}
+        GET    /pings/{id}
+        GET    /pings/{id}/results         Latency statistics as hosts finish
+
+    Args:
+        job_manager (JobManager): Runs the scans (a new one if None).
+        output_folder (str): Where the scans submitted through the API are saved.
+        host (str): Loopback address to listen on.
+        port (int): TCP port to listen on.
+        unix_socket (str): Path of a Unix socket to listen on instead of TCP.
+        ping_workers (int): Ping jobs that may run at the same time.
+    """
+
+    def __init__(self, job_manager=None, output_folder='scans', host=DEFAULT_API_HOST, port=DEFAULT_API_PORT,
+                 unix_socket=None, ping_workers=2):
+        if unix_socket is None and host != 'localhost' and not ipaddress.ip_address(host).is_loopback:
+            raise ValueError(f"The API has no authentication and only listens on loopback addresses, not {host}")
+        self.job_manager = job_manager or JobManager()
+        self.output_folder = output_folder
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.ping_executor = ThreadPoolExecutor(max_workers=ping_workers)
+        self.ping_jobs = {}
+        self.ping_ids = itertools.count(1)
+        self.scan_feeds = {}
+        self.ping_feeds = {}
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    # Server lifecycle
+
+    async def start(self):
+        """Start listening on the running loop; returns the asyncio server."""
+        self.loop = asyncio.get_running_loop()
+        if self.unix_socket:
+            if os.path.exists(self.unix_socket) and stat.S_ISSOCK(os.stat(self.unix_socket).st_mode):
+                os.remove(self.unix_socket)  # Left over by a previous run
+            self.server = await asyncio.start_unix_server(self._handle, path=self.unix_socket, backlog=BACKLOG)
+            os.chmod(self.unix_socket, 0o600)
+        else:
+            self.server = await asyncio.start_server(self._handle, self.host, self.port, backlog=BACKLOG)
+        return self.server
+
+    async def serve_forever(self, ready=None):
+        """Serve until stop() is called; 'ready' (threading.Event) is set once listening."""
+        await self.start()
+        if ready is not None:
+            ready.set()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self.unix_socket and os.path.exists(self.unix_socket):
+                os.remove(self.unix_socket)
+
+    def start_in_thread(self):
+        """
+        Run the server on its own event loop in a daemon thread (for the Tk application).
+
+        Raises:
+            OSError: If the address cannot be bound (e.g. the port is in use).
+        """
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            try:
+                asyncio.run(self.serve_forever(ready))
+            except Exception as e:
+                errors.append(e)
+                ready.set()
+
+        self.thread = threading.Thread(target=run, name='api-server', daemon=True)
+        self.thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self.thread
+
+    def stop(self):
+        """Stop listening (thread-safe); running jobs are not cancelled."""
+        if self.loop is not None and self.server is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.server.close)
+            except RuntimeError:
+                pass
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        self.ping_executor.shutdown(wait=False)
+
+    @property
+    def address(self):
+        """The address clients connect to ('http://127.0.0.1:8765' or the socket path)."""
+        if self.unix_socket:
+            return self.unix_socket
+        port = self.server.sockets[0].getsockname()[1] if self.server and self.server.sockets else self.port
+        return f"http://{self.host}:{port}"
+
+    # HTTP
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(400, "Too many headers")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return Request(method.upper(), target, headers, body)
+
+    async def _handle(self, reader, writer):
+        # One request per connection (Connection: close): streams end with the job
+        try:
+            try:
+                request = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+                if request is not None:
+                    await self._dispatch(request, writer)
+            except HttpError as e:
+                await self._send_json(writer, e.status, {'error': str(e)})
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                await self._send_json(writer, 400, {'error': "Incomplete or invalid request"})
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+            except Exception as e:
+                await self._send_json(writer, 500, {'error': f"{type(e).__name__}: {e}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _head(status, headers):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers]
+        lines.append('Connection: close')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def _send_json(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(self._head(status, [('Content-Type', 'application/json; charset=utf-8'),
+                                         ('Content-Length', len(body))]) + body)
+        await writer.drain()
+
+    async def _stream(self, writer, request, feed, event, final_status):
+        """
+        Send the items of a feed as they arrive, then an 'end' event with the final job status.
+
+        SSE: 'id: N', 'event: <event>', 'data: <json>' per item. JSON Lines:
+        {"event": ..., "id": N, "data": ...} per line, in HTTP chunks.
+        """
+        sse = request.wants_events()
+        try:
+            if 'from' in request.query:
+                start = int(request.query['from'])
+            else:
+                start = int(request.headers.get('last-event-id', -1)) + 1
+        except ValueError:
+            raise HttpError(400, "Invalid 'from' position")
+        if sse:
+            headers = [('Content-Type', 'text/event-stream; charset=utf-8'), ('Cache-Control', 'no-cache')]
+        else:
+            headers = [('Content-Type', 'application/x-ndjson; charset=utf-8'), ('Transfer-Encoding', 'chunked')]
+        writer.write(self._head(200, headers))
+
+        def frame(index, name, data):
+            if sse:
+                return f"id: {index}\nevent: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+            line = json.dumps({'event': name, 'id': index, 'data': data}, ensure_ascii=False).encode('utf-8') + b'\n'
+            return f"{len(line):x}\r\n".encode('ascii') + line + b'\r\n'
+
+        items = feed.follow(max(start, 0), KEEPALIVE_INTERVAL)
+        try:
+            async for index, item in items:
+                if item is None:
+                    if sse:
+                        writer.write(b': keepalive\n\n')
+                else:
+                    writer.write(frame(index, event, item))
+                await writer.drain()
+        finally:
+            # A client that went away stops following at once, so a drained feed is released
+            await items.aclose()
+        writer.write(frame(len(feed.items), 'end', final_status()))
+        if not sse:
+            writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def _dispatch(self, request, writer):
+        path, method = request.path, request.method
+        routes = {
+            ('health',): {'GET': self._health},
+            ('scans',): {'GET': self._list_scans, 'POST': self._submit_scan},
+            ('scans', None): {'GET': self._scan_status, 'DELETE': self._cancel_scan},
+            ('pings',): {'GET': self._list_pings, 'POST': self._submit_ping},
+            ('pings', None): {'GET': self._ping_status},
+        }
+        if len(path) == 3 and path[0] == 'scans' and path[2] == 'hosts' and method == 'GET':
+            job = self._scan_job(path[1])
+            await self._stream(writer, request, self._scan_feed(job), 'host', lambda: scan_job_status(job))
+            return
+        if len(path) == 3 and path[0] == 'pings' and path[2] == 'results' and method == 'GET':
+            job = self._ping_job(path[1])
+            await self._stream(writer, request, self._ping_feed(job), 'result', lambda: ping_job_status(job))
+            return
+
+        key = tuple(path[:1]) + (None,) * (len(path) - 1)
+        handlers = routes.get(key)
+        if handlers is None:
+            raise HttpError(404, f"Unknown path /{'/'.join(path)}")
+        handler = handlers.get(method)
+        if handler is None:
+            raise HttpError(405, f"{method} not allowed on /{'/'.join(path)}")
+        status, payload = handler(request, *path[1:])
+        await self._send_json(writer, status, payload)
+
+    # Scans
+
+    def _scan_job(self, job_id):
+        job = self.job_manager.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            raise HttpError(404, f"Unknown scan job {job_id}")
+        # A merged job's results are those of the job that absorbed it
+        while job.merged_into is not None:
+            job = job.merged_into
+        return job
+
+    def _release(self, feeds, job_id, feed):
+        """Return a function that forgets a drained feed (the job keeps its results)."""
+        def release():
+            if feeds.get(job_id) is feed:
+                del feeds[job_id]
+        return release
+
+    def _scan_feed(self, job):
+        """
+        Return the feed of a scan job.
+
+        Feeds are forgotten once their job has finished and their clients have
+        drained them: a finished job gets a closed feed of its results that is
+        not kept. Jobs not submitted through the API get one too.
+        """
+        feed = self.scan_feeds.get(job.id)
+        if feed is not None:
+            return feed
+        feed = ResultFeed(self.loop)
+        if job.finished.is_set():
+            if job.result is not None:
+                feed.items.extend(host.to_dict() for host in job.result)
+            feed.closed = True
+            return feed
+        feed.on_drained = self._release(self.scan_feeds, job.id, feed)
+        self.scan_feeds[job.id] = feed
+        # Hosts finished before this point are in the job's output files
+        job.host_callbacks.append(lambda host: feed.push(host.to_dict()))
+        job.done_callbacks.append(lambda job: feed.close())
+        if job.finished.is_set():
+            feed.close()
+        return feed
+
+    def _health(self, request):
+        return 200, {'status': 'ok', 'scans': len(self.job_manager.active_jobs()),
+                     'pings': sum(1 for job in self.ping_jobs.values() if job.state in ('queued', 'running'))}
+
+    def _list_scans(self, request):
+        jobs = sorted(self.job_manager.jobs.values(), key=lambda job: job.id)
+        if 'state' in request.query:
+            jobs = [job for job in jobs if job.state == request.query['state']]
+        return 200, {'scans': [scan_job_status(job) for job in jobs]}
+
+    def _submit_scan(self, request):
+        data = request.json()
+        target = str(data.get('target', '')).strip()
+        if not target:
+            raise HttpError(400, "Missing 'target'")
+        try:
+            targets = TargetSet.parse(target)
+        except (OSError, ValueError) as e:
+            raise HttpError(400, str(e))
+        if not targets:
+            raise HttpError(400, "No target left to scan")
+        priority = data.get('priority', 'normal')
+        if priority not in PRIORITIES:
+            raise HttpError(400, f"Unknown priority '{priority}' (high, normal or low)")
+
+        # The feed exists before the job can start, so no host is missed
+        feed = ResultFeed(self.loop)
+
+        def on_host(host_result):
+            # Built in the scanning thread, so the loop never sees a HostResult being filled
+            feed.push(host_result.to_dict())
+
+        def on_done(job):
+            feed.close()
+
+        job = self.job_manager.submit(target, self.output_folder, PRIORITIES[priority], host_callback=on_host,
+                                      done_callback=on_done, interface=data.get('interface') or None,
+                                      trace_routes=bool(data.get('trace_routes')))
+        if job.id in self.scan_feeds:
+            # Joined a job the API already follows: it streams to the existing feed
+            job.host_callbacks.remove(on_host)
+            job.done_callbacks.remove(on_done)
+            return 200, scan_job_status(job)
+        feed.on_drained = self._release(self.scan_feeds, job.id, feed)
+        self.scan_feeds[job.id] = feed
+        return 202, scan_job_status(job)
+
+    def _scan_status(self, request, job_id):
+        job = self.job_manager.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            raise HttpError(404, f"Unknown scan job {job_id}")
+        return 200, scan_job_status(job)
+
+    def _cancel_scan(self, request, job_id):
+        # Not _scan_job: cancelling a merged job detaches it instead of cancelling the job that absorbed it
+        job = self.job_manager.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            raise HttpError(404, f"Unknown scan job {job_id}")
+        keep_partial = request.query.get('keep_partial', '1').lower() not in ('0', 'false', 'no')
+        if not self.job_manager.cancel(job.id, keep_partial=keep_partial):
+            raise HttpError(409, f"Scan job {job.id} is already {job.state}")
+        return 200, scan_job_status(job)
+
+    # Pings
+
+    def _ping_job(self, job_id):
+        job = self.ping_jobs.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            raise HttpError(404, f"Unknown ping job {job_id}")
+        return job
+
+    def _ping_feed(self, job):
+        """Return the feed of a ping job (a closed feed of its results once the job's feed was forgotten)."""
+        feed = self.ping_feeds.get(job.id)
+        if feed is None:
+            feed = ResultFeed(self.loop)
+            feed.items.extend(job.results.values())
+            feed.closed = True
+        return feed
+
+    def _list_pings(self, request):
+        return 200, {'pings': [ping_job_status(job) for job in self.ping_jobs.values()]}
+
+    def _submit_ping(self, request):
+        data = request.json()
+        targets = data.get('targets', '')
+        try:
+            target_set = TargetSet.parse(targets)
+            count = int(data.get('count', 4))
+            interval = float(data.get('interval', 1.0))
+            timeout = float(data.get('timeout', 1))
+        except (OSError, TypeError, ValueError) as e:
+            raise HttpError(400, str(e))
+        if not target_set:
+            raise HttpError(400, "Missing 'targets'")
+        if target_set.size > MAX_PING_TARGETS:
+            raise HttpError(400, f"Too many targets ({target_set.size}, at most {MAX_PING_TARGETS}): use a scan")
+        if not 1 <= count <= 100:
+            raise HttpError(400, "'count' must be between 1 and 100")
+
+        job = PingJob(next(self.ping_ids), str(target_set), list(target_set), count, interval, timeout)
+        feed = self.ping_feeds[job.id] = ResultFeed(self.loop)
+        feed.on_drained = self._release(self.ping_feeds, job.id, feed)
+        self.ping_jobs[job.id] = job
+        self.ping_executor.submit(self._run_ping, job, feed)
+        return 202, ping_job_status(job)
+
+    @staticmethod
+    def _run_ping(job, feed):
+        from fonctions.ping import probe_latency
+
+        def on_result(stats):
+            job.results[stats['host']] = stats
+            feed.push(stats)
+
+        job.state = 'running'
+        job.started_at = time.time()
+        try:
+            probe_latency(job.hosts, job.count, job.interval, job.timeout, callback=on_result)
+            job.state = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.state = 'failed'
+        job.finished_at = time.time()
+        feed.close()
+
+    def _ping_status(self, request, job_id):
+        return 200, ping_job_status(self._ping_job(job_id))
+
+
+def main():
+    """
+    Command-line entry point: serve the API with its own job manager until interrupted.
+    """
+    parser = argparse.ArgumentParser(description="Local HTTP API to run scans and pings.")
+    parser.add_argument('--host', default=DEFAULT_API_HOST, help="Loopback address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_API_PORT, help="TCP port to listen on")
+    parser.add_argument('--unix', default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--output', default='scans', help="Folder of the scan results")
+    parser.add_argument('--workers', type=int, default=2, help="Scans that may run at the same time")
+    args = parser.parse_args()
+
+    server = ApiServer(JobManager(max_workers=args.workers), args.output, args.host, args.port, args.unix)
+
+    async def serve():
+        await server.start()
+        print(f"API listening on {server.address}. Press Ctrl+C to stop.")
+        async with server.server:
+            await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        server.job_manager.shutdown(cancel=True)
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,591 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+# Files of one scan: '<stamp>[_<series>]_scan_results.json|txt' and 'metrics/<stamp>[_<series>]_scan_metrics.json'
+SCAN_FILE = re.compile(r'^(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})(_[^/\\]*?)?_scan_(?:results|metrics)\.(?:json|jsonl|txt)$')
+STAMP_FORMAT = '%Y-%m-%d_%H-%M-%S'
+SCAN_SUBFOLDERS = ('', 'metrics')
+
+# Sub-folder of a scan folder holding the packs: one pack and one index per month
+ARCHIVE_FOLDER = 'archive'
+INDEX_VERSION = 1
+
+# Content-defined chunking: a chunk ends after a line whose CRC matches the mask,
+# so an edit only changes the chunks around it and identical runs of hosts dedupe
+MIN_CHUNK_SIZE = 2048
+MAX_CHUNK_SIZE = 64 * 1024
+BOUNDARY_MASK = 0x1f
+
+# Chunks are compressed separately (each can be read alone); this dictionary
+# primes zlib with the keys every scan file repeats
+ZLIB_DICTIONARY = (b'Network Scan Results Network Range: Scan started at Host: Status: up Port: - open (ssh) '
+                   b'"scan_time": "network_range": "hosts": [ "host": "status": "up", "hostname": "os": [ '
+                   b'"name": "accuracy": "line": "osclass": "type": "vendor": "osfamily": "osgen": "cpe": '
+                   b'"ports": [ "port": "state": "open", "closed", "filtered", "proto": "udp", "service": '
+                   b'"version": "tls": "subject": "issuer": "not_after": "fingerprint_sha256": },\n{\n')
+COMPRESSION_LEVEL = 9
+
+# A pack is rewritten when this share of it belongs to scans the retention dropped
+REPACK_RATIO = 0.5
+
+# A lock older than this is left over by a crashed compaction
+STALE_LOCK_SECONDS = 3600
+
+
+def split_chunks(data):
+    """
+    Split file content into content-defined chunks, at line boundaries.
+
+    Args:
+        data (bytes): The content.
+
+    Returns:
+        list: Chunks (bytes) whose concatenation is 'data'.
+    """
+    chunks = []
+    view = memoryview(data)
+    start = pos = 0
+    size = len(data)
+    while pos < size:
+        end = data.find(b'\n', pos)
+        end = size if end == -1 else end + 1
+        line_start, pos = pos, end
+        length = pos - start
+        if length >= MAX_CHUNK_SIZE:
+            # Very long line (compact JSON): cut it into fixed slices
+            while pos - start > MAX_CHUNK_SIZE:
+                chunks.append(data[start:start + MAX_CHUNK_SIZE])
+                start += MAX_CHUNK_SIZE
+            chunks.append(data[start:pos])
+            start = pos
+        elif length >= MIN_CHUNK_SIZE and not zlib.crc32(view[line_start:pos]) & BOUNDARY_MASK:
+            chunks.append(data[start:pos])
+            start = pos
+    if start < size:
+        chunks.append(data[start:])
+    return chunks
+
+
+def _compress(chunk):
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=ZLIB_DICTIONARY)
+    return compressor.compress(chunk) + compressor.flush()
+
+
+def _decompress(data):
+    decompressor = zlib.decompressobj(zdict=ZLIB_DICTIONARY)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def _write_json_atomic(path, data):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def scan_time(key):
+    """Return the datetime of a scan key ('2026-10-19_18-20-36_eth0')."""
+    return datetime.strptime(key[:19], STAMP_FORMAT)
+
+
+def scan_series(key):
+    """Return the series of a scan key: what follows the time stamp ('' for plain scans, '_eth0'...)."""
+    return key[19:]
+
+
+class RetentionPolicy:
+    """
+    Grandfather-father-son retention of scans.
+
+    Scans younger than 'keep_days' are all kept. Older ones keep the newest
+    scan of each day up to 'daily_days', of each ISO week up to
+    'weekly_days', and of each month up to 'monthly_days'; everything older
+    is deleted. Each series (the interface or name suffix of the scan files)
+    is thinned separately.
+
+    Without any of the three tiers (the default) nothing is ever deleted:
+    scans older than 'keep_days' are only moved into the archive.
+
+    Args:
+        keep_days (float): Keep every scan this recent (also the age at which scans are archived).
+        daily_days (float): Keep one scan per day up to this age (None: no daily tier).
+        weekly_days (float): Keep one scan per week up to this age (None: no weekly tier).
+        monthly_days (float): Keep one scan per month up to this age (None: no monthly tier).
+    """
+
+    def __init__(self, keep_days=1, daily_days=None, weekly_days=None, monthly_days=None):
+        self.keep_days = keep_days
+        self.daily_days = daily_days
+        self.weekly_days = weekly_days
+        self.monthly_days = monthly_days
+
+    @property
+    def thins(self):
+        """True if the policy deletes scans (at least one tier is set)."""
+        return any(days is not None for days in (self.daily_days, self.weekly_days, self.monthly_days))
+
+    def bucket(self, when, now):
+        """Return the period a scan competes in ('all' if it is kept regardless, None if it expired)."""
+        age = now - when
+        if age < timedelta(days=self.keep_days):
+            return 'all'
+        if not self.thins:
+            # Every scan is its own period: archived, never deleted
+            return ('scan', when)
+        if age < timedelta(days=self.daily_days or 0):
+            return ('day', when.date())
+        if age < timedelta(days=self.weekly_days or 0):
+            return ('week',) + tuple(when.isocalendar()[:2])
+        if age < timedelta(days=self.monthly_days or 0):
+            return ('month', when.year, when.month)
+        return None
+
+    def select(self, keys, now=None):
+        """
+        Return the scan keys to keep.
+
+        Args:
+            keys (iterable): Scan keys ('<stamp>[_<series>]').
+            now (datetime): Reference time (default: now).
+
+        Returns:
+            set: The kept keys.
+        """
+        now = now or datetime.now()
+        kept = set()
+        taken = set()
+        for key in sorted(keys, reverse=True):
+            bucket = self.bucket(scan_time(key), now)
+            if bucket == 'all':
+                kept.add(key)
+            elif bucket is not None and (scan_series(key), bucket) not in taken:
+                taken.add((scan_series(key), bucket))
+                kept.add(key)
+        return kept
+
+
+class Pack:
+    """
+    The archive of one month: compressed chunks in a pack file and a JSON index.
+
+    The index maps each archived file to its list of chunks and each chunk
+    (by truncated SHA-256) to its offset and length in the pack, so one file is read
+    with a few seeks, and a chunk shared by several files is stored once.
+    The pack only grows by appending; the index is replaced atomically after
+    the data is on disk, so an interrupted write leaves unreferenced bytes
+    that the next append truncates.
+
+    Args:
+        folder (str): The archive folder.
+        name (str): The month ('2026-10').
+    """
+
+    def __init__(self, folder, name):
+        self.folder = folder
+        self.name = name
+        self.index_path = os.path.join(folder, f"{name}.json")
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {'version': INDEX_VERSION, 'pack': f"{name}.0.pack", 'generation': 0, 'size': 0,
+                          'chunks': {}, 'scans': {}}
+        if self.index.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported archive index version in {self.index_path}")
+
+    @property
+    def pack_path(self):
+        return os.path.join(self.folder, self.index['pack'])
+
+    @property
+    def scans(self):
+        """{scan key: {relative file name: {'size', 'mtime', 'sha256', 'chunks'}}}."""
+        return self.index['scans']
+
+    def add_scan(self, key, files):
+        """
+        Archive the files of a scan (replacing a scan archived under the same key).
+
+        Args:
+            key (str): The scan key.
+            files (dict): {relative name: (content bytes, modification time)}.
+
+        Returns:
+            int: Bytes appended to the pack (after deduplication and compression).
+        """
+        chunks = self.index['chunks']
+        entries = {}
+        written = 0
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self.pack_path, 'ab') as pack:
+            pack.truncate(self.index['size'])
+            pack.seek(self.index['size'])
+            for name, (content, mtime) in files.items():
+                ids = []
+                for chunk in split_chunks(content):
+                    chunk_id = hashlib.sha256(chunk).hexdigest()[:32]
+                    if chunk_id not in chunks:
+                        data = _compress(chunk)
+                        chunks[chunk_id] = [pack.tell(), len(data), len(chunk)]
+                        pack.write(data)
+                        written += len(data)
+                    ids.append(chunk_id)
+                entries[name] = {'size': len(content), 'mtime': mtime,
+                                 'sha256': hashlib.sha256(content).hexdigest(), 'chunks': ids}
+            pack.flush()
+            os.fsync(pack.fileno())
+            self.index['size'] = pack.tell()
+        self.scans[key] = entries
+        return written
+
+    def read(self, key, name):
+        """Return the content of an archived file, checked against its SHA-256."""
+        entry = self.scans[key][name]
+        parts = []
+        with open(self.pack_path, 'rb') as pack:
+            for chunk_id in entry['chunks']:
+                offset, length, _ = self.index['chunks'][chunk_id]
+                pack.seek(offset)
+                parts.append(_decompress(pack.read(length)))
+        content = b''.join(parts)
+        if hashlib.sha256(content).hexdigest() != entry['sha256']:
+            raise ValueError(f"Archived file {name} is corrupted in {self.pack_path}")
+        return content
+
+    def remove_scan(self, key):
+        """Drop a scan from the index (its chunks stay in the pack until the next repack)."""
+        self.scans.pop(key, None)
+
+    def live_chunks(self):
+        return {chunk_id for entries in self.scans.values() for entry in entries.values()
+                for chunk_id in entry['chunks']}
+
+    def dead_bytes(self):
+        """Bytes of the pack used by chunks no archived file refers to."""
+        live = self.live_chunks()
+        return sum(length for chunk_id, (_, length, _) in self.index['chunks'].items() if chunk_id not in live)
+
+    def repack(self):
+        """
+        Rewrite the pack with the referenced chunks only.
+
+        The new pack gets a new file name; the index switches to it
+        atomically and the old pack is deleted afterwards.
+        """
+        live = self.live_chunks()
+        generation = self.index['generation'] + 1
+        new_name = f"{self.name}.{generation}.pack"
+        chunks = {}
+        with open(self.pack_path, 'rb') as old, open(os.path.join(self.folder, new_name), 'wb') as new:
+            for chunk_id, (offset, length, raw_size) in sorted(self.index['chunks'].items(), key=lambda item: item[1][0]):
+                if chunk_id not in live:
+                    continue
+                old.seek(offset)
+                chunks[chunk_id] = [new.tell(), length, raw_size]
+                new.write(old.read(length))
+            new.flush()
+            os.fsync(new.fileno())
+            size = new.tell()
+        old_path = self.pack_path
+        self.index.update(pack=new_name, generation=generation, size=size, chunks=chunks)
+        self.save()
+        os.remove(old_path)
+
+    def save(self):
+        """Write the index, or delete the pack and index once no scan is left."""
+        if not self.scans:
+            for path in (self.pack_path, self.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        _write_json_atomic(self.index_path, self.index)
+
+
+class Archive:
+    """
+    Compressed, deduplicated archive of the scans of a scan folder.
+
+    Scans older than the retention policy's 'keep_days' are moved from the
+    folder into '<folder>/archive/<YYYY-MM>.json|pack' by compact(), which
+    also deletes the scans the policy no longer keeps (archived or not) and
+    rewrites packs that are mostly dead. Archived files keep their names and
+    can be listed and read one by one.
+
+    Args:
+        folder (str): The scan folder (e.g. 'scans').
+        policy (RetentionPolicy): What to keep (default: every scan, archived
+            after a day).
+    """
+
+    def __init__(self, folder, policy=None):
+        self.folder = folder
+        self.archive_folder = os.path.join(folder, ARCHIVE_FOLDER)
+        self.policy = policy or RetentionPolicy()
+
+    def packs(self):
+        """Return the packs of the archive, oldest month first."""
+        if not os.path.isdir(self.archive_folder):
+            return []
+        names = sorted(entry.name[:-5] for entry in os.scandir(self.archive_folder)
+                       if re.match(r'^\d{4}-\d{2}\.json$', entry.name))
+        return [Pack(self.archive_folder, name) for name in names]
+
+    def files(self):
+        """
+        List the archived files.
+
+        Returns:
+            list: (relative name, size, modification time) tuples, newest scan first.
+        """
+        listing = []
+        for pack in self.packs():
+            for entries in pack.scans.values():
+                listing.extend((name, entry['size'], entry['mtime']) for name, entry in entries.items())
+        listing.sort(key=lambda item: item[0].rsplit('/', 1)[-1], reverse=True)
+        return listing
+
+    def _locate(self, name):
+        match = SCAN_FILE.match(os.path.basename(name))
+        if match is None:
+            raise KeyError(name)
+        key = match.group(1) + (match.group(2) or '')
+        pack_name = key[:7]
+        if not os.path.exists(os.path.join(self.archive_folder, f"{pack_name}.json")):
+            raise KeyError(name)
+        pack = Pack(self.archive_folder, pack_name)
+        if key not in pack.scans or name not in pack.scans[key]:
+            raise KeyError(name)
+        return pack, key
+
+    def read(self, name):
+        """
+        Return the content of an archived file.
+
+        Args:
+            name (str): Its name relative to the scan folder ('2026-10-19_18-20-36_scan_results.json').
+
+        Raises:
+            KeyError: If the file is not archived.
+        """
+        pack, key = self._locate(name)
+        return pack.read(key, name)
+
+    def open(self, name):
+        """Open an archived file as text (for functionalities.results readers)."""
+        return io.TextIOWrapper(io.BytesIO(self.read(name)), encoding='utf-8', errors='replace')
+
+    def extract(self, name, destination):
+        """Write an archived file to 'destination' (a file path) with its original modification time."""
+        pack, key = self._locate(name)
+        with open(destination, 'wb') as f:
+            f.write(pack.read(key, name))
+        mtime = pack.scans[key][name]['mtime']
+        os.utime(destination, (mtime, mtime))
+        return destination
+
+    def add(self, key, files):
+        """
+        Archive files under a scan key without going through the scan folder.
+
+        Args:
+            key (str): '<YYYY-mm-dd_HH-MM-SS>[_<series>]'.
+            files (dict): {relative name: content bytes}.
+        """
+        with self._lock():
+            pack = Pack(self.archive_folder, key[:7])
+            now = time.time()
+            pack.add_scan(key, {name: (content, now) for name, content in files.items()})
+            pack.save()
+
+    def loose_scans(self):
+        """
+        Group the scan files of the folder by scan.
+
+        Returns:
+            dict: {scan key: [relative file names]}.
+        """
+        scans = {}
+        for subfolder in SCAN_SUBFOLDERS:
+            path = os.path.join(self.folder, subfolder)
+            if not os.path.isdir(path):
+                continue
+            for entry in os.scandir(path):
+                match = SCAN_FILE.match(entry.name)
+                if match and entry.is_file():
+                    key = match.group(1) + (match.group(2) or '')
+                    scans.setdefault(key, []).append(f"{subfolder}/{entry.name}" if subfolder else entry.name)
+        return scans
+
+    def _lock(self):
+        # Compactions of the same archive (GUI start-up, CLI, test_scan.py) run one at a time
+        return FolderLock(self.archive_folder)
+
+    def compact(self, now=None):
+        """
+        Archive old scans and apply the retention policy.
+
+        Args:
+            now (datetime): Reference time (default: now).
+
+        Returns:
+            dict: 'archived' and 'deleted' scan counts, 'bytes_before' (loose
+                files archived) and 'bytes_written' (added to the packs), and
+                'repacked' packs.
+        """
+        now = now or datetime.now()
+        summary = {'archived': 0, 'deleted': 0, 'bytes_before': 0, 'bytes_written': 0, 'repacked': 0}
+        with self._lock():
+            loose = self.loose_scans()
+            packs = {pack.name: pack for pack in self.packs()}
+            archived = {key: pack for pack in packs.values() for key in pack.scans}
+            kept = self.policy.select(list(loose) + list(archived), now)
+            recent = {key for key in kept if self.policy.bucket(scan_time(key), now) == 'all'}
+            changed = set()
+
+            for key, names in sorted(loose.items()):
+                if key in recent:
+                    continue
+                paths = [os.path.join(self.folder, name) for name in names]
+                if key in kept:
+                    pack = packs.get(key[:7]) or packs.setdefault(key[:7], Pack(self.archive_folder, key[:7]))
+                    files = {}
+                    for name, path in zip(names, paths):
+                        with open(path, 'rb') as f:
+                            files[name] = (f.read(), os.path.getmtime(path))
+                    summary['bytes_before'] += sum(len(content) for content, _ in files.values())
+                    summary['bytes_written'] += pack.add_scan(key, files)
+                    # The index must be on disk before the loose files go away
+                    pack.save()
+                    summary['archived'] += 1
+                else:
+                    summary['deleted'] += 1
+                for path in paths:
+                    os.remove(path)
+
+            for key, pack in archived.items():
+                if key not in kept:
+                    pack.remove_scan(key)
+                    changed.add(pack.name)
+                    summary['deleted'] += 1
+
+            for name in sorted(changed):
+                pack = packs[name]
+                if pack.scans and pack.dead_bytes() > REPACK_RATIO * pack.index['size']:
+                    pack.repack()
+                    summary['repacked'] += 1
+                else:
+                    pack.save()
+        return summary
+
+
+class FolderLock:
+    """
+    Exclusive lock of a folder, across threads and processes (a lock file created with O_EXCL).
+
+    Args:
+        folder (str): The folder (created if missing).
+        name (str): Name of the lock file.
+    """
+
+    _locks = {}
+    _guard = threading.Lock()
+
+    def __init__(self, folder, name='.lock'):
+        self.path = os.path.join(folder, name)
+        with FolderLock._guard:
+            self.lock = FolderLock._locks.setdefault(os.path.abspath(self.path), threading.Lock())
+
+    def __enter__(self):
+        self.lock.acquire()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > STALE_LOCK_SECONDS:
+                        os.remove(self.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.2)
+
+    def __exit__(self, *exc_info):
+        try:
+            os.remove(self.path)
+        finally:
+            self.lock.release()
+
+
+def archive_scan_history(history, archive, series):
+    """
+    Move scan documents out of a growing history list into the archive.
+
+    Args:
+        history (list): Scan dictionaries ({'scan_time': 'YYYY-mm-dd HH:MM:SS', ...}), oldest first.
+        archive (Archive): Where to store them.
+        series (str): Name suffix of the archived files (e.g. 'history').
+    """
+    for scan in history:
+        try:
+            stamp = datetime.strptime(scan.get('scan_time', ''), '%Y-%m-%d %H:%M:%S').strftime(STAMP_FORMAT)
+        except ValueError:
+            stamp = datetime.now().strftime(STAMP_FORMAT)
+        key = f"{stamp}_{series}"
+        content = json.dumps(scan, indent=4).encode('utf-8') + b'\n'
+        archive.add(key, {f"{key}_scan_results.json": content})
+
+
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def main():
+    """
+    Command-line entry point: compact a scan folder, list its archive or extract a scan.
+    """
+    parser = argparse.ArgumentParser(description="Archive old scans and apply the retention policy.",
+                                     epilog="Scans are only deleted when --daily, --weekly or --monthly is given; "
+                                            "without them every scan is kept (e.g. --daily 30 --weekly 365).")
+    parser.add_argument('folder', nargs='?', default='scans', help="Scan folder (default: scans)")
+    parser.add_argument('--keep-days', type=float, default=1, help="Keep every scan this recent, unarchived")
+    parser.add_argument('--daily', type=float, help="Keep one scan per day up to this many days")
+    parser.add_argument('--weekly', type=float, help="Keep one scan per week up to this many days")
+    parser.add_argument('--monthly', type=float, help="Keep one scan per month up to this many days")
+    parser.add_argument('--list', action='store_true', help="List the archived files")
+    parser.add_argument('--extract', metavar='NAME', help="Extract an archived file to the current folder")
+    args = parser.parse_args()
+
+    archive = Archive(args.folder, RetentionPolicy(args.keep_days, args.daily, args.weekly, args.monthly))
+    if args.list:
+        for name, size, mtime in archive.files():
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))}  {format_size(size):>10}  {name}")
+        return
+    if args.extract:
+        print(f"Extracted {archive.extract(args.extract, os.path.basename(args.extract))}")
+        return
+
+    start = time.perf_counter()
+    summary = archive.compact()
+    print(f"{summary['archived']} scans archived ({format_size(summary['bytes_before'])} -> "
+          f"{format_size(summary['bytes_written'])}), {summary['deleted']} deleted, "
+          f"{summary['repacked']} packs rewritten in {time.perf_counter() - start:.2f}s.")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+import argparse
+import gzip
+import json
+import mmap
+import os
+import re
+import struct
+import time
+
+# Default location of the index built from the imported feeds
+DEFAULT_INDEX_PATH = os.path.join('resultat', 'cve', 'cve.idx')
+
+# Index file: header, product table (sorted by key), range records, string table
+INDEX_MAGIC = b'SHCVE001'
+HEADER = struct.Struct('<8sIIIII')       # magic, products, records, products offset, records offset, strings offset
+PRODUCT = struct.Struct('<III')          # key string, first record, record count
+RECORD = struct.Struct('<IIIHB')         # CVE string, start version string, end version string, score x10, flags
+NO_STRING = 0xffffffff
+
+# Range flags of a record
+START_INCLUDING = 0x01
+START_EXCLUDING = 0x02
+END_INCLUDING = 0x04
+END_EXCLUDING = 0x08
+EXACT = 0x10
+
+# Pre-release words sort before the release they precede (1.0rc1 < 1.0)
+PRE_RELEASE = {'a', 'alpha', 'b', 'beta', 'c', 'dev', 'pre', 'preview', 'rc'}
+VERSION_TOKEN = re.compile(r'\d+|[a-z]+')
+
+# nmap product names without a CPE in its database: product (lower case) -> 'part:vendor:product'
+PRODUCT_CPES = {
+    'openssh': 'a:openbsd:openssh',
+    'apache httpd': 'a:apache:http_server',
+    'apache tomcat': 'a:apache:tomcat',
+    'apache tomcat/coyote jsp engine': 'a:apache:tomcat',
+    'nginx': 'a:f5:nginx',
+    'microsoft iis httpd': 'a:microsoft:internet_information_services',
+    'lighttpd': 'a:lighttpd:lighttpd',
+    'mysql': 'a:oracle:mysql',
+    'mariadb': 'a:mariadb:mariadb',
+    'postgresql db': 'a:postgresql:postgresql',
+    'redis key-value store': 'a:redis:redis',
+    'vsftpd': 'a:vsftpd_project:vsftpd',
+    'proftpd': 'a:proftpd:proftpd',
+    'pure-ftpd': 'a:pureftpd:pure-ftpd',
+    'exim smtpd': 'a:exim:exim',
+    'postfix smtpd': 'a:postfix:postfix',
+    'dovecot imapd': 'a:dovecot:dovecot',
+    'dovecot pop3d': 'a:dovecot:dovecot',
+    'isc bind': 'a:isc:bind',
+    'dnsmasq': 'a:thekelleys:dnsmasq',
+    'samba smbd': 'a:samba:samba',
+    'dropbear sshd': 'a:dropbear_ssh_project:dropbear_ssh',
+    'jetty': 'a:eclipse:jetty',
+    'node.js express framework': 'a:expressjs:express',
+    'squid http proxy': 'a:squid-cache:squid',
+    'openssl': 'a:openssl:openssl',
+    'vmware esxi': 'o:vmware:esxi',
+}
+
+# nmap CPE names that NVD files under another vendor
+CPE_ALIASES = {
+    'a:igor_sysoev:nginx': 'a:f5:nginx',
+    'a:nginx:nginx': 'a:f5:nginx',
+    'a:mysql:mysql': 'a:oracle:mysql',
+    'a:beasts:vsftpd': 'a:vsftpd_project:vsftpd',
+}
+
+CPE_SEPARATOR = re.compile(r'(?<!\\):')
+
+
+def version_key(version):
+    """
+    Return a sort key of a version string.
+
+    Numbers compare numerically, pre-release words (alpha, beta, rc...) sort
+    before the release and other words (OpenSSH's 'p1') after it:
+    1.0rc1 < 1.0 < 1.0p1 < 1.0.1 < 1.10.
+    """
+    key = []
+    for token in VERSION_TOKEN.findall(version.lower()):
+        if token.isdigit():
+            key.append((2, int(token), ''))
+        elif token in PRE_RELEASE:
+            key.append((0, 0, token))
+        else:
+            key.append((1, 0, token))
+    key.append((1, 0, ''))
+    return tuple(key)
+
+
+def parse_cpe(cpe):
+    """
+    Split a CPE name (2.3 formatted string or 2.2 URI).
+
+    Returns:
+        tuple: ('part:vendor:product', version, update) with '' for missing or wildcard fields, or None.
+    """
+    cpe = cpe.strip().lower()
+    if cpe.startswith('cpe:2.3:'):
+        fields = [field.replace('\\', '') for field in CPE_SEPARATOR.split(cpe[8:])]
+    elif cpe.startswith('cpe:/'):
+        fields = cpe[5:].split(':')
+    else:
+        return None
+    fields += [''] * (5 - len(fields))
+    part, vendor, product, version, update = fields[:5]
+    if not (part and vendor and product):
+        return None
+    clean = lambda value: '' if value in ('*', '-') else value
+    return f"{part}:{vendor}:{product}", clean(version), clean(update)
+
+
+def service_cpes(port_data):
+    """
+    Normalize the service information nmap reported for a port to CPE names.
+
+    Uses the CPE of nmap's service database when there is one (-sV), or the
+    product name through PRODUCT_CPES.
+
+    Args:
+        port_data (dict): The port entry of python-nmap (product, version, cpe...).
+
+    Returns:
+        list: ('part:vendor:product', version) pairs; the version is '' when unknown.
+    """
+    version = (port_data.get('version') or '').split(' ', 1)[0]
+    found = []
+    for cpe in (port_data.get('cpe') or '').split():
+        parsed = parse_cpe(cpe)
+        if parsed is None:
+            continue
+        key, cpe_version, update = parsed
+        found.append((CPE_ALIASES.get(key, key), cpe_version + update or version))
+    if not found:
+        key = PRODUCT_CPES.get((port_data.get('product') or '').strip().lower())
+        if key:
+            found.append((key, version))
+    return found
+
+
+def _iter_feed_items(data):
+    """Yield (CVE id, score, cpe match dicts) from an NVD JSON feed (1.1 feeds or 2.0 API/feeds)."""
+    if 'CVE_Items' in data:
+        for item in data['CVE_Items']:
+            cve_id = item['cve']['CVE_data_meta']['ID']
+            impact = item.get('impact', {})
+            score = (impact.get('baseMetricV3', {}).get('cvssV3', {}).get('baseScore')
+                     or impact.get('baseMetricV2', {}).get('cvssV2', {}).get('baseScore') or 0)
+            nodes = list(item.get('configurations', {}).get('nodes', []))
+            matches = []
+            while nodes:
+                node = nodes.pop()
+                nodes.extend(node.get('children', []))
+                for match in node.get('cpe_match', []):
+                    matches.append({'vulnerable': match.get('vulnerable', True), 'cpe': match.get('cpe23Uri', ''),
+                                    **{key: match[key] for key in match if key.startswith('version')}})
+            yield cve_id, score, matches
+    for item in data.get('vulnerabilities', []):
+        cve = item.get('cve', item)
+        metrics = cve.get('metrics', {})
+        score = 0
+        for name in ('cvssMetricV40', 'cvssMetricV31', 'cvssMetricV30', 'cvssMetricV2'):
+            if metrics.get(name):
+                score = metrics[name][0].get('cvssData', {}).get('baseScore', 0)
+                break
+        matches = []
+        for configuration in cve.get('configurations', []):
+            for node in configuration.get('nodes', []):
+                for match in node.get('cpeMatch', []):
+                    matches.append({'vulnerable': match.get('vulnerable', True), 'cpe': match.get('criteria', ''),
+                                    **{key: match[key] for key in match if key.startswith('version')}})
+        yield cve['id'], score, matches
+
+
+def _load_feed(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_index(feed_paths, output_path=DEFAULT_INDEX_PATH):
+    """
+    Build the index from NVD JSON feeds (e.g. nvdcve-1.1-2023.json.gz, or NVD API 2.0 pages saved to files).
+
+    Every vulnerable CPE match becomes a record: the CVE, its CVSS base score
+    and the affected versions (an exact version or a start/end range).
+    Records are grouped by product and the products sorted, so a lookup is a
+    binary search in the memory-mapped file followed by a scan of that
+    product's ranges.
+
+    Args:
+        feed_paths (list): The feed files (.json or .json.gz).
+        output_path (str): The index file to write (replaced atomically).
+
+    Returns:
+        tuple: (number of products, number of records).
+    """
+    strings = {}
+    blob = bytearray()
+
+    def string(value):
+        if value is None:
+            return NO_STRING
+        offset = strings.get(value)
+        if offset is None:
+            data = value.encode('utf-8')
+            offset = strings[value] = len(blob)
+            blob.extend(struct.pack('<H', len(data)) + data)
+        return offset
+
+    products = {}
+    for path in feed_paths:
+        for cve_id, score, matches in _iter_feed_items(_load_feed(path)):
+            for match in matches:
+                parsed = parse_cpe(match['cpe']) if match['vulnerable'] else None
+                if parsed is None:
+                    continue
+                key, version, update = parsed
+                flags, start, end = 0, None, None
+                if version:
+                    flags, start = EXACT, version + update
+                else:
+                    for name, flag in (('versionStartIncluding', START_INCLUDING),
+                                       ('versionStartExcluding', START_EXCLUDING)):
+                        if match.get(name):
+                            flags, start = flags | flag, match[name]
+                    for name, flag in (('versionEndIncluding', END_INCLUDING), ('versionEndExcluding', END_EXCLUDING)):
+                        if match.get(name):
+                            flags, end = flags | flag, match[name]
+                products.setdefault(key, set()).add((cve_id, start, end, int(round(float(score) * 10)), flags))
+
+    records = bytearray()
+    table = bytearray()
+    count = 0
+    for key in sorted(products, key=lambda key: key.encode('utf-8')):
+        entries = sorted(products[key], key=lambda entry: (-entry[3], entry[0]))
+        table += PRODUCT.pack(string(key), count, len(entries))
+        for cve_id, start, end, score, flags in entries:
+            records += RECORD.pack(string(cve_id), string(start), string(end), score, flags)
+        count += len(entries)
+
+    products_offset = HEADER.size
+    records_offset = products_offset + len(table)
+    strings_offset = records_offset + len(records)
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(output_path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(INDEX_MAGIC, len(products), count, products_offset, records_offset, strings_offset))
+        f.write(table)
+        f.write(records)
+        f.write(blob)
+    os.replace(output_path + '.tmp', output_path)
+    return len(products), count
+
+
+class CveIndex:
+    """
+    Read-only, memory-mapped CVE index built by build_index().
+
+    Opening it costs a header read; the pages of the file are loaded by the
+    OS as lookups touch them, and are shared by every process using it.
+
+    Args:
+        path (str): The index file.
+
+    Raises:
+        OSError: If the file cannot be opened.
+        ValueError: If it is not an index.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.product_count, self.record_count, self.products_offset, self.records_offset, \
+            self.strings_offset = HEADER.unpack_from(self.map, 0)
+        if magic != INDEX_MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not a CVE index")
+        self._versions = {}
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _string(self, offset):
+        if offset == NO_STRING:
+            return None
+        position = self.strings_offset + offset
+        length = struct.unpack_from('<H', self.map, position)[0]
+        return self.map[position + 2:position + 2 + length].decode('utf-8')
+
+    def _raw_key(self, index):
+        offset = PRODUCT.unpack_from(self.map, self.products_offset + index * PRODUCT.size)[0]
+        position = self.strings_offset + offset
+        length = struct.unpack_from('<H', self.map, position)[0]
+        return self.map[position + 2:position + 2 + length]
+
+    def _product(self, key):
+        """Binary search of the product table; returns (first record, count) or None."""
+        wanted = key.encode('utf-8')
+        low, high = 0, self.product_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._raw_key(middle) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.product_count and self._raw_key(low) == wanted:
+            return PRODUCT.unpack_from(self.map, self.products_offset + low * PRODUCT.size)[1:]
+        return None
+
+    def _version_key(self, offset):
+        # Range bounds repeat across records and lookups: parse each once
+        key = self._versions.get(offset)
+        if key is None:
+            key = self._versions[offset] = version_key(self._string(offset))
+        return key
+
+    def lookup(self, product, version):
+        """
+        Return the CVEs affecting a version of a product.
+
+        Args:
+            product (str): 'part:vendor:product' (e.g. 'a:openbsd:openssh').
+            version (str): The detected version; '' matches only the records without version bounds.
+
+        Returns:
+            list: (CVE id, CVSS score) pairs, highest score first, each CVE once.
+        """
+        found = self._product(product)
+        if found is None:
+            return []
+        first, count = found
+        detected = version_key(version) if version else None
+        results = {}
+        for index in range(first, first + count):
+            cve, start, end, score, flags = RECORD.unpack_from(self.map, self.records_offset + index * RECORD.size)
+            if flags & EXACT:
+                if detected is None or detected != self._version_key(start):
+                    continue
+            elif flags:
+                if detected is None:
+                    continue
+                if flags & START_INCLUDING and detected < self._version_key(start):
+                    continue
+                if flags & START_EXCLUDING and detected <= self._version_key(start):
+                    continue
+                if flags & END_INCLUDING and detected > self._version_key(end):
+                    continue
+                if flags & END_EXCLUDING and detected >= self._version_key(end):
+                    continue
+            cve_id = self._string(cve)
+            results[cve_id] = max(results.get(cve_id, 0.0), score / 10)
+        return sorted(results.items(), key=lambda item: (-item[1], item[0]))
+
+    def match_port(self, port_data):
+        """
+        Return the likely vulnerabilities of an nmap port entry.
+
+        Returns:
+            list: {'id', 'score'} dicts (the layout of HostResult.vulnerabilities), highest score first.
+        """
+        matches = {}
+        for product, version in service_cpes(port_data):
+            for cve_id, score in self.lookup(product, version):
+                matches.setdefault(cve_id, {'id': cve_id, 'score': score})
+        return sorted(matches.values(), key=lambda match: (-match['score'], match['id']))
+
+
+def open_index(path=DEFAULT_INDEX_PATH):
+    """Open the CVE index if it was built, else return None (the scans then skip the annotations)."""
+    try:
+        return CveIndex(path)
+    except (OSError, ValueError):
+        return None
+
+
+def format_cves(matches, limit=5):
+    """One line for the CVEs of a port: the highest scores first."""
+    shown = ', '.join(f"{match['id']} ({match['score']:g})" for match in matches[:limit])
+    return shown + (f" (+{len(matches) - limit})" if len(matches) > limit else '')
+
+
+def main():
+    """
+    Command-line entry point: import NVD feeds into the index, or look a product up.
+    """
+    parser = argparse.ArgumentParser(description="Offline CVE index for the service versions found by the scans.")
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help=f"Index file (default: {DEFAULT_INDEX_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    importer = commands.add_parser('import', help="Build the index from NVD JSON feeds (.json or .json.gz)")
+    importer.add_argument('feeds', nargs='+')
+    lookup = commands.add_parser('lookup', help="List the CVEs of a CPE ('cpe:/a:openbsd:openssh:8.2p1') "
+                                                "or of an nmap product and version ('OpenSSH' '8.2p1')")
+    lookup.add_argument('product')
+    lookup.add_argument('version', nargs='?', default='')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        start = time.perf_counter()
+        products, records = build_index(args.feeds, args.index)
+        print(f"{records} version ranges of {products} products written to {args.index} "
+              f"in {time.perf_counter() - start:.1f}s.")
+        return
+
+    port_data = {'product': args.product, 'version': args.version}
+    if args.product.startswith('cpe:'):
+        port_data = {'cpe': args.product, 'version': args.version}
+    with CveIndex(args.index) as index:
+        start = time.perf_counter()
+        matches = index.match_port(port_data)
+        elapsed = (time.perf_counter() - start) * 1000
+    cpes = ', '.join(f"{product}:{version or '*'}" for product, version in service_cpes(port_data)) or 'no CPE'
+    for match in matches:
+        print(f"{match['id']:<18} {match['score']:>4.1f}")
+    print(f"{len(matches)} CVEs for {cpes} in {elapsed:.2f} ms.")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+import argparse
+import json
+import sys
+from collections import deque
+
+from functionalities.results import HostResult, PortSet, ScanResult, iter_scan_file
+
+
+class HostDiff:
+    """
+    Changes observed on a host that is present in both scans.
+    """
+
+    __slots__ = ('host', 'opened', 'closed', 'service_changes', 'status_change', 'os_change')
+
+    def __init__(self, host):
+        self.host = host
+        self.opened = {}
+        self.closed = {}
+        self.service_changes = {}
+        self.status_change = None
+        self.os_change = None
+
+    def __bool__(self):
+        return bool(self.opened or self.closed or self.service_changes or self.status_change or self.os_change)
+
+    def to_dict(self):
+        """Return the host delta as plain JSON-serializable data."""
+        delta = {'host': self.host}
+        if self.opened:
+            delta['opened'] = {proto: list(ports) for proto, ports in self.opened.items()}
+        if self.closed:
+            delta['closed'] = {proto: list(ports) for proto, ports in self.closed.items()}
+        if self.service_changes:
+            delta['service_changes'] = [
+                {'port': port, 'old': list(old), 'new': list(new), **({'proto': proto} if proto != 'tcp' else {})}
+                for (proto, port), (old, new) in sorted(self.service_changes.items())
+            ]
+        if self.status_change:
+            delta['status'] = list(self.status_change)
+        if self.os_change:
+            delta['os'] = [str(value) for value in self.os_change]
+        return delta
+
+
+class ScanDiff:
+    """
+    The differences between an older and a newer scan.
+
+    'old' and 'new' carry the scan metadata; 'hosts_added' and
+    'hosts_removed' hold the HostResults found in only one of the scans,
+    and 'hosts_changed' the HostDiffs, all in address order.
+    """
+
+    __slots__ = ('old', 'new', 'hosts_added', 'hosts_removed', 'hosts_changed')
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.hosts_added = []
+        self.hosts_removed = []
+        self.hosts_changed = []
+
+    def __bool__(self):
+        return bool(self.hosts_added or self.hosts_removed or self.hosts_changed)
+
+    def to_dict(self):
+        """
+        Return the machine-readable delta.
+
+        Returns:
+            dict: The delta with 'hosts_added', 'hosts_removed' and 'hosts_changed'.
+        """
+        return {
+            'old_scan': {'scan_time': self.old.scan_time, 'network_range': self.old.network_range},
+            'new_scan': {'scan_time': self.new.scan_time, 'network_range': self.new.network_range},
+            'hosts_added': [_host_summary(host) for host in self.hosts_added],
+            'hosts_removed': [_host_summary(host) for host in self.hosts_removed],
+            'hosts_changed': [host_diff.to_dict() for host_diff in self.hosts_changed]
+        }
+
+    def format_report(self):
+        """
+        Return a human-readable report of the changes.
+
+        Returns:
+            str: The formatted report.
+        """
+        lines = [
+            "Scan Comparison",
+            f"Old scan: {self.old.scan_time} ({self.old.network_range})",
+            f"New scan: {self.new.scan_time} ({self.new.network_range})",
+            "",
+            f"Hosts added: {len(self.hosts_added)}",
+            f"Hosts removed: {len(self.hosts_removed)}",
+            f"Hosts changed: {len(self.hosts_changed)}",
+            ""
+        ]
+
+        for host in self.hosts_added:
+            summary = _host_summary(host)
+            lines.append(f"[+] Host {host.host} appeared")
+            lines.extend(_format_port_lines(summary['ports'], "      open "))
+        for host in self.hosts_removed:
+            lines.append(f"[-] Host {host.host} disappeared")
+
+        for host_diff in self.hosts_changed:
+            lines.append(f"[*] Host {host_diff.host}")
+            if host_diff.status_change:
+                lines.append(f"      status: {host_diff.status_change[0]} -> {host_diff.status_change[1]}")
+            if host_diff.os_change:
+                lines.append(f"      os: {host_diff.os_change[0]} -> {host_diff.os_change[1]}")
+            for proto, ports in host_diff.opened.items():
+                lines.extend(f"      opened {port}/{proto}" for port in ports)
+            for proto, ports in host_diff.closed.items():
+                lines.extend(f"      closed {port}/{proto}" for port in ports)
+            for (proto, port), (old, new) in sorted(host_diff.service_changes.items()):
+                label = port if proto == 'tcp' else f"{port}/{proto}"
+                lines.append(f"      service {label}: {' '.join(old).strip() or 'unknown'} -> "
+                             f"{' '.join(new).strip() or 'unknown'}")
+
+        if not self:
+            lines.append("No differences found.")
+        return "\n".join(lines) + "\n"
+
+
+def _host_summary(host):
+    """Summarize a host that only exists in one of the two scans."""
+    ports = {}
+    for proto, state in host.states():
+        if state == 'open':
+            ports[proto] = list(host.ports('open', proto))
+    return {'host': host.host, 'status': host.status, 'ports': ports}
+
+
+def _format_port_lines(ports, prefix):
+    lines = []
+    for proto, port_list in ports.items():
+        lines.extend(f"{prefix}{port}/{proto}" for port in port_list)
+    return lines
+
+
+def diff_hosts(old_host, new_host):
+    """
+    Compare the two records of the same host.
+
+    Hosts whose port sets and side tables are equal are recognised first
+    (the common case, compared in C). Otherwise open ports are compared as
+    bitmaps, one protocol at a time, and only the services that differ are
+    looked at.
+
+    Args:
+        old_host (HostResult): The host in the older scan.
+        new_host (HostResult): The host in the newer scan.
+
+    Returns:
+        HostDiff: The changes (falsy when the host did not change).
+    """
+    host_diff = HostDiff(new_host.host)
+    if (old_host.status == new_host.status and old_host._states == new_host._states
+            and old_host.services == new_host.services and old_host.proto_services == new_host.proto_services
+            and old_host.os == new_host.os):
+        return host_diff
+
+    protocols = {proto for proto, _ in old_host.states()} | {proto for proto, _ in new_host.states()}
+    for proto in protocols:
+        old_bits = old_host.ports('open', proto)._to_int()
+        new_bits = new_host.ports('open', proto)._to_int()
+        if old_bits == new_bits:
+            continue
+        opened = new_bits & ~old_bits
+        closed = old_bits & ~new_bits
+        if opened:
+            host_diff.opened[proto] = PortSet._from_int(opened)
+        if closed:
+            host_diff.closed[proto] = PortSet._from_int(closed)
+
+    if old_host.services != new_host.services:
+        old_services = old_host.services
+        for port, new in new_host.services.items():
+            old = old_services.get(port)
+            # A service on a newly opened port is reported as an opened port, not a change
+            if old is not None and old != new:
+                host_diff.service_changes[('tcp', port)] = (old, new)
+    if old_host.proto_services != new_host.proto_services:
+        old_services = old_host.proto_services
+        for key, new in new_host.proto_services.items():
+            old = old_services.get(key)
+            if old is not None and old != new:
+                host_diff.service_changes[key] = (old, new)
+
+    if old_host.status != new_host.status:
+        host_diff.status_change = (old_host.status, new_host.status)
+    if old_host.os and new_host.os and old_host.os != new_host.os:
+        host_diff.os_change = (old_host.os, new_host.os)
+
+    return host_diff
+
+
+def diff_scans(old, new):
+    """
+    Compare two scans.
+
+    Args:
+        old (ScanResult): The older scan.
+        new (ScanResult): The newer scan.
+
+    Returns:
+        ScanDiff: Hosts that appeared or disappeared, and per-host port and service changes.
+    """
+    return _join_hosts(ScanDiff(old, new), _by_address(old.hosts.values()), _by_address(new.hosts.values()))
+
+
+def diff_scan_files(old_path, new_path, old_index=-1, new_index=-1):
+    """
+    Compare two stored scan files (JSON or TXT).
+
+    Scan files are written in address order, so the two files are streamed
+    side by side and merge-joined without keeping their hosts in memory.
+    A file whose hosts are out of order, or that holds several scans when
+    the last one is asked for, is read again with its scan kept and sorted.
+
+    Args:
+        old_path (str): Path to the older scan file.
+        new_path (str): Path to the newer scan file.
+        old_index (int): Which scan of the old file to use when it holds several.
+        new_index (int): Which scan of the new file to use when it holds several.
+
+    Returns:
+        ScanDiff: The differences between the two scans.
+    """
+    old_stream, new_stream = _ScanStream(old_path, old_index), _ScanStream(new_path, new_index)
+    scan_diff = _join_hosts(ScanDiff(None, None), old_stream, new_stream)
+    if old_stream.complete() and new_stream.complete():
+        scan_diff.old, scan_diff.new = old_stream.scan(), new_stream.scan()
+        return scan_diff
+
+    old, old_hosts = _read_scan(old_path, old_index)
+    new, new_hosts = _read_scan(new_path, new_index)
+    return _join_hosts(ScanDiff(old, new), old_hosts, new_hosts)
+
+
+class _ScanStream:
+    """
+    The hosts of one scan of a file, in file order, as (address key, host) pairs.
+
+    Hosts of JSON files are their decoded dicts, those of text reports HostResults.
+
+    Iteration stops early when a host is out of address order. complete()
+    tells whether the stream was the whole selected scan, in order.
+    """
+
+    def __init__(self, path, index):
+        self.path = path
+        self.index = index
+        self.header = None
+        self.in_order = True
+        self.more_scans = False
+
+    def __iter__(self):
+        # The last scan can only be streamed if it is also the first: checked once the stream ends
+        selected = self.index if self.index >= 0 else 0
+        last_key = None
+        # JSON hosts stay decoded dicts: only the hosts that differ are turned into HostResults
+        for header, host in iter_scan_file(self.path, raw=True):
+            if header['index'] != selected:
+                if header['index'] > selected:
+                    self.more_scans = True
+                    return
+                continue
+            self.header = header
+            if host is None:
+                continue
+            key = _address_key(host['host'] if isinstance(host, dict) else host.host)
+            # A repeated address also stops the stream: the sorted reading keeps its last record
+            if last_key is not None and key <= last_key:
+                self.in_order = False
+                return
+            last_key = key
+            yield key, host
+
+    def complete(self):
+        return (self.header is not None and self.in_order
+                and (self.index >= 0 or (self.index == -1 and not self.more_scans)))
+
+    def scan(self):
+        """Return the scan metadata (text reports only learn the scan date after the first host)."""
+        return ScanResult(self.header['scan_time'], self.header['network_range'])
+
+
+def _read_scan(path, index):
+    """
+    Stream a scan file and keep one of its scans.
+
+    Returns:
+        tuple: (ScanResult with the scan metadata and no hosts, its hosts as (address key, HostResult) pairs
+            sorted by address).
+    """
+    # The last scans seen, for a negative index; the selected one otherwise
+    scans = deque(maxlen=-index if index < 0 else 1)
+    for header, host in iter_scan_file(path):
+        if index >= 0 and header['index'] != index:
+            if header['index'] > index:
+                break
+            continue
+        if not scans or scans[-1][0]['index'] != header['index']:
+            scans.append((header, []))
+        if host is not None:
+            scans[-1][1].append(host)
+    if len(scans) < scans.maxlen:
+        raise ValueError(f"No scan #{index} in {path}" if scans or index not in (0, -1) else f"No scan found in {path}")
+    header, hosts = scans[0]
+    return ScanResult(header['scan_time'], header['network_range']), _by_address(hosts)
+
+
+def _by_address(hosts):
+    """
+    Return (address key, HostResult) pairs sorted by address.
+
+    A host recorded twice keeps its last record, as in ScanResult.
+    """
+    pairs = sorted(((_address_key(host.host), host) for host in hosts), key=lambda pair: pair[0])
+    return [pair for pair, following in zip(pairs, pairs[1:] + [None])
+            if following is None or following[0] != pair[0]]
+
+
+def _join_hosts(scan_diff, old_hosts, new_hosts):
+    """
+    Merge-join two address-sorted streams of (address key, host) pairs into a ScanDiff.
+
+    Both streams are walked once, side by side: an address found on one side
+    only is an added or removed host, and the records of an address found
+    on both sides are compared with diff_hosts unless they are equal dicts
+    (the same JSON entry in both files).
+    """
+    old_hosts, new_hosts = iter(old_hosts), iter(new_hosts)
+    old = next(old_hosts, None)
+    new = next(new_hosts, None)
+    while old is not None and new is not None:
+        if old[0] < new[0]:
+            scan_diff.hosts_removed.append(_host_result(old[1]))
+            old = next(old_hosts, None)
+        elif new[0] < old[0]:
+            scan_diff.hosts_added.append(_host_result(new[1]))
+            new = next(new_hosts, None)
+        else:
+            if not (isinstance(old[1], dict) and old[1] == new[1]):
+                host_diff = diff_hosts(_host_result(old[1]), _host_result(new[1]))
+                if host_diff:
+                    scan_diff.hosts_changed.append(host_diff)
+            old = next(old_hosts, None)
+            new = next(new_hosts, None)
+    if old is not None:
+        scan_diff.hosts_removed.append(_host_result(old[1]))
+        scan_diff.hosts_removed.extend(_host_result(host) for _, host in old_hosts)
+    if new is not None:
+        scan_diff.hosts_added.append(_host_result(new[1]))
+        scan_diff.hosts_added.extend(_host_result(host) for _, host in new_hosts)
+    return scan_diff
+
+
+def _host_result(host):
+    """Return a host of a scan stream as a HostResult."""
+    return HostResult.from_dict(host) if isinstance(host, dict) else host
+
+
+def _address_key(host):
+    """Sort IPv4 addresses numerically and anything else after them."""
+    parts = host.split('.')
+    if len(parts) == 4 and all(part.isdigit() for part in parts):
+        return (0, tuple(int(part) for part in parts), host)
+    return (1, (), host)
+
+
+def main():
+    """
+    Command-line entry point: compare two scan files and print the report.
+    """
+    parser = argparse.ArgumentParser(description="Compare two stored network scans.")
+    parser.add_argument('old', help="The older scan file (JSON or TXT)")
+    parser.add_argument('new', help="The newer scan file (JSON or TXT)")
+    parser.add_argument('--json', dest='json_output', help="Also save the machine-readable delta to this file")
+    args = parser.parse_args()
+
+    scan_diff = diff_scan_files(args.old, args.new)
+    sys.stdout.write(scan_diff.format_report())
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as json_file:
+            json.dump(scan_diff.to_dict(), json_file, indent=4)
+        print(f"Delta saved to {args.json_output}.")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
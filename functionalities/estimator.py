@@ -0,0 +1,364 @@
+import glob
+import ipaddress
+import json
+import math
+import os
+import time
+
+from functionalities.archive import Archive
+from functionalities.targets import TargetSet
+
+# Scan profiles: ports probed per host, whether host discovery is a separate phase,
+# and the rates used before any scan of the profile has been recorded
+PROFILES = {
+    # functionalities/scan.py: nmap -T4 -p 1-65535 --open (discovery inside the same nmap run)
+    'full_tcp': {
+        'ports_per_host': 65535,
+        'discovery_phase': False,
+        'defaults': {'seconds_per_host': 0.05, 'seconds_per_port': 1 / 20000, 'seconds_per_service': 0.0,
+                     'up_fraction': 0.1, 'services_per_host': 5},
+    },
+    # fonctions/scan.py: ping sweep, then nmap -p 1-1024 -sV on 10 hosts at a time (CVEs from the offline index)
+    'version_1024': {
+        'ports_per_host': 1024,
+        'discovery_phase': True,
+        'defaults': {'seconds_per_probed_host': 0.01, 'seconds_per_port': 1 / 500, 'seconds_per_service': 0.5,
+                     'up_fraction': 0.1, 'services_per_host': 5},
+    },
+    # fonctions/scan.py --scripts-vuln: the same with every vuln NSE script on every service
+    'vuln_1024': {
+        'ports_per_host': 1024,
+        'discovery_phase': True,
+        'defaults': {'seconds_per_probed_host': 0.01, 'seconds_per_port': 1 / 500, 'seconds_per_service': 2.0,
+                     'up_fraction': 0.1, 'services_per_host': 5},
+    },
+}
+
+# Recorded runs kept per profile, and how fast older runs lose weight (in runs)
+MAX_RUNS = 50
+HALF_LIFE_RUNS = 10
+
+# Relative error assumed while fewer than MIN_FIT_RUNS runs are known
+DEFAULT_ERROR = 0.5
+MIN_FIT_RUNS = 3
+
+
+def count_targets(target):
+    """
+    Return the number of addresses nmap will probe for a target.
+
+    Args:
+        target (str, TargetSet or int): Target text (see TargetSet.parse), a TargetSet or an address count.
+
+    Returns:
+        int: Number of addresses (network and broadcast excluded for a single IPv4 subnet).
+    """
+    if isinstance(target, int):
+        return target
+    if isinstance(target, str):
+        try:
+            network = ipaddress.ip_network(target.strip(), strict=False)
+        except ValueError:
+            network = None
+        if network is not None and network.version == 4 and network.prefixlen < 31:
+            return network.num_addresses - 2
+        try:
+            target = TargetSet.parse(target)
+        except (OSError, ValueError):
+            return 1
+    return max(1, target.size)
+
+
+def format_duration(seconds):
+    """Return a short human-readable duration ('45 s', '12 min', '3 h 20 min')."""
+    if seconds is None:
+        return "unknown"
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{math.ceil(seconds / 60)} min"
+    hours, minutes = divmod(math.ceil(seconds / 60), 60)
+    return f"{hours} h {minutes:02d} min"
+
+
+def _solve(matrix, vector):
+    """Solve a small linear system by Gaussian elimination (None if singular)."""
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+        if abs(rows[pivot][column]) < 1e-9:
+            return None
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(size):
+            if row != column:
+                factor = rows[row][column] / rows[column][column]
+                rows[row] = [a - factor * b for a, b in zip(rows[row], rows[column])]
+    return [rows[i][size] / rows[i][i] for i in range(size)]
+
+
+def _fit(features, targets, weights):
+    """
+    Weighted least squares with non-negative coefficients.
+
+    Features are dropped (last first, or the one with a negative coefficient)
+    until the system is solvable and every coefficient is >= 0.
+
+    Returns:
+        list: One coefficient per feature (0 for dropped features).
+    """
+    width = len(features[0])
+    # Scale every feature to about 1 so that near-collinear features are detected as singular
+    scales = [max(abs(f[i]) for f in features) or 1.0 for i in range(width)]
+    features = [[value / scale for value, scale in zip(f, scales)] for f in features]
+    active = list(range(min(width, len(targets))))
+    while active:
+        matrix = [[sum(w * f[i] * f[j] for f, w in zip(features, weights)) for j in active] for i in active]
+        vector = [sum(w * f[i] * t for f, t, w in zip(features, targets, weights)) for i in active]
+        solution = _solve(matrix, vector)
+        if solution is None:
+            active.pop()
+            continue
+        negative = [index for index, value in zip(active, solution) if value < 0]
+        if negative:
+            active.remove(min(negative, key=lambda index: solution[active.index(index)]))
+            continue
+        coefficients = [0.0] * width
+        for index, value in zip(active, solution):
+            coefficients[index] = value / scales[index]
+        return coefficients
+    return [0.0] * width
+
+
+class ScanEstimator:
+    """
+    Predict scan durations from the metrics of earlier scans.
+
+    Every finished scan saves a metrics summary (functionalities/metrics.py).
+    For each scan profile the estimator fits the time of the port scan phase
+    as a sum of per-port, per-service (version detection and scripts) and,
+    when discovery runs inside nmap, per-probed-host costs; a separate
+    discovery phase gives a hosts/second rate. Recent scans weigh more, so
+    the rates follow changes in the network.
+
+    The fraction of addresses that are up and the number of services per
+    host are learnt the same way, so a range can be estimated before it is
+    scanned.
+    """
+
+    def __init__(self):
+        self.runs = {}
+        self.models = {}
+
+    @classmethod
+    def from_folders(cls, folders):
+        """Create an estimator from the metrics saved in one or more scan output folders."""
+        estimator = cls()
+        for folder in folders:
+            estimator.load(folder)
+        return estimator
+
+    def load(self, folder):
+        """Learn from every '<folder>/metrics/*_scan_metrics.json' summary, archived or not, oldest first."""
+        archive = Archive(folder)
+        sources = [(os.path.basename(path), path, False)
+                   for path in glob.glob(os.path.join(folder, 'metrics', '*_scan_metrics.json'))]
+        sources += [(name.rsplit('/', 1)[-1], name, True) for name, _, _ in archive.files()
+                    if name.startswith('metrics/')]
+        for _, path, archived in sorted(sources):
+            try:
+                if archived:
+                    self.learn(json.loads(archive.read(path)))
+                else:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self.learn(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Skipping metrics file {path}: {e}")
+
+    def learn(self, summary):
+        """
+        Add one scan to the history.
+
+        Args:
+            summary (dict): A Metrics.summary() of a finished scan.
+
+        Returns:
+            bool: False if the summary lacks what the model needs (and was ignored).
+        """
+        info = summary.get('info', {})
+        profile = info.get('profile')
+        phases = summary.get('phases', {})
+        counters = summary.get('counters', {})
+        if profile not in PROFILES or 'port_scan' not in phases:
+            return False
+
+        probed = counters.get('hosts_probed', counters.get('probes_sent', 0))
+        up = counters.get('hosts_up', counters.get('replies', 0))
+        services = counters.get('ports_open')
+        if services is None:
+            services = sum(value for name, value in counters.items() if name.startswith('ports{'))
+        sample = {
+            'probed': probed,
+            'up': up,
+            'ports': up * info.get('ports_per_host', PROFILES[profile]['ports_per_host']),
+            'services': services,
+            'discovery_seconds': phases.get('discovery', {}).get('wall_seconds'),
+            'scan_seconds': phases['port_scan'].get('wall_seconds', phases['port_scan']['seconds']),
+        }
+        runs = self.runs.setdefault(profile, [])
+        runs.append(sample)
+        del runs[:-MAX_RUNS]
+        self.models.pop(profile, None)
+        return True
+
+    def model(self, profile):
+        """
+        Return the fitted rates of a profile.
+
+        Returns:
+            dict: seconds_per_port, seconds_per_service, seconds_per_host (discovery inside nmap),
+                seconds_per_probed_host (separate discovery), up_fraction, services_per_host,
+                error (relative) and runs (number of scans it is based on).
+        """
+        if profile in self.models:
+            return self.models[profile]
+        settings = PROFILES[profile]
+        model = dict(settings['defaults'])
+        runs = self.runs.get(profile, [])
+        model['runs'] = len(runs)
+        model['error'] = DEFAULT_ERROR
+        if runs:
+            weights = [0.5 ** ((len(runs) - 1 - index) / HALF_LIFE_RUNS) for index in range(len(runs))]
+
+            probed = sum(w * run['probed'] for run, w in zip(runs, weights))
+            up = sum(w * run['up'] for run, w in zip(runs, weights))
+            if probed:
+                model['up_fraction'] = up / probed
+            if up:
+                model['services_per_host'] = sum(w * run['services'] for run, w in zip(runs, weights)) / up
+
+            if settings['discovery_phase']:
+                timed = [(run, w) for run, w in zip(runs, weights) if run['discovery_seconds'] and run['probed']]
+                if timed:
+                    model['seconds_per_probed_host'] = (sum(w * run['discovery_seconds'] for run, w in timed)
+                                                        / sum(w * run['probed'] for run, w in timed))
+                features = [(run['ports'], run['services']) for run in runs]
+            else:
+                features = [(run['ports'], run['services'], run['probed']) for run in runs]
+
+            targets = [run['scan_seconds'] for run in runs]
+            coefficients = _fit(features, targets, weights)
+            if any(coefficients):
+                model['seconds_per_port'], model['seconds_per_service'] = coefficients[:2]
+                if not settings['discovery_phase']:
+                    model['seconds_per_host'] = coefficients[2]
+            else:
+                # Degenerate history (e.g. no open port): plain ratio of time to ports
+                ports = sum(w * run['ports'] for run, w in zip(runs, weights))
+                if ports:
+                    model['seconds_per_port'] = sum(w * t for t, w in zip(targets, weights)) / ports
+                    model['seconds_per_service'] = 0.0
+
+            if len(runs) >= MIN_FIT_RUNS:
+                errors = []
+                for run, feature, w in zip(runs, features, weights):
+                    if run['scan_seconds'] > 0:
+                        predicted = sum(c * f for c, f in zip(coefficients, feature))
+                        errors.append((w, ((predicted - run['scan_seconds']) / run['scan_seconds']) ** 2))
+                if errors:
+                    model['error'] = max(0.1, math.sqrt(sum(w * e for w, e in errors) / sum(w for w, _ in errors)))
+
+        self.models[profile] = model
+        return model
+
+    def estimate(self, target, profile='full_tcp', ports_per_host=None, hosts_up=None):
+        """
+        Predict the duration of a scan before it is launched.
+
+        Args:
+            target (str or int): The range to scan (CIDR, address or hostname) or a number of addresses.
+            profile (str): The scan profile (see PROFILES).
+            ports_per_host (int): Ports probed per host (default: the profile's).
+            hosts_up (int): Number of hosts known to be up (default: predicted from history).
+
+        Returns:
+            dict: 'seconds' (best guess), 'low' and 'high' bounds, 'hosts', 'hosts_up', 'runs'
+                (scans the estimate is based on) and 'breakdown' (seconds per phase).
+        """
+        model = self.model(profile)
+        settings = PROFILES[profile]
+        hosts = count_targets(target)
+        if hosts_up is None:
+            hosts_up = min(hosts, max(1.0, hosts * model['up_fraction']))
+        ports = hosts_up * (ports_per_host or settings['ports_per_host'])
+        services = hosts_up * model['services_per_host']
+
+        breakdown = {
+            'ports': ports * model['seconds_per_port'],
+            'scripts': services * model['seconds_per_service'],
+        }
+        if settings['discovery_phase']:
+            breakdown['discovery'] = hosts * model['seconds_per_probed_host']
+        else:
+            breakdown['hosts'] = hosts * model['seconds_per_host']
+        seconds = sum(breakdown.values())
+        return {
+            'seconds': seconds,
+            'low': seconds / (1 + model['error']),
+            'high': seconds * (1 + model['error']),
+            'hosts': hosts,
+            'hosts_up': hosts_up,
+            'runs': model['runs'],
+            'breakdown': breakdown,
+        }
+
+    def describe(self, target, profile='full_tcp'):
+        """Return a one-line human-readable estimate for a range."""
+        estimate = self.estimate(target, profile)
+        basis = f"based on {estimate['runs']} scans" if estimate['runs'] else "rough guess, no scan history yet"
+        return (f"Estimated duration: ~{format_duration(estimate['seconds'])} "
+                f"({format_duration(estimate['low'])} - {format_duration(estimate['high'])}, {basis})")
+
+
+class LiveEta:
+    """
+    Remaining-time estimate of a running scan.
+
+    Starts from the prediction and moves towards the observed pace as the
+    scan reports progress: with a fraction f done after t seconds, the
+    expected total is blended between the prediction and t / f, weighted by
+    f. Without progress reports the prediction is counted down, and a scan
+    running past it is given another 10% of its elapsed time.
+
+    Args:
+        predicted_seconds (float): The estimated duration of the whole scan.
+    """
+
+    def __init__(self, predicted_seconds):
+        self.predicted = predicted_seconds
+        self.start = time.monotonic()
+        self.fraction = 0.0
+
+    def update(self, fraction):
+        """Report progress (0-1)."""
+        self.fraction = min(1.0, max(self.fraction, fraction))
+
+    def elapsed(self):
+        """Seconds since the scan started."""
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        """Return the expected remaining seconds."""
+        elapsed = self.elapsed()
+        if self.fraction >= 1.0:
+            return 0.0
+        total = self.predicted
+        if self.fraction > 0:
+            total = (1 - self.fraction) * self.predicted + self.fraction * (elapsed / self.fraction)
+        remaining = total - elapsed
+        return remaining if remaining > 0 else elapsed * 0.1
+
+    def format(self):
+        """Return a short status line ('ETA 4 min (1 min elapsed)')."""
+        return f"ETA {format_duration(self.remaining())} ({format_duration(self.elapsed())} elapsed)"
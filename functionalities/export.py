@@ -0,0 +1,149 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+
+from functionalities.results import iter_scan_file
+
+# Export formats offered to the user: format key -> (label, file extension)
+EXPORT_FORMATS = {
+    'original': ("Original format (exact copy)", None),
+    'original.gz': ("Original format, gzip-compressed", '.gz'),
+    'jsonl': ("JSON Lines (one host per line)", '.jsonl'),
+    'jsonl.gz': ("JSON Lines, gzip-compressed", '.jsonl.gz'),
+    'csv': ("CSV (one port per row)", '.csv'),
+    'csv.gz': ("CSV, gzip-compressed", '.csv.gz'),
+}
+
+# Column order of the CSV export
+CSV_COLUMNS = ['scan_time', 'network_range', 'host', 'status', 'hostname', 'proto', 'port', 'state', 'service', 'version']
+
+# Buffer size used for every streamed write
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def export_extension(fmt, source_path):
+    """
+    Return the file extension an export should be saved with.
+
+    Args:
+        fmt (str): One of the EXPORT_FORMATS keys.
+        source_path (str): The scan file being exported.
+
+    Returns:
+        str: The extension, including the leading dot.
+    """
+    source_ext = os.path.splitext(source_path)[1] or '.txt'
+    if fmt == 'original':
+        return source_ext
+    if fmt == 'original.gz':
+        return source_ext + '.gz'
+    return EXPORT_FORMATS[fmt][1]
+
+
+def _open_output(dest_path, compressed):
+    """Open an export destination for buffered text writing."""
+    if compressed:
+        return gzip.open(dest_path, 'wt', encoding='utf-8', newline='')
+    return open(dest_path, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER_SIZE)
+
+
+def _copy_native(source_path, dest_path, compressed):
+    """Copy a scan file as-is; plain copies are done by the kernel (sendfile/copy_file_range)."""
+    if not compressed:
+        shutil.copyfile(source_path, dest_path)
+        return os.path.getsize(dest_path)
+    with open(source_path, 'rb') as src_file, gzip.open(dest_path, 'wb') as dest_file:
+        shutil.copyfileobj(src_file, dest_file, WRITE_BUFFER_SIZE)
+    return os.path.getsize(dest_path)
+
+
+def host_record(header, host):
+    """
+    Build the flat record written to JSON Lines exports for one host.
+
+    Args:
+        header (dict): The scan header yielded by iter_scan_file.
+        host (HostResult): The host.
+
+    Returns:
+        dict: The scan metadata merged with the host's JSON layout.
+    """
+    record = {'scan_time': header['scan_time'], 'network_range': header['network_range']}
+    record.update(host.to_dict())
+    return record
+
+
+def _write_jsonl(source_path, out, progress_callback):
+    count = 0
+    for header, host in iter_scan_file(source_path):
+        if host is None:
+            continue
+        out.write(json.dumps(host_record(header, host)))
+        out.write('\n')
+        count += 1
+        if progress_callback and count % 1000 == 0:
+            progress_callback(count)
+    return count
+
+
+def _write_csv(source_path, out, progress_callback):
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for header, host in iter_scan_file(source_path):
+        if host is None:
+            continue
+        prefix = [header['scan_time'], header['network_range'], host.host, host.status, host.hostname]
+        rows = 0
+        for port, proto, state in host.iter_ports():
+            service, version = host.service(port, proto)
+            writer.writerow(prefix + [proto, port, state, service, version])
+            rows += 1
+        if not rows:
+            writer.writerow(prefix + ['', '', '', '', ''])
+        count += 1
+        if progress_callback and count % 1000 == 0:
+            progress_callback(count)
+    return count
+
+
+def export_scan(source_path, dest_path, fmt='original', progress_callback=None):
+    """
+    Export a stored scan file to another location and format.
+
+    Conversions stream one host at a time, so memory use stays constant
+    whatever the size of the scan history. The output is written to a
+    temporary file next to the destination and renamed into place at the end.
+
+    Args:
+        source_path (str): The scan file to export (JSON or TXT).
+        dest_path (str): Where to save the export.
+        fmt (str): One of the EXPORT_FORMATS keys.
+        progress_callback (function): Called with the number of hosts written so far (optional).
+
+    Returns:
+        int: The number of hosts exported, or the number of bytes written for native copies.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    compressed = fmt.endswith('.gz')
+    temp_path = dest_path + '.part'
+    try:
+        if fmt.startswith('original'):
+            result = _copy_native(source_path, temp_path, compressed)
+        else:
+            with _open_output(temp_path, compressed) as out:
+                if fmt.startswith('jsonl'):
+                    result = _write_jsonl(source_path, out, progress_callback)
+                else:
+                    result = _write_csv(source_path, out, progress_callback)
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return result
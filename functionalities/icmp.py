@@ -0,0 +1,162 @@
+import os
+import select
+import socket
+import struct
+import time
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+
+def checksum(data):
+    """
+    Compute the Internet checksum of an ICMP packet.
+
+    Args:
+        data (bytes): The packet with a zeroed checksum field.
+
+    Returns:
+        int: The 16-bit checksum.
+    """
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(identifier, sequence, payload=b'seahawks'):
+    """
+    Build an ICMP echo request packet.
+
+    Args:
+        identifier (int): The echo identifier.
+        sequence (int): The echo sequence number.
+        payload (bytes): The echo payload.
+
+    Returns:
+        bytes: The packet.
+    """
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, identifier & 0xFFFF, sequence & 0xFFFF)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum(header + payload),
+                       identifier & 0xFFFF, sequence & 0xFFFF) + payload
+
+
+def open_icmp_socket():
+    """
+    Open a socket able to send ICMP echo requests.
+
+    An unprivileged ICMP datagram socket is tried first (Linux allows it when
+    net.ipv4.ping_group_range covers the user, macOS always does), then a raw
+    socket (root/administrator).
+
+    Returns:
+        tuple: (socket, is_raw), or (None, False) if ICMP sockets are not allowed.
+    """
+    for sock_type, is_raw in ((socket.SOCK_DGRAM, False), (socket.SOCK_RAW, True)):
+        try:
+            sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            sock.setblocking(False)
+            return sock, is_raw
+        except (PermissionError, OSError):
+            continue
+    return None, False
+
+
+def icmp_available():
+    """Return True if ICMP echo requests can be sent without spawning 'ping'."""
+    sock, _ = open_icmp_socket()
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def ping_many(hosts, timeout=1.0, sock=None):
+    """
+    Send one echo request to each host over a single socket and wait for the replies.
+
+    The whole batch costs one socket and one select loop, whatever the number
+    of hosts, instead of one 'ping' process per host.
+
+    Args:
+        hosts (list): The IPv4 addresses to probe.
+        timeout (float): How long to wait for replies, in seconds.
+        sock (tuple): An already open (socket, is_raw) pair to reuse (optional).
+
+    Returns:
+        dict: {host: round-trip time in ms, or None if no reply was received}.
+
+    Raises:
+        PermissionError: If no ICMP socket can be opened.
+    """
+    hosts = list(hosts)
+    if len(hosts) > 0x10000:
+        # Sequence numbers are 16 bits: probe very large batches in chunks
+        results = {}
+        for start in range(0, len(hosts), 0x10000):
+            results.update(ping_many(hosts[start:start + 0x10000], timeout, sock))
+        return results
+
+    owned = sock is None
+    icmp_sock, is_raw = open_icmp_socket() if owned else sock
+    if icmp_sock is None:
+        raise PermissionError("ICMP sockets are not allowed for this user")
+
+    results = {host: None for host in hosts}
+    identifier = os.getpid() & 0xFFFF
+    sent_at = {}
+    pending = {}
+    try:
+        for sequence, host in enumerate(results):
+            packet = build_echo_request(identifier, sequence)
+            try:
+                icmp_sock.sendto(packet, (host, 0))
+            except (BlockingIOError, InterruptedError):
+                # Send buffer full: wait until the socket is writable and retry once
+                select.select([], [icmp_sock], [], timeout)
+                try:
+                    icmp_sock.sendto(packet, (host, 0))
+                except OSError:
+                    continue
+            except OSError:
+                continue
+            sent_at[sequence & 0xFFFF] = time.perf_counter()
+            pending[sequence & 0xFFFF] = host
+
+        deadline = time.perf_counter() + timeout
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([icmp_sock], [], [], remaining)
+            if not readable:
+                break
+            while True:
+                try:
+                    data, address = icmp_sock.recvfrom(2048)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    break
+                received_at = time.perf_counter()
+                if is_raw:
+                    # Raw sockets also return the IP header
+                    data = data[(data[0] & 0x0F) * 4:]
+                if len(data) < 8:
+                    continue
+                icmp_type, _, _, reply_identifier, sequence = struct.unpack('!BBHHH', data[:8])
+                host = pending.get(sequence)
+                # Datagram sockets rewrite the identifier, so their replies are matched on sequence and address;
+                # a raw socket receives the replies to every process's pings, which only the identifier tells apart
+                if icmp_type != ICMP_ECHO_REPLY or host is None or host != address[0]:
+                    continue
+                if is_raw and reply_identifier != identifier:
+                    continue
+                results[host] = round((received_at - sent_at[sequence]) * 1000, 3)
+                del pending[sequence]
+    finally:
+        if owned:
+            icmp_sock.close()
+    return results
@@ -0,0 +1,354 @@
+import ipaddress
+import os
+import platform
+import re
+import socket
+import struct
+import subprocess
+
+# Netlink (Linux): route family messages and flags
+NETLINK_ROUTE = 0
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+
+# Address scopes of the kernel (rtnetlink.h)
+SCOPES = {0: 'global', 200: 'site', 253: 'link', 254: 'host'}
+
+# Interface flag of the kernel (if.h): administratively up
+IFF_UP = 0x1
+
+# Interface address list of Windows (InterfaceAlias|IPAddress|PrefixLength|ConnectionState per line)
+WINDOWS_ADDRESS_COMMAND = ['powershell', '-NoProfile', '-Command',
+                           'Get-NetIPAddress | ForEach-Object { $state = (Get-NetIPInterface -InterfaceIndex '
+                           '$_.InterfaceIndex -AddressFamily $_.AddressFamily).ConnectionState; '
+                           '"$($_.InterfaceAlias)|$($_.IPAddress)|$($_.PrefixLength)|$state" }']
+
+# 'en0: flags=8863<UP,BROADCAST,SMART,RUNNING,SIMPLEX,MULTICAST> mtu 1500' (BSD/macOS and recent net-tools)
+IFCONFIG_FLAGS = re.compile(r'flags=\w+<([^>]*)>')
+# 'inet 192.168.1.5 netmask 0xffffff00' (BSD/macOS) or 'inet 192.168.1.5  netmask 255.255.255.0' (net-tools)
+IFCONFIG_INET = re.compile(r'^\s+inet\s+(?:addr:)?([\d.]+).*?(?:netmask|Mask:)\s*(0x[0-9a-fA-F]+|[\d.]+)')
+IFCONFIG_INET6 = re.compile(r'^\s+inet6\s+(?:addr:\s*)?([0-9a-fA-F:]+)(?:%\S+)?(?:/(\d+)|.*?prefixlen\s+(\d+))')
+
+
+class InterfaceAddress:
+    """
+    An address of a local interface and the network it is attached to.
+
+    Args:
+        interface (str): Interface name (e.g. 'eth0', 'en0', 'Ethernet 2').
+        address (str or ipaddress.IPv4Address): The local address.
+        network (str or ipaddress.IPv4Network): The attached network (address and prefix).
+        index (int): Interface index (0 if unknown).
+        scope (str): 'global', 'site', 'link' or 'host'.
+        up (bool): The interface is up and has a carrier (True if unknown).
+    """
+
+    __slots__ = ('interface', 'address', 'network', 'index', 'scope', 'up')
+
+    def __init__(self, interface, address, network, index=0, scope='global', up=True):
+        self.interface = interface
+        self.address = ipaddress.ip_address(address)
+        self.network = ipaddress.ip_network(network, strict=False)
+        self.index = index
+        self.scope = scope
+        self.up = up
+
+    @property
+    def version(self):
+        return self.address.version
+
+    @property
+    def is_loopback(self):
+        return self.address.is_loopback or self.scope == 'host'
+
+    @property
+    def is_link_local(self):
+        return self.address.is_link_local or self.scope == 'link'
+
+    def __repr__(self):
+        down = '' if self.up else ' (down)'
+        return f"<InterfaceAddress {self.interface} {self.address} on {self.network}{down}>"
+
+
+class Route:
+    """
+    A route of the kernel routing table (IPv4).
+
+    Args:
+        interface (str): Outgoing interface.
+        network (ipaddress.IPv4Network): Destination.
+        gateway (ipaddress.IPv4Address): Next hop, None for networks reached directly (on-link).
+        metric (int): Route metric (lower is preferred).
+    """
+
+    __slots__ = ('interface', 'network', 'gateway', 'metric')
+
+    def __init__(self, interface, network, gateway=None, metric=0):
+        self.interface = interface
+        self.network = network
+        self.gateway = gateway
+        self.metric = metric
+
+    def __repr__(self):
+        via = f" via {self.gateway}" if self.gateway else ''
+        return f"<Route {self.network}{via} dev {self.interface}>"
+
+
+def _link_is_up(name):
+    """Return False if Linux reports the interface down (no IFF_UP) or without carrier, True otherwise or if unknown."""
+    folder = os.path.join('/sys/class/net', name)
+    try:
+        with open(os.path.join(folder, 'flags'), encoding='ascii') as f:
+            flags = int(f.read(), 16)
+    except (OSError, ValueError):
+        return True
+    if not flags & IFF_UP:
+        return False
+    # Reading the carrier of an interface that is down fails (EINVAL)
+    try:
+        with open(os.path.join(folder, 'carrier'), encoding='ascii') as f:
+            return f.read().strip() == '1'
+    except OSError:
+        return False
+
+
+def _netlink_addresses():
+    """Read the interface addresses from the kernel with an RTM_GETADDR dump (Linux)."""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.bind((0, 0))
+        # nlmsghdr (length, type, flags, sequence, pid) + ifaddrmsg (family, prefixlen, flags, scope, index)
+        sock.send(struct.pack('=IHHII', 24, RTM_GETADDR, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+                  + struct.pack('=BBBBI', socket.AF_UNSPEC, 0, 0, 0, 0))
+        addresses = []
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + 16 <= len(data):
+                length, message_type = struct.unpack_from('=IH', data, offset)
+                if message_type == NLMSG_DONE:
+                    return addresses
+                if message_type == NLMSG_ERROR:
+                    raise OSError("Netlink address dump failed")
+                if message_type == RTM_NEWADDR:
+                    addresses.append(_parse_address_message(data[offset + 16:offset + length]))
+                offset += (length + 3) & ~3
+    finally:
+        sock.close()
+
+
+def _parse_address_message(message):
+    family, prefixlen, _, scope, index = struct.unpack_from('=BBBBI', message)
+    attributes = {}
+    offset = 8
+    while offset + 4 <= len(message):
+        length, attribute_type = struct.unpack_from('=HH', message, offset)
+        if length < 4:
+            break
+        attributes[attribute_type] = message[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+    # IFA_LOCAL is the local address; IFA_ADDRESS is the peer on point-to-point links
+    raw = attributes.get(IFA_LOCAL) or attributes.get(IFA_ADDRESS)
+    address = ipaddress.ip_address(raw)
+    try:
+        name = socket.if_indextoname(index)
+    except OSError:
+        name = attributes.get(IFA_LABEL, b'').rstrip(b'\0').decode('utf-8', 'replace') or str(index)
+    return InterfaceAddress(name, address, f"{address}/{prefixlen}", index, SCOPES.get(scope, str(scope)),
+                            _link_is_up(name))
+
+
+def _ifconfig_addresses():
+    """Parse 'ifconfig' (BSD, macOS and Linux net-tools)."""
+    output = subprocess.run(['ifconfig', '-a'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, timeout=5, check=True).stdout
+    addresses = []
+    interface = None
+    up = True
+    for line in output.splitlines():
+        if line and not line[0].isspace():
+            interface = re.split(r'[:\s]', line, 1)[0]
+            # RUNNING is the carrier; without a flags field (older net-tools) the state is unknown
+            flags = IFCONFIG_FLAGS.search(line)
+            up = flags is None or {'UP', 'RUNNING'} <= set(flags.group(1).split(','))
+            continue
+        match = IFCONFIG_INET.match(line)
+        if match and interface:
+            mask = match.group(2)
+            mask = str(ipaddress.IPv4Address(int(mask, 16))) if mask.startswith('0x') else mask
+            addresses.append(InterfaceAddress(interface, match.group(1), f"{match.group(1)}/{mask}", up=up))
+            continue
+        match = IFCONFIG_INET6.match(line)
+        if match and interface:
+            prefix = match.group(2) or match.group(3) or '128'
+            addresses.append(InterfaceAddress(interface, match.group(1), f"{match.group(1)}/{prefix}", up=up))
+    return addresses
+
+
+def _windows_addresses():
+    """List the addresses with PowerShell's Get-NetIPAddress (language independent, unlike ipconfig)."""
+    output = subprocess.run(WINDOWS_ADDRESS_COMMAND, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, timeout=15, check=True).stdout
+    addresses = []
+    for line in output.splitlines():
+        parts = line.strip().rsplit('|', 3)
+        if len(parts) != 4 or not parts[2].isdigit():
+            continue
+        name, address, prefix, state = parts
+        address = address.split('%', 1)[0]
+        addresses.append(InterfaceAddress(name, address, f"{address}/{prefix}", up=state != 'Disconnected'))
+    return addresses
+
+
+def list_addresses():
+    """
+    Return the addresses of the local interfaces, with their real prefixes.
+
+    Uses netlink on Linux, PowerShell on Windows and ifconfig elsewhere. If
+    none of them works, falls back to the address used to reach other
+    networks, assumed to be on a /24.
+
+    Returns:
+        list: InterfaceAddress objects.
+    """
+    system = platform.system()
+    readers = []
+    if hasattr(socket, 'AF_NETLINK'):
+        readers.append(_netlink_addresses)
+    readers.append(_windows_addresses if system == 'Windows' else _ifconfig_addresses)
+    for reader in readers:
+        try:
+            addresses = reader()
+        except (OSError, ValueError, subprocess.SubprocessError):
+            continue
+        if addresses:
+            return addresses
+    local_ip = primary_address()
+    return [InterfaceAddress('', local_ip, f"{local_ip}/24")]
+
+
+def list_routes():
+    """
+    Return the IPv4 routes of the kernel from /proc/net/route (Linux; an empty list elsewhere).
+
+    Returns:
+        list: Route objects.
+    """
+    routes = []
+    try:
+        with open('/proc/net/route', 'r', encoding='ascii') as f:
+            lines = f.readlines()[1:]
+    except OSError:
+        return routes
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 8:
+            continue
+        # Addresses are hexadecimal, in the host byte order
+        destination, gateway, mask = (ipaddress.IPv4Address(struct.pack('=I', int(value, 16)))
+                                      for value in (fields[1], fields[2], fields[7]))
+        flags = int(fields[3], 16)
+        if not flags & 0x1:  # RTF_UP
+            continue
+        network = ipaddress.IPv4Network(f"{destination}/{mask}", strict=False)
+        routes.append(Route(fields[0], network, gateway if int(gateway) else None, int(fields[6])))
+    return routes
+
+
+def default_interface():
+    """Return the interface of the default route with the lowest metric (None if unknown)."""
+    defaults = [route for route in list_routes() if route.network.prefixlen == 0]
+    return min(defaults, key=lambda route: route.metric).interface if defaults else None
+
+
+def primary_address():
+    """Return the local address used to reach other networks (127.0.0.1 if there is none)."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.settimeout(0)
+    try:
+        s.connect(('10.254.254.254', 1))  # No packet is sent: this only selects the source address
+        return s.getsockname()[0]
+    except OSError:
+        return '127.0.0.1'
+    finally:
+        s.close()
+
+
+def attached_networks(version=4, include_link_local=False):
+    """
+    Return the networks the machine is directly attached to, one entry per network.
+
+    Loopback and single address (/32) networks are skipped, as are the
+    interfaces that are down or without carrier (e.g. a docker0 bridge with
+    no container) and link-local networks unless asked. Networks reached directly through an
+    on-link route (without an address in them) are included with the
+    interface's first address. The interface of the default route comes
+    first.
+
+    Args:
+        version (int): IP version (4; IPv6 networks are too large to sweep).
+        include_link_local (bool): Keep 169.254.0.0/16 and fe80::/64 networks.
+
+    Returns:
+        list: InterfaceAddress objects, whose 'network' is the range to scan and
+            'interface' the interface to scan it from.
+    """
+    entries = []
+    seen = set()
+    addresses = [entry for entry in list_addresses()
+                 if entry.version == version and not entry.is_loopback and entry.up]
+    for entry in addresses:
+        if entry.network in seen or entry.network.num_addresses == 1:
+            continue
+        if entry.is_link_local and not include_link_local:
+            continue
+        seen.add(entry.network)
+        entries.append(entry)
+
+    if version == 4:
+        for route in list_routes():
+            if route.gateway is not None or route.network.prefixlen == 0 or route.network.num_addresses == 1:
+                continue
+            if any(route.network.subnet_of(network) for network in seen):
+                continue
+            source = next((entry for entry in addresses if entry.interface == route.interface), None)
+            if source is not None:
+                seen.add(route.network)
+                entries.append(InterfaceAddress(route.interface, source.address, route.network,
+                                                source.index, source.scope))
+
+    primary = default_interface()
+    entries.sort(key=lambda entry: (entry.interface != primary, entry.interface, entry.network))
+    return entries
+
+
+def network_of(ip):
+    """
+    Return the attached network that contains an address.
+
+    Args:
+        ip (str): A local address.
+
+    Returns:
+        InterfaceAddress: The matching entry, or None.
+    """
+    address = ipaddress.ip_address(ip)
+    matches = [entry for entry in list_addresses() if address in entry.network]
+    return max(matches, key=lambda entry: entry.network.prefixlen) if matches else None
+
+
+def nmap_interface_name(interface):
+    """
+    Return the name to give to nmap's -e option for an interface.
+
+    nmap has its own interface names on Windows (see 'nmap --iflist'), so no
+    name is given there and nmap picks the interface from the routing table.
+    """
+    return None if os.name == 'nt' or not interface else interface
@@ -0,0 +1,398 @@
+import argparse
+import ipaddress
+import os
+import platform
+import select
+import socket
+import struct
+import subprocess
+import time
+
+from functionalities.interfaces import NETLINK_ROUTE, NLM_F_DUMP, NLM_F_REQUEST, NLMSG_DONE, NLMSG_ERROR, list_addresses
+from functionalities.targets import TargetSet
+
+# ICMPv6 message types
+ICMP6_PARAM_PROBLEM = 4
+ICMP6_ECHO_REQUEST = 128
+ICMP6_ECHO_REPLY = 129
+
+# Every node of a link
+ALL_NODES = 'ff02::1'
+
+# Destination options header holding one unrecognised option: its type starts with the bits 10, so every
+# node must drop the packet and answer with a Parameter Problem, even when it was sent to a multicast address
+# (RFC 8200, section 4.2). Hosts that ignore multicast echo requests (Windows) still answer this one.
+UNKNOWN_OPTION_HEADER = bytes([0, 0, 0x80, 4, 0, 0, 0, 0])
+
+# Netlink (Linux): neighbour table dump
+RTM_NEWNEIGH = 28
+RTM_GETNEIGH = 30
+NDA_DST = 1
+NDA_LLADDR = 2
+
+# Neighbour states worth scanning (reachable or seen recently); INCOMPLETE, FAILED and NOARP entries are not hosts
+NUD_REACHABLE = 0x02
+NUD_STALE = 0x04
+NUD_DELAY = 0x08
+NUD_PROBE = 0x10
+NUD_PERMANENT = 0x80
+NUD_VALID = NUD_REACHABLE | NUD_STALE | NUD_DELAY | NUD_PROBE | NUD_PERMANENT
+
+# 'ip -6 neigh' line: 'fe80::1 dev eth0 lladdr 52:54:00:12:34:56 router REACHABLE'
+IP_NEIGH_STATES = {'REACHABLE', 'STALE', 'DELAY', 'PROBE', 'PERMANENT'}
+
+# Neighbour list of Windows (InterfaceAlias|IPAddress|LinkLayerAddress|State per line)
+WINDOWS_NEIGHBOUR_COMMAND = ['powershell', '-NoProfile', '-Command',
+                             'Get-NetNeighbor -AddressFamily IPv6 | ForEach-Object '
+                             '{ "$($_.InterfaceAlias)|$($_.IPAddress)|$($_.LinkLayerAddress)|$($_.State)" }']
+WINDOWS_NEIGHBOUR_STATES = {'Reachable', 'Stale', 'Delay', 'Probe', 'Permanent'}
+
+# How long replies to the multicast probes are awaited, in seconds
+DEFAULT_TIMEOUT = 2.0
+
+# IPv6 ranges up to this size are swept address by address; larger ones (a /64 has 2^64 addresses) are
+# covered by multicast discovery and the neighbour table instead
+MAX_SWEEP = 65536
+
+
+class Ipv6Host:
+    """
+    An IPv6 host found on a link.
+
+    Args:
+        address (str or ipaddress.IPv6Address): The host's address (without scope).
+        interface (str): The local interface of the link it was found on.
+        mac (str): Its link-layer address, if known.
+        source (str): How it was found: 'echo', 'option' (Parameter Problem) or 'neighbour'.
+    """
+
+    __slots__ = ('address', 'interface', 'mac', 'sources')
+
+    def __init__(self, address, interface, mac=None, source=None):
+        self.address = ipaddress.IPv6Address(str(address).split('%', 1)[0])
+        self.interface = interface
+        self.mac = mac
+        self.sources = {source} if source else set()
+
+    @property
+    def target(self):
+        """The address to scan or ping: link-local addresses need their interface ('fe80::1%eth0')."""
+        if self.address.is_link_local and self.interface:
+            return f"{self.address}%{self.interface}"
+        return str(self.address)
+
+    def __repr__(self):
+        return f"<Ipv6Host {self.target} {'/'.join(sorted(self.sources))}>"
+
+
+def link_addresses(interfaces=None):
+    """
+    Return the IPv6 addresses of the local links.
+
+    Args:
+        interfaces (list): Only these interfaces (default: every interface with IPv6, except loopback).
+
+    Returns:
+        dict: {interface: [InterfaceAddress, ...]}, link-local addresses included.
+    """
+    links = {}
+    for entry in list_addresses():
+        if entry.version != 6 or entry.is_loopback or (interfaces and entry.interface not in interfaces):
+            continue
+        links.setdefault(entry.interface, []).append(entry)
+    return links
+
+
+def open_icmp6_socket():
+    """
+    Open a socket able to send ICMPv6 echo requests.
+
+    A raw socket is tried first (it also receives Parameter Problem messages
+    and may send the unknown-option probe), then an unprivileged datagram
+    socket (echo replies only).
+
+    Returns:
+        tuple: (socket, is_raw), or (None, False) if ICMPv6 sockets are not allowed.
+    """
+    for sock_type, is_raw in ((socket.SOCK_RAW, True), (socket.SOCK_DGRAM, False)):
+        try:
+            sock = socket.socket(socket.AF_INET6, sock_type, socket.IPPROTO_ICMPV6)
+            sock.setblocking(False)
+            return sock, is_raw
+        except (PermissionError, OSError):
+            continue
+    return None, False
+
+
+def build_echo_request6(identifier, sequence, payload=b'seahawks'):
+    """Build an ICMPv6 echo request (the kernel fills in the checksum, which covers the IPv6 pseudo-header)."""
+    return struct.pack('!BBHHH', ICMP6_ECHO_REQUEST, 0, 0, identifier & 0xFFFF, sequence & 0xFFFF) + payload
+
+
+def _parse_reply(data, identifier, is_raw):
+    """Return how a received ICMPv6 message reveals a host ('echo', 'option'), or None if it is not ours."""
+    if len(data) < 8:
+        return None
+    icmp_type, code = data[0], data[1]
+    if icmp_type == ICMP6_ECHO_REPLY:
+        # Datagram sockets rewrite the identifier and only deliver their own replies
+        reply_identifier = struct.unpack_from('!H', data, 4)[0]
+        return 'echo' if not is_raw or reply_identifier == identifier else None
+    if icmp_type == ICMP6_PARAM_PROBLEM and code == 2:
+        # The invoking packet follows: IPv6 header, our destination options header, then our echo request
+        offset = 8 + 40 + len(UNKNOWN_OPTION_HEADER)
+        if len(data) >= offset + 8 and data[offset] == ICMP6_ECHO_REQUEST:
+            return 'option' if struct.unpack_from('!H', data, offset + 4)[0] == identifier else None
+    return None
+
+
+def multicast_probe(interfaces=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Ask every node of each link to answer, with a few packets sent to ff02::1.
+
+    On each link, an echo request is sent from every local address: hosts
+    answer from the address matching the source, so the probe from a global
+    address reveals their global addresses and the one from the link-local
+    address their link-local ones. With a raw socket, a packet carrying an
+    unknown destination option is sent as well, which every node has to
+    answer (Parameter Problem), including those that ignore multicast echo.
+
+    Args:
+        interfaces (list): Links to probe (default: every interface with IPv6).
+        timeout (float): How long to wait for the replies, in seconds.
+
+    Returns:
+        dict: {address: Ipv6Host}.
+
+    Raises:
+        PermissionError: If no ICMPv6 socket can be opened.
+    """
+    identifier = os.getpid() & 0xFFFF
+    own = set()
+    sockets = {}
+    try:
+        for interface, entries in link_addresses(interfaces).items():
+            index = entries[0].index or socket.if_nametoindex(interface)
+            for sequence, entry in enumerate(entries):
+                own.add(entry.address)
+                sock, is_raw = open_icmp6_socket()
+                if sock is None:
+                    raise PermissionError("ICMPv6 sockets are not allowed for this user")
+                sockets[sock] = (interface, is_raw)
+                scope = index if entry.is_link_local else 0
+                try:
+                    sock.bind((str(entry.address), 0, 0, scope))
+                    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, index)
+                    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_LOOP, 0)
+                    packet = build_echo_request6(identifier, sequence)
+                    sock.sendto(packet, (ALL_NODES, 0, 0, index))
+                    if is_raw and hasattr(socket, 'IPV6_DSTOPTS'):
+                        sock.sendmsg([packet], [(socket.IPPROTO_IPV6, socket.IPV6_DSTOPTS, UNKNOWN_OPTION_HEADER)],
+                                     0, (ALL_NODES, 0, 0, index))
+                except OSError:
+                    # Address not usable yet (tentative) or option refused: the other probes still go out
+                    continue
+
+        hosts = {}
+        deadline = time.perf_counter() + timeout
+        while sockets:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select(list(sockets), [], [], remaining)
+            for sock in readable:
+                interface, is_raw = sockets[sock]
+                while True:
+                    try:
+                        data, address = sock.recvfrom(2048)
+                    except OSError:
+                        break
+                    source = _parse_reply(data, identifier, is_raw)
+                    host = Ipv6Host(address[0], interface, source=source)
+                    if source is None or host.address in own:
+                        continue
+                    known = hosts.setdefault(str(host.address), host)
+                    known.sources.add(source)
+        return hosts
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def _netlink_neighbours():
+    """Read the IPv6 neighbour table from the kernel with an RTM_GETNEIGH dump (Linux)."""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.bind((0, 0))
+        # nlmsghdr (length, type, flags, sequence, pid) + ndmsg (family, index, state, flags, type)
+        sock.send(struct.pack('=IHHII', 28, RTM_GETNEIGH, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+                  + struct.pack('=BxxxiHBB', socket.AF_INET6, 0, 0, 0, 0))
+        neighbours = []
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + 16 <= len(data):
+                length, message_type = struct.unpack_from('=IH', data, offset)
+                if message_type == NLMSG_DONE:
+                    return neighbours
+                if message_type == NLMSG_ERROR:
+                    raise OSError("Netlink neighbour dump failed")
+                if message_type == RTM_NEWNEIGH:
+                    neighbour = _parse_neighbour_message(data[offset + 16:offset + length])
+                    if neighbour is not None:
+                        neighbours.append(neighbour)
+                offset += (length + 3) & ~3
+    finally:
+        sock.close()
+
+
+def _parse_neighbour_message(message):
+    family, index, state, _, _ = struct.unpack_from('=BxxxiHBB', message)
+    if family != socket.AF_INET6 or not state & NUD_VALID:
+        return None
+    attributes = {}
+    offset = 12
+    while offset + 4 <= len(message):
+        length, attribute_type = struct.unpack_from('=HH', message, offset)
+        if length < 4:
+            break
+        attributes[attribute_type] = message[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+    if NDA_DST not in attributes:
+        return None
+    try:
+        interface = socket.if_indextoname(index)
+    except OSError:
+        interface = str(index)
+    mac = ':'.join(f"{byte:02x}" for byte in attributes[NDA_LLADDR]) if NDA_LLADDR in attributes else None
+    return Ipv6Host(ipaddress.IPv6Address(attributes[NDA_DST]), interface, mac, 'neighbour')
+
+
+def _ip_neighbours():
+    """Parse 'ip -6 neigh show' (Linux without netlink access)."""
+    output = subprocess.run(['ip', '-6', 'neigh', 'show'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, timeout=5, check=True).stdout
+    neighbours = []
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) < 3 or fields[-1] not in IP_NEIGH_STATES or 'dev' not in fields:
+            continue
+        mac = fields[fields.index('lladdr') + 1] if 'lladdr' in fields else None
+        neighbours.append(Ipv6Host(fields[0], fields[fields.index('dev') + 1], mac, 'neighbour'))
+    return neighbours
+
+
+def _windows_neighbours():
+    """List the IPv6 neighbours with PowerShell's Get-NetNeighbor."""
+    output = subprocess.run(WINDOWS_NEIGHBOUR_COMMAND, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, timeout=15, check=True).stdout
+    neighbours = []
+    for line in output.splitlines():
+        parts = line.strip().rsplit('|', 3)
+        if len(parts) != 4 or parts[3] not in WINDOWS_NEIGHBOUR_STATES:
+            continue
+        name, address, mac, _ = parts
+        neighbours.append(Ipv6Host(address, name, mac.replace('-', ':').lower() or None, 'neighbour'))
+    return neighbours
+
+
+def neighbour_table():
+    """
+    Return the IPv6 neighbours the system knows about (hosts it exchanged packets with recently).
+
+    Uses netlink on Linux (then the 'ip' command) and PowerShell on Windows.
+    Multicast addresses and entries that never resolved are left out.
+
+    Returns:
+        list: Ipv6Host objects.
+    """
+    readers = []
+    if hasattr(socket, 'AF_NETLINK'):
+        readers += [_netlink_neighbours, _ip_neighbours]
+    elif platform.system() == 'Windows':
+        readers.append(_windows_neighbours)
+    for reader in readers:
+        try:
+            return [host for host in reader() if not host.address.is_multicast]
+        except (OSError, ValueError, subprocess.SubprocessError):
+            continue
+    return []
+
+
+def discover_ipv6(interfaces=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Find the IPv6 hosts of the local links without sweeping their (2^64 address) networks.
+
+    The links are probed with multicast packets first (when ICMPv6 sockets
+    are allowed), then the neighbour table is read: it holds the hosts that
+    answered, with their link-layer address, and those the system talked to
+    recently.
+
+    Args:
+        interfaces (list): Links to cover (default: every interface with IPv6).
+        timeout (float): How long to wait for the multicast replies, in seconds.
+
+    Returns:
+        list: Ipv6Host objects, sorted by address.
+    """
+    try:
+        hosts = multicast_probe(interfaces, timeout)
+    except PermissionError:
+        print("ICMPv6 sockets unavailable: only the neighbour table is read.")
+        hosts = {}
+    for neighbour in neighbour_table():
+        if interfaces and neighbour.interface not in interfaces:
+            continue
+        host = hosts.setdefault(str(neighbour.address), neighbour)
+        host.sources |= neighbour.sources
+        host.mac = host.mac or neighbour.mac
+    return sorted(hosts.values(), key=lambda host: host.address)
+
+
+def expand_targets(targets, interfaces=None, timeout=DEFAULT_TIMEOUT, max_sweep=MAX_SWEEP):
+    """
+    Replace the IPv6 ranges too large to sweep by the hosts discovered in them.
+
+    IPv4 targets, hostnames and small IPv6 ranges are kept as they are.
+    Hosts outside the local links (beyond a router) cannot be discovered
+    this way: a remote /64 only yields the hosts the neighbour table knows.
+
+    Args:
+        targets (TargetSet): The targets.
+        interfaces (list): Links to discover on (default: every interface with IPv6).
+        timeout (float): How long to wait for the multicast replies, in seconds.
+        max_sweep (int): Largest IPv6 range kept as is.
+
+    Returns:
+        tuple: (TargetSet, list of the discovered Ipv6Host in the large ranges).
+    """
+    large = TargetSet([(6, start, end) for start, end in targets.intervals(6) if end - start + 1 > max_sweep])
+    if not large:
+        return targets, []
+    found = [host for host in discover_ipv6(interfaces, timeout) if host.address in large]
+    remaining = targets - large
+    if found:
+        remaining = remaining | TargetSet([(6, int(host.address), int(host.address)) for host in found])
+    return remaining, found
+
+
+def main():
+    """
+    Command-line entry point: list the IPv6 hosts of the local links.
+    """
+    parser = argparse.ArgumentParser(description="Discover the IPv6 hosts of the local links (multicast and "
+                                                 "neighbour table, without sweeping the networks).")
+    parser.add_argument('interfaces', nargs='*', help="Interfaces to probe (default: every interface with IPv6)")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Seconds to wait for replies")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    hosts = discover_ipv6(args.interfaces or None, args.timeout)
+    for host in hosts:
+        print(f"{host.target:45} {host.mac or '-':17} {'/'.join(sorted(host.sources))}")
+    print(f"{len(hosts)} hosts in {time.perf_counter() - start:.2f}s.")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
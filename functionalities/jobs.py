@@ -0,0 +1,495 @@
+import itertools
+import queue
+import re
+import shlex
+import subprocess
+import threading
+import time
+
+import nmap
+
+from functionalities.metrics import Metrics
+from functionalities.targets import TargetSet
+
+# Job priorities (lower runs first)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+# How often nmap reports its progress, and the progress element of its XML output
+STATS_INTERVAL = '5s'
+TASK_PROGRESS = re.compile(rb'<taskprogress [^>]*percent="([\d.]+)"')
+
+# Seconds given to nmap to exit after SIGTERM before it is killed
+KILL_GRACE_SECONDS = 2.0
+
+
+class ScanCancelled(Exception):
+    """Raised by NmapProcessScanner.scan() when the scan is cancelled and its partial results are discarded."""
+
+
+def close_partial_xml(output):
+    """
+    Turn the XML written by an interrupted nmap run into a complete document.
+
+    nmap writes each host element once the host is finished, so everything up
+    to the last '</host>' is valid; the runstats and closing tag are added.
+
+    Args:
+        output (bytes): The XML received so far.
+
+    Returns:
+        bytes: A document python-nmap can parse, with the finished hosts only.
+
+    Raises:
+        ScanCancelled: If no host was finished.
+    """
+    end = output.rfind(b'</host>')
+    if end == -1:
+        raise ScanCancelled("Scan cancelled before any host was finished")
+    body = output[:end + len(b'</host>')]
+    hosts = body.count(b'<host ') + body.count(b'<host>')
+    footer = (f'\n<runstats><finished time="{int(time.time())}" timestr="" summary="cancelled" elapsed="0" '
+              f'exit="cancelled"/><hosts up="{hosts}" down="0" total="{hosts}"/></runstats>\n</nmaprun>\n')
+    return body + footer.encode('ascii')
+
+
+class NmapProcessScanner(nmap.PortScanner):
+    """
+    An nmap.PortScanner whose nmap process can be stopped from another thread.
+
+    The XML report is read from nmap's standard output while the scan runs,
+    so its progress reports (--stats-every) are passed to 'progress_callback'
+    and a killed scan still has the hosts it finished.
+
+    Args:
+        progress_callback (function): Called with the percentage nmap reports (optional).
+        stats_interval (str): How often nmap reports its progress.
+    """
+
+    def __init__(self, progress_callback=None, stats_interval=STATS_INTERVAL):
+        super().__init__()
+        self.progress_callback = progress_callback
+        self.stats_interval = stats_interval
+        self.process = None
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.keep_partial = True
+
+    def scan(self, hosts='127.0.0.1', ports=None, arguments='-sV', sudo=False, timeout=0):
+        args = [self._nmap_path, '-oX', '-', '--stats-every', self.stats_interval]
+        args += shlex.split(hosts) + (['-p', ports] if ports else []) + shlex.split(arguments)
+        if sudo:
+            args = ['sudo'] + args
+
+        with self.lock:
+            if self.cancelled:
+                raise ScanCancelled("Scan cancelled before it started")
+            self.process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                            stderr=subprocess.PIPE)
+        process = self.process
+
+        # Drain stderr in the background so nmap never blocks on a full pipe
+        errors = []
+        reader = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+        reader.start()
+
+        # Like nmap.PortScanner, a scan that runs longer than 'timeout' seconds is killed
+        timed_out = threading.Event()
+        timer = None
+        if timeout:
+            def expire():
+                timed_out.set()
+                process.kill()
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        deadline = time.monotonic() + timeout if timeout else None
+
+        chunks = []
+        try:
+            for line in process.stdout:
+                chunks.append(line)
+                match = TASK_PROGRESS.search(line)
+                if match and self.progress_callback:
+                    self.progress_callback(float(match.group(1)))
+            process.wait(max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+        except subprocess.TimeoutExpired:
+            timed_out.set()
+            process.kill()
+            process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+        reader.join()
+        if timed_out.is_set() and not self.cancelled:
+            raise nmap.PortScannerTimeout('Timeout from nmap process')
+
+        output = b''.join(chunks)
+        if self.cancelled:
+            if not self.keep_partial:
+                raise ScanCancelled("Scan cancelled")
+            output = close_partial_xml(output)
+        self._nmap_last_output = output
+        nmap_err = b''.join(errors).decode(errors='replace')
+        warnings = [line + '\n' for line in nmap_err.splitlines() if line.lower().startswith('warning: ')]
+        failures = [line + '\n' for line in nmap_err.splitlines() if line and not line.lower().startswith('warning: ')]
+        return self.analyse_nmap_xml_scan(output, nmap_err, failures, warnings)
+
+    def kill(self, keep_partial=True):
+        """
+        Stop the running nmap process.
+
+        Args:
+            keep_partial (bool): Return the hosts finished so far from scan() instead of raising ScanCancelled.
+        """
+        with self.lock:
+            self.cancelled = True
+            self.keep_partial = keep_partial
+            process = self.process
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+
+        def force_kill():
+            if process.poll() is None:
+                process.kill()
+        timer = threading.Timer(KILL_GRACE_SECONDS, force_kill)
+        timer.daemon = True
+        timer.start()
+
+
+def target_covers(outer, inner):
+    """
+    Return True if scanning 'outer' also scans every target of 'inner'.
+
+    Both are target texts (see TargetSet.parse) or TargetSets; text that
+    cannot be parsed only matches itself.
+    """
+    try:
+        return TargetSet.parse(inner).issubset(TargetSet.parse(outer))
+    except (OSError, ValueError):
+        return str(outer).strip().lower() == str(inner).strip().lower()
+
+
+class ScanJob:
+    """
+    A scan submitted to the JobManager.
+
+    States: 'queued', 'running', 'done', 'failed', 'cancelled', and 'merged'
+    for a queued job absorbed by a later job whose target covers it (see
+    'merged_into'). A merged job follows the progress and hosts of that job;
+    when it finishes, the merged job takes its final state, result and error,
+    and its own done callbacks are called with it.
+    """
+
+    def __init__(self, job_id, target, output_folder, priority, interface=None, trace_routes=False):
+        self.id = job_id
+        self.target = target
+        self.interface = interface
+        self.output_folder = output_folder
+        self.priority = priority
+        self.trace_routes = trace_routes
+        self.state = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.metrics = Metrics(target)
+        self.liveness = None
+        self.scanner = None
+        self.cancel_requested = False
+        self.keep_partial = True
+        self.merged_into = None
+        self.merged = []
+        self.progress_callbacks = []
+        self.host_callbacks = []
+        self.done_callbacks = []
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    def report_progress(self, percent):
+        """Record progress (never moves backwards) and pass it to the listeners, and to the jobs merged into this one."""
+        self.progress = max(self.progress, percent)
+        for callback in list(self.progress_callbacks):
+            callback(self.progress)
+        for merged in list(self.merged):
+            merged.report_progress(percent)
+
+    def report_host(self, host_result):
+        """Pass a finished HostResult to the listeners (from the scanning thread), and to the jobs merged into this one."""
+        for callback in list(self.host_callbacks):
+            callback(host_result)
+        for merged in list(self.merged):
+            merged.report_host(host_result)
+
+    def check_cancelled(self):
+        """
+        Return True once the job is cancelled with its partial results kept (polled between the stages of a scan).
+
+        Raises:
+            ScanCancelled: If the job is cancelled and its partial results are discarded.
+        """
+        if not self.cancel_requested:
+            return False
+        if not self.keep_partial:
+            raise ScanCancelled("Scan cancelled")
+        return True
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish; returns False on timeout."""
+        return self.finished.wait(timeout)
+
+    def __repr__(self):
+        return f"<ScanJob #{self.id} {self.target} {self.state}>"
+
+
+def run_scan_job(job):
+    """
+    Default job runner: functionalities.scan.scan_network with a killable nmap process (and, for jobs submitted
+    with trace_routes, the routes to the hosts found, for the topology graph of the Stats page).
+
+    Returns:
+        ScanResult: The results, or None if the scan failed or was cancelled without keeping results.
+    """
+    from functionalities.scan import scan_network
+
+    job.scanner = NmapProcessScanner(progress_callback=job.report_progress)
+    if job.cancel_requested:
+        job.scanner.kill(job.keep_partial)
+    return scan_network(job.target, job.output_folder, progress_callback=job.report_progress,
+                        scanner=job.scanner, metrics=job.metrics, interface=job.interface,
+                        host_callback=job.report_host, trace_routes=job.trace_routes, liveness=job.liveness,
+                        cancelled=job.check_cancelled)
+
+
+class JobManager:
+    """
+    Run scans on a bounded pool of workers, by priority.
+
+    Submitting a target that is already covered by a queued or running job
+    (same target, or a subnet of it) returns that job instead of starting a
+    duplicate; a new target that covers queued jobs absorbs them. Running
+    jobs can be cancelled: their nmap process is killed and the hosts it
+    finished are either kept (written to the outputs) or discarded.
+
+    Args:
+        max_workers (int): Number of scans that may run at the same time.
+        runner (function): Runs a ScanJob and returns its result (default: run_scan_job).
+        liveness (LivenessCache): Shared host-liveness cache handed to the jobs (functionalities.liveness).
+    """
+
+    def __init__(self, max_workers=2, runner=None, liveness=None):
+        self.max_workers = max_workers
+        self.runner = runner or run_scan_job
+        self.liveness = liveness
+        self.queue = queue.PriorityQueue()
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.sequence = itertools.count()
+        self.workers = []
+
+    def submit(self, target, output_folder, priority=PRIORITY_NORMAL, progress_callback=None, done_callback=None,
+               interface=None, host_callback=None, trace_routes=False):
+        """
+        Queue a scan, or join the queued or running job that already covers the target.
+
+        Only jobs that scan from the same interface into the same output folder
+        are joined or merged: their results would otherwise be saved elsewhere.
+
+        Args:
+            target (str): The nmap target (address, CIDR or hostname).
+            output_folder (str): Where the results are saved.
+            priority (int): PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW (lower runs first).
+            progress_callback (function): Called with the progress percentage (from a worker thread).
+            done_callback (function): Called with the finished job (from a worker thread).
+            interface (str): Network interface to scan from (nmap -e), for a network attached to it.
+            host_callback (function): Called with each finished HostResult (from a worker thread).
+            trace_routes (bool): Also trace the routes to the hosts found (functionalities.topology).
+
+        Returns:
+            ScanJob: The job that will scan the target (check job.target: it may be a wider range).
+        """
+        with self.lock:
+            for job in self.jobs.values():
+                # A running job that does not trace the routes cannot start doing so
+                if (job.state in ('queued', 'running') and self._compatible(job, output_folder, interface)
+                        and (job.state == 'queued' or job.trace_routes or not trace_routes)
+                        and target_covers(job.target, target)):
+                    self._attach(job, progress_callback, done_callback, host_callback)
+                    job.trace_routes = job.trace_routes or trace_routes
+                    if job.state == 'queued' and priority < job.priority:
+                        job.priority = priority
+                        self.queue.put((priority, next(self.sequence), job))
+                    return job
+
+            job = ScanJob(next(self.ids), target, output_folder, priority, interface, trace_routes)
+            job.liveness = self.liveness
+            self._attach(job, progress_callback, done_callback, host_callback)
+            for queued in self.jobs.values():
+                if (queued.state == 'queued' and self._compatible(queued, output_folder, interface)
+                        and target_covers(target, queued.target)):
+                    queued.state = 'merged'
+                    queued.merged_into = job
+                    job.merged.append(queued)
+                    job.priority = min(job.priority, queued.priority)
+                    job.trace_routes = job.trace_routes or queued.trace_routes
+            self.jobs[job.id] = job
+            self.queue.put((job.priority, next(self.sequence), job))
+            self._start_workers()
+            return job
+
+    @staticmethod
+    def _compatible(job, output_folder, interface):
+        return job.output_folder == output_folder and job.interface == interface
+
+    @staticmethod
+    def _attach(job, progress_callback, done_callback, host_callback=None):
+        if progress_callback:
+            job.progress_callbacks.append(progress_callback)
+        if host_callback:
+            job.host_callbacks.append(host_callback)
+        if done_callback:
+            job.done_callbacks.append(done_callback)
+
+    def _start_workers(self):
+        self.workers = [worker for worker in self.workers if worker.is_alive()]
+        while len(self.workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def get(self, job_id):
+        """Return a job by id (None if unknown)."""
+        return self.jobs.get(job_id)
+
+    def active_jobs(self):
+        """Return the queued and running jobs, by priority then submission order."""
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if job.state in ('queued', 'running')]
+        return sorted(jobs, key=lambda job: (job.state != 'running', job.priority, job.id))
+
+    def cancel(self, job_id, keep_partial=True):
+        """
+        Cancel a job.
+
+        A queued job is dropped. A running job has its nmap process killed and
+        the stages after nmap skipped; with 'keep_partial' the hosts finished so
+        far are still saved. A merged job is detached from the job that absorbed
+        it, which goes on for its own submitter. The jobs merged into a cancelled
+        job do not depend on it any more: they are queued again on their own.
+
+        Returns:
+            bool: False if the job is unknown or already finished.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state not in ('queued', 'running', 'merged'):
+                return False
+            job.keep_partial = keep_partial
+            job.cancel_requested = True
+            if job.state == 'merged':
+                absorbing = job.merged_into
+                absorbing.merged.remove(job)
+                job.merged_into = None
+            else:
+                absorbing = None
+            for merged in job.merged:
+                if absorbing is not None:
+                    # The jobs this one had absorbed are still covered by the job that absorbed it
+                    merged.merged_into = absorbing
+                    absorbing.merged.append(merged)
+                else:
+                    merged.state = 'queued'
+                    merged.merged_into = None
+                    self.queue.put((merged.priority, next(self.sequence), merged))
+            job.merged = []
+            if job.state != 'running':
+                callbacks = self._finish(job, 'cancelled')
+            else:
+                callbacks = None
+                scanner = job.scanner
+        if callbacks is not None:
+            self._notify(callbacks)
+            return True
+        if scanner is not None and hasattr(scanner, 'kill'):
+            scanner.kill(keep_partial)
+        return True
+
+    def shutdown(self, cancel=True):
+        """Stop the workers, cancelling queued and running jobs unless 'cancel' is False."""
+        if cancel:
+            for job in self.active_jobs():
+                self.cancel(job.id, keep_partial=True)
+        for _ in self.workers:
+            self.queue.put((float('inf'), next(self.sequence), None))
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def _work(self):
+        while True:
+            priority, _, job = self.queue.get()
+            if job is None:
+                return
+            with self.lock:
+                # Stale entries: the job was re-queued with a new priority, merged or cancelled
+                if job.state != 'queued' or priority != job.priority:
+                    continue
+                job.state = 'running'
+                job.started_at = time.time()
+
+            result, error, cancelled = None, None, False
+            try:
+                result = self.runner(job)
+            except ScanCancelled:
+                cancelled = True
+            except Exception as e:
+                error = e
+            with self.lock:
+                job.result = result
+                job.error = error
+                if job.cancel_requested or cancelled:
+                    state = 'cancelled'
+                elif error is not None or result is None:
+                    state = 'failed'
+                else:
+                    state = 'done'
+                callbacks = self._finish(job, state)
+            self._notify(callbacks)
+
+    @staticmethod
+    def _finish(job, state):
+        """
+        Set the final state of a job and of the jobs merged into it (lock held).
+
+        Returns:
+            list: (job, callback) pairs: the done callbacks of the job, then those of each merged job.
+        """
+        job.state = state
+        job.finished_at = time.time()
+        callbacks = [(job, callback) for callback in job.done_callbacks]
+        # A merged job may itself have absorbed jobs before it was merged
+        pending = list(job.merged)
+        while pending:
+            merged = pending.pop(0)
+            pending.extend(merged.merged)
+            merged.state = state
+            merged.result = job.result
+            merged.error = job.error
+            merged.finished_at = job.finished_at
+            merged.finished.set()
+            callbacks.extend((merged, callback) for callback in merged.done_callbacks)
+        job.finished.set()
+        return callbacks
+
+    @staticmethod
+    def _notify(callbacks):
+        # Called without the lock: listeners may submit new jobs
+        for job, callback in callbacks:
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"Error in the completion callback of scan job #{job.id}: {e}")
@@ -0,0 +1,298 @@
+import argparse
+import ipaddress
+import os
+import sqlite3
+import threading
+import time
+
+from functionalities.targets import TargetSet
+
+# Where the cache is kept, shared by the GUI, the scanners and the command-line scripts
+DEFAULT_LIVENESS_PATH = os.path.join('resultat', 'liveness.db')
+
+# How long an observation is trusted: hosts seen up for 5 minutes, hosts that did not answer for 1 minute
+# (a silent host may just have dropped one probe)
+DEFAULT_UP_TTL = 300.0
+DEFAULT_DOWN_TTL = 60.0
+
+# Entries kept on disk: the least recently used are evicted beyond this
+DEFAULT_MAX_ENTRIES = 262144
+
+# Addresses per query of a batch lookup (below SQLite's limit on bound parameters)
+QUERY_BATCH = 500
+
+# Seconds a process waits for another one holding the write lock
+BUSY_TIMEOUT = 30.0
+
+# How thorough the discovery of each source is. A negative entry only stands in for a discovery that is not
+# more thorough: 'ping' sends ICMP echo requests, nmap's host discovery adds TCP SYN 443, TCP ACK 80 and
+# ICMP timestamp probes
+DISCOVERY_LEVELS = {'ping': 1, 'nmap': 2}
+
+
+def covers(source, method):
+    """Return True if a host that did not answer a 'source' discovery would not answer a 'method' one either."""
+    return DISCOVERY_LEVELS.get(source, 0) >= DISCOVERY_LEVELS.get(method, len(DISCOVERY_LEVELS) + 1)
+
+
+def address_key(address):
+    """
+    Return the indexed key of an address: its IP version, then its value on 16 bytes (big-endian).
+
+    Keys sort like the addresses, so an interval of a TargetSet is one range
+    of the index. Hostnames have no key (None).
+    """
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    return _key(address.version, int(address))
+
+
+def _key(version, value):
+    return bytes([version]) + value.to_bytes(16, 'big')
+
+
+class LivenessCache:
+    """
+    Persistent cache of which hosts answered a probe, and when.
+
+    Every discovery path (the ping page, both scanners, the ping script)
+    looks its targets up here first and only probes the addresses that have
+    no fresh entry, then records what it found. Entries hold the time of
+    the observation, so freshness is decided when reading: positive entries
+    are trusted for up_ttl seconds, negative entries (the host did not
+    answer) for down_ttl. Past max_entries, the least recently used entries
+    are evicted.
+
+    The cache is a SQLite database in WAL mode: readers never block, and
+    several processes (the GUI and a script) can share the file. Within a
+    process, one connection is shared by all threads behind a lock. The
+    addresses are indexed by value (see address_key), so looking up a
+    network reads only its own entries.
+
+    Args:
+        path (str): The database file (created if missing).
+        up_ttl (float): Seconds a host seen up is trusted.
+        down_ttl (float): Seconds a host that did not answer is trusted (0: no negative caching).
+        max_entries (int): Entries kept before the least recently used are evicted.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hosts (
+            address TEXT PRIMARY KEY,
+            up INTEGER NOT NULL,
+            rtt REAL,
+            source TEXT,
+            checked REAL NOT NULL,
+            used REAL NOT NULL,
+            key BLOB
+        );
+        CREATE INDEX IF NOT EXISTS hosts_used ON hosts (used);
+    """
+
+    def __init__(self, path=DEFAULT_LIVENESS_PATH, up_ttl=DEFAULT_UP_TTL, down_ttl=DEFAULT_DOWN_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.up_ttl = up_ttl
+        self.down_ttl = down_ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                                          isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self._add_keys()
+        self.connection.execute("CREATE INDEX IF NOT EXISTS hosts_key ON hosts (key)")
+
+    def _add_keys(self):
+        # Caches written before the address index have no 'key' column: add it and fill it in
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(hosts)")}
+            if 'key' not in columns:
+                connection.execute("ALTER TABLE hosts ADD COLUMN key BLOB")
+                addresses = [row[0] for row in connection.execute("SELECT address FROM hosts").fetchall()]
+                connection.executemany("UPDATE hosts SET key = ? WHERE address = ?",
+                                       [(address_key(address), address) for address in addresses])
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _fresh(self, up, checked, now, max_age):
+        ttl = self.up_ttl if up else self.down_ttl
+        if max_age is not None:
+            ttl = min(ttl, max_age)
+        return now - checked <= ttl
+
+    def _select(self, targets):
+        """Yield the (address, up, rtt, source, checked) rows of the targets."""
+        if isinstance(targets, TargetSet):
+            # One range scan of the address index per interval, however large the interval is
+            for version in (4, 6):
+                for start, end in targets.intervals(version):
+                    yield from self.connection.execute(
+                        "SELECT address, up, rtt, source, checked FROM hosts WHERE key BETWEEN ? AND ?",
+                        (_key(version, start), _key(version, end)))
+            targets = sorted(targets.hostnames)
+        targets = list(dict.fromkeys(str(target) for target in targets))
+        for start in range(0, len(targets), QUERY_BATCH):
+            batch = targets[start:start + QUERY_BATCH]
+            yield from self.connection.execute(
+                f"SELECT address, up, rtt, source, checked FROM hosts WHERE address IN ({','.join('?' * len(batch))})",
+                batch)
+
+    def lookup(self, targets, max_age=None):
+        """
+        Return the fresh entries of the targets.
+
+        Args:
+            targets (TargetSet or iterable): The addresses to look up.
+            max_age (float): Only trust observations at most this old (default: the TTLs).
+
+        Returns:
+            dict: {address: {'up': bool, 'rtt': ms or None, 'source': str, 'checked': timestamp}},
+                without the addresses that are unknown or whose entry has expired.
+        """
+        now = time.time()
+        with self.lock:
+            found = {address: {'up': bool(up), 'rtt': rtt, 'source': source, 'checked': checked}
+                     for address, up, rtt, source, checked in self._select(targets)
+                     if self._fresh(up, checked, now, max_age)}
+            if found:
+                # Reading an entry makes it recently used
+                self._write("UPDATE hosts SET used = ? WHERE address = ?", [(now, address) for address in found])
+        return found
+
+    def get(self, address, max_age=None):
+        """Return True or False for a fresh entry of the address, None if it has to be probed."""
+        entry = self.lookup([address], max_age).get(str(address))
+        return None if entry is None else entry['up']
+
+    def live_hosts(self, targets=None, max_age=None):
+        """Return the addresses with a fresh positive entry (of the targets, or all of them), oldest first."""
+        now = time.time()
+        with self.lock:
+            rows = self._select(targets) if targets is not None else self.connection.execute(
+                "SELECT address, up, rtt, source, checked FROM hosts WHERE up = 1")
+            return [address for address, up, rtt, source, checked in sorted(rows, key=lambda row: row[4])
+                    if up and self._fresh(up, checked, now, max_age)]
+
+    def record(self, address, up, rtt=None, source=None, timestamp=None):
+        """Record one observation of a host."""
+        self.record_many({address: up}, source, timestamp, {address: rtt} if rtt is not None else None)
+
+    def record_many(self, results, source=None, timestamp=None, rtts=None):
+        """
+        Record the outcome of a discovery pass.
+
+        Args:
+            results (dict): {address: True if it answered, False if not}.
+            source (str): What observed it (e.g. 'ping', 'nmap', see DISCOVERY_LEVELS).
+            timestamp (float): When it was observed (default: now).
+            rtts (dict): {address: round-trip time in ms} of the hosts that answered.
+        """
+        if not results:
+            return
+        timestamp = timestamp if timestamp is not None else time.time()
+        rtts = rtts or {}
+        rows = [(str(address), int(bool(up)), rtts.get(address), source, timestamp, timestamp, address_key(address))
+                for address, up in results.items()]
+        with self.lock:
+            self._write("INSERT OR REPLACE INTO hosts (address, up, rtt, source, checked, used, key) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._evict()
+
+    def record_stats(self, stats, source='ping'):
+        """Record the statistics returned by fonctions.ping.probe_latency for one host."""
+        self.record(stats['host'], stats['reachable'], stats.get('avg'), source)
+
+    def invalidate(self, targets=None):
+        """Forget the entries of the targets (or every entry), so they are probed again."""
+        with self.lock:
+            if targets is None:
+                self._write("DELETE FROM hosts", [()])
+                return
+            addresses = [(row[0],) for row in self._select(targets)]
+            self._write("DELETE FROM hosts WHERE address = ?", addresses)
+
+    def _write(self, statement, rows):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent processes wait (busy timeout)
+        # instead of failing halfway through the batch
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(statement, rows)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _evict(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM hosts").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Expired entries go first, then the least recently used ones
+        now = time.time()
+        self._write("DELETE FROM hosts WHERE (up = 1 AND checked < ?) OR (up = 0 AND checked < ?)",
+                    [(now - self.up_ttl, now - self.down_ttl)])
+        count = self.connection.execute("SELECT COUNT(*) FROM hosts").fetchone()[0]
+        if count > self.max_entries:
+            self._write("DELETE FROM hosts WHERE address IN (SELECT address FROM hosts ORDER BY used LIMIT ?)",
+                        [(count - self.max_entries,)])
+
+    def entries(self):
+        """Return every entry as (address, up, rtt, source, checked), most recent first."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT address, up, rtt, source, checked FROM hosts ORDER BY checked DESC").fetchall()
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main():
+    """
+    Command-line entry point: list or clear the liveness cache.
+    """
+    parser = argparse.ArgumentParser(description="Show the shared host-liveness cache.")
+    parser.add_argument('--path', default=DEFAULT_LIVENESS_PATH, help=f"Cache file (default: {DEFAULT_LIVENESS_PATH})")
+    parser.add_argument('--up', action='store_true', help="Only list the hosts currently known to be up")
+    parser.add_argument('--clear', action='store_true', help="Forget every entry")
+    args = parser.parse_args()
+
+    with LivenessCache(args.path) as cache:
+        if args.clear:
+            cache.invalidate()
+            print("Liveness cache cleared.")
+            return
+        if args.up:
+            for address in cache.live_hosts():
+                print(address)
+            return
+        now = time.time()
+        for address, up, rtt, source, checked in cache.entries():
+            fresh = cache._fresh(up, checked, now, None)
+            state = ('up' if up else 'down') + ('' if fresh else ' (expired)')
+            latency = f" {rtt:g} ms" if rtt is not None else ""
+            print(f"{address:39} {state:16} {now - checked:8.0f}s ago  {source or '-'}{latency}")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
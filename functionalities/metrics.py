@@ -0,0 +1,282 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prefix of every exported metric name
+METRIC_PREFIX = 'harvester_'
+
+# Default port of the metrics HTTP endpoint (bound to localhost)
+DEFAULT_METRICS_PORT = 9464
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    pairs = []
+    for name, value in key:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metrics:
+    """
+    Counters, gauges and timed spans of one scan.
+
+    Every method is thread-safe and cheap (a dict update under a lock), so it
+    can be called from the scanning threads. Values are exported in the
+    Prometheus text format (write_prometheus / MetricsServer) and as a JSON
+    summary saved with the scan results (save_summary).
+
+    Span names are the scan phases: 'discovery', 'port_scan', 'version_scan',
+    'parsing' and 'output'.
+
+    Args:
+        scan (str): Name of the scan, added to the summary (e.g. the network range).
+    """
+
+    def __init__(self, scan=''):
+        self.scan = scan
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.spans = {}
+        # Scan parameters kept in the summary (profile, ports per host...), used by the estimator
+        self.info = {}
+        self.start_time = time.time()
+        self.end_time = None
+
+    def inc(self, name, value=1, **labels):
+        """Add 'value' to a counter (probes sent, replies, retries, bytes written...)."""
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to its current value (in-flight probes, queue depth...)."""
+        with self.lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def add_gauge(self, name, value, **labels):
+        """Move a gauge up or down by 'value'."""
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, phase, seconds, end=None):
+        """
+        Record one timed execution of a phase.
+
+        Args:
+            phase (str): The phase name.
+            seconds (float): Duration of the execution.
+            end (float): time.perf_counter() at the end of the execution (default: now).
+        """
+        if end is None:
+            end = time.perf_counter()
+        with self.lock:
+            calls, total, longest, first, last = self.spans.get(phase, (0, 0.0, 0.0, end - seconds, end))
+            # 'first'/'last' bound the phase in wall-clock time: executions in parallel threads overlap
+            self.spans[phase] = (calls + 1, total + seconds, max(longest, seconds),
+                                 min(first, end - seconds), max(last, end))
+
+    @contextmanager
+    def span(self, phase):
+        """Time the enclosed block as one execution of 'phase'."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.observe(phase, end - start, end)
+
+    def finish(self):
+        """Mark the end of the scan."""
+        self.end_time = time.time()
+
+    def counter(self, name, **labels):
+        """Return the current value of a counter."""
+        with self.lock:
+            return self.counters.get((name, _label_key(labels)), 0)
+
+    def summary(self):
+        """
+        Return the metrics as a JSON-serializable dict.
+
+        Returns:
+            dict: scan, start/end time, duration, and the phases, counters and gauges.
+        """
+        with self.lock:
+            end_time = self.end_time or time.time()
+            return {
+                'scan': self.scan,
+                'started_at': round(self.start_time, 3),
+                'start_time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.start_time)),
+                'end_time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time)),
+                'duration_seconds': round(end_time - self.start_time, 3),
+                'info': dict(self.info),
+                'phases': {phase: {'calls': calls, 'seconds': round(total, 4), 'max_seconds': round(longest, 4),
+                                   'wall_seconds': round(last - first, 4)}
+                           for phase, (calls, total, longest, first, last) in self.spans.items()},
+                'counters': {name + _format_labels(key): value for (name, key), value in self.counters.items()},
+                'gauges': {name + _format_labels(key): value for (name, key), value in self.gauges.items()},
+            }
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            spans = sorted(self.spans.items())
+            end_time = self.end_time or time.time()
+
+        def add_family(name, kind, help_text, samples):
+            name = METRIC_PREFIX + name
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in samples:
+                value = value if isinstance(value, int) else round(value, 6)
+                lines.append(f"{name}{_format_labels(key)} {value}")
+
+        for kind, items in (('counter', counters), ('gauge', gauges)):
+            names = []
+            for (name, _), _ in items:
+                if name not in names:
+                    names.append(name)
+            for name in names:
+                suffix = '_total' if kind == 'counter' else ''
+                add_family(name + suffix, kind, name.replace('_', ' ').capitalize() + '.',
+                           [(key, value) for (item_name, key), value in items if item_name == name])
+
+        if spans:
+            add_family('phase_seconds_total', 'counter', 'Time spent in each scan phase.',
+                       [((('phase', phase),), span[1]) for phase, span in spans])
+            add_family('phase_calls_total', 'counter', 'Executions of each scan phase.',
+                       [((('phase', phase),), span[0]) for phase, span in spans])
+            add_family('phase_max_seconds', 'gauge', 'Longest execution of each scan phase.',
+                       [((('phase', phase),), span[2]) for phase, span in spans])
+        add_family('scan_duration_seconds', 'gauge', 'Duration of the scan.',
+                   [((('scan', self.scan),) if self.scan else (), end_time - self.start_time)])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Write the metrics to a .prom file (for the node_exporter textfile collector).
+
+        The file is replaced atomically so a collector never reads it half-written,
+        through a temporary file of its own: concurrent scans refresh the same file.
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(suffix='.part', prefix=os.path.basename(path) + '.', dir=folder or None)
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            # mkstemp creates the file private: the collector may run as another user
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def save_summary(self, path):
+        """Save the JSON summary of the scan."""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def format_summary(self):
+        """Return a short human-readable report of the phases and counters."""
+        summary = self.summary()
+        lines = [f"Scan {summary['scan']}: {summary['start_time']} -> {summary['end_time']} "
+                 f"({summary['duration_seconds']:.2f}s)"]
+        for phase, values in summary['phases'].items():
+            lines.append(f"  {phase:14} {values['seconds']:10.3f}s  {values['calls']:6} calls  "
+                         f"max {values['max_seconds']:.3f}s")
+        for name, value in summary['counters'].items():
+            lines.append(f"  {name:30} {value}")
+        return "\n".join(lines)
+
+
+def save_scan_metrics(metrics, output_folder, current_time):
+    """
+    Save the metrics of a finished scan next to its results.
+
+    Writes '<output_folder>/metrics/<current_time>_scan_metrics.json' and
+    refreshes '<output_folder>/metrics/scan.prom' with the latest scan. The
+    subfolder keeps the files out of the scan listings.
+
+    Returns:
+        str: The path of the JSON summary.
+    """
+    metrics_folder = os.path.join(output_folder, 'metrics')
+    summary_path = os.path.join(metrics_folder, f"{current_time}_scan_metrics.json")
+    metrics.save_summary(summary_path)
+    metrics.write_prometheus(os.path.join(metrics_folder, 'scan.prom'))
+    return summary_path
+
+
+class MetricsServer:
+    """
+    Serve live metrics over HTTP at /metrics in the Prometheus text format.
+
+    Bound to localhost by default; runs in a daemon thread. The served
+    Metrics object can be swapped (e.g. one per scan) with the 'metrics'
+    attribute.
+
+    Args:
+        metrics (Metrics): The metrics to serve.
+        host (str): Listen address.
+        port (int): Listen port (0 picks a free port, see 'port' after start()).
+    """
+
+    def __init__(self, metrics, host='127.0.0.1', port=DEFAULT_METRICS_PORT):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """Start serving in the background."""
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = owner.metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,320 @@
+import argparse
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from functionalities.icmp import icmp_available, open_icmp_socket, ping_many
+from functionalities.timeseries import TimeSeriesStore
+
+
+class TimerWheel:
+    """
+    A hierarchical timer wheel.
+
+    Level 0 has one slot per tick; each higher level has slots that are
+    'slots' times longer. Scheduling a timer and expiring it are O(1): a timer
+    sits in the coarsest level that can hold it and is cascaded down to finer
+    levels as its deadline approaches, so the cost of a tick does not depend
+    on how many timers are waiting.
+
+    Args:
+        tick (float): Duration of one tick in seconds.
+        slots (int): Number of slots per level.
+        levels (int): Number of levels (the horizon is tick * slots ** levels).
+    """
+
+    def __init__(self, tick=0.1, slots=64, levels=4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.spans = [slots ** level for level in range(levels + 1)]
+        self.current_tick = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, delay, item):
+        """
+        Schedule an item to expire after 'delay' seconds.
+
+        Args:
+            delay (float): Delay in seconds (rounded up to a whole tick, at least one).
+            item: Any object, returned by advance() when the timer expires.
+        """
+        expires = self.current_tick + max(1, math.ceil(delay / self.tick))
+        self._insert(expires, item)
+        self.count += 1
+
+    def _insert(self, expires, item):
+        delta = expires - self.current_tick
+        spans = self.spans
+        for level in range(self.levels):
+            if delta < spans[level + 1]:
+                slot = (expires // spans[level]) % self.slots
+                self.wheels[level][slot].append((expires, item))
+                return
+        # Beyond the horizon: park it in the top level, it is re-inserted when that slot comes round
+        level = self.levels - 1
+        slot = ((self.current_tick + spans[self.levels] - 1) // spans[level]) % self.slots
+        self.wheels[level][slot].append((expires, item))
+
+    def advance(self):
+        """
+        Move the wheel forward by one tick.
+
+        Returns:
+            list: The items whose timers expired on this tick.
+        """
+        self.current_tick += 1
+        now = self.current_tick
+        spans = self.spans
+
+        # Cascade the coarser levels whose slot boundary was just reached, coarsest first
+        for level in range(self.levels - 1, 0, -1):
+            if now % spans[level] == 0:
+                slot = (now // spans[level]) % self.slots
+                bucket = self.wheels[level][slot]
+                if bucket:
+                    self.wheels[level][slot] = []
+                    for expires, item in bucket:
+                        self._insert(expires, item)
+
+        slot = now % self.slots
+        bucket = self.wheels[0][slot]
+        if not bucket:
+            return []
+        self.wheels[0][slot] = []
+        expired = []
+        for expires, item in bucket:
+            if expires <= now:
+                expired.append(item)
+            else:
+                self._insert(expires, item)
+        self.count -= len(expired)
+        return expired
+
+
+def icmp_probe(hosts, timeout=1.0):
+    """
+    Default monitor probe: one ICMP echo per host over a shared socket.
+
+    Falls back to the system 'ping' command (fonctions/ping.py) when ICMP
+    sockets are not allowed for the current user.
+
+    Args:
+        hosts (list): The hosts due for a check.
+        timeout (float): Reply timeout in seconds.
+
+    Returns:
+        dict: {host: round-trip time in ms, or None if the host did not answer}.
+    """
+    sock = open_icmp_socket()
+    if sock[0] is not None:
+        try:
+            return ping_many(hosts, timeout, sock)
+        finally:
+            sock[0].close()
+
+    from fonctions.ping import probe_latency
+    results = probe_latency(hosts, count=1, timeout=timeout)
+    return {host: stats['avg'] for host, stats in results.items()}
+
+
+class ReachabilityMonitor:
+    """
+    Continuously check the reachability of many hosts.
+
+    Every host has its own check interval. Checks are scheduled on a
+    TimerWheel; on each tick the hosts that are due are probed together in a
+    single batch. When a host changes state an event is passed to 'on_event':
+    a dict with 'host', 'state' ('up' or 'down'), 'previous', 'time' and 'rtt'.
+
+    Args:
+        probe (function): Takes a list of hosts and returns {host: rtt or None} (default: icmp_probe).
+        on_event (function): Called with each up/down transition (optional).
+        tick (float): Scheduler resolution in seconds.
+        timeout (float): Probe timeout in seconds.
+        down_after (int): Consecutive failures before a host is reported down.
+        max_workers (int): Number of probe batches that may run at the same time.
+        store (TimeSeriesStore): Where to record every measurement (optional).
+    """
+
+    def __init__(self, probe=None, on_event=None, tick=0.5, timeout=1.0, down_after=2, max_workers=4, store=None):
+        self.probe = probe or icmp_probe
+        self.on_event = on_event
+        self.store = store
+        self.timeout = timeout
+        self.down_after = down_after
+        self.wheel = TimerWheel(tick=tick)
+        self.intervals = {}
+        self.states = {}
+        self.failures = {}
+        self.last_rtt = {}
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.thread = None
+
+    def add_host(self, host, interval=5.0):
+        """
+        Start monitoring a host (or change its interval).
+
+        Args:
+            host (str): The host to monitor.
+            interval (float): Seconds between two checks.
+        """
+        with self.lock:
+            is_new = host not in self.intervals
+            self.intervals[host] = interval
+            if is_new:
+                self.states[host] = 'unknown'
+                self.failures[host] = 0
+                # Timers of a previous registration of the same host are ignored when they expire
+                self.generations[host] = self.generations.get(host, 0) + 1
+                # First check on the next tick
+                self.wheel.schedule(0, (host, self.generations[host]))
+
+    def add_hosts(self, hosts, interval=5.0):
+        """Start monitoring several hosts with the same interval."""
+        for host in hosts:
+            self.add_host(host, interval)
+
+    def remove_host(self, host):
+        """Stop monitoring a host (its pending timer is dropped when it expires)."""
+        with self.lock:
+            self.intervals.pop(host, None)
+            self.states.pop(host, None)
+            self.failures.pop(host, None)
+            self.last_rtt.pop(host, None)
+
+    def snapshot(self):
+        """Return {host: (state, last rtt)} for every monitored host."""
+        with self.lock:
+            return {host: (state, self.last_rtt.get(host)) for host, state in self.states.items()}
+
+    def start(self):
+        """Run the monitor in a background thread."""
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the monitor and wait for the running probes."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.executor.shutdown(wait=True)
+
+    def run(self):
+        """Scheduler loop: advance the wheel in real time and dispatch due hosts."""
+        next_tick = time.monotonic()
+        while not self.stop_event.is_set():
+            next_tick += self.wheel.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0 and self.stop_event.wait(delay):
+                break
+            with self.lock:
+                due = [(host, generation) for host, generation in self.wheel.advance()
+                       if host in self.intervals and self.generations.get(host) == generation]
+            if due:
+                self.executor.submit(self.check, due)
+
+    def check(self, due):
+        """Probe a batch of due (host, generation) timers, emit transitions and reschedule them."""
+        now = time.time()
+        try:
+            results = self.probe([host for host, _ in due], self.timeout)
+        except Exception as e:
+            print(f"Monitor probe error: {e}")
+            results = {}
+
+        events = []
+        with self.lock:
+            for host, generation in due:
+                if host not in self.intervals or self.generations.get(host) != generation:
+                    continue
+                rtt = results.get(host)
+                previous = self.states[host]
+                if self.store is not None:
+                    self.store.record(host, rtt, timestamp=now)
+                if rtt is not None:
+                    self.failures[host] = 0
+                    self.last_rtt[host] = rtt
+                    state = 'up'
+                else:
+                    self.failures[host] += 1
+                    failed_enough = self.failures[host] >= self.down_after or previous == 'unknown'
+                    state = 'down' if failed_enough else previous
+                if state != previous:
+                    self.states[host] = state
+                    events.append({'host': host, 'state': state, 'previous': previous, 'time': now, 'rtt': rtt})
+                self.wheel.schedule(self.intervals[host], (host, generation))
+
+        if self.on_event:
+            for event in events:
+                self.on_event(event)
+
+
+def load_targets(path):
+    """
+    Load the hosts to monitor from a file.
+
+    Args:
+        path (str): Either a list of IPs, one per line (e.g. resultat/all_ips.txt),
+            or a stored scan file (JSON, JSONL or TXT report).
+
+    Returns:
+        list: The hosts, without duplicates, in file order.
+    """
+    if path.endswith(('.json', '.jsonl')) or path.endswith('last_scan.txt'):
+        from functionalities.results import iter_scan_file
+        hosts = (host.host for _, host in iter_scan_file(path) if host is not None)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            hosts = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    return list(dict.fromkeys(hosts))
+
+
+def main():
+    """
+    Command-line entry point: monitor every host of an inventory and print the transitions.
+    """
+    parser = argparse.ArgumentParser(description="Continuously monitor host reachability.")
+    parser.add_argument('inventory', nargs='?', default='resultat/all_ips.txt',
+                        help="List of IPs or stored scan file (default: resultat/all_ips.txt)")
+    parser.add_argument('--interval', type=float, default=5.0, help="Seconds between checks of a host")
+    parser.add_argument('--timeout', type=float, default=1.0, help="Probe timeout in seconds")
+    parser.add_argument('--history', default=None,
+                        help="Record latency/availability history in this folder (e.g. resultat/history)")
+    args = parser.parse_args()
+
+    hosts = load_targets(args.inventory)
+    if not icmp_available():
+        print("ICMP sockets unavailable: falling back to the 'ping' command (higher CPU usage).")
+
+    def print_event(event):
+        stamp = time.strftime('%H:%M:%S', time.localtime(event['time']))
+        rtt = f" ({event['rtt']:g} ms)" if event['rtt'] is not None else ""
+        print(f"[{stamp}] {event['host']} is {event['state'].upper()}{rtt}")
+
+    store = TimeSeriesStore(args.history) if args.history else None
+    monitor = ReachabilityMonitor(on_event=print_event, timeout=args.timeout, store=store)
+    monitor.add_hosts(hosts, args.interval)
+    print(f"Monitoring {len(hosts)} hosts every {args.interval:g}s. Press Ctrl+C to stop.")
+    monitor.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        monitor.stop()
+        if store is not None:
+            store.close()
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+import os
+import random
+import re
+import select
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import nmap
+
+from functionalities.icmp import checksum
+
+# Below this confidence a host is worth an nmap -O run
+ESCALATION_CONFIDENCE = 0.6
+
+# Initial TTLs used by operating systems: a reply is sent with one of them, minus the hops on the way
+INITIAL_TTLS = (32, 64, 128, 255)
+
+# Evidence of the initial TTL: (family, weight)
+TTL_EVIDENCE = {
+    32: [('Windows', 0.3)],
+    64: [('Linux', 0.35), ('macOS', 0.25), ('BSD', 0.25)],
+    128: [('Windows', 0.55)],
+    255: [('Network device', 0.45), ('Solaris', 0.2)],
+}
+
+# Order of the TCP options of a SYN-ACK (M=MSS, N=NOP, W=window scale, S=SACK permitted, T=timestamps, E=end)
+TCP_OPTION_SIGNATURES = {
+    'MSTNW': [('Linux', 0.7)],
+    'MNNSNW': [('Linux', 0.4)],
+    'MNWNNS': [('Windows', 0.65)],
+    'MNWNNTS': [('Windows', 0.5)],
+    'MNWNNTSE': [('macOS', 0.7)],
+    'MNWST': [('BSD', 0.6)],
+    'MNNSNWNNT': [('BSD', 0.3)],
+    'M': [('Network device', 0.35), ('Printer', 0.2)],
+}
+
+# Distinctive SYN-ACK window sizes
+WINDOW_EVIDENCE = {
+    8192: [('Windows', 0.3)],
+    65535: [('macOS', 0.15), ('BSD', 0.15), ('Windows', 0.1)],
+    64240: [('Windows', 0.1), ('Linux', 0.1)],
+    65160: [('Linux', 0.25)],
+    28960: [('Linux', 0.25)],
+    29200: [('Linux', 0.25)],
+    5840: [('Linux', 0.2)],
+    4128: [('Network device', 0.4)],
+}
+
+# Open ports that point to a platform
+PORT_EVIDENCE = {
+    135: [('Windows', 0.45)], 3389: [('Windows', 0.45)], 5985: [('Windows', 0.4)], 445: [('Windows', 0.2)],
+    548: [('macOS', 0.45)], 62078: [('macOS', 0.6)], 3283: [('macOS', 0.4)],
+    9100: [('Printer', 0.6)], 515: [('Printer', 0.45)], 631: [('Printer', 0.25), ('Linux', 0.1)],
+    111: [('Linux', 0.2), ('Solaris', 0.1)], 2049: [('Linux', 0.2)],
+    23: [('Network device', 0.2)], 161: [('Network device', 0.15)],
+    902: [('VMware ESXi', 0.5)],
+}
+
+# Service banners (nmap -sV product, version, extra info and CPE, lower case): pattern -> family, detail, weight
+BANNER_RULES = [
+    (re.compile(r'cpe:/o:microsoft:windows|microsoft windows|windows server|microsoft-ds|microsoft iis|msrpc'),
+     'Windows', '', 0.85),
+    (re.compile(r'ubuntu'), 'Linux', 'Ubuntu', 0.85),
+    (re.compile(r'debian'), 'Linux', 'Debian', 0.85),
+    (re.compile(r'red ?hat|rhel|centos|rocky|alma'), 'Linux', 'Red Hat', 0.8),
+    (re.compile(r'fedora'), 'Linux', 'Fedora', 0.8),
+    (re.compile(r'synology|qnap|openwrt|raspbian'), 'Linux', '', 0.7),
+    (re.compile(r'cpe:/o:linux|linux'), 'Linux', '', 0.7),
+    (re.compile(r'freebsd'), 'BSD', 'FreeBSD', 0.85),
+    (re.compile(r'openbsd'), 'BSD', 'OpenBSD', 0.85),
+    (re.compile(r'mac os x|macos|cpe:/o:apple|apple'), 'macOS', '', 0.8),
+    (re.compile(r'vmware esxi|vmware authentication daemon'), 'VMware ESXi', '', 0.85),
+    (re.compile(r'cisco|ios-xe|nx-os'), 'Network device', 'Cisco', 0.85),
+    (re.compile(r'mikrotik|routeros'), 'Network device', 'MikroTik RouterOS', 0.85),
+    (re.compile(r'fortinet|fortigate|juniper|junos|pfsense|ubiquiti'), 'Network device', '', 0.8),
+    (re.compile(r'jetdirect|printer|lexmark|brother|kyocera|xerox|ricoh|canon|epson'), 'Printer', '', 0.8),
+    (re.compile(r'solaris|sunos'), 'Solaris', '', 0.85),
+]
+
+# TCP option kinds, as letters of the option order
+TCP_OPTION_LETTERS = {0: 'E', 1: 'N', 2: 'M', 3: 'W', 4: 'S', 8: 'T'}
+
+HOST_CHUNK = re.compile(rb'<host[ >].*?</host>', re.S)
+HOST_ADDRESS = re.compile(rb'<address addr="([^"]+)" addrtype="ipv[46]"')
+REASON_TTL = re.compile(rb'<state state="open" reason="syn-ack" reason_ttl="(\d+)"|<status [^>]*reason_ttl="(\d+)"')
+
+
+class OsGuess:
+    """
+    The operating system a host most likely runs, and how sure the guess is.
+
+    Args:
+        family (str): OS family ('Windows', 'Linux', 'macOS', 'BSD', 'Network device'...), '' if unknown.
+        detail (str): Distribution or vendor, if known.
+        confidence (float): 0 to 1.
+        evidence (list): Short descriptions of the clues used.
+        source (str): 'passive' (classifier) or 'nmap' (nmap -O).
+    """
+
+    __slots__ = ('family', 'detail', 'confidence', 'evidence', 'source')
+
+    def __init__(self, family='', detail='', confidence=0.0, evidence=(), source='passive'):
+        self.family = family
+        self.detail = detail
+        self.confidence = confidence
+        self.evidence = list(evidence)
+        self.source = source
+
+    @property
+    def name(self):
+        if not self.family:
+            return 'Unknown'
+        return f"{self.family} ({self.detail})" if self.detail and self.detail != self.family else self.family
+
+    def to_osmatch(self):
+        """Return the guess in the layout of nmap's 'osmatch' entries (as stored in the scan files)."""
+        return {'name': self.name, 'accuracy': str(round(self.confidence * 100)), 'source': self.source,
+                'evidence': self.evidence}
+
+    def __str__(self):
+        return f"{self.name} ({self.confidence:.0%})" if self.family else 'Unknown'
+
+    def __repr__(self):
+        return f"<OsGuess {self} from {', '.join(self.evidence) or 'nothing'}>"
+
+
+def initial_ttl(ttl):
+    """Return the initial TTL a received TTL was most likely sent with."""
+    return next((initial for initial in INITIAL_TTLS if ttl <= initial), 255)
+
+
+def classify(ttl=None, window=None, options=None, ports=(), services=(), banners=()):
+    """
+    Guess the operating system of a host from what the scan already saw.
+
+    Every clue adds support to one or more OS families; the support of a
+    family is 1 - prod(1 - weight). The confidence is the support of the
+    best family, lowered by half the support of the runner-up.
+
+    Args:
+        ttl (int): TTL of a reply from the host (SYN-ACK or echo reply).
+        window (int): TCP window of a SYN-ACK.
+        options (str): TCP option order of a SYN-ACK (e.g. 'MSTNW', see TCP_OPTION_LETTERS).
+        ports (iterable): Open TCP ports.
+        services (iterable): nmap service names of the open ports.
+        banners (iterable): Service banners (product, version, extra info, CPE).
+
+    Returns:
+        OsGuess: The best guess ('' family if there was no clue).
+    """
+    missing = {}
+    details = {}
+    evidence = []
+
+    def add(family, weight, clue, detail=''):
+        missing[family] = missing.get(family, 1.0) * (1 - weight)
+        if detail and weight >= 0.5:
+            details.setdefault(family, detail)
+        if clue not in evidence:
+            evidence.append(clue)
+
+    if ttl:
+        initial = initial_ttl(ttl)
+        for family, weight in TTL_EVIDENCE[initial]:
+            add(family, weight, f"TTL {ttl} (initial {initial})")
+    if options is not None:
+        for family, weight in TCP_OPTION_SIGNATURES.get(options, []):
+            add(family, weight, f"TCP options {options}")
+    if window:
+        for family, weight in WINDOW_EVIDENCE.get(window, []):
+            add(family, weight, f"window {window}")
+    for port in ports:
+        for family, weight in PORT_EVIDENCE.get(port, []):
+            add(family, weight, f"port {port}")
+    for service in services:
+        if service in ('msrpc', 'ms-wbt-server', 'microsoft-ds'):
+            add('Windows', 0.5, f"service {service}")
+    for banner in banners:
+        text = banner.lower()
+        for pattern, family, detail, weight in BANNER_RULES:
+            if pattern.search(text):
+                add(family, weight, f"banner '{banner[:40]}'", detail)
+                break
+
+    if not missing:
+        return OsGuess()
+    support = sorted(((1 - value, family) for family, value in missing.items()), reverse=True)
+    best, family = support[0]
+    runner_up = support[1][0] if len(support) > 1 else 0.0
+    confidence = best * (1 - runner_up / 2)
+    return OsGuess(family, details.get(family, ''), round(min(confidence, 0.99), 2), evidence)
+
+
+def nmap_ttls(xml_output):
+    """
+    Return the reply TTL of each host of an nmap XML report ({address: ttl}).
+
+    nmap records the TTL of the packet that decided each state ('reason_ttl'):
+    the SYN-ACK of an open port, or the reply to host discovery. A caller that
+    reuses one report for many hosts parses it once and keeps the result.
+    """
+    if isinstance(xml_output, str):
+        xml_output = xml_output.encode('utf-8', 'replace')
+    ttls = {}
+    for chunk in HOST_CHUNK.finditer(xml_output or b''):
+        address = HOST_ADDRESS.search(chunk.group(0))
+        if address is None:
+            continue
+        for match in REASON_TTL.finditer(chunk.group(0)):
+            ttl = int(match.group(1) or match.group(2))
+            if ttl:
+                ttls[address.group(1).decode('ascii')] = ttl
+                break
+    return ttls
+
+
+def nmap_banners(port_data):
+    """Return the banner strings of an nmap port entry (product, version, extra info, CPE)."""
+    banners = []
+    for key in ('product', 'version', 'extrainfo', 'cpe'):
+        value = port_data.get(key)
+        if value:
+            banners.append(value)
+    return [' '.join(banners)] if banners else []
+
+
+def can_probe_syn():
+    """Return True if raw TCP sockets are available (Linux, run as root)."""
+    return hasattr(os, 'geteuid') and os.geteuid() == 0 and hasattr(socket, 'AF_PACKET')
+
+
+def can_escalate():
+    """Return True if nmap -O can run (it needs root, or an administrator with Npcap on Windows)."""
+    return os.name == 'nt' or (hasattr(os, 'geteuid') and os.geteuid() == 0)
+
+
+def _source_address(host):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect((host, 9))
+        return s.getsockname()[0]
+    finally:
+        s.close()
+
+
+def parse_tcp_options(data):
+    """Return the option order of a TCP options field (e.g. 'MNWNNS')."""
+    order = []
+    offset = 0
+    while offset < len(data):
+        kind = data[offset]
+        order.append(TCP_OPTION_LETTERS.get(kind, '?'))
+        if kind == 0:
+            break
+        if kind == 1:
+            offset += 1
+            continue
+        if offset + 1 >= len(data) or data[offset + 1] < 2:
+            break
+        offset += data[offset + 1]
+    return ''.join(order)
+
+
+def syn_fingerprint(host, port, timeout=1.0):
+    """
+    Send one SYN to an open port and read the TTL, window and option order of the SYN-ACK.
+
+    Needs a raw socket (root on Linux). The kernel answers the SYN-ACK with a
+    reset, as no connection was asked for, so the port is never left half
+    open.
+
+    Returns:
+        tuple: (ttl, window, options), or None if there was no answer or raw sockets are not available.
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+    except (PermissionError, OSError):
+        return None
+    try:
+        source = _source_address(host)
+        source_port = random.randint(32768, 60999)
+        sequence = random.getrandbits(32)
+        # Options of a Linux SYN: MSS 1460, SACK permitted, timestamps, NOP, window scale 7
+        options = struct.pack('!BBH', 2, 4, 1460) + b'\x04\x02' + struct.pack('!BBII', 8, 10, 1, 0) + b'\x01\x03\x03\x07'
+        header = struct.pack('!HHIIBBHHH', source_port, port, sequence, 0, (5 + len(options) // 4) << 4, 0x02,
+                             64240, 0, 0)
+        segment = header + options
+        pseudo_header = struct.pack('!4s4sBBH', socket.inet_aton(source), socket.inet_aton(host), 0,
+                                    socket.IPPROTO_TCP, len(segment))
+        segment = segment[:16] + struct.pack('!H', checksum(pseudo_header + segment)) + segment[18:]
+        sock.sendto(segment, (host, 0))
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                return None
+            packet = sock.recv(65535)
+            header_length = (packet[0] & 0x0f) * 4
+            tcp = packet[header_length:]
+            if len(tcp) < 20 or socket.inet_ntoa(packet[12:16]) != host:
+                continue
+            reply_source, reply_destination = struct.unpack('!HH', tcp[:4])
+            flags = tcp[13]
+            if reply_source != port or reply_destination != source_port or flags & 0x12 != 0x12:
+                continue
+            data_offset = (tcp[12] >> 4) * 4
+            window = struct.unpack('!H', tcp[14:16])[0]
+            return packet[8], window, parse_tcp_options(tcp[20:data_offset])
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+
+def nmap_os_detection(hosts, ports=None, scanner=None):
+    """
+    Run nmap -O on hosts the classifier was not sure about.
+
+    nmap needs an open and a closed port: the known open ports are given
+    with port 1 (tcpmux, nearly always closed) to skip the port scan.
+
+    Args:
+        hosts (list): Addresses.
+        ports (dict): {address: open ports}, to limit the probes (optional).
+        scanner (nmap.PortScanner): Scanner to use (default: a new one).
+
+    Returns:
+        dict: {address: OsGuess} for the hosts nmap identified (empty if nmap -O could not run, e.g. without
+            administrator rights).
+    """
+    if not hosts:
+        return {}
+    try:
+        nm = scanner if scanner is not None else nmap.PortScanner()
+        open_ports = sorted({port for host in hosts for port in (ports or {}).get(host, ())})
+        port_list = ','.join(map(str, [1] + [port for port in open_ports if port != 1])) if open_ports else None
+        nm.scan(hosts=' '.join(hosts), ports=port_list, arguments='-O --osscan-limit --max-os-tries 1 -T4')
+    except (nmap.PortScannerError, OSError) as e:
+        print(f"OS detection (nmap -O) unavailable: {e}")
+        return {}
+    guesses = {}
+    for host in nm.all_hosts():
+        matches = nm[host].get('osmatch') or []
+        if not matches:
+            continue
+        best = matches[0]
+        classes = best.get('osclass') or [{}]
+        family = classes[0].get('osfamily') or best.get('name', '')
+        guesses[host] = OsGuess(family, best.get('name', ''), int(best.get('accuracy', 0) or 0) / 100,
+                                ['nmap -O'], source='nmap')
+    return guesses
+
+
+def fingerprint_hosts(hosts, probe=True, escalate=True, max_workers=32):
+    """
+    Guess the OS of scanned hosts, spending probes only on the doubtful ones.
+
+    Every host is classified from the clues of the scan. Hosts below
+    ESCALATION_CONFIDENCE get one SYN probe (TCP window and options) when raw
+    sockets are available, and the ones still in doubt are passed to nmap -O
+    in a single run. Hosts without an open port are never probed: neither
+    probe has a port to work with.
+
+    Args:
+        hosts (dict): {address: clues}, clues being a dict with 'ttl', 'ports', 'services' and 'banners'
+            (all optional).
+        probe (bool): Allow SYN probes.
+        escalate (bool): Allow nmap -O.
+        max_workers (int): SYN probes in flight at once.
+
+    Returns:
+        dict: {address: OsGuess}.
+    """
+    def guess(address, ttl=None, window=None, options=None):
+        clues = hosts[address]
+        return classify(ttl or clues.get('ttl'), window, options, clues.get('ports', ()), clues.get('services', ()),
+                        clues.get('banners', ()))
+
+    guesses = {address: guess(address) for address in hosts}
+
+    def doubtful():
+        return [address for address, result in guesses.items()
+                if result.confidence < ESCALATION_CONFIDENCE and hosts[address].get('ports')]
+
+    candidates = [address for address in doubtful() if ':' not in address]
+    if probe and candidates and can_probe_syn():
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            replies = executor.map(lambda address: syn_fingerprint(address, min(hosts[address]['ports'])), candidates)
+            for address, reply in zip(candidates, replies):
+                if reply is not None:
+                    guesses[address] = guess(address, *reply)
+
+    remaining = doubtful()
+    if escalate and remaining and can_escalate():
+        ports = {address: hosts[address]['ports'] for address in remaining}
+        for address, result in nmap_os_detection(remaining, ports).items():
+            if result.confidence > guesses[address].confidence:
+                guesses[address] = result
+    return guesses
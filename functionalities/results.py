@@ -0,0 +1,786 @@
+import ast
+import json
+import re
+import sys
+from array import array
+from bisect import bisect_left
+
+# Number of possible TCP/UDP ports (0-65535)
+PORT_SPACE = 65536
+
+# A full bitmap covers the whole port space in 8 KiB
+BITMAP_BYTES = PORT_SPACE // 8
+
+# Past this many ports a sorted array of uint16 is bigger than the bitmap
+ARRAY_LIMIT = BITMAP_BYTES // 2
+
+# Shared (service, version) tuples so identical pairs are stored only once
+_SERVICE_TABLE = {}
+
+
+def intern_service(service, version=''):
+    """
+    Return a shared, interned (service, version) pair.
+
+    Args:
+        service (str): The service name reported by nmap (e.g. 'http').
+        version (str): The service version string, if any.
+
+    Returns:
+        tuple: The canonical (service, version) tuple.
+    """
+    key = (service or '', version or '')
+    pair = _SERVICE_TABLE.get(key)
+    if pair is None:
+        pair = (sys.intern(key[0]), sys.intern(key[1]))
+        _SERVICE_TABLE[key] = pair
+    return pair
+
+
+class PortSet:
+    """
+    A compact set of port numbers.
+
+    Small sets are kept as a sorted array of 16-bit integers. Once a set grows
+    past ARRAY_LIMIT ports it is promoted to a 65536-bit bitmap, which never
+    takes more than 8 KiB. Set operations between bitmaps are done on whole
+    integers, so they run in C instead of port by port.
+    """
+
+    __slots__ = ('_ports', '_bits')
+
+    def __init__(self, ports=()):
+        self._ports = array('H')
+        self._bits = None
+        for port in ports:
+            self.add(port)
+
+    @classmethod
+    def _from_int(cls, value):
+        """Build a PortSet from an integer whose bit N means port N."""
+        result = cls()
+        if value.bit_count() > ARRAY_LIMIT:
+            result._ports = None
+            result._bits = bytearray(value.to_bytes(BITMAP_BYTES, 'little'))
+        else:
+            ports = result._ports
+            while value:
+                low_bit = value & -value
+                ports.append(low_bit.bit_length() - 1)
+                value ^= low_bit
+        return result
+
+    @classmethod
+    def _from_sorted(cls, ports):
+        """Build a PortSet from a sorted list of distinct port numbers."""
+        if ports and not (0 <= ports[0] and ports[-1] < PORT_SPACE):
+            raise ValueError(f"Port out of range: {ports[0] if ports[0] < 0 else ports[-1]}")
+        result = cls()
+        result._ports = array('H', ports)
+        if len(ports) > ARRAY_LIMIT:
+            result._promote()
+        return result
+
+    def _to_int(self):
+        """Return the set as an integer whose bit N means port N."""
+        if self._bits is not None:
+            return int.from_bytes(self._bits, 'little')
+        value = 0
+        for port in self._ports:
+            value |= 1 << port
+        return value
+
+    def _promote(self):
+        """Switch from the sorted array to the bitmap representation."""
+        bits = bytearray(BITMAP_BYTES)
+        for port in self._ports:
+            bits[port >> 3] |= 1 << (port & 7)
+        self._bits = bits
+        self._ports = None
+
+    def add(self, port):
+        """Add a port to the set."""
+        if not 0 <= port < PORT_SPACE:
+            raise ValueError(f"Port out of range: {port}")
+        if self._bits is not None:
+            self._bits[port >> 3] |= 1 << (port & 7)
+            return
+        ports = self._ports
+        index = bisect_left(ports, port)
+        if index < len(ports) and ports[index] == port:
+            return
+        ports.insert(index, port)
+        if len(ports) > ARRAY_LIMIT:
+            self._promote()
+
+    def discard(self, port):
+        """Remove a port from the set if it is present."""
+        if self._bits is not None:
+            if 0 <= port < PORT_SPACE:
+                self._bits[port >> 3] &= ~(1 << (port & 7)) & 0xFF
+            return
+        index = bisect_left(self._ports, port)
+        if index < len(self._ports) and self._ports[index] == port:
+            del self._ports[index]
+
+    def __contains__(self, port):
+        if not 0 <= port < PORT_SPACE:
+            return False
+        if self._bits is not None:
+            return bool(self._bits[port >> 3] & (1 << (port & 7)))
+        index = bisect_left(self._ports, port)
+        return index < len(self._ports) and self._ports[index] == port
+
+    def __iter__(self):
+        if self._bits is None:
+            return iter(self._ports)
+        return self._iter_bits()
+
+    def _iter_bits(self):
+        bits = self._bits
+        for index, byte in enumerate(bits):
+            if byte:
+                base = index << 3
+                for offset in range(8):
+                    if byte & (1 << offset):
+                        yield base + offset
+
+    def __len__(self):
+        if self._bits is not None:
+            return int.from_bytes(self._bits, 'little').bit_count()
+        return len(self._ports)
+
+    def __bool__(self):
+        if self._bits is not None:
+            return any(self._bits)
+        return len(self._ports) > 0
+
+    def __eq__(self, other):
+        if not isinstance(other, PortSet):
+            return NotImplemented
+        if self._ports is not None and other._ports is not None:
+            # Both sorted arrays: compared in C
+            return self._ports == other._ports
+        return self._to_int() == other._to_int()
+
+    def __repr__(self):
+        return f"PortSet({list(self)!r})"
+
+    def __or__(self, other):
+        return PortSet._from_int(self._to_int() | other._to_int())
+
+    def __and__(self, other):
+        return PortSet._from_int(self._to_int() & other._to_int())
+
+    def __sub__(self, other):
+        return PortSet._from_int(self._to_int() & ~other._to_int())
+
+    def __xor__(self, other):
+        return PortSet._from_int(self._to_int() ^ other._to_int())
+
+    union = __or__
+    intersection = __and__
+    difference = __sub__
+    symmetric_difference = __xor__
+
+    def nbytes(self):
+        """Return the number of bytes used by the port storage."""
+        if self._bits is not None:
+            return len(self._bits)
+        return self._ports.itemsize * len(self._ports)
+
+
+_EMPTY_PORTS = PortSet()
+
+
+class HostResult:
+    """
+    Scan results for a single host.
+
+    Ports are grouped by (protocol, state) into PortSets. Service names,
+    versions, script output, TLS certificates and likely CVEs live in side
+    tables keyed by port, so the common case of a port with no extra data
+    costs a couple of bits. The services of UDP (and other non-TCP) ports
+    have their own table, keyed by (protocol, port), so DNS on 53/udp does
+    not replace what nmap found on 53/tcp.
+    """
+
+    __slots__ = ('host', 'status', 'hostname', 'os', '_states', 'services', 'proto_services', 'scripts',
+                 'certificates', 'vulnerabilities')
+
+    def __init__(self, host, status='up', hostname='', os=None):
+        self.host = sys.intern(host)
+        self.status = sys.intern(status or '')
+        self.hostname = hostname or ''
+        self.os = os if os is not None else []
+        self._states = {}
+        self.services = {}
+        self.proto_services = {}
+        self.scripts = {}
+        self.certificates = {}
+        self.vulnerabilities = {}
+
+    def set_port(self, port, state, service=None, version=None, proto='tcp', scripts=None):
+        """
+        Record the state of a port, moving it out of any previous state.
+
+        Args:
+            port (int): The port number.
+            state (str): The port state reported by nmap (e.g. 'open').
+            service (str): The service name, if known.
+            version (str): The service version, if known.
+            proto (str): The transport protocol ('tcp' or 'udp').
+            scripts (dict): NSE script output for this port, if any.
+        """
+        port = int(port)
+        key = (sys.intern(proto), sys.intern(state))
+        for other_key, ports in self._states.items():
+            if other_key[0] == key[0] and other_key != key:
+                ports.discard(port)
+        ports = self._states.get(key)
+        if ports is None:
+            ports = self._states[key] = PortSet()
+        ports.add(port)
+        if service or version:
+            if proto == 'tcp':
+                self.services[port] = intern_service(service, version)
+            else:
+                self.proto_services[(key[0], port)] = intern_service(service, version)
+        if scripts:
+            self.scripts[port] = scripts
+
+    def ports(self, state='open', proto='tcp'):
+        """
+        Return the PortSet of ports in a given state.
+
+        Args:
+            state (str): The port state to select.
+            proto (str): The transport protocol.
+
+        Returns:
+            PortSet: The matching ports (empty if there are none).
+        """
+        return self._states.get((proto, state), _EMPTY_PORTS)
+
+    def states(self):
+        """Return the (protocol, state) keys that have at least one port."""
+        return [key for key, ports in self._states.items() if ports]
+
+    def service(self, port, proto='tcp'):
+        """Return the (service, version) pair recorded for a port."""
+        if proto == 'tcp':
+            return self.services.get(port, ('', ''))
+        return self.proto_services.get((proto, port), ('', ''))
+
+    def iter_ports(self):
+        """
+        Iterate over every recorded port, sorted by port number.
+
+        Yields:
+            tuple: (port, proto, state) for each recorded port.
+        """
+        entries = []
+        for (proto, state), ports in self._states.items():
+            for port in ports:
+                entries.append((port, proto, state))
+        entries.sort()
+        return iter(entries)
+
+    def to_dict(self):
+        """
+        Convert the host to the dictionary layout used in the JSON scan files.
+
+        Returns:
+            dict: The host information with a 'ports' list.
+        """
+        ports = []
+        for port, proto, state in self.iter_ports():
+            service, version = self.service(port, proto)
+            port_info = {
+                'port': port,
+                'state': state,
+                'service': service or 'unknown'
+            }
+            if version:
+                port_info['version'] = version
+            if proto != 'tcp':
+                port_info['proto'] = proto
+            elif port in self.certificates:
+                port_info['tls'] = self.certificates[port]
+            if port in self.vulnerabilities and proto == 'tcp':
+                port_info['cves'] = self.vulnerabilities[port]
+            ports.append(port_info)
+        return {
+            'host': self.host,
+            'status': self.status,
+            'hostname': self.hostname,
+            'os': self.os,
+            'ports': ports
+        }
+
+    @classmethod
+    def from_dict(cls, host_info):
+        """
+        Build a HostResult from a host entry of a JSON scan file.
+
+        Args:
+            host_info (dict): The host information dictionary.
+
+        Returns:
+            HostResult: The compact host record.
+        """
+        host = cls(host_info['host'], host_info.get('status', 'up'),
+                   host_info.get('hostname', ''), host_info.get('os', []))
+        # Same result as set_port for each entry, but every PortSet is built once from its sorted ports
+        states = {}
+        for port_info in host_info.get('ports', []):
+            port = int(port_info['port'])
+            proto = port_info.get('proto', 'tcp')
+            states[(proto, port)] = port_info.get('state', 'open')
+            service, version = port_info.get('service'), port_info.get('version')
+            if service or version:
+                if proto == 'tcp':
+                    host.services[port] = intern_service(service, version)
+                else:
+                    host.proto_services[(sys.intern(proto), port)] = intern_service(service, version)
+            if 'tls' in port_info:
+                host.certificates[port] = port_info['tls']
+            if 'cves' in port_info:
+                host.vulnerabilities[port] = port_info['cves']
+        groups = {}
+        for (proto, port), state in states.items():
+            groups.setdefault((proto, state), []).append(port)
+        for (proto, state), ports in groups.items():
+            ports.sort()
+            host._states[(sys.intern(proto), sys.intern(state))] = PortSet._from_sorted(ports)
+        return host
+
+    def nbytes(self):
+        """Return an estimate of the bytes used by the port storage."""
+        return sum(ports.nbytes() for ports in self._states.values())
+
+
+class ScanResult:
+    """
+    The results of a scan: scan metadata plus one HostResult per host.
+    """
+
+    __slots__ = ('scan_time', 'network_range', 'hosts')
+
+    def __init__(self, scan_time, network_range):
+        self.scan_time = scan_time
+        self.network_range = network_range
+        self.hosts = {}
+
+    def add_host(self, host):
+        """Add (or replace) a HostResult."""
+        self.hosts[host.host] = host
+        return host
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def __iter__(self):
+        return iter(self.hosts.values())
+
+    def port_union(self, state='open', proto='tcp'):
+        """Return every port that is in the given state on at least one host."""
+        value = 0
+        for host in self.hosts.values():
+            value |= host.ports(state, proto)._to_int()
+        return PortSet._from_int(value)
+
+    def port_intersection(self, state='open', proto='tcp'):
+        """Return the ports that are in the given state on every host."""
+        value = None
+        for host in self.hosts.values():
+            bits = host.ports(state, proto)._to_int()
+            value = bits if value is None else value & bits
+            if not value:
+                break
+        return PortSet._from_int(value or 0)
+
+    def hosts_with_port(self, port, state='open', proto='tcp'):
+        """Return the addresses of the hosts that have the port in the given state."""
+        return [host.host for host in self.hosts.values() if port in host.ports(state, proto)]
+
+    def to_dict(self):
+        """
+        Convert the scan to the dictionary layout used in the JSON scan files.
+
+        Returns:
+            dict: The scan results.
+        """
+        return {
+            'scan_time': self.scan_time,
+            'network_range': self.network_range,
+            'hosts': [host.to_dict() for host in self.hosts.values()]
+        }
+
+    @classmethod
+    def from_dict(cls, scan_results):
+        """
+        Build a ScanResult from a JSON scan file dictionary.
+
+        Args:
+            scan_results (dict): The scan results dictionary.
+
+        Returns:
+            ScanResult: The compact scan record.
+        """
+        scan = cls(scan_results.get('scan_time', ''), scan_results.get('network_range', ''))
+        for host_info in scan_results.get('hosts', []):
+            scan.add_host(HostResult.from_dict(host_info))
+        return scan
+
+
+# Size of the chunks read when streaming a scan file
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class _JsonStream:
+    """
+    A minimal incremental JSON reader.
+
+    It walks the outer objects and arrays of a scan file by hand and only
+    decodes the small values inside them (one host at a time), so a file of
+    any size is read with a bounded buffer.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """Read the next chunk, dropping the part of the buffer already consumed."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            buffer = self.buffer
+            length = len(buffer)
+            pos = self.pos
+            while pos < length and buffer[pos] in ' \t\r\n':
+                pos += 1
+            self.pos = pos
+            if pos < length:
+                return buffer[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Malformed scan file: expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number that ends exactly at the buffer edge may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and not isinstance(value, (dict, list, str)):
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def members(self):
+        """Iterate over the keys of an object; the caller must consume each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Malformed scan file: unexpected {char!r} at offset {self.pos}")
+
+    def items(self):
+        """Iterate over the elements of an array; the caller must consume each element."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Malformed scan file: unexpected {char!r} at offset {self.pos}")
+
+
+def _raw_host(host_info):
+    """Keep a decoded host entry as it is (iter_scan_file with raw=True)."""
+    return host_info
+
+
+def _iter_json_scan(stream, index, build):
+    """Stream one scan object, yielding the header then each host."""
+    header = {'index': index, 'scan_time': '', 'network_range': ''}
+    started = False
+    for key in stream.members():
+        if key == 'hosts' and stream.peek() == '[':
+            if not started:
+                started = True
+                yield header, None
+            for _ in stream.items():
+                yield header, build(stream.value())
+        else:
+            value = stream.value()
+            if key in ('scan_time', 'network_range'):
+                header[key] = value
+    if not started:
+        yield header, None
+
+
+def _iter_json_documents(fp, build=HostResult.from_dict):
+    """Stream every scan held in a JSON scan file (appended documents or a history)."""
+    stream = _JsonStream(fp)
+    index = 0
+    while stream.peek() == '{':
+        header = {'index': index, 'scan_time': '', 'network_range': ''}
+        started = False
+        is_history = False
+        for key in stream.members():
+            if key == 'scans' and stream.peek() == '[':
+                # A {'scans': [...]} history written by functionalities/test_scan.py
+                is_history = True
+                for _ in stream.items():
+                    yield from _iter_json_scan(stream, index, build)
+                    index += 1
+            elif key == 'hosts' and stream.peek() == '[':
+                if not started:
+                    started = True
+                    yield header, None
+                for _ in stream.items():
+                    yield header, build(stream.value())
+            else:
+                value = stream.value()
+                if key in ('scan_time', 'network_range'):
+                    header[key] = value
+        if not is_history:
+            if not started:
+                yield header, None
+            index += 1
+
+
+def _iter_jsonl_file(lines, build=HostResult.from_dict):
+    """Stream a JSON Lines file holding one host record per line."""
+    header = None
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        scan_time = record.pop('scan_time', '')
+        network_range = record.pop('network_range', '')
+        if header is None or (header['scan_time'], header['network_range']) != (scan_time, network_range):
+            index = header['index'] + 1 if header else 0
+            header = {'index': index, 'scan_time': scan_time, 'network_range': network_range}
+            yield header, None
+        yield header, build(record)
+
+
+# A CVE and its CVSS score in the 'Vulnérabilités probables:' lines of the text report
+CVE_SCORE = re.compile(r'(CVE-\d{4}-\d+) \(([\d.]+)\)')
+
+
+def _iter_fonctions_report(lines, path):
+    """Stream a text report written by fonctions/scan.py (e.g. resultat/last_scan.txt)."""
+    header = {'index': 0, 'scan_time': '', 'network_range': path}
+    host = None
+    port = None
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("Date de création du fichier :"):
+            header['scan_time'] = stripped.split(':', 1)[1].strip()
+        elif stripped.startswith("IP:"):
+            if host is not None:
+                yield header, host
+            else:
+                yield header, None
+            host = HostResult(stripped[3:].strip())
+            port = None
+        elif host is None:
+            continue
+        elif stripped.startswith("Système d'exploitation:"):
+            host.os = stripped.split(':', 1)[1].strip()
+        elif stripped.startswith("Port ") and ':' in stripped:
+            # 'Port 22: ssh OpenSSH 8.9' or 'Port 53/udp: domain dnsmasq 2.89'
+            label, _, rest = stripped.partition(':')
+            service, _, version = rest.strip().partition(' ')
+            number, _, proto = label[5:].partition('/')
+            proto = proto.strip() or 'tcp'
+            host.set_port(int(number), 'open', service, version.strip(), proto)
+            # Script output and CVEs that follow belong to TCP ports only
+            port = int(number) if proto == 'tcp' else None
+        elif stripped.startswith("Vulnérabilités:"):
+            value = stripped.split(':', 1)[1].strip()
+            if port is not None and value.startswith('{'):
+                try:
+                    host.scripts[port] = ast.literal_eval(value)
+                except (ValueError, SyntaxError):
+                    pass
+        elif stripped.startswith("Vulnérabilités probables:") and port is not None:
+            # 'CVE-2023-38408 (9.8), CVE-2021-41617 (7) (+3)': the CVEs of the offline index
+            host.vulnerabilities[port] = [{'id': cve, 'score': float(score)}
+                                          for cve, score in CVE_SCORE.findall(stripped)]
+    if host is not None:
+        yield header, host
+    else:
+        yield header, None
+
+
+def _iter_functionalities_report(lines, path):
+    """Stream a text report written by functionalities/scan.py (Host:/Status:/Port: lines)."""
+    header = None
+    host = None
+    index = -1
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("Scan started at "):
+            if host is not None:
+                yield header, host
+                host = None
+            index += 1
+            header = {'index': index, 'scan_time': stripped[len("Scan started at "):], 'network_range': path}
+            yield header, None
+        elif stripped.startswith("Network Range:") and host is None and header is not None:
+            # Written after the time by format_scan_header, before the first host
+            header['network_range'] = stripped[len("Network Range:"):].strip()
+        elif stripped.startswith("Host:"):
+            if header is None:
+                index += 1
+                header = {'index': index, 'scan_time': '', 'network_range': path}
+                yield header, None
+            if host is not None:
+                yield header, host
+            host = HostResult(stripped[5:].strip())
+        elif host is None:
+            continue
+        elif stripped.startswith("Status:"):
+            host.status = stripped[7:].strip()
+        elif stripped.startswith("Port:"):
+            # Port: 22 - open (ssh), or Port: 53/udp - open (domain)
+            port, _, rest = stripped[5:].partition(' - ')
+            state, _, service = rest.partition(' (')
+            number, _, proto = port.partition('/')
+            host.set_port(int(number), state.strip(), service.rstrip(')'), proto=proto.strip() or 'tcp')
+    if host is not None:
+        yield header, host
+
+
+def iter_scan_file(path, raw=False):
+    """
+    Stream the hosts stored in a scan file, one at a time.
+
+    Understands the JSON files written by functionalities/scan.py (one or more
+    appended scan documents, or a {'scans': [...]} history), their TXT twins,
+    JSON Lines host records, and the text reports written by fonctions/scan.py.
+    Memory use does not
+    depend on the size of the file.
+
+    Args:
+        path (str): The scan file to read.
+        raw (bool): Yield the hosts of JSON and JSON Lines files as their
+            decoded dicts (the layout of HostResult.to_dict) instead of
+            building HostResults; text reports still yield HostResults.
+
+    Yields:
+        tuple: (header, host) where header is a dict with 'index', 'scan_time'
+        and 'network_range', and host is a HostResult. Each scan first yields
+        its header with host set to None, so scans without hosts are visible.
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        yield from iter_scan_stream(f, path, raw)
+
+
+def iter_scan_stream(f, path, raw=False):
+    """
+    Stream the hosts of an open scan file (e.g. one read from functionalities.archive).
+
+    Args:
+        f (file): A seekable text file.
+        path (str): Its name: the extension tells the layout apart, as in iter_scan_file.
+        raw (bool): Yield the hosts of JSON layouts as dicts, as in iter_scan_file.
+    """
+    if path.endswith('.json'):
+        yield from _iter_json_documents(f, _raw_host if raw else HostResult.from_dict)
+        return
+    if path.endswith('.jsonl'):
+        yield from _iter_jsonl_file(f, _raw_host if raw else HostResult.from_dict)
+        return
+
+    # Tell the two text layouts apart from the start of the file
+    start = f.read(READ_CHUNK_SIZE)
+    f.seek(0)
+    if "IP:" in start and "Ports ouverts:" in start:
+        yield from _iter_fonctions_report(f, path)
+    else:
+        yield from _iter_functionalities_report(f, path)
+
+
+def load_scans(path):
+    """
+    Load every scan stored in a result file.
+
+    Args:
+        path (str): The scan file to read (see iter_scan_file for the supported layouts).
+
+    Returns:
+        list: The ScanResult objects in file order.
+    """
+    scans = []
+    current_index = None
+    for header, host in iter_scan_file(path):
+        if header['index'] != current_index:
+            current_index = header['index']
+            scans.append(ScanResult(header['scan_time'], header['network_range']))
+        scan = scans[-1]
+        # Text reports only learn the scan date after the header was first seen
+        scan.scan_time = header['scan_time']
+        if host is not None:
+            scan.add_host(host)
+    return scans
+
+
+def load_scan(path, index=-1):
+    """
+    Load a single scan from a result file.
+
+    Args:
+        path (str): The scan file to read.
+        index (int): Which scan to return when the file holds several (default: the last one).
+
+    Returns:
+        ScanResult: The selected scan.
+    """
+    scans = load_scans(path)
+    if not scans:
+        raise ValueError(f"No scan found in {path}")
+    return scans[index]
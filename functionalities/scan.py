@@ -1,11 +1,31 @@
-import nmap
-import json
-import socket
 import ipaddress
 from datetime import datetime
 import os
+import re
+import shlex
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import tkinter as tk
 from tkinter import messagebox
+from functionalities.interfaces import attached_networks, network_of, nmap_interface_name, primary_address
+from functionalities.ipv6 import expand_targets
+from functionalities.jobs import ScanCancelled
+from functionalities.liveness import covers
+from functionalities.metrics import Metrics, save_scan_metrics
+from functionalities.osfp import fingerprint_hosts, nmap_ttls
+from functionalities.results import HostResult, ScanResult
+from functionalities.sinks import JsonSink, SearchSink, SinkGroup, TxtSink
+from functionalities.targets import TargetSet
+from functionalities.transport import SYSTEM_TRANSPORT
+from functionalities.tls import CertificateCache, TlsInspector, tls_mode
+from functionalities.topology import hop_distances, map_topology, save_topology
+from functionalities.udp import UdpScanner, add_udp_results
+
+# Above this many CIDR blocks the targets are given to nmap in a file (-iL) rather than on the command line
+MAX_COMMAND_LINE_TARGETS = 256
+
+# Hosts per batch of the UDP, TLS and OS stages (a cancelled scan stops between two batches)
+STAGE_BATCH_SIZE = 256
 
 def ask_scan_choice():
     """
@@ -16,7 +36,7 @@ def ask_scan_choice():
     """
     print("\nSelect a scan type:")
     print("1 - Scan a single IP address")
-    print("2 - Scan a subnet based on your current IP")
+    print("2 - Scan the local networks (every interface)")
     
     # Ensure valid input (1-2)
     choice = input("Enter your choice (1-2): ").strip()
@@ -30,32 +50,25 @@ def get_local_ip():
     Get the local IP address of the machine.
     
     Returns:
-        str: The local IP address.
+        str: The address of the interface used to reach other networks.
     """
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.settimeout(0)
-    try:
-        s.connect(('10.254.254.254', 1))  # This won't actually connect but will determine the local IP
-        local_ip = s.getsockname()[0]
-    except:
-        local_ip = '127.0.0.1'  # Fallback to localhost if unable to detect the local IP
-    finally:
-        s.close()
-    
-    return local_ip
+    return primary_address()
 
 def get_subnet_from_ip(local_ip):
     """
-    Given a local IP address, calculate the subnet to scan (assuming /24 mask).
+    Given a local IP address, return the network it is attached to, with its real prefix.
     
     Args:
         local_ip (str): The local IP address of the machine.
         
     Returns:
-        str: The subnet to scan (e.g., '192.168.1.0/24').
+        str: The subnet to scan (e.g., '192.168.1.0/24', or '10.0.0.0/22'); a /24 (a /64 for IPv6) if the address is not local.
     """
-    network = ipaddress.IPv4Network(local_ip + '/24', strict=False)
-    return str(network.network_address) + '/24'
+    entry = network_of(local_ip)
+    if entry is not None:
+        return str(entry.network)
+    address = ipaddress.ip_address(local_ip)
+    return str(ipaddress.ip_network(f"{address}/{64 if address.version == 6 else 24}", strict=False))
 
 def show_warning_popup(message):
     """
@@ -66,6 +79,37 @@ def show_warning_popup(message):
     messagebox.showwarning("Scan Warning", message)
     root.quit()  # Close the root window after the message is shown
 
+def format_host_for_txt(host_info):
+    """
+    Format one host of the scan results for the human-readable text file.
+
+    Args:
+        host_info (dict): The host information dictionary.
+
+    Returns:
+        str: The formatted host block.
+    """
+    lines = [
+        f"Host: {host_info['host']}",
+        f"  Status: {host_info['status']}",
+        f"  Hostname: {host_info['hostname']}",
+        f"  OS: {host_info['os']}"
+    ]
+
+    if host_info['ports']:
+        lines.append("  Ports:")
+        for port_info in host_info['ports']:
+            lines.append(f"    - Port: {port_info['port']}")
+            lines.append(f"      State: {port_info['state']}")
+            lines.append(f"      Service: {port_info['service']}")
+            if 'tls' in port_info:
+                lines.append(f"      Certificate: {port_info['tls']['subject']} (expires {port_info['tls']['not_after']})")
+    else:
+        lines.append("  No open ports detected.")
+
+    lines.append("")  # Add a newline for separation between hosts
+    return "\n".join(lines) + "\n"
+
 def format_scan_results_for_txt(scan_results):
     """
     Format the scan results for a clear, human-readable text file.
@@ -76,51 +120,214 @@ def format_scan_results_for_txt(scan_results):
     Returns:
         str: A formatted string to be saved as a text file.
     """
-    output = f"Network Scan Results ({scan_results['scan_time']})\n"
-    output += f"Network Range: {scan_results['network_range']}\n\n"
-    
-    for host_info in scan_results["hosts"]:
-        output += f"Host: {host_info['host']}\n"
-        output += f"  Status: {host_info['status']}\n"
-        output += f"  Hostname: {host_info['hostname']}\n"
-        output += f"  OS: {host_info['os']}\n"
-        
-        if host_info['ports']:
-            output += f"  Ports:\n"
-            for port_info in host_info['ports']:
-                output += f"    - Port: {port_info['port']}\n"
-                output += f"      State: {port_info['state']}\n"
-                output += f"      Service: {port_info['service']}\n"
+    parts = [
+        f"Network Scan Results ({scan_results['scan_time']})\n",
+        f"Network Range: {scan_results['network_range']}\n\n"
+    ]
+    parts.extend(format_host_for_txt(host_info) for host_info in scan_results["hosts"])
+    return "".join(parts)
+
+def format_scan_header(scan_time, network_range):
+    """
+    Return the delimiter written at the top of the TXT scan results: the scan time and the targets.
+    """
+    return f"\n{'='*50}\nScan started at {scan_time}\nNetwork Range: {network_range}\n{'='*50}\n"
+
+def format_os_match(match):
+    """Format an OS match (an nmap 'osmatch' entry or a passive guess) as 'name (accuracy%)'."""
+    if isinstance(match, dict) and 'name' in match:
+        return f"{match['name']} ({match.get('accuracy', '?')}%)"
+    return str(match)
+
+def format_host_summary(host_result):
+    """
+    Return the short TXT block written for each host of the scan results.
+
+    Args:
+        host_result (HostResult): The host to format.
+
+    Returns:
+        str: The host block (Host/Status/OS/Port lines).
+    """
+    lines = [f"Host: {host_result.host}", f"Status: {host_result.status}"]
+    if isinstance(host_result.os, list) and host_result.os:
+        lines.append(f"OS: {', '.join([format_os_match(item) for item in host_result.os])}")
+    for port, proto, state in host_result.iter_ports():
+        label = port if proto == 'tcp' else f"{port}/{proto}"
+        lines.append(f"Port: {label} - {state} ({host_result.service(port, proto)[0] or 'unknown'})")
+        certificate = host_result.certificates.get(port) if proto == 'tcp' else None
+        if certificate:
+            lines.append(f"  TLS: {certificate['common_name'] or certificate['subject']} "
+                         f"(expires {certificate['not_after'][:10]}, {certificate['key_type']})")
+    return "\n" + "\n".join(lines) + "\n"
+
+def default_sinks(output_folder, current_time):
+    """
+    Build the sinks used when the caller does not provide any: a JSON and a TXT file in the output folder,
+    and the search index of the folder ('<output_folder>/search', see functionalities.search).
+
+    Args:
+        output_folder (str): The folder to save the scan results.
+        current_time (str): The timestamp used in the file names.
+
+    Returns:
+        list: The JsonSink, TxtSink and SearchSink.
+    """
+    output_file_json = os.path.join(output_folder, f"{current_time}_scan_results.json")
+    output_file_txt = os.path.join(output_folder, f"{current_time}_scan_results.txt")
+    return [JsonSink(output_file_json), TxtSink(output_file_txt, format_host_summary, format_scan_header),
+            SearchSink(os.path.join(output_folder, 'search'), os.path.basename(output_file_json))]
+
+def nmap_target_arguments(targets):
+    """
+    Turn a TargetSet into nmap arguments.
+
+    nmap cannot mix IPv4 and IPv6 in one run: IPv6 targets are skipped (with a
+    warning) when IPv4 targets are present, and '-6' is added otherwise.
+
+    Args:
+        targets (TargetSet): The targets.
+
+    Returns:
+        tuple: (hosts argument, extra arguments, path of a temporary target file to delete or None).
+    """
+    extra = ''
+    if targets.has_version(6):
+        if targets.has_version(4):
+            print("[WARNING] nmap cannot scan IPv4 and IPv6 in the same run: IPv6 targets skipped.")
+            targets = targets - TargetSet([(6, 0, 2 ** 128 - 1)])
         else:
-            output += "  No open ports detected.\n"
-        
-        output += "\n"  # Add a newline for separation between hosts
+            extra = ' -6'
 
-    return output
+    names = targets.to_nmap_targets()
+    if len(names) <= MAX_COMMAND_LINE_TARGETS:
+        return ' '.join(names), extra, None
+    handle, path = tempfile.mkstemp(suffix='.txt', prefix='nmap_targets_')
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(names) + '\n')
+    # The arguments go through shlex: quote the path and use forward slashes (nmap accepts them on Windows)
+    return '', f"{extra} -iL {shlex.quote(path.replace(os.sep, '/'))}", path
 
-def scan_network(network_range, output_folder, progress_callback=None):
+def batches(items, size=STAGE_BATCH_SIZE):
+    """Split a list into consecutive slices of at most 'size' items."""
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+def scan_network(network_range, output_folder, progress_callback=None, sinks=None, keep_results=True, scanner=None,
+                 metrics=None, udp_ports=None, inspect_tls=True, interface=None, os_probes=True, host_callback=None,
+                 transport=SYSTEM_TRANSPORT, trace_routes=False, liveness=None, cancelled=None):
     """
     Perform a network scan using nmap on the provided network range.
 
+    Each host is handed to the output sinks as soon as it has been parsed, so
+    the reports are built incrementally instead of at the end of the scan.
+
     Args:
-        network_range (str): The network range or single IP to scan.
+        network_range (str or TargetSet): The targets: an IP, CIDR, range, hostname, '@file', with '!' exclusions
+            (see functionalities.targets.TargetSet.parse).
         output_folder (str): The folder to save the scan results.
         progress_callback (function): Function to update progress (optional).
+        sinks (list): ResultSink objects to write to (default: timestamped JSON and TXT files).
+        keep_results (bool): Keep every host in the returned ScanResult (False keeps memory flat).
+        scanner (nmap.PortScanner): Scanner to use instead of a new nmap.PortScanner (e.g. a replay of recorded XML).
+        metrics (Metrics): Where to record phase timings and counters (default: a new Metrics).
+            The summary is saved in '<output_folder>/metrics' with the results.
+        udp_ports (list): UDP ports to probe on the hosts that are up (e.g. functionalities.udp.DEFAULT_UDP_PORTS;
+            default: no UDP scan).
+        inspect_tls (bool): Fetch the certificates of the open TLS ports. Parsed certificates are cached by
+            fingerprint in '<output_folder>/tls/certificates.json'.
+        interface (str): Network interface nmap sends from (-e), for targets attached to that interface.
+            Its name is added to the output file names so parallel scans of several interfaces do not collide.
+        os_probes (bool): Allow a SYN probe and then nmap -O for the hosts whose OS the passive classifier
+            (functionalities.osfp) is not sure about.
+        host_callback (function): Called with each finished HostResult, after the sinks (e.g. to stream results).
+        transport (Transport): Where the scanner comes from when none is given (functionalities.transport: the
+            real network by default, or e.g. a simulated one). The UDP, TLS, OS and route probes use real sockets:
+            they are skipped if it is not live.
+        trace_routes (bool): Trace the routes to the hosts that are up, all at once (functionalities.topology).
+            The hop graph is saved in '<output_folder>/topology'.
+        liveness (LivenessCache): Shared host-liveness cache (functionalities.liveness). Addresses recently seen
+            down by a discovery as thorough as nmap's are not scanned, nmap's host discovery is skipped (-Pn)
+            when every target was recently seen up, and the hosts found up are recorded.
+        cancelled (function): Polled before each stage after nmap and each of their batches (e.g.
+            ScanJob.check_cancelled). Once it returns True the remaining stages are skipped and the hosts found
+            so far are written; it raises ScanCancelled to discard them.
 
     Returns:
-        dict: Scan results as a dictionary.
+        ScanResult: Scan results in the compact result model (use to_dict() for the JSON layout).
+
+    Raises:
+        ScanCancelled: If the scan is cancelled and its partial results are discarded.
     """
     try:
         # Create the output folder if it doesn't exist
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
 
+        if metrics is None:
+            metrics = Metrics(str(network_range))
+        metrics.info.update(profile='full_tcp', ports_per_host=65535)
+        if cancelled is None:
+            cancelled = lambda: False
+
         # Initialize the nmap scanner
-        nm = nmap.PortScanner()
+        nm = scanner if scanner is not None else transport.scanner()
+        if not transport.live:
+            udp_ports, inspect_tls, os_probes, trace_routes, liveness = None, False, False, False, None
         print(f"Scanning network: {network_range}...")
 
-        # Scan all ports (1-65535)
-        nm.scan(hosts=network_range, arguments='-T4 -p 1-65535 --open')
+        # Merge and deduplicate the targets, and apply the exclusions, before nmap sees them
+        targets = TargetSet.parse(network_range)
+        if not isinstance(network_range, str):
+            network_range = str(targets)
+
+        # IPv6 networks cannot be swept (a /64 holds 2^64 addresses): the hosts found on the links by multicast
+        # probes and in the neighbour table are scanned instead (functionalities.ipv6)
+        if targets.has_version(6) and transport.live:
+            with metrics.span('ipv6_discovery'):
+                targets, discovered = expand_targets(targets, [interface] if interface else None)
+            metrics.inc('ipv6_hosts_discovered', len(discovered))
+            if not targets:
+                print(f"\n[WARNING] No IPv6 host answered on the links of {network_range}.")
+                return None
+
+        # Skip the discovery the liveness cache already answers: drop the addresses recently seen down by a
+        # discovery as thorough as nmap's (not a mere ping: a host may drop ICMP and still answer on TCP), and
+        # if every remaining target was recently seen up, let nmap scan them without pinging first
+        skip_discovery = False
+        if liveness is not None:
+            known = liveness.lookup(targets)
+            down = [address for address, entry in known.items()
+                    if not entry['up'] and covers(entry['source'], 'nmap')]
+            if down:
+                targets = targets - TargetSet.parse(' '.join(down))
+            skip_discovery = bool(targets) and not targets.hostnames and \
+                sum(1 for entry in known.values() if entry['up']) == targets.size
+            metrics.inc('liveness_hits', len(known))
+            if not targets:
+                print(f"\n[WARNING] Every target of {network_range} was recently seen down (liveness cache).")
+                return None
+
+        hosts, extra_arguments, targets_file = nmap_target_arguments(targets)
+        if interface:
+            extra_arguments += f" -e {shlex.quote(interface)}"
+        if skip_discovery:
+            extra_arguments += " -Pn"
+
+        # Scan all ports (1-65535): nmap does discovery and the port scan in a single run
+        try:
+            with metrics.span('port_scan'):
+                nm.scan(hosts=hosts, arguments='-T4 -p 1-65535 --open' + extra_arguments)
+        finally:
+            if targets_file:
+                os.remove(targets_file)
+        scan_stats = nm.scanstats()
+        metrics.inc('hosts_probed', int(scan_stats.get('totalhosts', 0) or 0))
+        metrics.inc('hosts_up', int(scan_stats.get('uphosts', 0) or 0))
+
+        # Only the hosts found up are recorded: with --open, nmap leaves out the hosts without open ports,
+        # so a missing address is not proof that it is down
+        if liveness is not None and not skip_discovery:
+            liveness.record_many({host: True for host in nm.all_hosts() if nm[host].state() == 'up'}, source='nmap')
 
         # Check if no hosts are found
         if len(nm.all_hosts()) == 0:
@@ -128,70 +335,164 @@ def scan_network(network_range, output_folder, progress_callback=None):
             show_warning_popup(f"No hosts were found during the scan for the range: {network_range}.")
             return None
 
+        # UDP is not asked from nmap (-sU takes hours): the asynchronous scanner probes the hosts that are up
+        udp_results = {}
+        if udp_ports and not cancelled():
+            up_hosts = [host for host in nm.all_hosts() if nm[host].state() == 'up']
+            udp_scanner = UdpScanner(udp_ports)
+            with metrics.span('udp_scan'):
+                for batch in batches(up_hosts):
+                    if cancelled():
+                        break
+                    udp_results.update(udp_scanner.scan(batch))
+                    metrics.inc('udp_probes', len(batch) * len(udp_ports))
+
+        # Certificates of the open ports that speak TLS, every handshake of a batch at once
+        certificates = {}
+        if inspect_tls and not cancelled():
+            endpoints = []
+            for host in nm.all_hosts():
+                for port, port_data in nm[host].get('tcp', {}).items():
+                    mode = tls_mode(port, port_data.get('name'))
+                    if mode and port_data['state'] == 'open':
+                        endpoints.append((host, port, mode, nm[host].hostname()))
+            if endpoints:
+                cache = CertificateCache(os.path.join(output_folder, 'tls', 'certificates.json'))
+                inspector = TlsInspector(cache=cache, metrics=metrics)
+                with metrics.span('tls'):
+                    for batch in batches(endpoints):
+                        if cancelled():
+                            break
+                        for (host, port), certificate in inspector.inspect_many(batch).items():
+                            certificates.setdefault(host, {})[port] = certificate
+                cache.save()
+
+        # OS of the hosts nmap did not fingerprint: classified from the reply TTLs and open ports of the scan,
+        # with a SYN probe or nmap -O only for the doubtful ones
+        ttls = nmap_ttls(nm.get_nmap_last_output())
+        os_guesses = {}
+        if not cancelled():
+            with metrics.span('os_detection'):
+                clues = {}
+                for host in nm.all_hosts():
+                    if nm[host].get('osmatch'):
+                        continue
+                    tcp = nm[host].get('tcp', {})
+                    ports = sorted(port for port, port_data in tcp.items() if port_data['state'] == 'open')
+                    clues[host] = {'ttl': ttls.get(host), 'ports': ports,
+                                   'services': [tcp[port].get('name', '') for port in ports]}
+                for batch in batches(list(clues)):
+                    if cancelled():
+                        break
+                    os_guesses.update(fingerprint_hosts({host: clues[host] for host in batch},
+                                                        probe=os_probes, escalate=os_probes))
+
+        # Routes to the hosts that are up, traced in one concurrent pass (first probes sent at their TTL distance)
+        topology = None
+        if trace_routes and not cancelled():
+            with metrics.span('topology'):
+                up_hosts = [host for host in nm.all_hosts() if nm[host].state() == 'up']
+                topology = map_topology(up_hosts, hop_distances(ttls), metrics)
+        if cancelled():
+            print(f"Scan of {network_range} cancelled: saving the hosts found so far.")
+
         # Generate a timestamp for the scan output filenames
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        output_file_json = os.path.join(output_folder, f"{current_time}_scan_results.json")
-        output_file_txt = os.path.join(output_folder, f"{current_time}_scan_results.txt")
-        
+        file_stamp = current_time + '_' + re.sub(r'[^\w.-]', '_', interface) if interface else current_time
+        if sinks is None:
+            sinks = default_sinks(output_folder, file_stamp)
+        sink = SinkGroup(sinks)
+
         # Prepare results
-        scan_results = {'scan_time': current_time, 'network_range': network_range, 'hosts': []}
-        txt_output = []
-
-        # Add a delimiter for the new scan in the text file
-        delimiter = f"\n{'='*50}\nScan started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{'='*50}\n"
-        txt_output.append(delimiter)
-
-        # Scan each host in the range
-        for idx, host in enumerate(nm.all_hosts()):
-            if progress_callback:
-                progress_callback((idx + 1) / len(nm.all_hosts()) * 100)
-
-            host_info = {
-                'host': host,
-                'status': nm[host].state(),
-                'hostname': nm[host].hostname(),
-                'os': nm[host].get('osmatch', []),
-                'ports': []
-            }
-
-            host_txt = f"Host: {host}\nStatus: {nm[host].state()}\n"
-
-            # Handle OS information
-            if 'osmatch' in nm[host] and isinstance(nm[host]['osmatch'], list):
-                os_matches = ', '.join([str(item) for item in nm[host]['osmatch']])
-                host_txt += f"OS: {os_matches}\n"
-            
-            # Handle port information
-            for proto in nm[host].all_protocols():
-                for port in nm[host][proto]:
-                    port_info = {
-                        'port': port,
-                        'state': nm[host][proto][port]['state'],
-                        'service': nm[host][proto][port].get('name', 'unknown')
-                    }
-                    host_info['ports'].append(port_info)
-                    host_txt += f"Port: {port} - {nm[host][proto][port]['state']} ({nm[host][proto][port].get('name', 'unknown')})\n"
-            
-            # Add host information to scan results
-            scan_results['hosts'].append(host_info)
-            txt_output.append(host_txt)
-
-        # Save results to JSON file
-        with open(output_file_json, 'a') as json_file:
-            json.dump(scan_results, json_file, indent=4)
-            json_file.write("\n\n")
-
-        # Save results to TXT file
-        with open(output_file_txt, 'a') as txt_file:
-            txt_file.write("\n".join(txt_output))
-
-        print(f"Scan completed. Results saved to {output_file_json} and {output_file_txt}.")
+        scan_results = ScanResult(current_time, network_range)
+
+        with sink:
+            sink.open(current_time, network_range)
+
+            # Scan each host in the range
+            all_hosts = nm.all_hosts()
+            for idx, host in enumerate(all_hosts):
+                if progress_callback:
+                    progress_callback((idx + 1) / len(all_hosts) * 100)
+
+                with metrics.span('parsing'):
+                    os_matches = nm[host].get('osmatch') or ([os_guesses[host].to_osmatch()] if host in os_guesses else [])
+                    host_result = HostResult(host, nm[host].state(), nm[host].hostname(), os_matches)
+
+                    # Handle port information
+                    for proto in nm[host].all_protocols():
+                        for port, port_data in nm[host][proto].items():
+                            host_result.set_port(port, port_data['state'], port_data.get('name', 'unknown'),
+                                                 port_data.get('version'), proto, port_data.get('script'))
+                        metrics.inc('ports', len(nm[host][proto]), proto=proto)
+                    if host in udp_results:
+                        add_udp_results(host_result, udp_results[host])
+                    host_result.certificates.update(certificates.get(host, {}))
+
+                # Hand the finished host to the sinks
+                with metrics.span('output'):
+                    sink.write_host(host_result)
+                metrics.inc('hosts_written')
+                if host_callback:
+                    host_callback(host_result)
+                if keep_results:
+                    scan_results.add_host(host_result)
+
+            # Finalize the outputs (closing again on leaving the block is a no-op)
+            with metrics.span('output'):
+                sink.close()
+
+        if topology is not None:
+            save_topology(topology, output_folder, file_stamp)
+
+        paths = [path for path in (getattr(item, 'path', None) for item in sinks) if path]
+        metrics.inc('bytes_written', sum(os.path.getsize(path) for path in paths if os.path.exists(path)))
+        metrics.finish()
+        summary_path = save_scan_metrics(metrics, output_folder, file_stamp)
+        print(f"Scan completed. Results saved to {', '.join(paths)}.")
+        print(f"Scan metrics saved to {summary_path}.")
         return scan_results
 
+    except ScanCancelled:
+        print(f"Scan of {network_range} cancelled: no results saved.")
+        raise
     except Exception as e:
         print(f"An error occurred during the scan: {e}")
         return None
 
+def scan_local_networks(output_folder, max_workers=4, ipv6=False, **kwargs):
+    """
+    Scan every network the machine is attached to, concurrently, each from its own interface.
+
+    The networks and their prefixes come from the interface inventory
+    (functionalities.interfaces), so a /22 is scanned whole and a second
+    network card is not forgotten.
+
+    Args:
+        output_folder (str): The folder to save the scan results.
+        max_workers (int): Networks scanned at the same time.
+        ipv6 (bool): Also scan the IPv6 networks (their hosts are discovered on the link, not swept).
+        **kwargs: Passed on to scan_network.
+
+    Returns:
+        dict: {network: ScanResult or None}.
+    """
+    networks = attached_networks() + (attached_networks(version=6) if ipv6 else [])
+    if not networks:
+        print("No attached network found.")
+        return {}
+    for entry in networks:
+        print(f"Detected network: {entry.network} on {entry.interface or 'default interface'} ({entry.address})")
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(networks)))) as executor:
+        futures = {executor.submit(scan_network, str(entry.network), output_folder,
+                                   interface=nmap_interface_name(entry.interface), **kwargs): entry
+                   for entry in networks}
+        for future in as_completed(futures):
+            results[str(futures[future].network)] = future.result()
+    return results
+
 def main():
     """
     Main function to drive the program, allowing the user to choose scan options and initiate the scan.
@@ -202,15 +503,12 @@ def main():
 
         if choice == 1:
             # Scan a single IP address
-            ip_address = input("\nEnter the IP address to scan: ").strip()
+            ip_address = input("\nEnter the IP address to scan (or targets: CIDR, range, hostname, @file, !exclusion): ").strip()
             scan_network(ip_address, 'scans')  # Save to the 'scans' folder
 
         elif choice == 2:
-            # Scan a subnet based on the current IP
-            local_ip = get_local_ip()
-            subnet = get_subnet_from_ip(local_ip)
-            print(f"Detected subnet: {subnet}")
-            scan_network(subnet, 'scans')  # Save to the 'scans' folder
+            # Scan every attached network at its real size, one interface per scan
+            scan_local_networks('scans')  # Save to the 'scans' folder
 
 # Run the program
 if __name__ == "__main__":
@@ -0,0 +1,606 @@
+import argparse
+import bisect
+import json
+import os
+import re
+import time
+import zlib
+from array import array
+
+from functionalities.archive import SCAN_FILE, Archive, FolderLock
+from functionalities.results import iter_scan_file, iter_scan_stream
+
+# Index layout: '<folder>/index.json' lists the segments; each segment is a zlib-compressed JSON document
+INDEX_VERSION = 1
+MANIFEST_NAME = 'index.json'
+
+# Index of the application's result folder (functionalities/scan.py and the API write to 'scans')
+DEFAULT_INDEX_FOLDER = os.path.join('scans', 'search')
+
+# Tiered merges: a segment's tier is log(documents) in base MERGE_FACTOR, and MERGE_FACTOR adjacent segments
+# of one tier are merged into one of the next tier, so a search reads O(MERGE_FACTOR * log(documents)) files
+# and each document is rewritten O(log(documents)) times
+MERGE_FACTOR = 4
+
+# Fields of the terms ('field:value'); bare query words search 'text', which holds every token
+FIELDS = ('host', 'hostname', 'port', 'service', 'script', 'cve', 'os', 'status', 'text')
+
+# Words of free text (script output, versions, OS names): letters and digits joined by . _ / -
+WORD_PATTERN = re.compile(r'[a-z0-9]+(?:[._/-][a-z0-9]+)*')
+WORD_PARTS = re.compile(r'[._/-]')
+CVE_PATTERN = re.compile(r'\bcve-\d{4}-\d{4,}\b', re.IGNORECASE)
+
+# Scan times of the file names ('2026-10-19_18-20-36'), stored like the others ('2026-10-19 18:20:36')
+STAMP_TIME = re.compile(r'^(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})')
+
+# Query syntax: parentheses, quoted phrases and words
+QUERY_TOKEN = re.compile(r'\(|\)|"[^"]*"|[^\s()]+')
+
+
+def words(text):
+    """
+    Tokenize free text: lower-case words plus their parts.
+
+    'ssl-ccs-injection' gives 'ssl-ccs-injection', 'ssl', 'ccs' and
+    'injection', so both the whole identifier and any part of it match.
+    """
+    tokens = []
+    for word in WORD_PATTERN.findall(str(text).lower()):
+        tokens.append(word)
+        parts = WORD_PARTS.split(word)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def _flatten(value):
+    """Yield the strings of nested script output (dicts, lists, tables)."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key)
+            yield from _flatten(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _flatten(item)
+    elif value is not None:
+        yield str(value)
+
+
+def host_terms(host):
+    """
+    Return the index terms of a HostResult.
+
+    Returns:
+        set: 'field:value' strings.
+    """
+    terms = {f"host:{host.host}", f"status:{host.status}"}
+    text = [host.hostname]
+    if host.hostname:
+        terms.add(f"hostname:{host.hostname.lower()}")
+    os_names = host.os if isinstance(host.os, str) else ' '.join(
+        match.get('name', '') for match in host.os if isinstance(match, dict))
+    for word in words(os_names):
+        terms.add(f"os:{word}")
+    for port, proto, state in host.iter_ports():
+        if state != 'open':
+            continue
+        terms.add(f"port:{port}")
+        service, version = host.service(port, proto)
+        if service:
+            terms.add(f"service:{service.lower()}")
+            text.append(service)
+        text.append(version)
+    for port, scripts in host.scripts.items():
+        for script_id, output in (scripts.items() if isinstance(scripts, dict) else ()):
+            terms.add(f"script:{script_id.lower()}")
+            text.append(script_id)
+            for line in _flatten(output):
+                text.append(line)
+                terms.update(f"cve:{cve.lower()}" for cve in CVE_PATTERN.findall(line))
+    for matches in host.vulnerabilities.values():
+        terms.update(f"cve:{match['id'].lower()}" for match in matches)
+    for certificate in host.certificates.values():
+        text.append(certificate.get('common_name') or '')
+        text.extend(certificate.get('sans') or ())
+    # Many ports share a service and version: tokenize each distinct value once
+    for value in set(text):
+        terms.update(f"text:{word}" for word in words(value))
+    # Field values are searchable as bare words too
+    terms.update(f"text:{term.split(':', 1)[1]}" for term in list(terms)
+                 if not term.startswith(('text:', 'status:', 'host:')))
+    return terms
+
+
+def host_summary(host, scan_time, source):
+    """The document stored for a hit: what a search result shows."""
+    return {
+        'host': host.host,
+        'hostname': host.hostname,
+        'scan_time': STAMP_TIME.sub(r'\1 \2:\3:\4', scan_time or ''),
+        'source': source,
+        'ports': [f"{port}/{proto}" if proto != 'tcp' else port
+                  for port, proto, state in host.iter_ports() if state == 'open'],
+        'scripts': sorted({script_id for scripts in host.scripts.values()
+                           for script_id in (scripts if isinstance(scripts, dict) else ())}),
+    }
+
+
+def _encode_postings(doc_ids):
+    """Delta-encode a sorted list of document ids."""
+    previous = 0
+    deltas = []
+    for doc_id in doc_ids:
+        deltas.append(doc_id - previous)
+        previous = doc_id
+    return deltas
+
+
+def _decode_postings(deltas):
+    postings = array('I')
+    total = 0
+    for delta in deltas:
+        total += delta
+        postings.append(total)
+    return postings
+
+
+class QueryError(ValueError):
+    """Raised for a query that cannot be parsed."""
+
+
+class SearchIndex:
+    """
+    Inverted index of scanned hosts: one document per host and scan.
+
+    Terms are 'field:value' strings (see FIELDS and host_terms): script IDs,
+    CVE identifiers, services, ports, addresses and the words of script
+    output, versions and OS names. Documents are added in batches; each
+    commit writes a new immutable segment (delta-encoded postings lists,
+    compressed), and runs of segments of similar size are merged (see
+    MERGE_FACTOR). A search loads only the documents committed since the
+    previous one. Sources
+    (a scan file and scan) are recorded, so ingesting the same scan again
+    is a no-op.
+
+    Queries: words are ANDed; OR, NOT (or a leading '-') and parentheses
+    combine them; 'field:value' searches one field; a trailing '*' matches a
+    prefix ('cve:cve-2014-*', 'script:ssl-*', 'host:10.0.1.*'); quoted text
+    matches documents holding all its words.
+
+    Args:
+        folder (str): The index folder (created on the first commit).
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.manifest_path = os.path.join(folder, MANIFEST_NAME)
+        self.pending = []
+        self.pending_sources = set()
+        # In-memory view of the committed documents [loaded_from, loaded_until), loaded on the first search
+        self.loaded_from = None
+        self.loaded_until = 0
+        self.terms = {}
+        self.sorted_terms = None
+        self.docs = {}
+        self.manifest = self._read_manifest()
+        self.sources = set(self.manifest['sources'])
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {'version': INDEX_VERSION, 'segments': [], 'next_doc': 0, 'next_segment': 0, 'sources': [],
+                    'segment_docs': {}}
+        if manifest.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version in {self.manifest_path}")
+        # {segment: [first document, documents]}, missing from the indexes written before tiered merges
+        manifest.setdefault('segment_docs', {})
+        return manifest
+
+    def _segment_docs(self, name):
+        """Return (first document, documents) of a segment, reading it if the manifest does not say."""
+        docs = self.manifest['segment_docs'].get(name)
+        if docs is None:
+            segment = self._read_segment(name)
+            docs = self.manifest['segment_docs'][name] = [segment['first_doc'], len(segment['docs'])]
+        return tuple(docs)
+
+    # Ingest
+
+    def has_source(self, source):
+        """True if a scan was already ingested (or is pending) under this source key."""
+        return source in self.pending_sources or source in self.sources
+
+    def add_host(self, host, scan_time, source):
+        """
+        Queue a host for the next commit.
+
+        Args:
+            host (HostResult): The host.
+            scan_time (str): When it was scanned.
+            source (str): Key of the scan it comes from ('<file name>#<scan index>#<scan time>').
+        """
+        self.pending.append((host_terms(host), host_summary(host, scan_time, source)))
+        self.pending_sources.add(source)
+
+    def ingest_stream(self, hosts, name):
+        """
+        Queue the hosts of a scan file not ingested yet.
+
+        Args:
+            hosts (iterable): (header, host) pairs from functionalities.results.iter_scan_file.
+            name (str): The file name, part of the source keys.
+
+        Returns:
+            int: Hosts queued.
+        """
+        count = 0
+        skipped = set()
+        for header, host in hosts:
+            if host is None:
+                continue
+            source = f"{name}#{header['index']}#{header['scan_time']}"
+            if source in skipped or (source not in self.pending_sources and self.has_source(source)):
+                skipped.add(source)
+                continue
+            self.add_host(host, header['scan_time'], source)
+            count += 1
+        return count
+
+    def ingest_file(self, path):
+        """Queue the scans of a result file (JSON, JSON Lines or text report)."""
+        return self.ingest_stream(iter_scan_file(path), os.path.basename(path))
+
+    def ingest_folder(self, folder):
+        """
+        Queue every scan of a folder: its result files and the scans of its archive.
+
+        Returns:
+            int: Hosts queued.
+        """
+        loose = {entry.name: entry.path for entry in os.scandir(folder) if entry.is_file()
+                 and (entry.name == 'last_scan.txt' or (SCAN_FILE.match(entry.name) and '_scan_results.' in entry.name))}
+        archive = Archive(folder)
+        archived = [name for name, _, _ in archive.files() if '_scan_results.' in name]
+        names = set(loose) | set(archived)
+
+        def is_twin(name):
+            # The TXT twin of a JSON scan holds the same hosts
+            return name.endswith('.txt') and name[:-4] + '.json' in names
+
+        count = 0
+        for name in sorted(loose):
+            if not is_twin(name):
+                count += self.ingest_file(loose[name])
+        for name in sorted(archived):
+            # A loose copy of the same file is recognized by its source keys
+            if not is_twin(name):
+                with archive.open(name) as f:
+                    count += self.ingest_stream(iter_scan_stream(f, name), name)
+        return count
+
+    def commit(self):
+        """
+        Write the queued hosts as a new segment (merging the segments if there are too many).
+
+        Returns:
+            int: Documents written.
+        """
+        if not self.pending:
+            return 0
+        with FolderLock(self.folder):
+            # Another process may have committed since this index was opened
+            self.manifest = self._read_manifest()
+            first = self.manifest['next_doc']
+            postings = {}
+            docs = []
+            for offset, (terms, summary) in enumerate(self.pending):
+                docs.append(summary)
+                for term in terms:
+                    postings.setdefault(term, []).append(first + offset)
+            name = self._write_segment(first, docs, postings)
+            self.manifest['segments'].append(name)
+            self.manifest['next_doc'] = first + len(docs)
+            self.sources = set(self.manifest['sources'])
+            self.manifest['sources'].extend(sorted(self.pending_sources - self.sources))
+            self.sources.update(self.pending_sources)
+            self._merge_segments()
+            self._write_manifest()
+            written = len(self.pending)
+            self.pending = []
+            self.pending_sources = set()
+        return written
+
+    def _write_segment(self, first, docs, postings):
+        name = f"segment-{self.manifest['next_segment']:06d}.seg"
+        self.manifest['next_segment'] += 1
+        self.manifest['segment_docs'][name] = [first, len(docs)]
+        segment = {'first_doc': first, 'docs': docs,
+                   'terms': {term: _encode_postings(ids) for term, ids in postings.items()}}
+        path = os.path.join(self.folder, name)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(zlib.compress(json.dumps(segment, separators=(',', ':')).encode('utf-8'), 6))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        return name
+
+    def _read_segment(self, name):
+        with open(os.path.join(self.folder, name), 'rb') as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def _tier(self, name):
+        documents = max(1, self._segment_docs(name)[1])
+        tier = 0
+        while documents >= MERGE_FACTOR:
+            documents //= MERGE_FACTOR
+            tier += 1
+        return tier
+
+    def _merge_segments(self):
+        """
+        Merge the runs of MERGE_FACTOR adjacent segments of one tier, newest first, until none is left (lock held).
+
+        Only adjacent segments are merged: their documents are consecutive,
+        so the merged segment is one range of document ids too.
+        """
+        merged_any = True
+        while merged_any:
+            merged_any = False
+            segments = self.manifest['segments']
+            end = len(segments)
+            while end >= MERGE_FACTOR:
+                run = segments[end - MERGE_FACTOR:end]
+                if len({self._tier(name) for name in run}) == 1:
+                    self._merge_run(end - MERGE_FACTOR, end)
+                    merged_any = True
+                    break
+                end -= 1
+
+    def _merge_run(self, start, end):
+        """Rewrite the segments [start, end) of the manifest as one (lock held)."""
+        old = self.manifest['segments'][start:end]
+        docs = []
+        postings = {}
+        first = None
+        for name in old:
+            segment = self._read_segment(name)
+            if first is None:
+                first = segment['first_doc']
+            docs.extend(segment['docs'])
+            for term, deltas in segment['terms'].items():
+                postings.setdefault(term, array('I')).extend(_decode_postings(deltas))
+        merged = self._write_segment(first or 0, docs, postings)
+        self.manifest['segments'][start:end] = [merged]
+        for name in old:
+            self.manifest['segment_docs'].pop(name, None)
+        # Readers holding the old manifest may still open the old segments for a moment
+        self._write_manifest()
+        for name in old:
+            os.remove(os.path.join(self.folder, name))
+
+    def _write_manifest(self):
+        with open(self.manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+    # Search
+
+    def refresh(self):
+        """
+        Load the documents committed since the last search.
+
+        Documents are committed in id order and segments hold consecutive ids,
+        so the loaded documents are one range: a segment below its end is
+        skipped (a merge of loaded segments), and only the new documents of
+        the others are decoded.
+        """
+        self.manifest = self._read_manifest()
+        self.sources = set(self.manifest['sources'])
+        segments = self.manifest['segments']
+        start = self._segment_docs(segments[0])[0] if segments else 0
+        if self.manifest['next_doc'] < self.loaded_until or (self.loaded_from is not None and start != self.loaded_from):
+            # The index was rebuilt: start over
+            self.loaded_from, self.loaded_until, self.terms, self.docs = None, 0, {}, {}
+        if self.loaded_from is None:
+            self.loaded_from = self.loaded_until = start
+        for name in segments:
+            first, count = self._segment_docs(name)
+            if first + count <= self.loaded_until:
+                continue
+            segment = self._read_segment(name)
+            skip = self.loaded_until - first
+            for offset, summary in enumerate(segment['docs'][skip:], start=skip):
+                self.docs[first + offset] = summary
+            for term, deltas in segment['terms'].items():
+                postings = _decode_postings(deltas)
+                if skip > 0:
+                    postings = postings[bisect.bisect_left(postings, self.loaded_until):]
+                    if not postings:
+                        continue
+                if term in self.terms:
+                    self.terms[term].extend(postings)
+                else:
+                    self.terms[term] = postings
+            self.loaded_until = first + count
+            self.sorted_terms = None
+
+    def _postings(self, term):
+        """Document ids of a term, or of every term starting with it if it ends with '*'."""
+        if not term.endswith('*'):
+            return set(self.terms.get(term, ()))
+        prefix = term[:-1]
+        if self.sorted_terms is None:
+            self.sorted_terms = sorted(self.terms)
+        result = set()
+        index = bisect.bisect_left(self.sorted_terms, prefix)
+        while index < len(self.sorted_terms) and self.sorted_terms[index].startswith(prefix):
+            result.update(self.terms[self.sorted_terms[index]])
+            index += 1
+        return result
+
+    def _word(self, token):
+        """Document ids of one query word ('field:value', 'value', 'prefix*', '"a phrase"')."""
+        if token.startswith('"'):
+            terms = [f"text:{word}" for word in WORD_PATTERN.findall(token.strip('"').lower())]
+        else:
+            field, sep, value = token.partition(':')
+            if sep and field.lower() in FIELDS:
+                value = value.lower()
+                field = field.lower()
+                if field == 'cve' and not value.startswith('cve-'):
+                    value = 'cve-' + value
+                terms = [f"{field}:{value}"]
+            else:
+                prefix = token.endswith('*')
+                found = WORD_PATTERN.findall(token.lower().rstrip('*'))
+                terms = [f"text:{word}" for word in found]
+                if prefix and terms:
+                    terms[-1] += '*'
+        if not terms:
+            raise QueryError(f"Nothing to search in '{token}'")
+        result = self._postings(terms[0])
+        for term in terms[1:]:
+            result &= self._postings(term)
+        return result
+
+    def _parse(self, tokens, position=0, depth=0):
+        """expression := conjunction ('OR' conjunction)*, evaluated to a set of document ids."""
+        result, position = self._conjunction(tokens, position, depth)
+        while position < len(tokens) and tokens[position] == 'OR':
+            right, position = self._conjunction(tokens, position + 1, depth)
+            result |= right
+        return result, position
+
+    def _conjunction(self, tokens, position, depth):
+        result = None
+        while position < len(tokens) and tokens[position] not in ('OR', ')'):
+            if tokens[position] == 'AND':
+                position += 1
+                continue
+            negate = False
+            while position < len(tokens) and (tokens[position] == 'NOT' or
+                                              (tokens[position].startswith('-') and len(tokens[position]) > 1)):
+                if tokens[position] == 'NOT':
+                    position += 1
+                else:
+                    tokens[position] = tokens[position][1:]
+                negate = not negate
+            if position >= len(tokens):
+                raise QueryError("Query ends with NOT")
+            if tokens[position] == '(':
+                value, position = self._parse(tokens, position + 1, depth + 1)
+                if position >= len(tokens) or tokens[position] != ')':
+                    raise QueryError("Missing ')'")
+                position += 1
+            elif tokens[position] == ')':
+                raise QueryError("Unexpected ')'")
+            else:
+                value = self._word(tokens[position])
+                position += 1
+            if negate:
+                value = set(self.docs) - value
+            result = value if result is None else result & value
+        if result is None:
+            raise QueryError("Empty query or operator without operand")
+        return result, position
+
+    def search(self, query, limit=None):
+        """
+        Return the host documents matching a query, newest scan first.
+
+        Args:
+            query (str): The query (see the class documentation).
+            limit (int): Maximum number of documents (default: all).
+
+        Returns:
+            list: Documents ({'host', 'hostname', 'scan_time', 'source', 'ports', 'scripts'}).
+
+        Raises:
+            QueryError: If the query cannot be parsed.
+        """
+        self.refresh()
+        tokens = QUERY_TOKEN.findall(query)
+        if not tokens:
+            raise QueryError("Empty query")
+        matches, position = self._parse(tokens)
+        if position != len(tokens):
+            raise QueryError(f"Unexpected '{tokens[position]}'")
+        # Document ids grow with ingestion: the highest ids are the latest scans ingested
+        doc_ids = sorted(matches, key=lambda doc_id: (self.docs[doc_id]['scan_time'], doc_id), reverse=True)
+        if limit is not None:
+            doc_ids = doc_ids[:limit]
+        return [self.docs[doc_id] for doc_id in doc_ids]
+
+    def matching_hosts(self, query):
+        """
+        Answer 'which hosts match': one entry per address with its latest matching scan.
+
+        Returns:
+            list: (host, latest matching document, number of matching scans), latest first.
+        """
+        latest = {}
+        counts = {}
+        for doc in self.search(query):
+            latest.setdefault(doc['host'], doc)
+            counts[doc['host']] = counts.get(doc['host'], 0) + 1
+        return [(host, doc, counts[host]) for host, doc in latest.items()]
+
+
+def format_hit(doc, scans=None):
+    ports = ', '.join(map(str, doc['ports'][:12])) + (', ...' if len(doc['ports']) > 12 else '')
+    line = f"{doc['host']:<16} {doc['hostname'] or '-':<24} {doc['scan_time']:<20} ports: {ports or '-'}"
+    if doc['scripts']:
+        line += f"\n{'':<16} scripts: {', '.join(doc['scripts'])}"
+    if scans is not None:
+        line += f"\n{'':<16} {scans} matching scans, latest in {doc['source'].split('#', 1)[0]}"
+    return line
+
+
+def main():
+    """
+    Command-line entry point: ingest scan results and search them.
+    """
+    parser = argparse.ArgumentParser(description="Search the scan history (script IDs, CVEs, services, text).")
+    parser.add_argument('query', nargs='?', help="e.g. 'cve:CVE-2014-0224', 'script:ssl-* AND NOT port:443', 'openssh*'")
+    parser.add_argument('--index', default=DEFAULT_INDEX_FOLDER, help=f"Index folder (default: {DEFAULT_INDEX_FOLDER})")
+    parser.add_argument('--ingest', nargs='+', metavar='PATH', default=[],
+                        help="Scan files or folders (with their archive) to add to the index first")
+    parser.add_argument('--all', action='store_true', help="List every matching scan, not only the latest per host")
+    parser.add_argument('--limit', type=int, default=100, help="Maximum number of results")
+    args = parser.parse_args()
+
+    index = SearchIndex(args.index)
+    if args.ingest:
+        start = time.perf_counter()
+        for path in args.ingest:
+            if os.path.isdir(path):
+                index.ingest_folder(path)
+            else:
+                index.ingest_file(path)
+        written = index.commit()
+        print(f"{written} hosts indexed in {time.perf_counter() - start:.2f}s.")
+    if not args.query:
+        return
+
+    index.refresh()
+    start = time.perf_counter()
+    try:
+        if args.all:
+            results = [(doc, None) for doc in index.search(args.query, args.limit)]
+        else:
+            results = [(doc, scans) for _, doc, scans in index.matching_hosts(args.query)[:args.limit]]
+    except QueryError as e:
+        parser.error(str(e))
+    elapsed = (time.perf_counter() - start) * 1000
+    for doc, scans in results:
+        print(format_hit(doc, scans))
+    print(f"{len(results)} results in {elapsed:.1f} ms.")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import json
+import os
+import sqlite3
+
+import time
+
+# Buffer size of the file-based sinks
+WRITE_BUFFER_SIZE = 256 * 1024
+
+# The file sinks push their buffer to the OS every FLUSH_HOSTS hosts or FLUSH_SECONDS seconds, and on close
+FLUSH_HOSTS = 64
+FLUSH_SECONDS = 5.0
+
+
+class ResultSink:
+    """
+    Base class for scan output sinks.
+
+    A sink receives the scan header once, then each host as soon as it is
+    finished, and is finalized when the scan completes. File sinks write to
+    '<path>.part' and rename it into place on close, so a finished file is
+    never half-written while an interrupted scan still leaves its partial
+    results on disk.
+
+    Sinks can be used as context managers: leaving the block normally
+    finalizes the sink, leaving it with an exception aborts it.
+    """
+
+    def open(self, scan_time, network_range):
+        """Start a new scan."""
+        raise NotImplementedError
+
+    def write_host(self, host):
+        """Write one finished HostResult."""
+        raise NotImplementedError
+
+    def close(self):
+        """Finalize the output."""
+        raise NotImplementedError
+
+    def abort(self):
+        """Stop writing but keep whatever partial output exists."""
+        self.close_files()
+
+    def close_files(self):
+        """Release open resources without finalizing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class FileSink(ResultSink):
+    """
+    Common logic of the sinks that write a single file.
+
+    The finished hosts are flushed to the OS in groups (see FLUSH_HOSTS and
+    FLUSH_SECONDS), so an interrupted scan leaves all but the last few on
+    disk without a system call per host.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = path + '.part'
+        self.file = None
+        self.hosts_written = 0
+        self.unflushed = 0
+        self.flushed_at = 0.0
+
+    def open(self, scan_time, network_range):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.file = open(self.temp_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+        self.hosts_written = 0
+        self.unflushed = 0
+        self.flushed_at = time.monotonic()
+        self.write_header(scan_time, network_range)
+
+    def write_header(self, scan_time, network_range):
+        pass
+
+    def write_footer(self):
+        pass
+
+    def write_host(self, host):
+        self.file.write(self.format_host(host))
+        self.hosts_written += 1
+        self.unflushed += 1
+        if self.unflushed >= FLUSH_HOSTS or time.monotonic() - self.flushed_at >= FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """Push the hosts written so far to the OS, so they survive if the scan dies."""
+        if self.file is not None:
+            self.file.flush()
+        self.unflushed = 0
+        self.flushed_at = time.monotonic()
+
+    def format_host(self, host):
+        raise NotImplementedError
+
+    def close(self):
+        if self.file is None:
+            return
+        self.write_footer()
+        self.file.close()
+        self.file = None
+        os.replace(self.temp_path, self.path)
+
+    def close_files(self):
+        # Closing flushes the buffer: an aborted scan keeps every host it wrote
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class TxtSink(FileSink):
+    """
+    Human-readable text report.
+
+    Args:
+        path (str): The final file path.
+        format_host (function): Returns the text block for one HostResult.
+        format_header (function): Returns the text written before the first host (optional).
+    """
+
+    def __init__(self, path, format_host, format_header=None):
+        super().__init__(path)
+        self._format_host = format_host
+        self._format_header = format_header
+
+    def write_header(self, scan_time, network_range):
+        if self._format_header:
+            self.file.write(self._format_header(scan_time, network_range))
+
+    def format_host(self, host):
+        return self._format_host(host)
+
+
+class JsonSink(FileSink):
+    """
+    JSON scan document in the layout used by the 'scans' folder.
+
+    The document is streamed: the header and opening of the 'hosts' array are
+    written first, each host is appended as it arrives and the array is closed
+    on finalize.
+    """
+
+    def write_header(self, scan_time, network_range):
+        header = json.dumps({'scan_time': scan_time, 'network_range': network_range}, indent=4)
+        # Drop the closing brace so the hosts array can be streamed into the object
+        self.file.write(header[:-2] + ',\n    "hosts": [')
+
+    def format_host(self, host):
+        separator = ',' if self.hosts_written else ''
+        body = json.dumps(host.to_dict(), indent=4).replace('\n', '\n        ')
+        return f"{separator}\n        {body}"
+
+    def write_footer(self):
+        self.file.write('\n    ]\n}\n' if self.hosts_written else ']\n}\n')
+
+
+class JsonlSink(FileSink):
+    """
+    JSON Lines output: one self-contained record per host.
+    """
+
+    def write_header(self, scan_time, network_range):
+        self.header = {'scan_time': scan_time, 'network_range': network_range}
+
+    def format_host(self, host):
+        record = dict(self.header)
+        record.update(host.to_dict())
+        return json.dumps(record) + '\n'
+
+
+class SqliteSink(ResultSink):
+    """
+    SQLite database of scans, hosts and ports.
+
+    Each host is committed as soon as it is written. The scan row is marked as
+    finished on close, so interrupted scans can be told apart.
+
+    Args:
+        path (str): The database file (created if missing).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_time TEXT,
+            network_range TEXT,
+            finished INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS hosts (
+            scan_id INTEGER,
+            host TEXT,
+            status TEXT,
+            hostname TEXT,
+            os TEXT,
+            PRIMARY KEY (scan_id, host)
+        );
+        CREATE TABLE IF NOT EXISTS ports (
+            scan_id INTEGER,
+            host TEXT,
+            proto TEXT,
+            port INTEGER,
+            state TEXT,
+            service TEXT,
+            version TEXT,
+            PRIMARY KEY (scan_id, host, proto, port)
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        self.scan_id = None
+
+    def open(self, scan_time, network_range):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(self.SCHEMA)
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO scans (scan_time, network_range) VALUES (?, ?)", (scan_time, network_range)
+            )
+        self.scan_id = cursor.lastrowid
+
+    def write_host(self, host):
+        os_info = host.os if isinstance(host.os, str) else json.dumps(host.os)
+        rows = []
+        for port, proto, state in host.iter_ports():
+            service, version = host.service(port, proto)
+            rows.append((self.scan_id, host.host, proto, port, state, service, version))
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO hosts VALUES (?, ?, ?, ?, ?)",
+                (self.scan_id, host.host, host.status, host.hostname, os_info)
+            )
+            self.connection.executemany("INSERT OR REPLACE INTO ports VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        if self.connection is None:
+            return
+        with self.connection:
+            self.connection.execute("UPDATE scans SET finished = 1 WHERE id = ?", (self.scan_id,))
+        self.close_files()
+
+    def close_files(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class SinkGroup(ResultSink):
+    """
+    Fan a scan out to several sinks at once.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def open(self, scan_time, network_range):
+        for sink in self.sinks:
+            sink.open(scan_time, network_range)
+
+    def write_host(self, host):
+        for sink in self.sinks:
+            sink.write_host(host)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def abort(self):
+        for sink in self.sinks:
+            sink.abort()
+
+
+class SearchSink(ResultSink):
+    """
+    Add each host to the search index (functionalities.search) as the scan runs; committed on close.
+
+    Args:
+        folder (str): The index folder.
+        source (str): Name of the result file written alongside, so ingesting that file later is a no-op.
+    """
+
+    def __init__(self, folder, source):
+        self.folder = folder
+        self.source = source
+        self.index = None
+        self.key = None
+
+    def open(self, scan_time, network_range):
+        from functionalities.search import SearchIndex
+
+        self.index = SearchIndex(self.folder)
+        self.scan_time = scan_time
+        self.key = f"{self.source}#0#{scan_time}"
+
+    def write_host(self, host):
+        self.index.add_host(host, self.scan_time, self.key)
+
+    def close(self):
+        if self.index is not None:
+            self.index.commit()
+            self.index = None
+
+    def abort(self):
+        # The hosts of an interrupted scan are still worth finding
+        self.close()
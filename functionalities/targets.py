@@ -0,0 +1,363 @@
+import bisect
+import heapq
+import ipaddress
+import itertools
+import re
+
+# Address families: version -> (address class, number of bits)
+FAMILIES = {4: (ipaddress.IPv4Address, 32), 6: (ipaddress.IPv6Address, 128)}
+
+# nmap octet syntax: 192.168.1-3.1-254, 10.0.*.1 (commas separate targets in text, see TargetSet.parse)
+OCTET_PATTERN = re.compile(r'^[\d*,-]+(\.[\d*,-]+){3}$')
+
+# Hostnames (RFC 1123 labels)
+HOSTNAME_PATTERN = re.compile(r'^(?=.{1,253}\.?$)[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?'
+                              r'(\.[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*\.?$')
+
+# Limit on the intervals a single nmap octet expression may produce
+MAX_OCTET_INTERVALS = 65536
+
+
+def _merge(intervals):
+    """Merge sorted (start, end) intervals that overlap or touch."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _difference(intervals, removed):
+    """Remove the 'removed' intervals from 'intervals' (both sorted and merged)."""
+    result = []
+    index = 0
+    for start, end in intervals:
+        while index < len(removed) and removed[index][1] < start:
+            index += 1
+        position = index
+        while position < len(removed) and removed[position][0] <= end:
+            cut_start, cut_end = removed[position]
+            if cut_start > start:
+                result.append((start, cut_start - 1))
+            start = max(start, cut_end + 1)
+            if start > end:
+                break
+            position += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+def _intersection(left, right):
+    """Intersect two sorted and merged interval lists."""
+    result = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        start = max(left[i][0], right[j][0])
+        end = min(left[i][1], right[j][1])
+        if start <= end:
+            result.append((start, end))
+        if left[i][1] < right[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _parse_octets(token):
+    """Return the (start, end) IPv4 intervals of an nmap octet expression ('10.0.1-3.1-254')."""
+    octets = []
+    for part in token.split('.'):
+        values = []
+        for item in part.split(','):
+            if item == '*':
+                low, high = 0, 255
+            elif '-' in item:
+                low_text, high_text = item.split('-', 1)
+                low = int(low_text) if low_text else 0
+                high = int(high_text) if high_text else 255
+            else:
+                low = high = int(item)
+            if not 0 <= low <= high <= 255:
+                raise ValueError(f"Invalid octet range '{item}' in {token}")
+            values.append((low, high))
+        octets.append(_merge(sorted(values)))
+
+    count = 1
+    for ranges in octets[:3]:
+        count *= sum(high - low + 1 for low, high in ranges)
+    if count * len(octets[3]) > MAX_OCTET_INTERVALS:
+        raise ValueError(f"Target expression too fragmented: {token}")
+
+    expanded = [[value for low, high in ranges for value in range(low, high + 1)] for ranges in octets[:3]]
+    intervals = []
+    for a, b, c in itertools.product(*expanded):
+        base = (a << 24) | (b << 16) | (c << 8)
+        intervals.extend((base + low, base + high) for low, high in octets[3])
+    return intervals
+
+
+def _parse_token(token):
+    """
+    Parse one target.
+
+    Returns:
+        tuple: (version, intervals) for addresses, or (None, hostname).
+    """
+    if '/' in token or (':' in token and '-' not in token):
+        network = ipaddress.ip_network(token, strict=False)
+        return network.version, [(int(network.network_address), int(network.broadcast_address))]
+
+    if '-' in token and not OCTET_PATTERN.match(token):
+        first_text, last_text = token.split('-', 1)
+        try:
+            first = ipaddress.ip_address(first_text)
+        except ValueError:
+            first = None
+        if first is not None:
+            if last_text.isdigit() and first.version == 4:
+                # 10.0.0.1-50: the end replaces the last octet
+                last = ipaddress.ip_address(int(first) & ~0xff | int(last_text))
+            else:
+                last = ipaddress.ip_address(last_text)
+            if last.version != first.version or int(last) < int(first):
+                raise ValueError(f"Invalid address range: {token}")
+            return first.version, [(int(first), int(last))]
+
+    if OCTET_PATTERN.match(token):
+        return 4, _parse_octets(token)
+
+    try:
+        address = ipaddress.ip_address(token)
+        return address.version, [(int(address), int(address))]
+    except ValueError:
+        pass
+
+    if HOSTNAME_PATTERN.match(token) and not token.replace('.', '').isdigit():
+        return None, token.lower().rstrip('.')
+    raise ValueError(f"Invalid target: {token}")
+
+
+class TargetSet:
+    """
+    A set of scan targets stored as sorted, merged integer intervals.
+
+    IPv4 and IPv6 addresses are kept as (start, end) intervals of their
+    integer values, so a /8 or a file of thousands of adjacent addresses
+    costs a few tuples. Union, intersection and difference are linear merges
+    of the interval lists, membership is a binary search, and iteration is
+    lazy. Hostnames are kept by name.
+
+    Target syntax (parse, from_file): CIDRs (10.0.0.0/24, 2001:db8::/64),
+    single addresses, ranges (10.0.0.1-10.0.0.50, 10.0.0.1-50), nmap octet
+    expressions (192.168.1-3.*), hostnames, '@path' for a file of targets,
+    and a '!' prefix to exclude a target (e.g. '10.0.0.0/24 !10.0.0.1').
+
+    Args:
+        intervals (iterable): (version, start, end) triples (need not be sorted).
+        hostnames (iterable): Host names.
+    """
+
+    __slots__ = ('_intervals', '_starts', 'hostnames')
+
+    def __init__(self, intervals=(), hostnames=()):
+        grouped = {4: [], 6: []}
+        for version, start, end in intervals:
+            grouped[version].append((start, end))
+        self._intervals = {version: _merge(sorted(items)) for version, items in grouped.items()}
+        self._starts = None
+        self.hostnames = frozenset(hostnames)
+
+    @classmethod
+    def _from_intervals(cls, v4, v6, hostnames):
+        targets = cls.__new__(cls)
+        targets._intervals = {4: v4, 6: v6}
+        targets._starts = None
+        targets.hostnames = frozenset(hostnames)
+        return targets
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Build a target set from text.
+
+        Args:
+            spec (str or iterable): Targets separated by spaces, commas or new lines (or a list of them).
+                A TargetSet is returned as is.
+
+        Returns:
+            TargetSet: The included targets minus the excluded ones.
+
+        Raises:
+            ValueError: If a target cannot be parsed.
+        """
+        if isinstance(spec, TargetSet):
+            return spec
+        tokens = spec.replace(',', ' ').split() if isinstance(spec, str) else spec
+        included, excluded = [], []
+        included_names, excluded_names = set(), set()
+        for token in tokens:
+            token = token.strip()
+            if not token or token.startswith('#'):
+                continue
+            exclude = token.startswith('!')
+            if exclude:
+                token = token[1:]
+            if token.startswith('@'):
+                targets = cls.from_file(token[1:])
+                (excluded if exclude else included).append(targets)
+                (excluded_names if exclude else included_names).update(targets.hostnames)
+                continue
+            version, value = _parse_token(token)
+            if version is None:
+                (excluded_names if exclude else included_names).add(value)
+            else:
+                (excluded if exclude else included).extend((version, start, end) for start, end in value)
+
+        result = cls._collect(included, included_names)
+        if excluded or excluded_names:
+            result = result - cls._collect(excluded, excluded_names)
+        return result
+
+    @classmethod
+    def _collect(cls, items, hostnames):
+        # Items are (version, start, end) triples or whole TargetSets (from files)
+        triples = []
+        for item in items:
+            if isinstance(item, TargetSet):
+                triples.extend((version, start, end) for version in (4, 6) for start, end in item._intervals[version])
+            else:
+                triples.append(item)
+        return cls(triples, hostnames)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load targets from a file: one or more per line, '#' starts a comment.
+
+        Accepts resultat/all_ips.txt as well as hand-written lists with ranges and exclusions.
+        """
+        tokens = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0]
+                tokens.extend(line.replace(',', ' ').split())
+        return cls.parse(tokens)
+
+    def intervals(self, version):
+        """Return the (start, end) integer intervals of one address family."""
+        return list(self._intervals[version])
+
+    @property
+    def size(self):
+        """Number of addresses and hostnames (may exceed sys.maxsize for IPv6)."""
+        total = len(self.hostnames)
+        for intervals in self._intervals.values():
+            total += sum(end - start + 1 for start, end in intervals)
+        return total
+
+    def __bool__(self):
+        return bool(self._intervals[4] or self._intervals[6] or self.hostnames)
+
+    def __eq__(self, other):
+        if not isinstance(other, TargetSet):
+            return NotImplemented
+        return self._intervals == other._intervals and self.hostnames == other.hostnames
+
+    def __hash__(self):
+        return hash((tuple(self._intervals[4]), tuple(self._intervals[6]), self.hostnames))
+
+    def has_version(self, version):
+        """Return True if the set holds addresses of this IP version."""
+        return bool(self._intervals[version])
+
+    def __contains__(self, target):
+        """Membership of an address (str, ipaddress object) or hostname, in O(log n)."""
+        if isinstance(target, str):
+            try:
+                target = ipaddress.ip_address(target)
+            except ValueError:
+                return target.lower().rstrip('.') in self.hostnames
+        if self._starts is None:
+            self._starts = {version: [start for start, _ in intervals]
+                            for version, intervals in self._intervals.items()}
+        value = int(target)
+        index = bisect.bisect_right(self._starts[target.version], value) - 1
+        return index >= 0 and self._intervals[target.version][index][1] >= value
+
+    def _combine(self, other, operation):
+        if isinstance(other, str):
+            other = TargetSet.parse(other)
+        if not isinstance(other, TargetSet):
+            return NotImplemented
+        return operation(other)
+
+    def union(self, other):
+        """Targets in either set."""
+        def operation(other):
+            merged = {version: _merge(heapq.merge(self._intervals[version], other._intervals[version]))
+                      for version in (4, 6)}
+            return TargetSet._from_intervals(merged[4], merged[6], self.hostnames | other.hostnames)
+        return self._combine(other, operation)
+
+    def difference(self, other):
+        """Targets of this set that are not in 'other'."""
+        def operation(other):
+            kept = {version: _difference(self._intervals[version], other._intervals[version]) for version in (4, 6)}
+            return TargetSet._from_intervals(kept[4], kept[6], self.hostnames - other.hostnames)
+        return self._combine(other, operation)
+
+    def intersection(self, other):
+        """Targets in both sets."""
+        def operation(other):
+            common = {version: _intersection(self._intervals[version], other._intervals[version])
+                      for version in (4, 6)}
+            return TargetSet._from_intervals(common[4], common[6], self.hostnames & other.hostnames)
+        return self._combine(other, operation)
+
+    def exclude(self, other):
+        """Remove targets (a TargetSet or target text such as '10.0.0.1 @exclude.txt')."""
+        return self.difference(other)
+
+    def issubset(self, other):
+        """Return True if every target of this set is in 'other'."""
+        return not self.difference(other)
+
+    __or__ = union
+    __sub__ = difference
+    __and__ = intersection
+    __le__ = issubset
+
+    def __iter__(self):
+        """Yield every address as a string (IPv4, then IPv6, then hostnames), lazily."""
+        for version in (4, 6):
+            address_class = FAMILIES[version][0]
+            for start, end in self._intervals[version]:
+                for value in range(start, end + 1):
+                    yield str(address_class(value))
+        yield from sorted(self.hostnames)
+
+    def networks(self):
+        """Yield the smallest list of CIDR blocks covering the addresses, lazily."""
+        for version in (4, 6):
+            address_class = FAMILIES[version][0]
+            for start, end in self._intervals[version]:
+                yield from ipaddress.summarize_address_range(address_class(start), address_class(end))
+
+    def to_nmap_targets(self):
+        """Return the targets as nmap arguments: CIDR blocks (a /32 as a plain address) then hostnames."""
+        targets = []
+        for network in self.networks():
+            targets.append(str(network.network_address) if network.num_addresses == 1 else str(network))
+        targets.extend(sorted(self.hostnames))
+        return targets
+
+    def __str__(self):
+        return ' '.join(self.to_nmap_targets())
+
+    def __repr__(self):
+        ranges = len(self._intervals[4]) + len(self._intervals[6])
+        return f"<TargetSet {self.size} targets in {ranges} ranges, {len(self.hostnames)} hostnames>"
@@ -2,7 +2,17 @@ import nmap
 import json
 import socket
 import ipaddress
+import os
 from datetime import datetime
+from functionalities.archive import Archive, archive_scan_history
+from functionalities.interfaces import network_of
+from functionalities.osfp import fingerprint_hosts, nmap_banners, nmap_ttls
+
+# The JSON history keeps this many scans; older ones move to the archive of ARCHIVE_FOLDER
+MAX_HISTORY_SCANS = 20
+# The text history is archived and restarted beyond this size
+MAX_HISTORY_TXT_BYTES = 1024 * 1024
+ARCHIVE_FOLDER = "scans"
 
 def ask_scan_choice():
     """
@@ -45,16 +55,19 @@ def get_local_ip():
 
 def get_subnet_from_ip(local_ip):
     """
-    Given a local IP address, calculate the subnet to scan (assuming /24 mask).
+    Given a local IP address, return the network it is attached to, with its real prefix.
     
     Args:
         local_ip (str): The local IP address of the machine.
         
     Returns:
-        str: The subnet to scan (e.g., '192.168.1.0/24').
+        str: The subnet to scan (e.g., '192.168.1.0/24'); a /24 (a /64 for IPv6) if the address is not local.
     """
-    network = ipaddress.IPv4Network(local_ip + '/24', strict=False)
-    return str(network.network_address) + '/24'
+    entry = network_of(local_ip)
+    if entry is not None:
+        return str(entry.network)
+    address = ipaddress.ip_address(local_ip)
+    return str(ipaddress.ip_network(f"{address}/{64 if address.version == 6 else 24}", strict=False))
 
 def format_scan_results_for_txt(scan_results):
     """
@@ -66,27 +79,47 @@ def format_scan_results_for_txt(scan_results):
     Returns:
         str: A formatted string to be saved as a text file.
     """
-    output = f"Network Scan Results ({scan_results['scan_time']})\n"
-    output += f"Network Range: {scan_results['network_range']}\n\n"
+    lines = [
+        f"Network Scan Results ({scan_results['scan_time']})",
+        f"Network Range: {scan_results['network_range']}",
+        ""
+    ]
     
     for host_info in scan_results["hosts"]:
-        output += f"Host: {host_info['host']}\n"
-        output += f"  Status: {host_info['status']}\n"
-        output += f"  Hostname: {host_info['hostname']}\n"
-        output += f"  OS: {host_info['os']}\n"
+        lines.append(f"Host: {host_info['host']}")
+        lines.append(f"  Status: {host_info['status']}")
+        lines.append(f"  Hostname: {host_info['hostname']}")
+        lines.append(f"  OS: {host_info['os']}")
         
         if host_info['ports']:
-            output += f"  Ports:\n"
+            lines.append("  Ports:")
             for port_info in host_info['ports']:
-                output += f"    - Port: {port_info['port']}\n"
-                output += f"      State: {port_info['state']}\n"
-                output += f"      Service: {port_info['service']}\n"
+                lines.append(f"    - Port: {port_info['port']}")
+                lines.append(f"      State: {port_info['state']}")
+                lines.append(f"      Service: {port_info['service']}")
         else:
-            output += "  No open ports detected.\n"
+            lines.append("  No open ports detected.")
         
-        output += "\n"  # Add a newline for separation between hosts
+        lines.append("")  # Add a newline for separation between hosts
+
+    return "\n".join(lines) + "\n"
 
-    return output
+def guess_os(nm, host, ttls):
+    """
+    Guess the OS of a scanned host from its reply TTL, open ports and service banners.
+
+    Returns:
+        OsGuess: The guess (nmap -O is only run if the passive guess is doubtful).
+    """
+    tcp = nm[host].get('tcp', {})
+    ports = sorted(port for port, port_data in tcp.items() if port_data['state'] == 'open')
+    clues = {
+        'ttl': ttls.get(host),
+        'ports': ports,
+        'services': [tcp[port].get('name', '') for port in ports],
+        'banners': [banner for port in ports for banner in nmap_banners(tcp[port])]
+    }
+    return fingerprint_hosts({host: clues})[host]
 
 def scan_network(network_range, output_file_json="network_scan_results.json", output_file_txt="network_scan_results.txt"):
     """
@@ -105,8 +138,9 @@ def scan_network(network_range, output_file_json="network_scan_results.json", ou
         nm = nmap.PortScanner()
         print(f"\nScanning network: {network_range}...")
 
-        # Perform the scan using nmap with detailed options
-        nm.scan(hosts=network_range, arguments='-A -O')
+        # Perform the scan using nmap with service detection (the OS is classified from the results, without -A -O)
+        nm.scan(hosts=network_range, arguments='-sV')
+        ttls = nmap_ttls(nm.get_nmap_last_output())
 
         # Prepare the results in a dictionary
         scan_results = {
@@ -121,7 +155,7 @@ def scan_network(network_range, output_file_json="network_scan_results.json", ou
                 'host': host,
                 'status': nm[host].state(),
                 'hostname': nm[host].hostname(),
-                'os': nm[host].get('osmatch', 'Unknown OS'),
+                'os': nm[host].get('osmatch') or [guess_os(nm, host, ttls).to_osmatch()],
                 'ports': []
             }
 
@@ -149,13 +183,24 @@ def scan_network(network_range, output_file_json="network_scan_results.json", ou
 
         all_data['scans'].append(scan_results)
 
+        # Keep the history bounded: the oldest scans go to the compressed archive
+        overflow = len(all_data['scans']) - MAX_HISTORY_SCANS
+        if overflow > 0:
+            archive_scan_history(all_data['scans'][:overflow], Archive(ARCHIVE_FOLDER), "history")
+            del all_data['scans'][:overflow]
+
         with open(output_file_json, 'w') as file_json:
             json.dump(all_data, file_json, indent=4, separators=(',', ': '))
 
         # Format the results for a clear text output
         text_output = format_scan_results_for_txt(scan_results)
 
-        # Append the formatted results to a text file
+        # Append the formatted results to a text file, archiving it first once it is too large
+        if os.path.exists(output_file_txt) and os.path.getsize(output_file_txt) > MAX_HISTORY_TXT_BYTES:
+            key = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + "_history"
+            with open(output_file_txt, 'rb') as file_txt:
+                Archive(ARCHIVE_FOLDER).add(key, {f"{key}_scan_results.txt": file_txt.read()})
+            os.remove(output_file_txt)
         with open(output_file_txt, 'a') as file_txt:
             file_txt.write(text_output)
 
@@ -0,0 +1,295 @@
+from collections import OrderedDict
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+# File signature and layout version; version 1 files have no series key
+MAGIC = b'SHRRD2\0\0'
+MAGIC_V1 = b'SHRRD1\0\0'
+
+# Default archives: (seconds per row, number of rows)
+#   raw: 10 s samples for 1 day, then 1 minute averages for 7 days, then 1 hour averages for 1 year
+DEFAULT_ARCHIVES = ((10, 8640), (60, 10080), (3600, 8760))
+
+# File header: magic, number of archives
+HEADER = struct.Struct('<8sI4x')
+
+# Series key after the header (version 2): the host as given, UTF-8, NUL padded (file names are sanitized)
+KEY = struct.Struct('<256s')
+
+# Archive descriptor: step, rows, data offset, then the pending (not yet written) row:
+# slot start, latency sum, latency count, up count, sample count
+ARCHIVE = struct.Struct('<IIqqdIII4x')
+
+# One row: slot start, average latency (NaN if no reply), availability (0-1, NaN if no sample), sample count
+ROW = struct.Struct('<qddI4x')
+
+NAN = float('nan')
+
+# Databases a TimeSeriesStore keeps open at once (each holds a file and a mapping)
+DEFAULT_MAX_OPEN = 128
+
+
+class RoundRobinDatabase:
+    """
+    A fixed-size time-series file in the style of RRDtool.
+
+    The file holds one ring buffer per archive, memory-mapped so that opening
+    it costs nothing and an update touches a few bytes. Each sample is
+    consolidated into every archive at once: the raw archive keeps short
+    steps, the coarser ones keep minute and hour averages of latency and
+    availability. The file size never changes after creation.
+
+    Args:
+        path (str): The database file (created if missing).
+        archives (tuple): (step seconds, rows) pairs, used only when creating the file.
+        key (str): The series key (host) stored in the file, used only when creating it.
+    """
+
+    def __init__(self, path, archives=DEFAULT_ARCHIVES, key=None):
+        self.path = path
+        self.lock = threading.Lock()
+        if not os.path.exists(path):
+            self._create(path, archives, key)
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, count = HEADER.unpack_from(self.map, 0)
+        if magic not in (MAGIC, MAGIC_V1):
+            self.close()
+            raise ValueError(f"Not a time-series file: {path}")
+        self.key = _unpack_key(self.map) if magic == MAGIC else None
+        # Offset of the archive descriptors
+        self.descriptors = HEADER.size + (KEY.size if magic == MAGIC else 0)
+        self.archives = []
+        for index in range(count):
+            step, rows, offset = ARCHIVE.unpack_from(self.map, self.descriptors + index * ARCHIVE.size)[:3]
+            self.archives.append((step, rows, offset))
+
+    @staticmethod
+    def _create(path, archives, key=None):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        encoded_key = (key or '').encode('utf-8')
+        if len(encoded_key) > KEY.size:
+            raise ValueError(f"Series key too long: {key}")
+        offset = HEADER.size + KEY.size + ARCHIVE.size * len(archives)
+        temp_path = path + '.part'
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(archives)))
+            f.write(KEY.pack(encoded_key))
+            for step, rows in archives:
+                f.write(ARCHIVE.pack(step, rows, offset, 0, 0.0, 0, 0, 0))
+                offset += rows * ROW.size
+            f.truncate(offset)
+        os.replace(temp_path, path)
+
+    def close(self):
+        """Flush and close the file."""
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _write_row(self, step, rows, offset, slot, latency_sum, latency_count, up_count, count):
+        latency = latency_sum / latency_count if latency_count else NAN
+        availability = up_count / count if count else NAN
+        index = (slot // step) % rows
+        ROW.pack_into(self.map, offset + index * ROW.size, slot, latency, availability, count)
+
+    def update(self, latency, up=None, timestamp=None):
+        """
+        Add a measurement.
+
+        Args:
+            latency (float): Round-trip time in ms, or None if the host did not answer.
+            up (bool): Whether the host answered (default: latency is not None).
+            timestamp (float): Time of the measurement (default: now).
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if up is None:
+            up = latency is not None
+        timestamp = int(timestamp)
+
+        with self.lock:
+            for index, (step, rows, offset) in enumerate(self.archives):
+                position = self.descriptors + index * ARCHIVE.size
+                (_, _, _, slot, latency_sum, latency_count,
+                 up_count, count) = ARCHIVE.unpack_from(self.map, position)
+                current = timestamp - timestamp % step
+                if current < slot:
+                    # Samples older than the pending row are dropped
+                    continue
+                if current != slot:
+                    if count:
+                        self._write_row(step, rows, offset, slot, latency_sum, latency_count, up_count, count)
+                    slot, latency_sum, latency_count, up_count, count = current, 0.0, 0, 0, 0
+                if latency is not None:
+                    latency_sum += latency
+                    latency_count += 1
+                up_count += 1 if up else 0
+                count += 1
+                ARCHIVE.pack_into(self.map, position, step, rows, offset, slot,
+                                  latency_sum, latency_count, up_count, count)
+
+    def fetch(self, start, end=None, step=None):
+        """
+        Read the consolidated values of a time range.
+
+        The finest archive that still covers 'start' is used unless 'step'
+        selects one explicitly.
+
+        Args:
+            start (float): Start of the range (timestamp).
+            end (float): End of the range (default: now).
+            step (int): Archive step to read from (optional).
+
+        Returns:
+            list: (timestamp, average latency or None, availability or None) tuples, oldest first.
+        """
+        if end is None:
+            end = time.time()
+        with self.lock:
+            archive_index = self._choose_archive(start, end, step)
+            step, rows, offset = self.archives[archive_index]
+            pending = ARCHIVE.unpack_from(self.map, self.descriptors + archive_index * ARCHIVE.size)
+
+            points = []
+            first = int(start) - int(start) % step
+            # Never read more than one full turn of the ring
+            first = max(first, int(end) - int(end) % step - (rows - 1) * step)
+            for slot in range(first, int(end) + 1, step):
+                if slot == pending[3] and pending[7]:
+                    latency_count, up_count, count = pending[5], pending[6], pending[7]
+                    latency = pending[4] / latency_count if latency_count else None
+                    points.append((slot, latency, up_count / count))
+                    continue
+                row_slot, latency, availability, count = ROW.unpack_from(self.map, offset + ((slot // step) % rows) * ROW.size)
+                if row_slot != slot or not count:
+                    continue
+                points.append((slot, None if math.isnan(latency) else latency,
+                               None if math.isnan(availability) else availability))
+            return points
+
+    def _choose_archive(self, start, end, step):
+        if step is not None:
+            for index, archive in enumerate(self.archives):
+                if archive[0] == step:
+                    return index
+            raise ValueError(f"No archive with a step of {step} seconds")
+        for index, (archive_step, rows, _) in enumerate(self.archives):
+            if end - start <= archive_step * (rows - 1) and start >= end - archive_step * rows:
+                return index
+        return len(self.archives) - 1
+
+
+def series_file_name(key):
+    """Return a file name safe on every platform for a series key (IPv4, IPv6 or hostname)."""
+    safe = ''.join(char if char.isalnum() or char in '.-_' else '_' for char in key)
+    return safe + '.rrd'
+
+
+def _unpack_key(data):
+    return KEY.unpack_from(data, HEADER.size)[0].rstrip(b'\0').decode('utf-8', 'replace') or None
+
+
+def read_series_key(path):
+    """Return the series key stored in a database file (None for version 1 files, which have none)."""
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size + KEY.size)
+    if len(data) < HEADER.size + KEY.size or data[:len(MAGIC)] != MAGIC:
+        return None
+    return _unpack_key(data)
+
+
+class TimeSeriesStore:
+    """
+    A folder of RoundRobinDatabase files, one per host.
+
+    Disk use is bounded: every file has a fixed size decided at creation
+    (about 850 KiB with the default archives, for a year of history).
+    So are file descriptors: at most max_open databases stay open, the least
+    recently used one is closed when another has to be opened.
+
+    Args:
+        directory (str): The folder holding the .rrd files.
+        archives (tuple): Archive layout for new files.
+        max_open (int): Databases kept open at once.
+    """
+
+    def __init__(self, directory=os.path.join('resultat', 'history'), archives=DEFAULT_ARCHIVES,
+                 max_open=DEFAULT_MAX_OPEN):
+        self.directory = directory
+        self.archives = archives
+        self.max_open = max(1, max_open)
+        self.databases = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _database(self, key):
+        # Called with the lock held: the database cannot be closed by an eviction while it is used
+        database = self.databases.get(key)
+        if database is not None:
+            self.databases.move_to_end(key)
+            return database
+        while len(self.databases) >= self.max_open:
+            self.databases.popitem(last=False)[1].close()
+        path = os.path.join(self.directory, series_file_name(key))
+        database = self.databases[key] = RoundRobinDatabase(path, self.archives, key)
+        return database
+
+    def record(self, key, latency, up=None, timestamp=None):
+        """Add a latency/availability measurement for a host."""
+        with self.lock:
+            self._database(key).update(latency, up, timestamp)
+
+    def record_stats(self, stats, timestamp=None):
+        """Add a measurement from the statistics returned by fonctions.ping.probe_latency."""
+        self.record(stats['host'], stats['avg'], stats['reachable'], timestamp)
+
+    def fetch(self, key, start, end=None, step=None):
+        """
+        Read the history of a host (see RoundRobinDatabase.fetch).
+
+        Returns an empty list for hosts without history, without creating a file.
+        """
+        with self.lock:
+            if key not in self.databases and not os.path.exists(os.path.join(self.directory, series_file_name(key))):
+                return []
+            return self._database(key).fetch(start, end, step)
+
+    def keys(self):
+        """Return the hosts that have a history file, as they were recorded (e.g. IPv6 addresses with ':')."""
+        if not os.path.exists(self.directory):
+            return []
+        keys = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.rrd'):
+                continue
+            try:
+                key = read_series_key(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            # Files of version 1 only have their sanitized name
+            keys.append(key or name[:-4])
+        return sorted(keys)
+
+    def close(self):
+        """Close every open database."""
+        with self.lock:
+            for database in self.databases.values():
+                database.close()
+            self.databases.clear()
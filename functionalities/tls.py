@@ -0,0 +1,471 @@
+import hashlib
+import ipaddress
+import json
+import os
+import socket
+import ssl
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+# Ports that speak TLS from the first byte
+TLS_PORTS = {261, 443, 448, 465, 563, 614, 636, 853, 989, 990, 992, 993, 994, 995, 1443, 2083, 2087, 2096, 2376,
+             3269, 4443, 5061, 5986, 6443, 6514, 8443, 8883, 9443, 10250}
+
+# nmap service names of TLS ports (with -sV, 'ssl/<service>' names are reported as the inner service)
+TLS_SERVICES = {'https', 'https-alt', 'ssl', 'imaps', 'pop3s', 'smtps', 'ldaps', 'ftps', 'ftps-data', 'nntps',
+                'ircs', 'ircs-u', 'domain-s', 'docker-s', 'sip-tls', 'secure-mqtt', 'wbem-https', 'kubernetes'}
+
+# Services that send a plain text greeting, then switch to TLS (STARTTLS and alike)
+STARTTLS_SERVICES = {'smtp': 'smtp', 'submission': 'smtp', 'ftp': 'ftp', 'pop3': 'pop3', 'imap': 'imap',
+                     'vmware-auth': 'vmware-auth'}
+STARTTLS_PORTS = {21: 'ftp', 25: 'smtp', 110: 'pop3', 143: 'imap', 587: 'smtp', 902: 'vmware-auth',
+                  912: 'vmware-auth'}
+
+# Concurrency and timeouts of the inspection
+DEFAULT_TIMEOUT = 3.0
+DEFAULT_WORKERS = 64
+
+# Certificates expiring within this many days are reported
+EXPIRY_WARNING_DAYS = 30
+
+# Object identifiers used in certificates
+NAME_OIDS = {
+    '2.5.4.3': 'CN', '2.5.4.6': 'C', '2.5.4.7': 'L', '2.5.4.8': 'ST', '2.5.4.10': 'O', '2.5.4.11': 'OU',
+    '2.5.4.5': 'serialNumber', '1.2.840.113549.1.9.1': 'emailAddress', '0.9.2342.19200300.100.1.25': 'DC',
+}
+KEY_OIDS = {
+    '1.2.840.113549.1.1.1': 'RSA', '1.2.840.10045.2.1': 'EC', '1.2.840.10040.4.1': 'DSA',
+    '1.3.101.112': 'Ed25519', '1.3.101.113': 'Ed448', '1.2.840.113549.1.1.10': 'RSA-PSS',
+}
+CURVE_OIDS = {
+    '1.2.840.10045.3.1.7': 'P-256', '1.3.132.0.34': 'P-384', '1.3.132.0.35': 'P-521',
+    '1.3.132.0.10': 'secp256k1', '1.2.840.10045.3.1.1': 'P-192',
+}
+SUBJECT_ALT_NAME_OID = '2.5.29.17'
+
+
+def _read_tlv(data, offset):
+    """
+    Read one DER element.
+
+    Returns:
+        tuple: (tag, start of the value, end of the value).
+    """
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    if offset + length > len(data):
+        raise ValueError("Truncated DER element")
+    return tag, offset, offset + length
+
+
+def _children(data, start, end):
+    """Yield (tag, start, end) for each element of a constructed DER value."""
+    while start < end:
+        tag, value_start, value_end = _read_tlv(data, start)
+        yield tag, value_start, value_end
+        start = value_end
+
+
+def _oid(value):
+    numbers = []
+    current = 0
+    for byte in value:
+        current = (current << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            numbers.append(current)
+            current = 0
+    first = min(numbers[0] // 40, 2)
+    return '.'.join(map(str, [first, numbers[0] - first * 40] + numbers[1:]))
+
+
+def _string(tag, value):
+    if tag == 0x1e:  # BMPString
+        return value.decode('utf-16-be', 'replace')
+    if tag == 0x1c:  # UniversalString
+        return value.decode('utf-32-be', 'replace')
+    return value.decode('utf-8', 'replace')
+
+
+def _name(data, start, end):
+    """Return a distinguished name as a list of (attribute, value) pairs."""
+    attributes = []
+    for _, set_start, set_end in _children(data, start, end):
+        for _, pair_start, pair_end in _children(data, set_start, set_end):
+            (_, oid_start, oid_end), (tag, value_start, value_end) = list(_children(data, pair_start, pair_end))[:2]
+            oid = _oid(data[oid_start:oid_end])
+            attributes.append((NAME_OIDS.get(oid, oid), _string(tag, data[value_start:value_end])))
+    return attributes
+
+
+def _time(tag, value):
+    text = value.decode('ascii')
+    if tag == 0x17:  # UTCTime: two-digit years 50-99 are 19xx
+        year = int(text[:2])
+        text = ('19' if year >= 50 else '20') + text
+    moment = datetime.strptime(text[:14], '%Y%m%d%H%M%S')
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _public_key(data, start, end):
+    """Return the key type of a SubjectPublicKeyInfo (e.g. 'RSA 2048', 'EC P-256')."""
+    (_, algorithm_start, algorithm_end), (_, key_start, key_end) = list(_children(data, start, end))[:2]
+    algorithm = list(_children(data, algorithm_start, algorithm_end))
+    oid = _oid(data[algorithm[0][1]:algorithm[0][2]])
+    name = KEY_OIDS.get(oid, oid)
+    if name in ('RSA', 'RSA-PSS'):
+        # BIT STRING: unused bits byte, then SEQUENCE { modulus, exponent }
+        _, sequence_start, sequence_end = _read_tlv(data, key_start + 1)
+        _, modulus_start, modulus_end = next(_children(data, sequence_start, sequence_end))
+        return f"{name} {int.from_bytes(data[modulus_start:modulus_end], 'big').bit_length()}"
+    if name == 'EC' and len(algorithm) > 1 and algorithm[1][0] == 0x06:
+        curve = _oid(data[algorithm[1][1]:algorithm[1][2]])
+        return f"EC {CURVE_OIDS.get(curve, curve)}"
+    if name == 'DSA':
+        return f"DSA {(key_end - key_start - 1) * 8}"
+    return name
+
+
+def _subject_alt_names(value):
+    """Return the DNS names, IP addresses, e-mails and URIs of a subjectAltName extension."""
+    _, start, end = _read_tlv(value, 0)
+    names = []
+    for tag, name_start, name_end in _children(value, start, end):
+        if tag in (0x81, 0x82, 0x86):
+            prefix = {0x81: 'email:', 0x82: '', 0x86: 'uri:'}[tag]
+            names.append(prefix + value[name_start:name_end].decode('ascii', 'replace'))
+        elif tag == 0x87 and name_end - name_start in (4, 16):
+            names.append(str(ipaddress.ip_address(value[name_start:name_end])))
+    return names
+
+
+def format_name(attributes):
+    """Format a distinguished name as 'CN=..., O=..., C=...'."""
+    return ', '.join(f"{attribute}={value}" for attribute, value in attributes)
+
+
+def parse_certificate(der):
+    """
+    Extract the inventory fields of a DER encoded X.509 certificate.
+
+    Returns:
+        dict: subject, common_name, issuer, sans, serial, not_before, not_after (ISO 8601, UTC),
+            key_type, self_signed and fingerprint_sha256.
+
+    Raises:
+        ValueError: If the certificate cannot be decoded.
+    """
+    try:
+        _, cert_start, cert_end = _read_tlv(der, 0)
+        _, tbs_start, tbs_end = next(_children(der, cert_start, cert_end))
+        fields = list(_children(der, tbs_start, tbs_end))
+        if fields[0][0] == 0xa0:  # explicit version
+            fields = fields[1:]
+        serial, _, issuer, validity, subject, public_key = fields[:6]
+        not_before, not_after = list(_children(der, validity[1], validity[2]))[:2]
+
+        sans = []
+        for tag, start, end in fields[6:]:
+            if tag != 0xa3:  # extensions
+                continue
+            _, extensions_start, extensions_end = _read_tlv(der, start)
+            for _, extension_start, extension_end in _children(der, extensions_start, extensions_end):
+                parts = list(_children(der, extension_start, extension_end))
+                if _oid(der[parts[0][1]:parts[0][2]]) == SUBJECT_ALT_NAME_OID:
+                    sans = _subject_alt_names(der[parts[-1][1]:parts[-1][2]])
+
+        subject_name = _name(der, subject[1], subject[2])
+        issuer_name = _name(der, issuer[1], issuer[2])
+        # The times and the key are decoded here too: a damaged field must not escape as an IndexError
+        return {
+            'subject': format_name(subject_name),
+            'common_name': next((value for attribute, value in subject_name if attribute == 'CN'), ''),
+            'issuer': format_name(issuer_name),
+            'sans': sans,
+            'serial': der[serial[1]:serial[2]].hex(),
+            'not_before': _time(not_before[0], der[not_before[1]:not_before[2]]),
+            'not_after': _time(not_after[0], der[not_after[1]:not_after[2]]),
+            'key_type': _public_key(der, public_key[1], public_key[2]),
+            'self_signed': subject_name == issuer_name,
+            'fingerprint_sha256': hashlib.sha256(der).hexdigest(),
+        }
+    except (IndexError, StopIteration, ValueError) as e:
+        raise ValueError(f"Invalid certificate: {e}") from e
+
+
+def days_until_expiry(certificate, now=None):
+    """Return the number of days before a certificate expires (negative once expired)."""
+    now = now or datetime.now(timezone.utc)
+    not_after = datetime.strptime(certificate['not_after'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    return (not_after - now).total_seconds() / 86400
+
+
+def tls_mode(port, service=''):
+    """
+    Return how to reach TLS on a port: 'tls' (direct handshake), a STARTTLS protocol name, or None.
+
+    Args:
+        port (int): The TCP port.
+        service (str): The service name reported by nmap, if any.
+    """
+    service = (service or '').lower()
+    if port in TLS_PORTS or service in TLS_SERVICES or service.startswith('ssl/'):
+        return 'tls'
+    return STARTTLS_SERVICES.get(service) or STARTTLS_PORTS.get(port)
+
+
+def _read_reply(sock, done):
+    """Read server lines until done(line) is True for a line; return that line."""
+    buffer = b''
+    while True:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("Connection closed before the TLS upgrade")
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if done(line.rstrip(b'\r')):
+                return line.rstrip(b'\r')
+
+
+def _starttls(sock, protocol):
+    """Run the plain text exchange that precedes the TLS handshake."""
+    def expect(prefix, done=None):
+        line = _read_reply(sock, done or (lambda line: line[3:4] != b'-'))
+        if not line.startswith(prefix):
+            raise ConnectionError(f"{protocol} refused the TLS upgrade: {line[:80]!r}")
+
+    if protocol in ('smtp', 'ftp'):
+        expect(b'220')
+        if protocol == 'smtp':
+            sock.sendall(b'EHLO seahawks.local\r\n')
+            expect(b'250')
+            sock.sendall(b'STARTTLS\r\n')
+            expect(b'220')
+        else:
+            sock.sendall(b'AUTH TLS\r\n')
+            expect(b'234')
+    elif protocol == 'pop3':
+        expect(b'+OK', lambda line: True)
+        sock.sendall(b'STLS\r\n')
+        expect(b'+OK', lambda line: True)
+    elif protocol == 'imap':
+        expect(b'* OK', lambda line: True)
+        sock.sendall(b'a001 STARTTLS\r\n')
+        expect(b'a001 OK', lambda line: line.startswith(b'a001 '))
+    elif protocol == 'vmware-auth':
+        # '220 VMware Authentication Daemon Version 1.10: SSL Required, ...': the client then starts TLS
+        expect(b'220')
+
+
+class CertificateCache:
+    """
+    Parsed certificates keyed by SHA-256 fingerprint.
+
+    Endpoints still have to be contacted to learn which certificate they
+    serve, but a certificate seen before (on another port, host or scan) is
+    not decoded again. The cache can be saved to a JSON file and reloaded.
+
+    Args:
+        path (str): JSON file to load the cache from and save it to (optional).
+        max_entries (int): Past this size the oldest entries are dropped on save.
+    """
+
+    def __init__(self, path=None, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def certificate(self, der):
+        """Return the parsed certificate, decoding it only if its fingerprint is new."""
+        fingerprint = hashlib.sha256(der).hexdigest()
+        with self.lock:
+            certificate = self.entries.get(fingerprint)
+            if certificate is not None:
+                self.hits += 1
+                return certificate
+            self.misses += 1
+        certificate = parse_certificate(der)
+        with self.lock:
+            self.entries[fingerprint] = certificate
+        return certificate
+
+    def save(self):
+        """Write the cache to its file (replaced atomically)."""
+        if not self.path:
+            return
+        with self.lock:
+            entries = dict(list(self.entries.items())[-self.max_entries:])
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # A temporary file of its own: concurrent scans save the same cache
+        handle, temp_path = tempfile.mkstemp(suffix='.part', prefix=os.path.basename(self.path) + '.',
+                                             dir=folder or None)
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def _client_context():
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    # Inventory, not validation: accept old protocols and weak ciphers to still get the certificate
+    try:
+        context.minimum_version = ssl.TLSVersion.TLSv1
+        context.set_ciphers('ALL:@SECLEVEL=0')
+    except (ValueError, ssl.SSLError):
+        pass
+    return context
+
+
+class TlsInspector:
+    """
+    Fetch and decode the certificates of TLS endpoints, many at once.
+
+    Each endpoint gets one TCP connection and one handshake (after a STARTTLS
+    exchange for mail, FTP and VMware services); the certificate is not
+    validated, only recorded. Handshakes run in a thread pool, and the
+    certificates are decoded through a CertificateCache.
+
+    Args:
+        timeout (float): Seconds allowed for the connection and handshake of one endpoint.
+        max_workers (int): Handshakes in flight at once.
+        cache (CertificateCache): Cache of parsed certificates (default: a new in-memory cache).
+        metrics (Metrics): Where to count handshakes, cache hits and errors (optional).
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_workers=DEFAULT_WORKERS, cache=None, metrics=None):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else CertificateCache()
+        self.metrics = metrics
+        self.context = _client_context()
+
+    def inspect(self, host, port, mode='tls', server_name=None):
+        """
+        Handshake with one endpoint and return its certificate.
+
+        Args:
+            host (str): Address to connect to.
+            port (int): TCP port.
+            mode (str): 'tls' or a STARTTLS protocol (see tls_mode).
+            server_name (str): Host name sent in the SNI extension (optional).
+
+        Returns:
+            dict: The certificate fields (parse_certificate) plus 'tls_version' and 'cipher'.
+
+        Raises:
+            OSError: If the connection or handshake fails (ssl.SSLError included).
+            ValueError: If the certificate cannot be decoded.
+        """
+        with socket.create_connection((host, port), timeout=self.timeout) as sock:
+            if mode != 'tls':
+                _starttls(sock, mode)
+            with self.context.wrap_socket(sock, server_hostname=server_name or None) as tls_sock:
+                der = tls_sock.getpeercert(binary_form=True)
+                tls_version = tls_sock.version()
+                cipher = tls_sock.cipher()
+        if not der:
+            raise ValueError("No certificate presented")
+        certificate = dict(self.cache.certificate(der))
+        certificate['tls_version'] = tls_version or ''
+        certificate['cipher'] = cipher[0] if cipher else ''
+        return certificate
+
+    def _inspect_quietly(self, host, port, mode, server_name):
+        try:
+            certificate = self.inspect(host, port, mode, server_name)
+        except (OSError, ValueError):
+            self._count('tls_errors')
+            return None
+        self._count('tls_handshakes')
+        return certificate
+
+    def _count(self, name):
+        if self.metrics is not None:
+            self.metrics.inc(name)
+
+    def inspect_many(self, endpoints):
+        """
+        Inspect endpoints concurrently.
+
+        Args:
+            endpoints (iterable): (host, port, mode) or (host, port, mode, server_name) tuples.
+
+        Returns:
+            dict: {(host, port): certificate} for the endpoints that completed a handshake.
+        """
+        results = {}
+        hits = self.cache.hits
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for endpoint in endpoints:
+                host, port, mode = endpoint[:3]
+                server_name = endpoint[3] if len(endpoint) > 3 else None
+                futures[executor.submit(self._inspect_quietly, host, port, mode, server_name)] = (host, port)
+            for future in as_completed(futures):
+                certificate = future.result()
+                if certificate is not None:
+                    results[futures[future]] = certificate
+        if self.metrics is not None:
+            self.metrics.inc('tls_cache_hits', self.cache.hits - hits)
+        return results
+
+    def inspect_host(self, host_result):
+        """
+        Inspect the TLS capable open TCP ports of a host and store the certificates in host_result.certificates.
+
+        Returns:
+            HostResult: The same host.
+        """
+        endpoints = []
+        for port in host_result.ports('open'):
+            mode = tls_mode(port, host_result.service(port)[0])
+            if mode:
+                endpoints.append((host_result.host, port, mode, host_result.hostname))
+        for (_, port), certificate in self.inspect_many(endpoints).items():
+            host_result.certificates[port] = certificate
+        return host_result
+
+
+def expiry_inventory(hosts, within_days=None, now=None):
+    """
+    List the certificates of scanned hosts by expiry date.
+
+    Args:
+        hosts (iterable): HostResult objects (e.g. a ScanResult).
+        within_days (float): Only keep certificates expiring within this many days (default: all).
+        now (datetime): Reference time (default: now, UTC).
+
+    Returns:
+        list: (days left, host, port, common name, not_after) tuples, soonest first.
+    """
+    inventory = []
+    for host_result in hosts:
+        for port, certificate in host_result.certificates.items():
+            days = days_until_expiry(certificate, now)
+            if within_days is None or days <= within_days:
+                inventory.append((days, host_result.host, port, certificate['common_name'], certificate['not_after']))
+    inventory.sort()
+    return inventory
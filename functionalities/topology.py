@@ -0,0 +1,579 @@
+import argparse
+import errno
+import ipaddress
+import json
+import os
+import select
+import socket
+import struct
+import sys
+import time
+
+from functionalities.interfaces import primary_address
+from functionalities.osfp import initial_ttl
+
+# Linux socket options: ICMP errors caused by our datagrams are queued on the socket (no raw socket needed)
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+MSG_ERRQUEUE = getattr(socket, 'MSG_ERRQUEUE', 0x2000)
+SO_EE_ORIGIN_ICMP = 2
+
+# struct sock_extended_err, followed by the address of the router that sent the ICMP error
+EXTENDED_ERROR = struct.Struct('=IBBBBII')
+ICMP_DEST_UNREACH = 3
+ICMP_TIME_EXCEEDED = 11
+ICMP_PORT_UNREACH = 3
+
+# Every probe of a trace goes to the same port from the same port (Paris traceroute): load balancers
+# hashing the flow keep it on one path, so the hops of a trace belong to one path
+PROBE_PORT = 33434
+
+# Probe payload: a marker and the probe number, same length for every probe (the IP length stays constant too)
+PAYLOAD = struct.Struct('!4sI')
+PAYLOAD_MARKER = b'SHTR'
+
+# Defaults of a mapping pass
+DEFAULT_START_TTL = 3
+DEFAULT_MAX_TTL = 30
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_RETRIES = 2
+DEFAULT_GAP_LIMIT = 3
+DEFAULT_RATE = 2000
+DEFAULT_PREFIX = 24
+
+# Where the maps are saved, next to the scan results
+TOPOLOGY_FOLDER = 'topology'
+
+
+def topology_available():
+    """Return True if TTL-limited probes can be traced here (Linux: IP_RECVERR on a UDP socket)."""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        return True
+    except OSError:
+        return False
+
+
+class Trace:
+    """
+    The probing state and the hops of one target.
+
+    A trace probes forward from its start TTL until the target answers,
+    then backward from the TTL below the start until it reaches a router
+    already known (Doubletree): the hops before it are taken from the trace
+    that found it. Forward probing also stops at a router another target of
+    the same prefix has already been traced through: the rest of the path
+    is taken from that target.
+    """
+
+    __slots__ = ('target', 'prefix', 'start_ttl', 'ttl', 'direction', 'attempts', 'gaps', 'hops', 'reached_ttl',
+                 'status', 'joined', 'joined_back', 'inferred', 'inferred_before')
+
+    def __init__(self, target, start_ttl, prefix):
+        self.target = target
+        self.prefix = prefix
+        self.start_ttl = start_ttl
+        self.ttl = start_ttl
+        self.direction = 'forward'
+        self.attempts = 0
+        self.gaps = 0
+        self.hops = {}
+        self.reached_ttl = None
+        self.status = 'unreached'
+        self.joined = None
+        self.joined_back = None
+        self.inferred = []
+        self.inferred_before = []
+
+    @property
+    def active(self):
+        return self.direction is not None
+
+    def path(self):
+        """
+        Return the hops in order: [(ttl, address or None, rtt in ms or None, inferred)].
+
+        The target itself ends the path when it answered (or when the path was
+        completed from another target's trace).
+        """
+        last = self.reached_ttl - 1 if self.reached_ttl is not None else max(self.hops, default=0)
+        hops = list(self.inferred_before)
+        hops.extend((ttl, *self.hops[ttl], False) for ttl in sorted(self.hops) if ttl <= last)
+        hops.extend(self.inferred)
+        if self.reached_ttl is not None:
+            hops.append((self.reached_ttl, self.target, None, False))
+        elif self.status == 'joined':
+            hops.append((hops[-1][0] + 1 if hops else 1, self.target, None, True))
+        return hops
+
+    def to_dict(self):
+        return {
+            'target': self.target,
+            'status': self.status,
+            'hops': [{'ttl': ttl, 'address': address, 'rtt': rtt, **({'inferred': True} if inferred else {})}
+                     for ttl, address, rtt, inferred in self.path()],
+        }
+
+
+class TopologyMapper:
+    """
+    Trace the routes to many hosts at once, one TTL step per round.
+
+    Every round sends one UDP probe to each active target, all from a single
+    socket, and collects the ICMP time-exceeded and port-unreachable errors
+    the kernel queues on it (IP_RECVERR: no raw socket or root rights, Linux
+    only). A thousand targets cost as many rounds as the longest path, not a
+    thousand traceroute runs.
+
+    Args:
+        start_ttl (int): TTL of the first probe of a target without a distance hint.
+        max_ttl (int): Highest TTL probed.
+        timeout (float): How long a round waits for the answers, in seconds.
+        retries (int): Probes sent at a TTL before recording it as a silent hop.
+        gap_limit (int): Silent hops in a row after which forward probing gives up.
+        rate (int): Probes sent per second (routers rate-limit their ICMP errors).
+        prefix (int): Length of the prefixes whose targets share the end of their paths (global stop set).
+        metrics (Metrics): Where to count the probes (optional).
+    """
+
+    def __init__(self, start_ttl=DEFAULT_START_TTL, max_ttl=DEFAULT_MAX_TTL, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, gap_limit=DEFAULT_GAP_LIMIT, rate=DEFAULT_RATE, prefix=DEFAULT_PREFIX,
+                 metrics=None):
+        self.start_ttl = start_ttl
+        self.max_ttl = max_ttl
+        self.timeout = timeout
+        self.retries = retries
+        self.gap_limit = gap_limit
+        self.rate = rate
+        self.prefix = prefix
+        self.metrics = metrics
+        self.probes_sent = 0
+
+    def _open_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        sock.bind(('', 0))
+        sock.setblocking(False)
+        return sock
+
+    def trace(self, targets, distances=None):
+        """
+        Trace the routes to the targets.
+
+        Args:
+            targets (list): IPv4 addresses (other entries are ignored).
+            distances (dict): Known hop counts {target: hops} (e.g. from the reply TTLs of the scan): the
+                first probe of those targets is sent at that TTL, so it usually reaches them at once.
+
+        Returns:
+            Topology: The traces and the hop graph.
+
+        Raises:
+            OSError: If the probing socket cannot be opened (e.g. not on Linux).
+        """
+        distances = distances or {}
+        traces = {}
+        for target in targets:
+            try:
+                address = ipaddress.IPv4Address(target)
+            except ValueError:
+                continue
+            start = min(max(1, int(distances.get(target) or self.start_ttl)), self.max_ttl)
+            prefix = str(ipaddress.IPv4Network((int(address), self.prefix), strict=False))
+            traces[str(address)] = Trace(str(address), start, prefix)
+
+        # Doubletree stop sets: routers seen near us, and (router, destination prefix) pairs already traced
+        # (each with the trace that found it)
+        local_stop = {}
+        global_stop = {}
+        started = time.time()
+        sock = self._open_socket()
+        try:
+            while True:
+                active = [trace for trace in traces.values() if trace.active]
+                if not active:
+                    break
+                self._round(sock, active, local_stop, global_stop)
+        finally:
+            sock.close()
+
+        self._complete_joined(traces)
+        if self.metrics is not None:
+            self.metrics.inc('topology_probes', self.probes_sent)
+            self.metrics.inc('topology_targets', len(traces))
+        return Topology(primary_address() or 'local', list(traces.values()), started, time.time() - started)
+
+    def _round(self, sock, active, local_stop, global_stop):
+        """Send one probe per active trace and process the answers until all came back or the round times out."""
+        outstanding = {}
+        batch = max(1, self.rate // 20)
+        for index, trace in enumerate(active):
+            probe_id = self.probes_sent & 0xFFFFFFFF
+            self.probes_sent += 1
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, trace.ttl)
+                self._send(sock, PAYLOAD.pack(PAYLOAD_MARKER, probe_id), trace.target)
+            except OSError as e:
+                # No route to the target: nothing to trace
+                if e.errno in (errno.ENETUNREACH, errno.EHOSTUNREACH, errno.EACCES, errno.EPERM):
+                    trace.status = 'no-route'
+                    trace.direction = None
+                    continue
+                raise
+            outstanding[probe_id] = (trace, time.perf_counter())
+            if (index + 1) % batch == 0:
+                time.sleep(batch / self.rate)
+
+        poller = select.poll()
+        poller.register(sock, select.POLLIN | select.POLLERR)
+        answered = set()
+        deadline = time.perf_counter() + self.timeout
+        while len(answered) < len(outstanding):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            if not poller.poll(remaining * 1000):
+                break
+            for probe_id, router, kind in self._drain(sock):
+                if probe_id not in outstanding or probe_id in answered:
+                    continue
+                answered.add(probe_id)
+                trace, sent_at = outstanding[probe_id]
+                rtt = round((time.perf_counter() - sent_at) * 1000, 3)
+                self._advance(trace, router, rtt, kind, local_stop, global_stop)
+
+        for probe_id, (trace, _) in outstanding.items():
+            if probe_id not in answered:
+                self._advance(trace, None, None, 'timeout', local_stop, global_stop)
+
+    @staticmethod
+    def _send(sock, payload, target):
+        try:
+            sock.sendto(payload, (target, PROBE_PORT))
+        except OSError as e:
+            # An ICMP error of an earlier probe can be reported by this call: the probe was not sent, send it again
+            if e.errno in (errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH):
+                sock.sendto(payload, (target, PROBE_PORT))
+            else:
+                raise
+
+    @staticmethod
+    def _drain(sock):
+        """Read every queued ICMP error; yield (probe id, sender address, 'hop' | 'target' | 'unreachable')."""
+        while True:
+            try:
+                data, ancillary, _, address = sock.recvmsg(64, 512, MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                continue
+            # A target listening on the probe port answers with a datagram instead of an ICMP error
+            if len(data) < PAYLOAD.size or not data.startswith(PAYLOAD_MARKER):
+                continue
+            probe_id = PAYLOAD.unpack_from(data)[1]
+            for level, kind, value in ancillary:
+                if level != socket.IPPROTO_IP or kind != IP_RECVERR or len(value) < EXTENDED_ERROR.size + 8:
+                    continue
+                _, origin, icmp_type, icmp_code, _, _, _ = EXTENDED_ERROR.unpack_from(value)
+                if origin != SO_EE_ORIGIN_ICMP:
+                    continue
+                sender = socket.inet_ntoa(value[EXTENDED_ERROR.size + 4:EXTENDED_ERROR.size + 8])
+                if icmp_type == ICMP_TIME_EXCEEDED:
+                    yield probe_id, sender, 'hop'
+                elif icmp_type == ICMP_DEST_UNREACH and (icmp_code == ICMP_PORT_UNREACH or sender == address[0]):
+                    yield probe_id, sender, 'target'
+                else:
+                    yield probe_id, sender, 'unreachable'
+        # Datagrams answered by the targets themselves are not probes we can match: drop them
+        while True:
+            try:
+                sock.recvfrom(64)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                continue
+
+    def _advance(self, trace, router, rtt, kind, local_stop, global_stop):
+        """Record the answer to a trace's probe and choose its next TTL."""
+        ttl = trace.ttl
+        if kind == 'timeout':
+            trace.attempts += 1
+            if trace.attempts < self.retries:
+                return
+            trace.hops[ttl] = (None, None)
+        else:
+            trace.hops[ttl] = (router, rtt)
+        trace.attempts = 0
+
+        if trace.direction == 'forward':
+            if kind == 'target':
+                trace.reached_ttl = ttl
+                trace.status = 'reached'
+                self._turn_back(trace)
+            elif kind == 'unreachable':
+                trace.status = 'unreachable'
+                self._turn_back(trace)
+            elif kind == 'timeout':
+                trace.gaps += 1
+                if trace.gaps >= self.gap_limit or ttl >= self.max_ttl:
+                    self._turn_back(trace)
+                else:
+                    trace.ttl += 1
+            else:
+                trace.gaps = 0
+                owner = global_stop.get((router, trace.prefix))
+                if owner is not None and owner is not trace:
+                    # Another target of this prefix went through this router: its trace gives the rest of the path
+                    trace.joined = (owner, router)
+                    trace.status = 'joined'
+                    self._turn_back(trace)
+                else:
+                    global_stop[(router, trace.prefix)] = trace
+                    local_stop.setdefault(router, trace)
+                    if ttl >= self.max_ttl:
+                        self._turn_back(trace)
+                    else:
+                        trace.ttl += 1
+        else:
+            if kind == 'target':
+                # The target is nearer than the start TTL
+                trace.reached_ttl = ttl
+                for higher in [hop for hop in trace.hops if hop > ttl]:
+                    del trace.hops[higher]
+            elif kind == 'hop' and local_stop.get(router, trace) is not trace:
+                # Known router: the hops before it are those of the trace that found it
+                trace.joined_back = (local_stop[router], router)
+                trace.direction = None
+                return
+            elif kind == 'hop':
+                local_stop.setdefault(router, trace)
+            trace.ttl -= 1
+            if trace.ttl < 1:
+                trace.direction = None
+
+    @staticmethod
+    def _turn_back(trace):
+        trace.direction = 'backward'
+        trace.ttl = trace.start_ttl - 1
+        if trace.ttl < 1:
+            trace.direction = None
+
+    @staticmethod
+    def _complete_joined(traces):
+        """Fill in the hops of the traces that stopped at a router another trace had already found."""
+        done = set()
+
+        def shifted(owner, router, own_ttl, before):
+            # The owner's hops before (or after) the shared router, renumbered to this trace's TTLs
+            path = owner.path()
+            owner_ttl = next((ttl for ttl, address, _, _ in path if address == router), None)
+            if owner_ttl is None:
+                return []
+            return [(ttl - owner_ttl + own_ttl, address, None, True) for ttl, address, _, _ in path
+                    if address is not None and address != owner.target
+                    and (ttl < owner_ttl if before else ttl > owner_ttl) and ttl - owner_ttl + own_ttl >= 1]
+
+        def complete(trace, seen):
+            if trace.target in done or trace.target in seen:
+                return
+            seen = seen | {trace.target}
+            for attribute, before in (('joined_back', True), ('joined', False)):
+                join = getattr(trace, attribute)
+                if join is None:
+                    continue
+                owner, router = join
+                complete(owner, seen)
+                own_ttl = max(ttl for ttl, (address, _) in trace.hops.items() if address == router)
+                hops = shifted(owner, router, own_ttl, before)
+                if before:
+                    trace.inferred_before = [hop for hop in hops if hop[0] not in trace.hops]
+                else:
+                    trace.inferred = hops
+            done.add(trace.target)
+
+        for trace in traces.values():
+            complete(trace, frozenset())
+
+
+class Topology:
+    """
+    The traced paths of a scan and the hop graph they form.
+
+    Args:
+        source (str): The address the probes were sent from.
+        traces (list): Trace objects or their to_dict() form.
+        started (float): When the mapping started (epoch seconds).
+        seconds (float): How long it took.
+    """
+
+    def __init__(self, source, traces, started=None, seconds=0.0):
+        self.source = source
+        self.paths = [trace.to_dict() if isinstance(trace, Trace) else trace for trace in traces]
+        self.started = started if started is not None else time.time()
+        self.seconds = seconds
+
+    def nodes(self):
+        """
+        Return the graph nodes: {address: {'kind': 'source' | 'router' | 'target', 'depth': hops, 'rtt': ms}}.
+        """
+        nodes = {self.source: {'kind': 'source', 'depth': 0, 'rtt': None}}
+        for path in self.paths:
+            for hop in path['hops']:
+                address = hop['address']
+                if address is None:
+                    continue
+                kind = 'target' if address == path['target'] else 'router'
+                node = nodes.setdefault(address, {'kind': kind, 'depth': hop['ttl'], 'rtt': hop['rtt']})
+                if node['kind'] != 'source':
+                    node['depth'] = min(node['depth'], hop['ttl'])
+                    if kind == 'router':
+                        node['kind'] = 'router'
+                    if hop['rtt'] is not None and (node['rtt'] is None or hop['rtt'] < node['rtt']):
+                        node['rtt'] = hop['rtt']
+        return nodes
+
+    def edges(self):
+        """
+        Return the graph edges: {(from, to): {'paths': count, 'gap': silent hops between, 'inferred': bool}}.
+        """
+        edges = {}
+        for path in self.paths:
+            previous, gap = self.source, 0
+            for hop in path['hops']:
+                if hop['address'] is None:
+                    gap += 1
+                    continue
+                if hop['address'] != previous:
+                    edge = edges.setdefault((previous, hop['address']), {'paths': 0, 'gap': gap, 'inferred': True})
+                    edge['paths'] += 1
+                    edge['inferred'] = edge['inferred'] and bool(hop.get('inferred'))
+                previous, gap = hop['address'], 0
+        return edges
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'seconds': round(self.seconds, 3),
+            'paths': self.paths,
+            'edges': [{'from': a, 'to': b, **edge} for (a, b), edge in sorted(self.edges().items())],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        started = time.mktime(time.strptime(data['started'], '%Y-%m-%d %H:%M:%S')) if data.get('started') else None
+        return cls(data.get('source', 'local'), data.get('paths', []), started, data.get('seconds', 0.0))
+
+
+def hop_distances(ttls):
+    """
+    Estimate hop counts from reply TTLs ({host: TTL}, e.g. functionalities.osfp.nmap_ttls).
+
+    Returns:
+        dict: {host: hops}, for TopologyMapper.trace.
+    """
+    return {host: initial_ttl(ttl) - ttl + 1 for host, ttl in ttls.items() if ttl}
+
+
+def map_topology(targets, distances=None, metrics=None, **kwargs):
+    """
+    Trace the routes to the targets, or return None where it cannot be done (see topology_available).
+
+    Args:
+        targets (list): The hosts found up.
+        distances (dict): Known hop counts {target: hops} (optional).
+        metrics (Metrics): Where to count the probes (optional).
+        **kwargs: TopologyMapper settings.
+
+    Returns:
+        Topology: The map, or None.
+    """
+    if not targets or not topology_available():
+        return None
+    try:
+        return TopologyMapper(metrics=metrics, **kwargs).trace(targets, distances)
+    except OSError as e:
+        print(f"[WARNING] Topology mapping failed: {e}")
+        return None
+
+
+def save_topology(topology, output_folder, current_time):
+    """
+    Save a map next to the scan results: '<output_folder>/topology/<current_time>_topology.json'.
+
+    Returns:
+        str: The path of the file.
+    """
+    folder = os.path.join(output_folder, TOPOLOGY_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{current_time}_topology.json")
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(topology.to_dict(), f)
+    os.replace(path + '.part', path)
+    return path
+
+
+def latest_topology_file(folders):
+    """Return the newest saved map of the given result folders, or None."""
+    newest = None
+    for output_folder in folders:
+        folder = os.path.join(output_folder, TOPOLOGY_FOLDER)
+        try:
+            names = [name for name in os.listdir(folder) if name.endswith('_topology.json')]
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(folder, name)
+            mtime = os.path.getmtime(path)
+            if newest is None or mtime > newest[0]:
+                newest = (mtime, path)
+    return newest[1] if newest else None
+
+
+def load_topology(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return Topology.from_dict(json.load(f))
+
+
+def format_path(path):
+    """One line per trace: 'target (status): hop1 hop2 * hop4'."""
+    hops = ' '.join((hop['address'] or '*') + ('?' if hop.get('inferred') else '') for hop in path['hops'])
+    return f"{path['target']} ({path['status']}): {hops}"
+
+
+def main():
+    """
+    Command-line entry point: trace the routes to some hosts and print the paths.
+    """
+    parser = argparse.ArgumentParser(description="Trace the routes to many hosts at once (Paris traceroute, "
+                                                 "Doubletree stop sets).")
+    parser.add_argument('targets', nargs='+', help="IPv4 addresses or networks (every address of a network is traced)")
+    parser.add_argument('--start-ttl', type=int, default=DEFAULT_START_TTL)
+    parser.add_argument('--max-ttl', type=int, default=DEFAULT_MAX_TTL)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--rate', type=int, default=DEFAULT_RATE, help="Probes per second")
+    parser.add_argument('--output', help="Save the map in '<output>/topology'")
+    args = parser.parse_args()
+
+    if not topology_available():
+        print("Topology mapping needs Linux (IP_RECVERR).")
+        return
+    targets = []
+    for target in args.targets:
+        network = ipaddress.ip_network(target, strict=False)
+        targets.extend(str(address) for address in (network.hosts() if network.num_addresses > 2 else network))
+    mapper = TopologyMapper(args.start_ttl, args.max_ttl, args.timeout, rate=args.rate)
+    topology = mapper.trace(targets)
+    for path in topology.paths:
+        print(format_path(path))
+    print(f"{len(topology.paths)} targets, {mapper.probes_sent} probes, {len(topology.nodes())} nodes "
+          f"in {topology.seconds:.2f}s.")
+    if args.output:
+        print(f"Saved to {save_topology(topology, args.output, time.strftime('%Y-%m-%d_%H-%M-%S'))}.")
+
+
+# Run the program
+if __name__ == "__main__":
+    main()
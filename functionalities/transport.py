@@ -0,0 +1,529 @@
+import hashlib
+import ipaddress
+import json
+import math
+import platform
+import re
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import quoteattr
+
+import nmap
+
+from functionalities.icmp import icmp_available, ping_many
+from functionalities.targets import TargetSet
+
+# Round-trip time in the output of the system 'ping' command (any locale: time=, temps=, Zeit=...)
+RTT_PATTERN = re.compile(r'(?:time|temps|zeit|tiempo|tempo|durata)\s*[=<]\s*([\d.,]+)\s*ms', re.IGNORECASE)
+
+# Ports nmap scans when no -p is given (its top 1000 are mostly below 1024: close enough for a simulation)
+DEFAULT_NMAP_PORTS = [(1, 1024)]
+
+# Echo requests nmap sends to a host before deciding it is down
+DISCOVERY_PROBES = 2
+
+# Defaults of a simulated network (see SimulatedNetwork)
+DEFAULT_MODEL = {
+    'seed': 0,
+    'rtt_ms': 1.0,
+    'jitter_ms': 0.2,
+    'loss': 0.0,
+    'ttl': 64,
+    'rate_limit': None,
+    'scan_rate': 10000,
+    'service_seconds': 0.5,
+    'script_seconds': 2.0,
+}
+
+
+def nmap_xml_header(arguments, start=None):
+    """Return the start of an nmap XML report (<nmaprun> and <scaninfo>)."""
+    start = int(start if start is not None else time.time())
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<nmaprun scanner="nmap" args={quoteattr("nmap -oX - " + arguments)} start="{start}" startstr="" '
+            'version="7.94" xmloutputversion="1.05">\n'
+            '<scaninfo type="syn" protocol="tcp" numservices="65535" services="1-65535"/>\n')
+
+
+def nmap_xml_host(address, ports=(), hostname='', ttl=64, os_name=None, start=None):
+    """
+    Return the <host> element of a host that is up.
+
+    Args:
+        address (str): The IPv4 or IPv6 address.
+        ports (list): (port, state, service dict) triples; the service dict may hold name, product,
+            version, extrainfo, cpe and scripts ({script id: output}).
+        hostname (str): The PTR name, if any.
+        ttl (int): TTL of the replies (nmap's reason_ttl, read by functionalities.osfp).
+        os_name (str): An OS match to report (as nmap -O would), if any.
+    """
+    start = int(start if start is not None else time.time())
+    family = 'ipv6' if ':' in address else 'ipv4'
+    parts = [f'<host starttime="{start}" endtime="{start}"><status state="up" reason="echo-reply" reason_ttl="{ttl}"/>\n'
+             f'<address addr="{address}" addrtype="{family}"/>\n<hostnames>']
+    if hostname:
+        parts.append(f'<hostname name={quoteattr(hostname)} type="PTR"/>')
+    parts.append('</hostnames>\n<ports>')
+    for port, state, service in ports:
+        parts.append(f'<port protocol="tcp" portid="{port}"><state state="{state}" reason="syn-ack" reason_ttl="{ttl}"/>'
+                     f'<service name={quoteattr(service.get("name") or "unknown")}')
+        for key in ('product', 'version', 'extrainfo'):
+            if service.get(key):
+                parts.append(f' {key}={quoteattr(service[key])}')
+        parts.append(' method="probed" conf="10">')
+        if service.get('cpe'):
+            parts.append(f'<cpe>{service["cpe"]}</cpe>')
+        parts.append('</service>')
+        for script_id, output in (service.get('scripts') or {}).items():
+            parts.append(f'<script id={quoteattr(script_id)} output={quoteattr(output)}/>')
+        parts.append('</port>\n')
+    parts.append('</ports>\n')
+    if os_name:
+        parts.append(f'<os><osmatch name={quoteattr(os_name)} accuracy="95" line="1">'
+                     f'<osclass type="general purpose" vendor="" osfamily={quoteattr(os_name.split()[0])} '
+                     'osgen="" accuracy="95"/></osmatch></os>\n')
+    parts.append('</host>\n')
+    return ''.join(parts)
+
+
+def nmap_xml_footer(up, total, elapsed=1.0, end=None):
+    """Return the end of an nmap XML report (<runstats>)."""
+    end = int(end if end is not None else time.time())
+    return (f'<runstats><finished time="{end}" timestr="" summary="" elapsed="{elapsed:.2f}" exit="success"/>'
+            f'<hosts up="{up}" down="{total - up}" total="{total}"/></runstats>\n</nmaprun>\n')
+
+
+def parse_port_spec(spec):
+    """
+    Parse an nmap port list ('1-1024', '22,80,8000-8100', 'T:22,U:53', '-' for all ports).
+
+    Returns:
+        list: (first, last) TCP port ranges.
+    """
+    ranges = []
+    protocol = 'T'
+    for item in spec.split(','):
+        item = item.strip()
+        if ':' in item:
+            protocol, item = item.split(':', 1)
+        if protocol.upper() != 'T' or not item:
+            continue
+        if item == '-':
+            ranges.append((1, 65535))
+        elif '-' in item:
+            first, last = item.split('-', 1)
+            ranges.append((int(first or 1), int(last or 65535)))
+        else:
+            ranges.append((int(item), int(item)))
+    return ranges
+
+
+class Transport:
+    """
+    Base class of the network transports used by the scanners.
+
+    A transport answers the two questions the scan code asks the network:
+    is this host up (the discovery probe), and what does nmap see on it
+    (the port scan, through an nmap.PortScanner-compatible object). The
+    system transport uses the real network; the simulated one answers from a
+    declarative model, so large estates can be scanned deterministically.
+    """
+
+    # True when probes leave the machine: the TLS, UDP and OS probes of the scanners use real sockets
+    # and are only run on a live transport
+    live = True
+
+    def ping(self, host, timeout=1.0):
+        """Send one echo request; return the round-trip time in ms, or None."""
+        raise NotImplementedError
+
+    def ping_many(self, hosts, timeout=1.0):
+        """Probe several hosts; return {host: round-trip time in ms or None}."""
+        return {host: self.ping(host, timeout) for host in hosts}
+
+    def is_up(self, host, timeout=1.0):
+        """Return True if the host answered an echo request."""
+        return self.ping(host, timeout) is not None
+
+    def scanner(self):
+        """Return a new nmap.PortScanner-compatible object (one per thread: they are not thread-safe)."""
+        raise NotImplementedError
+
+
+class SystemTransport(Transport):
+    """
+    The real network: ICMP sockets (or the 'ping' command) and nmap.
+    """
+
+    def __init__(self, max_workers=64):
+        self.max_workers = max_workers
+        self._icmp = None
+
+    def _use_icmp(self):
+        if self._icmp is None:
+            self._icmp = icmp_available()
+        return self._icmp
+
+    def ping(self, host, timeout=1.0):
+        if self._use_icmp() and ':' not in host:
+            return ping_many([host], timeout)[host]
+        if platform.system().lower() == "windows":
+            cmd = ['ping', '-n', '1', '-w', str(int(timeout * 1000)), host]
+        else:
+            cmd = ['ping', '-n', '-c', '1', '-W', str(max(1, math.ceil(timeout))), host]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                    encoding='utf-8', errors='ignore', timeout=timeout + 1)
+        except (subprocess.TimeoutExpired, OSError):
+            return None
+        if result.returncode != 0:
+            return None
+        match = RTT_PATTERN.search(result.stdout)
+        return float(match.group(1).replace(',', '.')) if match else 0.0
+
+    def ping_many(self, hosts, timeout=1.0):
+        hosts = list(hosts)
+        if self._use_icmp() and not any(':' in host for host in hosts):
+            return ping_many(hosts, timeout)
+        if not hosts:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(hosts))) as executor:
+            return dict(zip(hosts, executor.map(lambda host: self.ping(host, timeout), hosts)))
+
+    def scanner(self):
+        return nmap.PortScanner()
+
+
+# The transport of the scanners when none is given
+SYSTEM_TRANSPORT = SystemTransport()
+
+
+def _normalize_port(entry):
+    # Ports are given as [name, product, version] or as a service dict
+    if isinstance(entry, dict):
+        return dict(entry)
+    values = list(entry) + [''] * 3
+    return {'name': values[0], 'product': values[1], 'version': values[2]}
+
+
+class SimulatedHost:
+    """A host of a simulated network: its services and the behaviour of the path to it."""
+
+    __slots__ = ('address', 'hostname', 'ports', 'os', 'ttl', 'rtt_ms', 'jitter_ms', 'loss', 'bucket')
+
+    def __init__(self, address, settings, hostname='', bucket=None):
+        self.address = address
+        self.hostname = hostname
+        self.ports = {int(port): _normalize_port(entry) for port, entry in (settings.get('ports') or {}).items()}
+        for port, scripts in (settings.get('scripts') or {}).items():
+            self.ports.setdefault(int(port), {'name': 'unknown'})['scripts'] = scripts
+        self.os = settings.get('os')
+        self.ttl = settings['ttl']
+        self.rtt_ms = settings['rtt_ms']
+        self.jitter_ms = settings['jitter_ms']
+        self.loss = settings['loss']
+        self.bucket = bucket
+
+
+class TokenBucket:
+    """Probes per second a router or firewall answers; the excess is dropped, as ICMP rate limiting does."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate / 10))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class SimulatedNetwork:
+    """
+    A declarative model of a network, answered from memory.
+
+    The model is a dict (or JSON file) with network-wide defaults, host
+    profiles, segments and individual hosts:
+
+        {"seed": 1, "loss": 0.01, "rate_limit": 20000,
+         "profiles": {"linux": {"ports": {"22": ["ssh", "OpenSSH", "8.9p1"]}, "os": "Linux 5.X"},
+                      "printer": {"ports": {"9100": ["jetdirect", "", ""]}, "rtt_ms": 15, "ttl": 255}},
+         "segments": [{"network": "10.0.0.0/16", "density": 0.05, "profiles": {"linux": 9, "printer": 1},
+                       "hostname": "h{index}.lab.local", "rtt_ms": 3, "rate_limit": 1000}],
+         "hosts": {"10.0.0.1": {"profile": "linux", "ports": {"80": ["http", "nginx", "1.18.0"]}}}}
+
+    rtt_ms, jitter_ms (normal distribution around rtt_ms), loss (probability
+    that a probe or its reply is lost) and ttl may be set network-wide, per
+    segment, per profile or per host, the most specific value winning.
+    rate_limit (probes per second) applies to the whole network and to each
+    segment that sets it. scan_rate, service_seconds and script_seconds set
+    the simulated duration of nmap runs. Which addresses of a segment are up,
+    their profile and each probe's fate are derived from the seed, so a run
+    is reproducible whatever the thread scheduling.
+    """
+
+    def __init__(self, model=None):
+        model = dict(model or {})
+        self.settings = {key: model.get(key, value) for key, value in DEFAULT_MODEL.items()}
+        self.seed = self.settings['seed']
+        self.profiles = model.get('profiles', {})
+        self.bucket = TokenBucket(self.settings['rate_limit']) if self.settings['rate_limit'] else None
+        self.segments = []
+        for segment in model.get('segments', []):
+            network = ipaddress.ip_network(segment['network'], strict=False)
+            weights = segment.get('profiles') or {name: 1 for name in self.profiles} or {'': 1}
+            total = float(sum(weights.values()))
+            cumulative, acc = [], 0.0
+            for name, weight in weights.items():
+                acc += weight / total
+                cumulative.append((acc, name))
+            bucket = TokenBucket(segment['rate_limit']) if segment.get('rate_limit') else None
+            self.segments.append((network, segment, cumulative, bucket))
+        self.explicit = {}
+        for address, settings in (model.get('hosts') or {}).items():
+            if isinstance(settings, str):
+                settings = {'profile': settings}
+            self.explicit[str(ipaddress.ip_address(address))] = settings
+        self._hosts = {}
+        self._probes = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """Load a model from a JSON file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _uniform(self, address, salt):
+        # Reproducible number in [0, 1) for an address and a purpose
+        digest = hashlib.blake2b(f"{self.seed}|{address}|{salt}".encode('ascii'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') / 2 ** 64
+
+    def _settings(self, *layers):
+        settings = dict(self.settings)
+        for layer in layers:
+            settings.update({key: value for key, value in layer.items() if value is not None})
+        return settings
+
+    def host(self, address):
+        """
+        Return the SimulatedHost at an address, or None if nothing answers there.
+        """
+        if address in self._hosts:
+            return self._hosts[address]
+        host = None
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            ip = None
+        segment_entry = next((entry for entry in self.segments if ip is not None and ip in entry[0]), None)
+        if address in self.explicit:
+            settings = self.explicit[address]
+            segment = segment_entry[1] if segment_entry else {}
+            profile = self.profiles.get(settings.get('profile'), {})
+            # The host's ports and scripts add to those of its profile
+            merged = self._settings(segment, profile, settings)
+            for key in ('ports', 'scripts'):
+                merged[key] = {**(profile.get(key) or {}), **(settings.get(key) or {})}
+            host = SimulatedHost(address, merged, settings.get('hostname', ''),
+                                 segment_entry[3] if segment_entry else None)
+        elif segment_entry is not None:
+            network, segment, cumulative, bucket = segment_entry
+            # Nothing answers on the network and broadcast addresses of an IPv4 segment
+            reserved = network.version == 4 and network.prefixlen < 31 and ip in (network.network_address,
+                                                                                  network.broadcast_address)
+            if not reserved and self._uniform(address, 'up') < segment.get('density', 1.0):
+                choice = self._uniform(address, 'profile')
+                name = next((name for bound, name in cumulative if choice < bound), cumulative[-1][1])
+                index = int(ip) - int(network.network_address)
+                hostname = segment.get('hostname', '').format(index=index, address=address.replace('.', '-'))
+                host = SimulatedHost(address, self._settings(segment, self.profiles.get(name, {})), hostname, bucket)
+        self._hosts[address] = host
+        return host
+
+    def hosts(self, targets=None):
+        """
+        Yield the SimulatedHosts that exist, in address order (all of them, or those among 'targets').
+
+        Only the addresses of the model's segments and hosts are visited, so a
+        /8 target with a /16 segment costs the /16.
+        """
+        targets = TargetSet.parse(targets) if targets is not None else None
+        covered = TargetSet([(network.version, int(network.network_address), int(network.broadcast_address))
+                             for network, _, _, _ in self.segments])
+        covered = covered | TargetSet.parse(list(self.explicit))
+        if targets is not None:
+            covered = covered & targets
+        for address in covered:
+            host = self.host(address)
+            if host is not None:
+                yield host
+
+    def networks(self):
+        """Return the networks of the model's segments (the default targets of a simulated scan)."""
+        return [str(network) for network, _, _, _ in self.segments]
+
+    def probe(self, address):
+        """
+        Send one simulated echo request.
+
+        Returns:
+            float: The round-trip time in ms, or None if the host is down or the probe was lost or rate limited.
+        """
+        host = self.host(address)
+        if host is None:
+            return None
+        with self._lock:
+            count = self._probes[address] = self._probes.get(address, 0) + 1
+        if self.bucket is not None and not self.bucket.take():
+            return None
+        if host.bucket is not None and not host.bucket.take():
+            return None
+        if host.loss and self._uniform(address, f'loss{count}') < host.loss:
+            return None
+        # Box-Muller from two reproducible uniforms: normal jitter around the host's RTT
+        u1 = max(self._uniform(address, f'rtt{count}a'), 1e-12)
+        u2 = self._uniform(address, f'rtt{count}b')
+        noise = math.sqrt(-2 * math.log(u1)) * math.cos(2 * math.pi * u2)
+        return round(max(0.01, host.rtt_ms + host.jitter_ms * noise), 3)
+
+
+class SimulatedTransport(Transport):
+    """
+    A transport answered by a SimulatedNetwork.
+
+    Args:
+        network (SimulatedNetwork): The model.
+        time_scale (float): Fraction of the simulated time actually waited (1: real time, 0: no waiting).
+            Waiting lets thread pools and timeouts behave as on a real network; 0 measures the code alone.
+    """
+
+    live = False
+
+    def __init__(self, network, time_scale=1.0):
+        self.network = network
+        self.time_scale = time_scale
+
+    def wait(self, seconds):
+        if self.time_scale > 0 and seconds > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def ping(self, host, timeout=1.0):
+        rtt = self.network.probe(host)
+        if rtt is not None and rtt > timeout * 1000:
+            rtt = None
+        self.wait(rtt / 1000 if rtt is not None else timeout)
+        return rtt
+
+    def ping_many(self, hosts, timeout=1.0):
+        # One batch over one socket: the wait is the slowest reply (or the timeout), not the sum
+        results = {}
+        for host in hosts:
+            rtt = self.network.probe(host)
+            results[host] = rtt if rtt is not None and rtt <= timeout * 1000 else None
+        waits = [rtt / 1000 for rtt in results.values() if rtt is not None]
+        self.wait(timeout if len(waits) < len(results) else max(waits, default=0))
+        return results
+
+    def scanner(self):
+        return SimulatedScanner(self)
+
+
+class SimulatedScanner(nmap.PortScanner):
+    """
+    An nmap.PortScanner that answers scan() from a simulated network.
+
+    The arguments the scanners use are understood (-p, --open, -sV,
+    --script, -O, -sn, -Pn, -iL, -e, -6); the answer is written as nmap XML
+    and parsed by python-nmap, so callers see exactly the shape a real run
+    returns.
+    """
+
+    def __init__(self, transport):
+        # The parent constructor looks for the nmap binary, which a simulation does not need
+        self.transport = transport
+        self.network = transport.network
+        self._scan_result = {}
+        self._nmap_last_output = ''
+
+    def scan(self, hosts='127.0.0.1', ports=None, arguments='-sV', sudo=False, timeout=0):
+        options = shlex.split(arguments)
+        target_tokens = hosts.split() if hosts else []
+        port_ranges = parse_port_spec(ports) if ports else None
+        index = 0
+        while index < len(options):
+            option = options[index]
+            if option in ('-p', '-iL', '-e') and index + 1 < len(options):
+                value = options[index + 1]
+                if option == '-p':
+                    port_ranges = parse_port_spec(value)
+                elif option == '-iL':
+                    target_tokens.append('@' + value)
+                index += 2
+                continue
+            if option.startswith('-p') and len(option) > 2:
+                port_ranges = parse_port_spec(option[2:])
+            index += 1
+        port_ranges = port_ranges or DEFAULT_NMAP_PORTS
+        versions = '-sV' in options or '-A' in options
+        scripts = any(option.startswith(('--script', '-sC')) for option in options) or '-A' in options
+        os_detection = '-O' in options or '-A' in options
+        ping_only = '-sn' in options
+        skip_discovery = '-Pn' in options
+
+        targets = TargetSet.parse(target_tokens)
+        parts = [nmap_xml_header(' '.join(options + target_tokens))]
+        up = 0
+        probes = 0
+        slowest = 0.0
+        services = 0
+        for host in self.network.hosts(targets):
+            if not skip_discovery:
+                rtts = [self.network.probe(host.address) for _ in range(DISCOVERY_PROBES)]
+                probes += DISCOVERY_PROBES
+                answered = [rtt for rtt in rtts if rtt is not None]
+                if not answered:
+                    continue
+                slowest = max(slowest, min(answered))
+            up += 1
+            open_ports = []
+            if not ping_only:
+                probes += sum(last - first + 1 for first, last in port_ranges)
+                for port in sorted(host.ports):
+                    if not any(first <= port <= last for first, last in port_ranges):
+                        continue
+                    service = host.ports[port]
+                    if not versions:
+                        service = {'name': service.get('name'), 'scripts': service.get('scripts') if scripts else None}
+                    elif not scripts:
+                        service = {key: value for key, value in service.items() if key != 'scripts'}
+                    open_ports.append((port, 'open', service))
+                services += len(open_ports)
+            parts.append(nmap_xml_host(host.address, open_ports, host.hostname, host.ttl,
+                                       host.os if os_detection else None))
+        # Addresses of the targets that are not in the model never answered: they count as probed and down
+        total = max(targets.size, up)
+        if not skip_discovery:
+            probes += (total - up) * DISCOVERY_PROBES
+
+        settings = self.network.settings
+        elapsed = probes / settings['scan_rate'] + slowest / 1000
+        if versions and services:
+            elapsed += settings['service_seconds']
+        if scripts and services:
+            elapsed += settings['script_seconds']
+        self.transport.wait(elapsed)
+
+        parts.append(nmap_xml_footer(up, total, elapsed))
+        return self.analyse_nmap_xml_scan(''.join(parts))
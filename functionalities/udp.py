@@ -0,0 +1,340 @@
+import asyncio
+import itertools
+import os
+import re
+import socket
+import struct
+import time
+
+# UDP ports probed by default (each has a protocol payload below)
+DEFAULT_UDP_PORTS = (53, 69, 123, 137, 161, 1900, 5353)
+
+# Port states, as nmap names them
+OPEN = 'open'
+CLOSED = 'closed'
+FILTERED = 'filtered'
+OPEN_FILTERED = 'open|filtered'
+
+# Pacing defaults. Linux answers at most about one ICMP port unreachable per
+# second to a given peer (burst of 6): probing one host faster than that makes
+# closed ports look silent. Hosts are interleaved so the global rate stays high.
+DEFAULT_RATE = 2000
+DEFAULT_HOST_RATE = 1.0
+DEFAULT_HOST_BURST = 6
+
+SNMP_SYSDESCR_OID = b'\x06\x08\x2b\x06\x01\x02\x01\x01\x01\x00'
+
+
+def _dns_name(name):
+    return b''.join(bytes([len(label)]) + label.encode('ascii') for label in name.split('.') if label) + b'\0'
+
+
+def _skip_dns_name(data, offset):
+    while offset < len(data):
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xc0 == 0xc0:
+            return offset + 2
+        offset += length + 1
+    return offset
+
+
+def dns_payload(transaction_id):
+    """DNS query for the CHAOS TXT record 'version.bind' (answered or refused by most servers)."""
+    return struct.pack('!HHHHHH', transaction_id, 0x0100, 1, 0, 0, 0) + _dns_name('version.bind') + struct.pack('!HH', 16, 3)
+
+
+def parse_dns(data):
+    """Return the server version from a version.bind answer ('' if refused)."""
+    if len(data) < 12 or not data[2] & 0x80:
+        return None
+    answers = struct.unpack('!H', data[6:8])[0]
+    offset = _skip_dns_name(data, 12) + 4
+    if answers:
+        offset = _skip_dns_name(data, offset) + 10
+        if offset < len(data):
+            length = data[offset]
+            return data[offset + 1:offset + 1 + length].decode('utf-8', 'replace')
+    return ''
+
+
+def mdns_payload(transaction_id):
+    """Unicast DNS-SD service enumeration query."""
+    return (struct.pack('!HHHHHH', transaction_id, 0, 1, 0, 0, 0)
+            + _dns_name('_services._dns-sd._udp.local') + struct.pack('!HH', 12, 1))
+
+
+def parse_mdns(data):
+    return '' if len(data) >= 12 and data[2] & 0x80 else None
+
+
+def ntp_payload(transaction_id):
+    """NTP version 3 client request."""
+    return b'\x1b' + b'\0' * 47
+
+
+def parse_ntp(data):
+    if len(data) < 48 or data[0] & 0x07 != 4:
+        return None
+    return f"NTP v{(data[0] >> 3) & 0x07}, stratum {data[1]}"
+
+
+def netbios_payload(transaction_id):
+    """NetBIOS node status (NBSTAT) request for the wildcard name."""
+    # '*' padded with NULs, first-level encoded (each nibble + 'A')
+    encoded = b''.join(bytes([0x41 + (byte >> 4), 0x41 + (byte & 0x0f)]) for byte in b'*' + b'\0' * 15)
+    return struct.pack('!HHHHHH', transaction_id, 0, 1, 0, 0, 0) + b'\x20' + encoded + b'\0' + struct.pack('!HH', 0x21, 1)
+
+
+def parse_netbios(data):
+    """Return the first NetBIOS name of the node."""
+    # Header (12) + encoded name (34) + type, class, TTL, length (10), then the name count
+    if len(data) < 57 + 18:
+        return '' if len(data) >= 12 else None
+    return data[57:72].decode('ascii', 'replace').strip()
+
+
+def _ber_length(length):
+    return bytes([length]) if length < 0x80 else bytes([0x81, length])
+
+
+def _ber(tag, value):
+    return bytes([tag]) + _ber_length(len(value)) + value
+
+
+def snmp_payload(transaction_id, community=b'public'):
+    """SNMPv1 GetRequest for sysDescr.0."""
+    varbind = _ber(0x30, SNMP_SYSDESCR_OID + b'\x05\x00')
+    pdu = _ber(0xa0, _ber(0x02, struct.pack('!I', transaction_id)) + b'\x02\x01\x00\x02\x01\x00' + _ber(0x30, varbind))
+    return _ber(0x30, b'\x02\x01\x00' + _ber(0x04, community) + pdu)
+
+
+def parse_snmp(data):
+    """Return sysDescr from a GetResponse."""
+    if not data.startswith(b'\x30'):
+        return None
+    index = data.find(SNMP_SYSDESCR_OID)
+    if index == -1 or index + len(SNMP_SYSDESCR_OID) + 2 > len(data):
+        return ''
+    offset = index + len(SNMP_SYSDESCR_OID)
+    if data[offset] != 0x04:
+        return ''
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    return data[offset:offset + length].decode('utf-8', 'replace').strip()
+
+
+def tftp_payload(transaction_id):
+    """TFTP read request for a file that does not exist (servers answer with an error packet)."""
+    return b'\x00\x01' + f"seahawks-{transaction_id}.txt".encode('ascii') + b'\0octet\0'
+
+
+def parse_tftp(data):
+    return '' if len(data) >= 4 and data[1] in (3, 5) else None
+
+
+def ssdp_payload(transaction_id):
+    """SSDP (UPnP) discovery request."""
+    return (b'M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\nMAN: "ssdp:discover"\r\n'
+            b'MX: 1\r\nST: ssdp:all\r\n\r\n')
+
+
+def parse_ssdp(data):
+    match = re.search(rb'(?im)^server:\s*(.+?)\s*$', data)
+    return match.group(1).decode('utf-8', 'replace') if match else ''
+
+
+# port -> (service name, payload builder, response parser returning a version string, or None if not that protocol)
+UDP_PROBES = {
+    53: ('domain', dns_payload, parse_dns),
+    69: ('tftp', tftp_payload, parse_tftp),
+    123: ('ntp', ntp_payload, parse_ntp),
+    137: ('netbios-ns', netbios_payload, parse_netbios),
+    161: ('snmp', snmp_payload, parse_snmp),
+    1900: ('upnp', ssdp_payload, parse_ssdp),
+    5353: ('mdns', mdns_payload, parse_mdns),
+}
+
+
+class TokenBucket:
+    """
+    Rate limiter for asyncio code: 'rate' tokens per second, up to 'burst' saved.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _ProbeProtocol(asyncio.DatagramProtocol):
+    """Connected datagram endpoint of one probe: the first reply or ICMP error settles its future."""
+
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, address):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+    def connection_lost(self, exc):
+        if exc is not None and not self.future.done():
+            self.future.set_exception(exc)
+
+
+class UdpScanner:
+    """
+    Asynchronous UDP port scanner.
+
+    Each probe uses a connected datagram socket, so the kernel reports the
+    ICMP errors caused by the probe: a reply means 'open', an ICMP port
+    unreachable 'closed', another ICMP error (host or network unreachable,
+    administratively prohibited) 'filtered', and silence after every retry
+    'open|filtered'. Well-known ports get a payload their service answers;
+    the reply is parsed for a version string.
+
+    Probes are sent port by port across all hosts, and paced both globally
+    and per host to stay under the targets' ICMP rate limits.
+
+    Args:
+        ports (iterable): UDP ports to probe.
+        rate (float): Maximum probes per second overall.
+        host_rate (float): Maximum probes per second to one host.
+        host_burst (int): Probes a host may receive at once before host_rate applies.
+        timeout (float): Seconds to wait for an answer to each probe.
+        retries (int): Extra probes sent to ports that stayed silent.
+        max_in_flight (int): Maximum probes waiting for an answer (one socket each).
+    """
+
+    def __init__(self, ports=DEFAULT_UDP_PORTS, rate=DEFAULT_RATE, host_rate=DEFAULT_HOST_RATE,
+                 host_burst=DEFAULT_HOST_BURST, timeout=1.0, retries=1, max_in_flight=256):
+        self.ports = list(ports)
+        self.rate = rate
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.timeout = timeout
+        self.retries = retries
+        self.max_in_flight = max_in_flight
+        self.transaction_ids = itertools.count(int.from_bytes(os.urandom(2), 'big'))
+
+    def probe_payload(self, port):
+        """Return the payload sent to a port (empty for ports without a protocol probe)."""
+        probe = UDP_PROBES.get(port)
+        return probe[1](next(self.transaction_ids) & 0xffff) if probe else b''
+
+    async def probe(self, host, port, family=socket.AF_INET):
+        """
+        Probe one port once.
+
+        Returns:
+            tuple: (state, reply bytes or None).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            sock.setblocking(False)
+            sock.connect((host, port))
+            transport, _ = await loop.create_datagram_endpoint(lambda: _ProbeProtocol(future), sock=sock)
+        except OSError:
+            sock.close()
+            return FILTERED, None
+        try:
+            payload = self.probe_payload(port)
+            if payload:
+                transport.sendto(payload)
+            else:
+                # asyncio's transports drop empty datagrams: ports without a protocol probe get one from the socket
+                sock.send(payload)
+            data = await asyncio.wait_for(future, self.timeout)
+            return OPEN, data
+        except asyncio.TimeoutError:
+            return OPEN_FILTERED, None
+        except (ConnectionRefusedError, ConnectionResetError):
+            # ICMP port unreachable (reported as a reset on Windows)
+            return CLOSED, None
+        except OSError:
+            return FILTERED, None
+        finally:
+            transport.close()
+
+    async def scan_async(self, hosts, callback=None):
+        """
+        Scan every port of every host.
+
+        Args:
+            hosts (iterable): Addresses to scan.
+            callback (function): Called with (host, port, state, service, version) for each finished port.
+
+        Returns:
+            dict: {host: {port: (state, service, version)}}.
+        """
+        hosts = list(hosts)
+        results = {host: {} for host in hosts}
+        global_bucket = TokenBucket(self.rate, burst=max(1, self.max_in_flight // 4))
+        host_buckets = {}
+
+        # Port-major order: consecutive probes go to different hosts
+        work = ((host, port) for port in self.ports for host in hosts)
+
+        async def worker():
+            for host, port in work:
+                bucket = host_buckets.get(host)
+                if bucket is None:
+                    bucket = host_buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+                family = socket.AF_INET6 if ':' in host else socket.AF_INET
+                for _ in range(self.retries + 1):
+                    await bucket.acquire()
+                    await global_bucket.acquire()
+                    state, data = await self.probe(host, port, family)
+                    if state != OPEN_FILTERED:
+                        break
+                service, version = UDP_PROBES.get(port, ('unknown', None, None))[0], ''
+                if data is not None and port in UDP_PROBES:
+                    version = UDP_PROBES[port][2](data) or ''
+                results[host][port] = (state, service, version)
+                if callback:
+                    callback(host, port, state, service, version)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.max_in_flight)]
+        await asyncio.gather(*workers)
+        return results
+
+    def scan(self, hosts, callback=None):
+        """Blocking wrapper around scan_async (runs its own event loop)."""
+        return asyncio.run(self.scan_async(hosts, callback))
+
+
+def add_udp_results(host_result, ports):
+    """
+    Record UDP results in a HostResult.
+
+    Args:
+        host_result (HostResult): The host.
+        ports (dict): {port: (state, service, version)} for this host, as returned by UdpScanner.
+    """
+    for port, (state, service, version) in sorted(ports.items()):
+        if state != OPEN:
+            service = version = None
+        host_result.set_port(port, state, service, version or None, proto='udp')
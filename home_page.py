@@ -1,11 +1,13 @@
 from tkinter import *
 from tkinter import simpledialog, messagebox
 from tkinter import font as tkfont
-from functionalities.scan import scan_network
+from functionalities.estimator import LiveEta, ScanEstimator
+from functionalities.interfaces import attached_networks, nmap_interface_name
+from functionalities.jobs import PRIORITY_HIGH, PRIORITY_NORMAL
+from functionalities.targets import TargetSet
 from utils import get_version
 from PIL import Image, ImageTk
 import os
-import threading
 
 def load_icon(path, size=(40, 40)):
     """Load icons with error handling."""
@@ -22,6 +24,9 @@ def load_icon(path, size=(40, 40)):
 
 from tkinter import ttk
 
+# Folders the scans of this page are saved to (their 'metrics' subfolders feed the duration estimator)
+SCAN_OUTPUT_FOLDERS = ["single_ip_scan_results.json", "subnet_scan_results.json", "scans"]
+
 class HomePage:
     def __init__(self, root, app):
         self.root = root
@@ -65,6 +70,48 @@ class HomePage:
         # Progress bar
         self.progress = ttk.Progressbar(self.frame, orient=HORIZONTAL, length=200, mode='determinate')
         self.progress.place(relx=0.5, rely=0.65, anchor="center")
+
+        # Duration estimate (before a scan) and ETA (during a scan), learnt from earlier scans
+        self.estimator = ScanEstimator.from_folders(SCAN_OUTPUT_FOLDERS)
+        self.eta = None
+        self.eta_refresh = None  # Pending root.after() of the ETA refresh, None when it is not running
+        self.estimate_label = Label(self.frame, text="", font=("Helvetica", 10), fg='white', bg='#313438')
+        self.estimate_label.place(relx=0.5, rely=0.7, anchor="center")
+        # Networks attached to the interfaces (with their real prefixes), refreshed before each subnet scan
+        self.networks = attached_networks()
+        self.show_subnet_estimate()
+
+        # Cancel button of the running scans (one per network for a subnet scan)
+        self.current_jobs = []
+        self.cancel_button = Button(
+            self.frame,
+            text="Cancel scan",
+            font=("Helvetica", 10),
+            bg='#202225',
+            fg='white',
+            activebackground='#41464b',
+            activeforeground='white',
+            relief="flat",
+            cursor="hand2",
+            command=self.cancel_scan
+        )
+        self.cancel_button.place(relx=0.5, rely=0.76, anchor="center")
+
+        # Tracing the routes to the hosts found feeds the topology graph of the Stats page (off by default)
+        self.trace_routes = BooleanVar(value=False)
+        self.trace_check = Checkbutton(
+            self.frame,
+            text="Trace routes (topology graph)",
+            variable=self.trace_routes,
+            font=("Helvetica", 10),
+            bg='#313438',
+            fg='white',
+            selectcolor='#202225',
+            activebackground='#313438',
+            activeforeground='white',
+            cursor="hand2"
+        )
+        self.trace_check.place(relx=0.5, rely=0.81, anchor="center")
         
         self.animate_circle()
 
@@ -111,55 +158,131 @@ class HomePage:
 
     def start_scan(self):
         """Trigger the scan functionality in the background."""
-        scan_type = simpledialog.askstring("Scan Type", "Enter scan type:\n1 - Single IP\n2 - Subnet (current IP)")
+        scan_type = simpledialog.askstring("Scan Type", "Enter scan type:\n1 - Single IP\n2 - Local networks (every interface)")
 
         if scan_type == "1":
-            ip_address = simpledialog.askstring("Single IP", "Enter the IP address to scan:")
-            if ip_address:
-                output_file = "single_ip_scan_results.json"
-                threading.Thread(target=self.run_scan, args=(ip_address, output_file)).start()
+            ip_address = simpledialog.askstring("Single IP", "Enter the IP address to scan:\n(or targets: CIDR, range, hostname, @file, !exclusion)")
+            if ip_address and self.confirm_estimate(ip_address):
+                # A single host is quick: let it overtake queued subnet scans
+                self.submit_scan(ip_address, "single_ip_scan_results.json", PRIORITY_HIGH)
         elif scan_type == "2":
-            # Automatically detect local IP and calculate the subnet
-            local_ip = self.get_local_ip()
-            subnet = self.get_subnet_from_ip(local_ip)
-            output_file = "subnet_scan_results.json"
-            threading.Thread(target=self.run_scan, args=(subnet, output_file)).start()
+            # Every attached network at its real size, each scanned from its own interface (in parallel)
+            self.networks = attached_networks()
+            if not self.networks:
+                messagebox.showwarning("No Network", "No network interface with an IPv4 network was found.")
+            elif self.confirm_estimate(self.local_networks()):
+                for entry in self.networks:
+                    self.submit_scan(str(entry.network), "subnet_scan_results.json", PRIORITY_NORMAL,
+                                     nmap_interface_name(entry.interface))
         else:
             messagebox.showwarning("Invalid Input", "Please enter a valid scan type (1 or 2).")
 
-    def run_scan(self, network_range, output_file):
-        """Run the scan in a separate thread."""
-        try:
-            # Run scan and update the progress bar
-            scan_network(network_range, output_file, progress_callback=self.update_progress)
-            messagebox.showinfo("Scan Complete", f"Results saved to {output_file}.")
-        except Exception as e:
-            messagebox.showerror("Scan Error", f"An error occurred during the scan: {e}")
+    def submit_scan(self, network_range, output_file, priority, interface=None):
+        """Hand the scan to the job manager (it runs in the background)."""
+        known_jobs = set(self.app.job_manager.jobs)
+        job = self.app.job_manager.submit(network_range, output_file, priority,
+                                          progress_callback=self.update_progress, done_callback=self.scan_finished,
+                                          interface=interface, trace_routes=self.trace_routes.get())
+        if job.id in known_jobs or job.target != network_range:
+            messagebox.showinfo("Scan Already Planned",
+                                f"{network_range} is already covered by scan #{job.id} of {job.target} ({job.state}).")
+            return
+        if not self.current_jobs:
+            self.progress['value'] = 0
+        self.current_jobs.append(job)
+        self.start_eta(' '.join(job.target for job in self.current_jobs))
+
+    def local_networks(self):
+        """Return the attached networks as a target list ('192.168.1.0/24 10.0.0.0/22')."""
+        return ' '.join(str(entry.network) for entry in self.networks)
+
+    def scan_finished(self, job):
+        """Report a finished scan (called from the job manager's worker thread: handed to the Tk thread)."""
+        self.root.after(0, self.show_scan_result, job)
+
+    def show_scan_result(self, job):
+        """Report a finished scan (on the Tk thread)."""
+        if job in self.current_jobs:
+            self.current_jobs.remove(job)
+            if not self.current_jobs:
+                self.eta = None
+        if job.state == 'done':
+            # Learn from this scan so the next estimates take it into account
+            self.estimator.learn(job.metrics.summary())
+            messagebox.showinfo("Scan Complete", f"Results saved to {job.output_folder}.")
+        elif job.state == 'cancelled':
+            kept = "Partial results were saved" if job.result is not None else "No results were saved"
+            messagebox.showinfo("Scan Cancelled", f"Scan of {job.target} cancelled. {kept}.")
+        else:
+            messagebox.showerror("Scan Error", f"An error occurred during the scan of {job.target}: {job.error or 'no results'}")
+
+    def cancel_scan(self):
+        """Cancel the running scans, asking whether their partial results should be kept."""
+        jobs = list(self.current_jobs)
+        if not jobs:
+            messagebox.showinfo("Cancel Scan", "No scan is running.")
+            return
+        targets = ', '.join(job.target for job in jobs)
+        keep_partial = messagebox.askyesnocancel("Cancel Scan", f"Cancel the scan of {targets}?\n\nKeep the hosts already scanned?")
+        if keep_partial is None:
+            return
+        for job in jobs:
+            self.app.job_manager.cancel(job.id, keep_partial=keep_partial)
 
     def update_progress(self, progress):
-        """Update the progress bar."""
+        """Report the progress of a scan (called from the job manager's worker threads: handed to the Tk thread)."""
+        self.root.after(0, self.show_progress, progress)
+
+    def show_progress(self, progress):
+        """Update the progress bar (the average of the running scans when several networks are scanned)."""
+        jobs = list(self.current_jobs)
+        if jobs:
+            progress = sum(job.progress for job in jobs) / len(jobs)
         self.progress['value'] = progress
-        self.root.update_idletasks()  # Update the GUI to reflect the progress change
+        if self.eta is not None:
+            self.eta.update(progress / 100)
+
+    def show_subnet_estimate(self):
+        """Show the estimated duration of a scan of the local networks."""
+        networks = self.local_networks()
+        if networks:
+            self.estimate_label.config(text=f"{networks}: {self.estimator.describe(networks)}")
 
-    def get_local_ip(self):
-        """Get the local IP address of the machine."""
-        import socket
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.settimeout(0)
+    def confirm_estimate(self, network_range):
+        """Show the estimated duration of a scan and ask whether to start it."""
+        return messagebox.askokcancel("Scan Estimate", f"{network_range}\n{self.estimator.describe(network_range)}"
+                                                       f"{self.describe_known_hosts(network_range)}\n\nStart the scan?")
+
+    def describe_known_hosts(self, network_range):
+        """Describe what the liveness cache already knows about the targets (skipped by the scan's discovery)."""
         try:
-            s.connect(('10.254.254.254', 1))  # This won't actually connect but will determine the local IP
-            local_ip = s.getsockname()[0]
-        except:
-            local_ip = '127.0.0.1'  # Fallback to localhost if unable to detect the local IP
-        finally:
-            s.close()
-        return local_ip
-
-    def get_subnet_from_ip(self, local_ip):
-        """Given a local IP address, calculate the subnet to scan."""
-        import ipaddress
-        network = ipaddress.IPv4Network(local_ip + '/24', strict=False)
-        return str(network.network_address) + '/24'
+            known = self.app.liveness.lookup(TargetSet.parse(network_range))
+        except (ValueError, OSError):
+            return ""
+        if not known:
+            return ""
+        up = sum(1 for entry in known.values() if entry['up'])
+        return f"\nLiveness cache: {up} up, {len(known) - up} down recently (the down ones are skipped)"
+
+    def start_eta(self, network_range):
+        """Start the live ETA of the scans (refreshed every second until they end)."""
+        predicted = self.estimator.estimate(network_range)['seconds']
+        if self.eta is None:
+            self.eta = LiveEta(predicted)
+        else:
+            # Another scan joins the running ones: same start time, new prediction
+            self.eta.predicted = predicted
+        if self.eta_refresh is None:
+            self.update_eta()
+
+    def update_eta(self):
+        """Refresh the ETA label while a scan is running."""
+        if self.eta is None:
+            self.eta_refresh = None
+            self.show_subnet_estimate()
+            return
+        self.estimate_label.config(text=self.eta.format())
+        self.eta_refresh = self.root.after(1000, self.update_eta)
 
     def animate_circle(self):
         """Animation for the pulsating circle."""
@@ -1,10 +1,14 @@
 import os
-import subprocess
+import threading
 from tkinter import *
 from tkinter import font as tkfont
 from tkinter import messagebox
 from PIL import Image, ImageTk
+from fonctions.ping import latency_stats, probe_latency
+from functionalities.ipv6 import MAX_SWEEP, discover_ipv6
+from utils import draw_latency_graph
 import ipaddress
+import time
 
 # Function to load icons with error handling
 def load_icon(path, size=(50, 50)):
@@ -58,9 +62,13 @@ class PingPage:
         self.ping_button.pack(pady=20)
 
         # Results display
-        self.results_label = Label(self.frame, text="Results will be displayed here.", font=("Helvetica", 12), fg='white', bg='#313438')
+        self.results_label = Label(self.frame, text="Results will be displayed here.", font=("Helvetica", 12), fg='white', bg='#313438', justify=LEFT, wraplength=560)
         self.results_label.pack(pady=10)
 
+        # Latency history of the last pinged host
+        self.history_canvas = Canvas(self.frame, width=500, height=150, bg='#202225', bd=0, highlightthickness=0)
+        self.history_canvas.pack(pady=5)
+
         # Bottom frame for navigation (same as HomePage)
         self.bottom_frame = Frame(self.frame, bg='#202225', height=60)
         self.bottom_frame.pack(side=BOTTOM, fill=X)
@@ -118,40 +126,104 @@ class PingPage:
             self.ping_single_host(host)
 
     def ping_single_host(self, host):
-        """Ping a single host."""
-        try:
-            # Run the ping command with a timeout of 1 second and a single ping (-n 1)
-            result = subprocess.run(
-                ["ping", "-n", "1", "-w", "1000", host],  # -w sets the timeout in milliseconds
-                capture_output=True, text=True
-            )
-            if result.returncode == 0:
-                self.results_label.config(text=f"Host {host} is reachable.")
-            else:
-                self.results_label.config(text=f"Host {host} is not reachable.")
-        except Exception as e:
-            self.results_label.config(text=f"Error pinging {host}: {e}")
+        """Measure the latency of a single host in the background."""
+        self.run_probe([host], count=4, interval=0.2, render=self.render_single_host)
 
     def ping_subnet(self, subnet):
-        """Ping all hosts in a subnet."""
+        """Ping all hosts in a subnet concurrently (except those the liveness cache knows about)."""
         try:
-            network = ipaddress.IPv4Network(subnet, strict=False)
-
-            reachable_hosts = []
-            for ip in network.hosts():
-                result = subprocess.run(
-                    ["ping", "-n", "1", "-w", "1000", str(ip)],  # Use a timeout of 1 second per ping
-                    capture_output=True, text=True
-                )
-                if result.returncode == 0:
-                    reachable_hosts.append(str(ip))
-
-            if reachable_hosts:
-                self.results_label.config(text=f"Reachable hosts: {', '.join(reachable_hosts)}")
-            else:
-                self.results_label.config(text="No hosts were reachable in the subnet.")
-        except Exception as e:
+            network = ipaddress.ip_network(subnet, strict=False)
+        except ValueError as e:
             self.results_label.config(text=f"Error pinging subnet {subnet}: {e}")
+            return
+        if network.version == 6 and network.num_addresses > MAX_SWEEP:
+            self.discover_subnet(network)
+            return
+        hosts = [str(ip) for ip in network.hosts()]
+        self.run_probe(hosts, count=1, interval=0.2, render=self.render_subnet, known=self.app.liveness.lookup(hosts))
+
+    def discover_subnet(self, network):
+        """Ping the hosts of an IPv6 network found on the links (multicast and neighbour table), not all 2^64."""
+        self.ping_button.config(state=DISABLED)
+        self.results_label.config(text=f"Discovering the IPv6 hosts of {network}...")
+
+        def worker():
+            try:
+                hosts = [host.target for host in discover_ipv6() if host.address in network]
+            except OSError as e:
+                self.root.after(0, lambda error=e: self.finish_probe(None, error))
+                return
+            self.root.after(0, lambda: self.run_probe(hosts, count=1, interval=0.2, render=self.render_subnet,
+                                                      known=self.app.liveness.lookup(hosts)))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def run_probe(self, hosts, count, interval, render, known=None):
+        """
+        Run the latency probe in a worker thread and render the results on the GUI thread.
+
+        Hosts in 'known' (fresh liveness cache entries) are not probed: their last observation is shown instead.
+        """
+        known = known or {}
+        probed = [host for host in hosts if host not in known]
+        self.ping_button.config(state=DISABLED)
+        self.results_label.config(text=f"Pinging {len(probed)} host(s)...")
+
+        def worker():
+            try:
+                measured = probe_latency(probed, count=count, interval=interval, liveness=self.app.liveness)
+                # Keep every measurement in the history store instead of discarding it
+                for stats in measured.values():
+                    self.app.history_store.record_stats(stats)
+                results = {}
+                for host in hosts:
+                    if host in measured:
+                        results[host] = measured[host]
+                        continue
+                    entry = known[host]
+                    results[host] = latency_stats(host, [entry['rtt']] if entry['rtt'] is not None else [], 1)
+                    results[host].update(reachable=entry['up'], cached=True)
+                self.root.after(0, lambda: self.finish_probe(render, results))
+            except Exception as e:
+                self.root.after(0, lambda error=e: self.finish_probe(None, error))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def finish_probe(self, render, results):
+        """Re-enable the Ping button and display the probe results."""
+        self.ping_button.config(state=NORMAL)
+        if render is None:
+            self.results_label.config(text=f"Error while pinging: {results}")
+        else:
+            render(results)
+
+    def render_single_host(self, results):
+        """Display the latency statistics of a single host."""
+        stats = next(iter(results.values()))
+        if stats['reachable']:
+            self.results_label.config(text=(
+                f"Host {stats['host']} is reachable.\n"
+                f"min/avg/max/mdev = {stats['min']:g}/{stats['avg']:g}/{stats['max']:g}/{stats['mdev']:g} ms\n"
+                f"jitter: {stats['jitter']:g} ms, loss: {stats['loss']:g}%"
+            ))
+        else:
+            self.results_label.config(text=f"Host {stats['host']} is not reachable.")
+        self.draw_history(stats['host'])
+
+    def draw_history(self, host, period=24 * 3600):
+        """Draw the latency history of a host over the last day."""
+        points = self.app.history_store.fetch(host, time.time() - period)
+        draw_latency_graph(self.history_canvas, points, title=f"{host} - last 24 h")
+
+    def render_subnet(self, results):
+        """Display the reachable hosts of a subnet with their latency."""
+        reachable = [stats for stats in results.values() if stats['reachable']]
+        if reachable:
+            lines = [f"{stats['host']} ({stats['avg']:g} ms)" if stats['avg'] is not None else stats['host']
+                     for stats in reachable]
+            self.results_label.config(text=f"Reachable hosts ({len(reachable)}/{len(results)}): {', '.join(lines)}")
+        else:
+            self.results_label.config(text="No hosts were reachable in the subnet.")
 
     def show(self):
         """Display the Ping page."""
@@ -2,7 +2,15 @@ from tkinter import *
 from tkinter import filedialog, messagebox
 from tkinter import font as tkfont
 from PIL import Image, ImageTk
+from functionalities.archive import ARCHIVE_FOLDER, Archive
+from functionalities.export import EXPORT_FORMATS, export_extension, export_scan
+from functionalities.topology import latest_topology_file, load_topology
+from home_page import SCAN_OUTPUT_FOLDERS
+from utils import draw_latency_graph, draw_topology_graph
 import os
+import tempfile
+import threading
+import time
 
 # Function to load icons with error handling
 def load_icon(path, size=(50, 50)):
@@ -23,6 +31,10 @@ class StatsPage:
         self.root = root
         self.app = app
         self.scan_results_dir = scan_results_dir
+        self.archived_times = {}
+        self.topology_file = None
+        self.export_thread = None
+        self.export_result = None
         self.frame = Frame(self.root, bg='#313438')
 
         # Title frame
@@ -45,10 +57,21 @@ class StatsPage:
         self.subtitle_label = Label(self.frame, text="You are on the Stats page", font=("Helvetica", 14), fg='white', bg='#313438')
         self.subtitle_label.pack(pady=10)
 
-        # Add the Download TXT button
+        # List of available scan files (newest first)
+        self.scan_listbox = Listbox(self.frame, font=("Helvetica", 11), height=6, width=45, exportselection=False)
+        self.scan_listbox.pack(pady=5)
+
+        # Export format selection
+        self.format_labels = {label: fmt for fmt, (label, _) in EXPORT_FORMATS.items()}
+        self.format_var = StringVar(value=EXPORT_FORMATS['original'][0])
+        self.format_menu = OptionMenu(self.frame, self.format_var, *self.format_labels)
+        self.format_menu.config(font=("Arial", 11), bg='#41464b', fg='white', activebackground='#574f4f', relief="flat")
+        self.format_menu.pack(pady=5)
+
+        # Add the Download button
         self.download_button = Button(
             self.frame,
-            text="Download Latest Scan Results",
+            text="Download Selected Scan Results",
             font=("Arial", 14),
             bg='#4CAF50',
             fg='white',
@@ -60,6 +83,18 @@ class StatsPage:
         )
         self.download_button.pack(pady=20)
 
+        # Latency history: host selection and graph
+        self.history_var = StringVar(value="")
+        self.history_menu = OptionMenu(self.frame, self.history_var, "")
+        self.history_menu.config(font=("Arial", 11), bg='#41464b', fg='white', activebackground='#574f4f', relief="flat")
+        self.history_menu.pack(pady=5)
+        self.history_canvas = Canvas(self.frame, width=500, height=150, bg='#202225', bd=0, highlightthickness=0)
+        self.history_canvas.pack(pady=5)
+
+        # Routes to the hosts of the latest scan (functionalities/topology.py)
+        self.topology_canvas = Canvas(self.frame, width=500, height=180, bg='#202225', bd=0, highlightthickness=0)
+        self.topology_canvas.pack(pady=5)
+
         # Refresh button
         self.refresh_button = Button(
             self.frame,
@@ -136,62 +171,163 @@ class StatsPage:
                 print(f"Directory not found: {self.scan_results_dir}")
                 return []
             
-            files = [f for f in os.listdir(self.scan_results_dir) if f.endswith('.txt') or f.endswith('.json')]
-            print(f"Files found: {files}")  # Debugging line
+            files = [f for f in os.listdir(self.scan_results_dir) if f.endswith(('.txt', '.json', '.jsonl'))]
+            # Older scans are in the archive (functionalities/archive.py) and are listed as 'archive/<name>'
+            self.archived_times = {f"{ARCHIVE_FOLDER}/{name}": mtime
+                                   for name, _, mtime in Archive(self.scan_results_dir).files()
+                                   if not name.startswith('metrics/')}
+            files.extend(self.archived_times)
             return files
         except Exception as e:
             print(f"Error reading scan files: {e}")
             return []
 
     def update_download_button(self):
-        """Update the download button based on available scan files."""
+        """Update the scan list and the download button based on available scan files."""
         files = self.list_scan_files()
-        
+
+        # Keep the user's selection across refreshes
+        selected = self.get_selected_scan_file()
+        files = sorted(files, key=self.scan_file_time, reverse=True)
+        self.scan_listbox.delete(0, END)
+        for f in files:
+            self.scan_listbox.insert(END, f)
+        if files:
+            index = files.index(selected) if selected in files else 0
+            self.scan_listbox.selection_set(index)
+
+        if self.export_thread is not None and self.export_thread.is_alive():
+            return
         if files:
-            self.download_button.config(text="Download Latest Scan Results")
+            self.download_button.config(text="Download Selected Scan Results")
             self.download_button.config(state=NORMAL)
         else:
             self.download_button.config(text="No Scan Files Available")
             self.download_button.config(state=DISABLED)
 
+    def scan_file_time(self, name):
+        """Return the time of a listed scan file (archived files keep their original time)."""
+        if name in self.archived_times:
+            return self.archived_times[name]
+        return os.path.getctime(os.path.join(self.scan_results_dir, name))
+
+    def get_selected_scan_file(self):
+        """Return the file name selected in the scan list (None if nothing is selected)."""
+        selection = self.scan_listbox.curselection()
+        if selection:
+            return self.scan_listbox.get(selection[0])
+        return None
+
     def download_latest_scan_file(self):
-        """Prompt the user to download the latest scan result file."""
+        """Prompt the user to export the selected scan file (the latest one by default)."""
         try:
-            files = self.list_scan_files()
-            if files:
-                # Determine the most recent file based on creation time
-                latest_file = max(
-                    (os.path.join(self.scan_results_dir, f) for f in files), 
-                    key=os.path.getctime
-                )
-                print(f"Latest file detected: {latest_file}")  # Debugging line
-                
-                # Prompt the user to save the file
-                file_path = filedialog.asksaveasfilename(
-                    defaultextension=".txt",
-                    filetypes=[("Text Files", "*.txt")],
-                    title="Save TXT Scan Results",
-                    initialfile=os.path.basename(latest_file)
-                )
-                if file_path:
-                    # Copy the content to the selected location
-                    with open(latest_file, "r") as src_file:
-                        content = src_file.read()
-                    with open(file_path, "w") as dest_file:
-                        dest_file.write(content)
-                    messagebox.showinfo("Download Complete", f"Scan results have been saved to {file_path}.")
-            else:
+            selected = self.get_selected_scan_file()
+            if not selected:
                 messagebox.showerror("No Files", "No scan files found.")
+                return
+
+            source_path = os.path.join(self.scan_results_dir, selected)
+            fmt = self.format_labels[self.format_var.get()]
+            extension = export_extension(fmt, source_path)
+            base_name = os.path.splitext(os.path.basename(selected))[0]
+
+            # Prompt the user for the destination
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=extension,
+                filetypes=[(EXPORT_FORMATS[fmt][0], "*" + extension), ("All Files", "*.*")],
+                title="Save Scan Results",
+                initialfile=base_name + extension
+            )
+            if not file_path:
+                return
+
+            # Export in the background so large histories do not freeze the GUI
+            self.download_button.config(text="Exporting...", state=DISABLED)
+            self.export_thread = threading.Thread(
+                target=self.run_export, args=(source_path, file_path, fmt), daemon=True
+            )
+            self.export_thread.start()
+            self.root.after(200, self.check_export)
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred while downloading the file: {e}")
 
+    def run_export(self, source_path, file_path, fmt):
+        """Run the export in a separate thread and keep its outcome for the GUI thread."""
+        try:
+            name = os.path.relpath(source_path, self.scan_results_dir).replace(os.sep, '/')
+            if name.startswith(ARCHIVE_FOLDER + '/'):
+                # Archived scans are extracted alone (under their own name, which tells the format apart)
+                name = name[len(ARCHIVE_FOLDER) + 1:]
+                with tempfile.TemporaryDirectory() as folder:
+                    extracted = Archive(self.scan_results_dir).extract(name, os.path.join(folder, name))
+                    export_scan(extracted, file_path, fmt)
+            else:
+                export_scan(source_path, file_path, fmt)
+            self.export_result = (True, file_path)
+        except Exception as e:
+            self.export_result = (False, e)
+
+    def check_export(self):
+        """Poll the export thread from the GUI thread and report when it is done."""
+        if self.export_thread.is_alive():
+            self.root.after(200, self.check_export)
+            return
+
+        self.update_download_button()
+        success, detail = self.export_result
+        if success:
+            messagebox.showinfo("Download Complete", f"Scan results have been saved to {detail}.")
+        else:
+            messagebox.showerror("Error", f"An error occurred while downloading the file: {detail}")
+
+    def update_history_menu(self):
+        """List the hosts that have a latency history and redraw the selected one."""
+        hosts = self.app.history_store.keys()
+        menu = self.history_menu["menu"]
+        menu.delete(0, END)
+        for host in hosts:
+            menu.add_command(label=host, command=lambda value=host: self.select_history_host(value))
+        if hosts and self.history_var.get() not in hosts:
+            self.history_var.set(hosts[0])
+        self.draw_history()
+
+    def select_history_host(self, host):
+        """Show the history of another host."""
+        self.history_var.set(host)
+        self.draw_history()
+
+    def draw_history(self, period=7 * 24 * 3600):
+        """Draw the latency history of the selected host over the last week."""
+        host = self.history_var.get()
+        points = self.app.history_store.fetch(host, time.time() - period) if host else []
+        draw_latency_graph(self.history_canvas, points, title=f"{host} - last 7 days" if host else "")
+
+    def draw_topology(self):
+        """Draw the hop graph of the latest scan that traced its routes (redrawn only when a newer one exists)."""
+        folders = [self.scan_results_dir] + [folder for folder in SCAN_OUTPUT_FOLDERS if folder != self.scan_results_dir]
+        path = latest_topology_file(folders)
+        if path == self.topology_file and path is not None:
+            return
+        self.topology_file = path
+        try:
+            topology = load_topology(path) if path else None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading topology: {path}, {e}")
+            topology = None
+        title = f"Routes - {topology.to_dict()['started']}" if topology else ""
+        draw_topology_graph(self.topology_canvas, topology, title=title)
+
     def refresh_page(self):
         """Manually refresh the Stats page."""
         self.update_download_button()
+        self.update_history_menu()
+        self.draw_topology()
 
     def auto_refresh(self):
         """Automatically refresh the page every 10 seconds."""
         self.update_download_button()
+        self.update_history_menu()
+        self.draw_topology()
         self.root.after(30000, self.auto_refresh)  # Refresh every 10 seconds
 
     def show(self):
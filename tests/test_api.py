@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.api import ResultFeed
+
+
+class ResultFeedTest(unittest.TestCase):
+    def test_released_once_closed_and_drained(self):
+        released = []
+
+        async def run():
+            feed = ResultFeed(asyncio.get_running_loop(), on_drained=lambda: released.append(True))
+
+            async def follow():
+                return [item async for _, item in feed.follow()]
+
+            follower = asyncio.ensure_future(follow())
+            await asyncio.sleep(0)
+            feed.push('10.0.0.1')
+            feed.close()
+            await asyncio.sleep(0)
+            # Closed, but a client is still reading it
+            self.assertEqual(released, [])
+            self.assertEqual(await follower, ['10.0.0.1'])
+            self.assertEqual(released, [True])
+
+        asyncio.run(run())
+
+    def test_released_at_close_without_followers(self):
+        released = []
+
+        async def run():
+            feed = ResultFeed(asyncio.get_running_loop(), on_drained=lambda: released.append(True))
+            feed.push('10.0.0.1')
+            feed.close()
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        self.assertEqual(released, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.archive import STAMP_FORMAT, Archive, RetentionPolicy
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+class RetentionTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        # Four scans a day for the last 60 days
+        self.names = []
+        for hours in range(0, 60 * 24, 6):
+            stamp = (NOW - timedelta(hours=hours)).strftime(STAMP_FORMAT)
+            name = f"{stamp}_scan_results.txt"
+            with open(os.path.join(self.folder.name, name), 'w', encoding='utf-8') as f:
+                f.write(f"Scan started at {stamp}\nHost: 10.0.0.1\nStatus: up\nPort: 22 - open (ssh)\n")
+            self.names.append(name)
+
+    def test_default_policy_keeps_every_scan(self):
+        archive = Archive(self.folder.name)
+        summary = archive.compact(NOW)
+        self.assertEqual(summary['deleted'], 0)
+        self.assertEqual(summary['archived'], len(self.names) - 4)
+        archived = {name for name, _, _ in archive.files()}
+        loose = {name for name in os.listdir(self.folder.name) if name.endswith('.txt')}
+        self.assertEqual(archived | loose, set(self.names))
+
+    def test_tiers_thin_old_scans(self):
+        summary = Archive(self.folder.name, RetentionPolicy(daily_days=30)).compact(NOW)
+        # The last day is kept whole, then the newest scan of each of the 30 dates up to 30 days back
+        self.assertEqual(summary['archived'], 30)
+        self.assertEqual(summary['deleted'], len(self.names) - 4 - 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
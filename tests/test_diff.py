@@ -0,0 +1,91 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.diff import diff_scan_files, diff_scans
+from functionalities.results import HostResult, load_scan
+from functionalities.scan import format_host_summary, format_scan_header
+from functionalities.sinks import JsonSink, TxtSink
+
+
+def make_host(address, ports, version='8.9p1'):
+    host = HostResult(address)
+    for port in ports:
+        host.set_port(port, 'open', 'ssh' if port == 22 else 'http', version if port == 22 else '')
+    return host
+
+
+# address -> (open ports, ssh version) in the older and the newer scan
+OLD = {'10.0.0.1': ([22, 80], '8.9p1'), '10.0.0.2': ([22], '8.9p1'), '10.0.0.3': ([80], ''),
+       '10.0.0.10': ([22, 443], '8.9p1')}
+NEW = {'10.0.0.1': ([22, 80], '8.9p1'), '10.0.0.2': ([22], '9.6p1'), '10.0.0.4': ([443], ''),
+       '10.0.0.10': ([22], '8.9p1')}
+
+
+class DiffFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def write(self, name, scans, sink=JsonSink):
+        """Write scans (lists of (address, (ports, version)) pairs, in file order) to one file."""
+        path = os.path.join(self.folder.name, name)
+        with open(path, 'w', encoding='utf-8') as out:
+            for index, hosts in enumerate(scans):
+                part = os.path.join(self.folder.name, f"part{index}")
+                args = (format_host_summary, format_scan_header) if sink is TxtSink else ()
+                with sink(part, *args) as writer:
+                    writer.open(f"2026-10-0{index + 1} 12:00:00", '10.0.0.0/24')
+                    for address, (ports, version) in hosts:
+                        writer.write_host(make_host(address, ports, version))
+                with open(part, encoding='utf-8') as f:
+                    out.write(f.read())
+        return path
+
+    def check(self, scan_diff):
+        self.assertEqual([host.host for host in scan_diff.hosts_added], ['10.0.0.4'])
+        self.assertEqual([host.host for host in scan_diff.hosts_removed], ['10.0.0.3'])
+        changed = {host_diff.host: host_diff for host_diff in scan_diff.hosts_changed}
+        self.assertEqual(sorted(changed), ['10.0.0.10', '10.0.0.2'])
+        self.assertEqual(list(changed['10.0.0.10'].closed['tcp']), [443])
+        self.assertEqual(changed['10.0.0.2'].service_changes[('tcp', 22)], (('ssh', '8.9p1'), ('ssh', '9.6p1')))
+
+    def test_sorted_json_files(self):
+        old = self.write('old.json', [sorted(OLD.items(), key=lambda item: int(item[0].split('.')[-1]))])
+        new = self.write('new.json', [list(NEW.items())])
+        scan_diff = diff_scan_files(old, new)
+        self.check(scan_diff)
+        self.assertEqual(scan_diff.to_dict(), diff_scans(load_scan(old), load_scan(new)).to_dict())
+
+    def test_unsorted_file_and_repeated_host(self):
+        hosts = list(reversed(OLD.items())) + [('10.0.0.2', ([22], '8.9p1'))]
+        old = self.write('old.json', [hosts])
+        new = self.write('new.json', [list(NEW.items())])
+        self.check(diff_scan_files(old, new))
+
+    def test_last_scan_of_a_file(self):
+        old = self.write('old.json', [list(NEW.items()), list(OLD.items())])
+        new = self.write('new.json', [list(OLD.items()), list(NEW.items())])
+        scan_diff = diff_scan_files(old, new)
+        self.check(scan_diff)
+        self.assertEqual(scan_diff.old.scan_time, '2026-10-02 12:00:00')
+        # An explicit index selects an earlier scan
+        self.assertFalse(diff_scan_files(old, new, old_index=1, new_index=0))
+
+    def test_text_reports(self):
+        old = self.write('old.txt', [list(OLD.items())], TxtSink)
+        new = self.write('new.txt', [list(NEW.items())], TxtSink)
+        scan_diff = diff_scan_files(old, new)
+        self.assertEqual([host.host for host in scan_diff.hosts_added], ['10.0.0.4'])
+        self.assertEqual([host.host for host in scan_diff.hosts_removed], ['10.0.0.3'])
+        self.assertEqual(sorted(host_diff.host for host_diff in scan_diff.hosts_changed), ['10.0.0.10'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import struct
+import sys
+import unittest
+from unittest import mock
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities import icmp
+from functionalities.icmp import ICMP_ECHO_REPLY, ping_many
+
+# Minimal IPv4 header (version 4, 20 bytes) in front of what a raw socket receives
+IP_HEADER = bytes([0x45]) + bytes(19)
+
+
+class RawSocket:
+    """A raw ICMP socket whose replies are queued by the test."""
+
+    def __init__(self):
+        self.replies = []
+
+    def sendto(self, packet, address):
+        pass
+
+    def recvfrom(self, size):
+        if not self.replies:
+            raise BlockingIOError
+        return self.replies.pop(0)
+
+
+def echo_reply(identifier, sequence):
+    return IP_HEADER + struct.pack('!BBHHH', ICMP_ECHO_REPLY, 0, 0, identifier, sequence)
+
+
+class PingManyTest(unittest.TestCase):
+    def test_raw_socket_ignores_the_replies_of_other_processes(self):
+        sock = RawSocket()
+        identifier = os.getpid() & 0xFFFF
+        sock.replies = [(echo_reply(identifier ^ 1, 0), ('10.0.0.1', 0)),
+                        (echo_reply(identifier ^ 1, 1), ('10.0.0.2', 0)),
+                        (echo_reply(identifier, 1), ('10.0.0.2', 0))]
+        with mock.patch.object(icmp.select, 'select', side_effect=lambda r, w, x, t: (r, w, [])):
+            results = ping_many(['10.0.0.1', '10.0.0.2'], timeout=0.05, sock=(sock, True))
+        self.assertIsNone(results['10.0.0.1'])
+        self.assertIsNotNone(results['10.0.0.2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities import interfaces
+from functionalities.interfaces import InterfaceAddress, attached_networks
+
+IFCONFIG = """\
+lo0: flags=8049<UP,LOOPBACK,RUNNING,MULTICAST> mtu 16384
+\tinet 127.0.0.1 netmask 0xff000000
+en0: flags=8863<UP,BROADCAST,SMART,RUNNING,SIMPLEX,MULTICAST> mtu 1500
+\tinet 192.168.1.5 netmask 0xffffff00 broadcast 192.168.1.255
+bridge0: flags=8822<BROADCAST,SMART,SIMPLEX,MULTICAST> mtu 1500
+\tinet 172.17.0.1 netmask 0xffff0000 broadcast 172.17.255.255
+en5: flags=8863<UP,BROADCAST,SMART,SIMPLEX,MULTICAST> mtu 1500
+\tinet 10.1.0.5 netmask 0xffffff00 broadcast 10.1.0.255
+"""
+
+
+class AttachedNetworksTest(unittest.TestCase):
+    def test_ifconfig_flags(self):
+        completed = subprocess.CompletedProcess([], 0, stdout=IFCONFIG)
+        with mock.patch.object(interfaces.subprocess, 'run', return_value=completed):
+            addresses = interfaces._ifconfig_addresses()
+        # bridge0 is down, en5 is up without carrier (no RUNNING)
+        self.assertEqual({entry.interface: entry.up for entry in addresses},
+                         {'lo0': True, 'en0': True, 'bridge0': False, 'en5': False})
+
+    def test_interfaces_that_are_down_are_skipped(self):
+        addresses = [InterfaceAddress('eth0', '192.168.1.5', '192.168.1.5/24'),
+                     InterfaceAddress('docker0', '172.17.0.1', '172.17.0.1/16', up=False)]
+        with mock.patch.object(interfaces, 'list_addresses', return_value=addresses), \
+                mock.patch.object(interfaces, 'list_routes', return_value=[]):
+            self.assertEqual([entry.interface for entry in attached_networks()], ['eth0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
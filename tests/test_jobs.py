@@ -0,0 +1,197 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import nmap
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.jobs import JobManager
+from functionalities.scan import scan_network
+
+# One host with an open TLS port, so every stage after nmap has something to do
+SCAN_XML = b"""<?xml version="1.0"?>
+<nmaprun scanner="nmap" args="nmap" start="0" version="7.94">
+<host><status state="up" reason="syn-ack" reason_ttl="64"/><address addr="10.0.0.5" addrtype="ipv4"/>
+<ports><port protocol="tcp" portid="443"><state state="open" reason="syn-ack" reason_ttl="64"/>
+<service name="https" method="table" conf="3"/></port></ports></host>
+<runstats><finished time="0" timestr="" elapsed="1" exit="success"/><hosts up="1" down="0" total="1"/></runstats>
+</nmaprun>
+"""
+
+
+class BlockingScanner(nmap.PortScanner):
+    """Replays SCAN_XML once it is released or killed, like an nmap run cancelled after its last host."""
+
+    def __init__(self, started):
+        # The parent constructor looks for the nmap binary, which a replay does not need
+        self._scan_result = {}
+        self._nmap_last_output = ''
+        self.started = started
+        self.release = threading.Event()
+
+    def scan(self, hosts='127.0.0.1', ports=None, arguments='-sV', sudo=False, timeout=0):
+        self.started.set()
+        self.release.wait(5)
+        self._nmap_last_output = SCAN_XML
+        return self.analyse_nmap_xml_scan(SCAN_XML.decode())
+
+    def kill(self, keep_partial=True):
+        self.release.set()
+
+
+class JobMergeTest(unittest.TestCase):
+    def setUp(self):
+        # One worker held by a first job, so the next ones stay queued until release is set
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.scanned = []
+
+        def runner(job):
+            self.scanned.append(job.target)
+            self.started.set()
+            self.release.wait(5)
+            return {'target': job.target}
+
+        self.manager = JobManager(max_workers=1, runner=runner)
+        self.addCleanup(self.manager.shutdown)
+        self.blocker = self.manager.submit('192.0.2.1', 'out')
+        self.assertTrue(self.started.wait(5))
+
+    def test_merged_job_reports_its_own_completion(self):
+        finished = []
+        narrow = self.manager.submit('10.0.0.1', 'out', done_callback=finished.append)
+        wide = self.manager.submit('10.0.0.0/24', 'out', done_callback=finished.append)
+        self.assertIs(narrow.merged_into, wide)
+        self.assertEqual(narrow.state, 'merged')
+        self.release.set()
+        self.assertTrue(narrow.wait(5))
+        self.assertTrue(self.blocker.wait(5))
+        # Each listener is called once, with its own job
+        self.assertEqual(sorted(job.id for job in finished), [narrow.id, wide.id])
+        self.assertEqual(narrow.state, 'done')
+        self.assertEqual(narrow.result, {'target': '10.0.0.0/24'})
+        self.assertNotIn('10.0.0.1', self.scanned)
+
+    def test_nested_merges_are_finished(self):
+        finished = []
+        host = self.manager.submit('10.0.0.1', 'out', done_callback=finished.append)
+        subnet = self.manager.submit('10.0.0.0/28', 'out', done_callback=finished.append)
+        network = self.manager.submit('10.0.0.0/24', 'out', done_callback=finished.append)
+        self.assertIs(host.merged_into, subnet)
+        self.assertIs(subnet.merged_into, network)
+        self.release.set()
+        self.assertTrue(host.wait(5))
+        self.assertEqual(sorted(job.id for job in finished), [host.id, subnet.id, network.id])
+        self.assertEqual({job.state for job in finished}, {'done'})
+
+    def test_different_output_folder_or_interface_is_not_merged(self):
+        wide = self.manager.submit('10.0.0.0/24', 'out')
+        other_folder = self.manager.submit('10.0.0.1', 'elsewhere')
+        other_interface = self.manager.submit('10.0.0.2', 'out', interface='eth1')
+        self.assertIsNot(other_folder, wide)
+        self.assertIsNot(other_interface, wide)
+        self.assertEqual(other_folder.state, 'queued')
+        self.assertIsNone(other_interface.merged_into)
+        self.release.set()
+        self.assertTrue(other_interface.wait(5))
+        self.assertIn('10.0.0.1', self.scanned)
+        self.assertIn('10.0.0.2', self.scanned)
+
+    def test_cancelling_a_merged_job_detaches_it(self):
+        narrow = self.manager.submit('10.0.0.1', 'out')
+        wide = self.manager.submit('10.0.0.0/24', 'out')
+        self.assertTrue(self.manager.cancel(narrow.id))
+        self.assertEqual(narrow.state, 'cancelled')
+        self.assertIsNone(narrow.merged_into)
+        self.assertEqual(wide.state, 'queued')
+        self.release.set()
+        self.assertTrue(wide.wait(5))
+        self.assertEqual((wide.state, narrow.state), ('done', 'cancelled'))
+
+    def test_cancelling_the_absorbing_job_requeues_the_merged_ones(self):
+        narrow = self.manager.submit('10.0.0.1', 'out')
+        wide = self.manager.submit('10.0.0.0/24', 'out')
+        self.assertTrue(self.manager.cancel(wide.id))
+        self.assertEqual((wide.state, narrow.state), ('cancelled', 'queued'))
+        self.release.set()
+        self.assertTrue(narrow.wait(5))
+        self.assertEqual(narrow.state, 'done')
+        self.assertEqual(narrow.result, {'target': '10.0.0.1'})
+
+    def test_routes_are_traced_only_on_request(self):
+        plain = self.manager.submit('10.0.0.0/24', 'out')
+        traced = self.manager.submit('10.0.1.0/24', 'out', trace_routes=True)
+        self.assertFalse(self.blocker.trace_routes)
+        self.assertFalse(plain.trace_routes)
+        self.assertTrue(traced.trace_routes)
+        # Joining a queued job asks it to trace the routes too
+        self.assertIs(self.manager.submit('10.0.0.1', 'out', trace_routes=True), plain)
+        self.assertTrue(plain.trace_routes)
+        # A running job cannot start tracing: a separate job does it
+        self.assertIsNot(self.manager.submit('192.0.2.1', 'out', trace_routes=True), self.blocker)
+        self.release.set()
+
+
+class JobCancelTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.started = threading.Event()
+        self.scanner = BlockingScanner(self.started)
+
+        def runner(job):
+            job.scanner = self.scanner
+            return scan_network(job.target, self.folder.name, sinks=[], scanner=job.scanner, udp_ports=[53],
+                                trace_routes=True, cancelled=job.check_cancelled)
+
+        self.manager = JobManager(max_workers=1, runner=runner)
+        self.addCleanup(self.manager.shutdown)
+        self.stages = {}
+        for name in ('UdpScanner', 'TlsInspector', 'fingerprint_hosts', 'map_topology'):
+            patcher = mock.patch(f'functionalities.scan.{name}')
+            self.stages[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+        self.stages['UdpScanner'].return_value.scan.return_value = {}
+        self.stages['TlsInspector'].return_value.inspect_many.return_value = {}
+        self.stages['fingerprint_hosts'].return_value = {}
+        self.stages['map_topology'].return_value = None
+
+    def test_stages_run_without_cancel(self):
+        job = self.manager.submit('10.0.0.0/24', 'out')
+        self.assertTrue(self.started.wait(5))
+        self.scanner.release.set()
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.state, 'done')
+        for name, stage in self.stages.items():
+            self.assertTrue(stage.called, name)
+
+    def test_cancelled_job_skips_the_later_stages(self):
+        job = self.manager.submit('10.0.0.0/24', 'out')
+        self.assertTrue(self.started.wait(5))
+        self.assertTrue(self.manager.cancel(job.id, keep_partial=True))
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.state, 'cancelled')
+        self.assertEqual([host.host for host in job.result], ['10.0.0.5'])
+        for name, stage in self.stages.items():
+            self.assertFalse(stage.called, name)
+
+    def test_discarded_cancel_is_not_an_error(self):
+        job = self.manager.submit('10.0.0.0/24', 'out')
+        self.assertTrue(self.started.wait(5))
+        self.manager.cancel(job.id, keep_partial=False)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.state, 'cancelled')
+        self.assertIsNone(job.result)
+        self.assertIsNone(job.error)
+        self.assertFalse(self.stages['map_topology'].called)
+
+
+if __name__ == '__main__':
+    unittest.main()
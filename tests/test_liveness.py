@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.liveness import LivenessCache, covers
+from functionalities.targets import TargetSet
+
+
+class LivenessCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.path = os.path.join(self.folder.name, 'liveness.db')
+
+    def open(self):
+        cache = LivenessCache(self.path)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_range_lookup(self):
+        cache = self.open()
+        cache.record_many({'10.0.0.5': True, '10.0.1.5': False, '10.0.2.5': True, '2001:db8::5': True,
+                           'printer.lan': False}, source='ping')
+        found = cache.lookup(TargetSet.parse('10.0.0.0/23 2001:db8::/120 printer.lan'))
+        self.assertEqual(sorted(found), ['10.0.0.5', '10.0.1.5', '2001:db8::5', 'printer.lan'])
+        self.assertEqual(cache.live_hosts(TargetSet.parse('10.0.2.0/24')), ['10.0.2.5'])
+
+    def test_range_lookup_uses_the_index(self):
+        cache = self.open()
+        plan = cache.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT address FROM hosts WHERE key BETWEEN ? AND ?", (b'', b'')).fetchall()
+        self.assertIn('hosts_key', ' '.join(str(row[-1]) for row in plan))
+
+    def test_older_cache_gets_the_keys(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript("""
+            CREATE TABLE hosts (address TEXT PRIMARY KEY, up INTEGER NOT NULL, rtt REAL, source TEXT,
+                                checked REAL NOT NULL, used REAL NOT NULL);
+        """)
+        connection.execute("INSERT INTO hosts VALUES ('10.0.0.5', 1, NULL, 'ping', strftime('%s', 'now'), 0)")
+        connection.commit()
+        connection.close()
+        cache = self.open()
+        self.assertEqual(list(cache.lookup(TargetSet.parse('10.0.0.0/24'))), ['10.0.0.5'])
+
+    def test_only_thorough_negatives_cover_nmap(self):
+        self.assertFalse(covers('ping', 'nmap'))
+        self.assertTrue(covers('nmap', 'nmap'))
+        self.assertTrue(covers('nmap', 'ping'))
+        self.assertFalse(covers(None, 'ping'))
+
+
+if __name__ == '__main__':
+    unittest.main()
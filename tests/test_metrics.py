@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.metrics import Metrics, save_scan_metrics
+
+
+class SaveMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def test_concurrent_scans_refresh_the_same_file(self):
+        errors = []
+
+        def save(number):
+            metrics = Metrics(f"10.0.{number}.0/24")
+            metrics.inc('hosts_up', number)
+            try:
+                for _ in range(20):
+                    save_scan_metrics(metrics, self.folder.name, f"2026-10-19_12-00-{number:02}")
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        metrics_folder = os.path.join(self.folder.name, 'metrics')
+        # One summary per scan and the shared file, no temporary file left behind
+        self.assertEqual(len(os.listdir(metrics_folder)), 8 + 1)
+        with open(os.path.join(metrics_folder, 'scan.prom'), encoding='utf-8') as f:
+            self.assertIn('scan_duration_seconds', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities import osfp
+from functionalities.osfp import ESCALATION_CONFIDENCE, OsGuess, classify, fingerprint_hosts, initial_ttl, nmap_ttls
+
+REPORT = b"""<nmaprun>
+<host><status state="up" reason="echo-reply" reason_ttl="0"/><address addr="10.0.0.1" addrtype="ipv4"/>
+<ports><port protocol="tcp" portid="22"><state state="open" reason="syn-ack" reason_ttl="63"/></port></ports></host>
+<host><status state="up" reason="echo-reply" reason_ttl="125"/><address addr="10.0.0.2" addrtype="ipv4"/></host>
+</nmaprun>
+"""
+
+
+class ClassifierTest(unittest.TestCase):
+    def test_initial_ttl(self):
+        self.assertEqual([initial_ttl(ttl) for ttl in (30, 63, 64, 120, 250)], [32, 64, 64, 128, 255])
+
+    def test_windows_from_ttl_and_ports(self):
+        guess = classify(ttl=127, ports=[135, 445, 3389], services=['msrpc', 'microsoft-ds', 'ms-wbt-server'])
+        self.assertEqual(guess.family, 'Windows')
+        self.assertGreaterEqual(guess.confidence, ESCALATION_CONFIDENCE)
+
+    def test_banner_gives_the_distribution(self):
+        guess = classify(ttl=64, ports=[22], services=['ssh'], banners=['OpenSSH 8.9p1 Ubuntu 3ubuntu0.6'])
+        self.assertEqual((guess.family, guess.detail), ('Linux', 'Ubuntu'))
+
+    def test_ttl_alone_is_doubtful(self):
+        guess = classify(ttl=64)
+        self.assertEqual(guess.family, 'Linux')
+        self.assertLess(guess.confidence, ESCALATION_CONFIDENCE)
+
+    def test_no_clue(self):
+        self.assertEqual(str(classify()), 'Unknown')
+
+    def test_reply_ttls_of_a_report(self):
+        self.assertEqual(nmap_ttls(REPORT), {'10.0.0.1': 63, '10.0.0.2': 125})
+        self.assertEqual(nmap_ttls(REPORT.decode()), nmap_ttls(REPORT))
+
+
+class EscalationTest(unittest.TestCase):
+    def setUp(self):
+        for name, value in (('can_probe_syn', False), ('can_escalate', True)):
+            patcher = mock.patch.object(osfp, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(osfp, 'nmap_os_detection',
+                                    return_value={'10.0.0.2': OsGuess('BSD', 'FreeBSD 13', 0.9, ['nmap -O'], 'nmap')})
+        self.nmap_os_detection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_doubtful_hosts_with_open_ports_are_escalated(self):
+        hosts = {
+            '10.0.0.1': {'ttl': 128, 'ports': [135, 3389], 'services': ['msrpc', 'ms-wbt-server']},
+            '10.0.0.2': {'ttl': 64, 'ports': [22], 'services': ['ssh']},
+            '10.0.0.3': {'ttl': 64, 'ports': []},
+        }
+        guesses = fingerprint_hosts(hosts)
+        self.nmap_os_detection.assert_called_once_with(['10.0.0.2'], {'10.0.0.2': [22]})
+        self.assertEqual(guesses['10.0.0.2'].source, 'nmap')
+        self.assertEqual(guesses['10.0.0.1'].source, 'passive')
+        self.assertEqual(guesses['10.0.0.3'].family, 'Linux')
+
+    def test_no_escalation_when_not_allowed_or_not_needed(self):
+        fingerprint_hosts({'10.0.0.2': {'ttl': 64, 'ports': [22]}}, escalate=False)
+        fingerprint_hosts({'10.0.0.1': {'ttl': 128, 'ports': [135, 3389], 'services': ['msrpc']}})
+        fingerprint_hosts({'10.0.0.3': {'ttl': 64, 'ports': []}})
+        self.nmap_os_detection.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
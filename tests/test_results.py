@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from fonctions.scan import format_machine_report
+from functionalities.results import HostResult, iter_scan_file
+from functionalities.scan import format_host_summary, format_scan_header
+from functionalities.udp import OPEN, OPEN_FILTERED, add_udp_results
+
+
+def dns_host():
+    """A host running BIND on TCP 53 and dnsmasq on UDP 53, with SSH on TCP 22."""
+    host = HostResult('192.168.1.10')
+    host.status = 'up'
+    host.os = 'Linux'
+    host.set_port(22, 'open', 'ssh', 'OpenSSH 8.9p1')
+    host.set_port(53, 'open', 'domain', 'BIND 9')
+    add_udp_results(host, {53: (OPEN, 'domain', 'dnsmasq'), 123: (OPEN_FILTERED, 'ntp', '')})
+    return host
+
+
+def parse_hosts(path):
+    return [host for header, host in iter_scan_file(path) if host is not None]
+
+
+class UdpServiceTest(unittest.TestCase):
+    def test_udp_result_keeps_tcp_service(self):
+        host = dns_host()
+        self.assertEqual(host.service(53), ('domain', 'BIND 9'))
+        self.assertEqual(host.service(53, 'tcp'), ('domain', 'BIND 9'))
+        self.assertEqual(host.service(53, 'udp'), ('domain', 'dnsmasq'))
+        # A port that is not open on UDP has no service
+        self.assertEqual(host.service(123, 'udp'), ('', ''))
+
+    def test_to_dict_reports_both_protocols(self):
+        ports = {(entry['port'], entry.get('proto', 'tcp')): entry
+                 for entry in dns_host().to_dict()['ports']}
+        self.assertEqual(ports[(53, 'tcp')]['version'], 'BIND 9')
+        self.assertEqual(ports[(53, 'udp')]['version'], 'dnsmasq')
+
+
+class ReportRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.folder.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_fonctions_report_with_udp_port(self):
+        path = self.write('rapport.txt', format_machine_report(dns_host()))
+        [host] = parse_hosts(path)
+        self.assertEqual(list(host.ports('open')), [22, 53])
+        self.assertEqual(list(host.ports('open', 'udp')), [53])
+        self.assertEqual(host.service(53, 'tcp')[0], 'domain')
+        self.assertEqual(host.service(53, 'udp')[0], 'domain')
+
+    def test_functionalities_report_with_udp_port(self):
+        path = self.write('scan_results.txt',
+                          format_scan_header('2026-10-19_12-00-00', '192.168.1.0/24') + format_host_summary(dns_host()))
+        [(header, _)] = [item for item in iter_scan_file(path) if item[1] is None]
+        self.assertEqual((header['scan_time'], header['network_range']), ('2026-10-19_12-00-00', '192.168.1.0/24'))
+        [host] = parse_hosts(path)
+        self.assertEqual(host.status, 'up')
+        self.assertEqual(list(host.ports('open')), [22, 53])
+        self.assertEqual(list(host.ports('open', 'udp')), [53])
+        self.assertEqual(list(host.ports(OPEN_FILTERED, 'udp')), [123])
+        self.assertEqual(host.service(53, 'udp')[0], 'domain')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.results import HostResult
+from functionalities.search import MERGE_FACTOR, QueryError, SearchIndex
+
+
+def make_host(address, ports, script=None):
+    host = HostResult(address)
+    for port, service, version in ports:
+        host.set_port(port, 'open', service, version, scripts={script[0]: script[1]} if script else None)
+    return host
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.index = SearchIndex(self.folder.name)
+
+    def commit(self, hosts, scan_time='2026-10-19_12-00-00', source=None):
+        for host in hosts:
+            self.index.add_host(host, scan_time, source or f"scan#{scan_time}")
+        return self.index.commit()
+
+    def hosts(self, query):
+        return sorted(doc['host'] for doc in self.index.search(query))
+
+    def test_queries(self):
+        self.commit([
+            make_host('10.0.0.1', [(22, 'ssh', 'OpenSSH 8.9p1')]),
+            make_host('10.0.0.2', [(443, 'https', 'nginx 1.18.0')],
+                      ('ssl-ccs-injection', 'VULNERABLE: CVE-2014-0224')),
+            make_host('10.0.0.3', [(22, 'ssh', 'OpenSSH 7.4'), (80, 'http', 'Apache httpd 2.4.6')]),
+        ])
+        self.assertEqual(self.hosts('service:ssh'), ['10.0.0.1', '10.0.0.3'])
+        self.assertEqual(self.hosts('cve:CVE-2014-0224'), ['10.0.0.2'])
+        self.assertEqual(self.hosts('script:ssl-*'), ['10.0.0.2'])
+        self.assertEqual(self.hosts('ssh AND NOT port:80'), ['10.0.0.1'])
+        self.assertEqual(self.hosts('port:80 OR port:443'), ['10.0.0.2', '10.0.0.3'])
+        self.assertEqual(self.hosts('"openssh 7.4"'), ['10.0.0.3'])
+        self.assertEqual(self.hosts('injection'), ['10.0.0.2'])
+        with self.assertRaises(QueryError):
+            self.index.search('(ssh')
+
+    def test_same_source_is_ingested_once(self):
+        host = make_host('10.0.0.1', [(22, 'ssh', '')])
+        self.assertEqual(self.commit([host], source='scan#0'), 1)
+        lines = [({'index': 0, 'scan_time': '2026-10-19_12-00-00'}, None),
+                 ({'index': 0, 'scan_time': '2026-10-19_12-00-00'}, host)]
+        self.assertEqual(self.index.ingest_stream(lines, 'scan'), 1)
+        self.index.commit()
+        self.assertEqual(self.index.ingest_stream(lines, 'scan'), 0)
+
+    def test_merges_keep_segments_of_similar_size(self):
+        commits = MERGE_FACTOR ** 2 + 1
+        for number in range(commits):
+            self.commit([make_host(f"10.0.{number}.1", [(22, 'ssh', '')])], source=f"scan#{number}")
+        segments = self.index.manifest['segments']
+        # 16 one-document commits become one segment of 16 and the 17th stays alone
+        self.assertEqual([self.index._segment_docs(name)[1] for name in segments], [MERGE_FACTOR ** 2, 1])
+        self.assertEqual(sorted(os.listdir(self.folder.name)), sorted(segments + ['index.json']))
+        self.assertEqual(len(self.index.search('service:ssh')), commits)
+
+    def test_refresh_loads_only_new_documents(self):
+        reader = SearchIndex(self.folder.name)
+        self.commit([make_host('10.0.0.1', [(22, 'ssh', '')])], source='scan#0')
+        self.assertEqual(len(reader.search('ssh')), 1)
+        # The next commits merge the first segment with new ones: the reader only decodes what it lacks
+        for number in range(1, MERGE_FACTOR):
+            self.commit([make_host(f"10.0.{number}.1", [(22, 'ssh', '')])], source=f"scan#{number}")
+        with mock.patch.object(reader, '_read_segment', wraps=reader._read_segment) as read_segment:
+            self.assertEqual(len(reader.search('ssh')), MERGE_FACTOR)
+            self.assertEqual(read_segment.call_count, 1)
+            self.assertEqual(len(reader.docs), MERGE_FACTOR)
+            reader.search('ssh')
+            self.assertEqual(read_segment.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import os
+import sys
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.targets import TargetSet
+
+
+class TargetSetSizeTest(unittest.TestCase):
+    def test_ipv6_network_size(self):
+        targets = TargetSet.parse('2001:db8::/64 192.168.1.0/24')
+        self.assertEqual(targets.size, 2 ** 64 + 256)
+        self.assertTrue(targets)
+        self.assertFalse(TargetSet.parse('10.0.0.1 !10.0.0.1'))
+
+    def test_list_of_a_small_set(self):
+        self.assertEqual([str(address) for address in TargetSet.parse('10.0.0.1-3')],
+                         ['10.0.0.1', '10.0.0.2', '10.0.0.3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
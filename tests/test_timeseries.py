@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.timeseries import ARCHIVE, HEADER, MAGIC_V1, ROW, RoundRobinDatabase, TimeSeriesStore
+
+# Small archives keep the files tiny: 10 s samples for 10 minutes
+ARCHIVES = ((10, 60),)
+
+
+class TimeSeriesStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def test_open_databases_are_bounded(self):
+        store = TimeSeriesStore(self.folder.name, ARCHIVES, max_open=8)
+        self.addCleanup(store.close)
+        hosts = [f"10.0.{index // 256}.{index % 256}" for index in range(100)]
+        opened = []
+        for host in hosts:
+            store.record(host, 1.5, True, timestamp=1000)
+            opened.append(store.databases[host])
+            self.assertLessEqual(len(store.databases), 8)
+        # Evicted databases have released their file and mapping
+        self.assertTrue(all(database.file is None and database.map is None for database in opened[:-8]))
+        self.assertEqual(len(store.keys()), 100)
+        # An evicted database is reopened on demand, with its history intact
+        rows = store.fetch(hosts[0], 990, 1010)
+        self.assertIn(1.5, [row[1] for row in rows])
+        self.assertIn(hosts[0], store.databases)
+        self.assertLessEqual(len(store.databases), 8)
+
+    def test_recently_used_database_stays_open(self):
+        store = TimeSeriesStore(self.folder.name, ARCHIVES, max_open=2)
+        self.addCleanup(store.close)
+        store.record('a', 1.0, True, timestamp=1000)
+        store.record('b', 1.0, True, timestamp=1000)
+        store.record('a', 2.0, True, timestamp=1010)
+        store.record('c', 1.0, True, timestamp=1000)
+        self.assertEqual(list(store.databases), ['a', 'c'])
+
+    def test_keys_are_the_recorded_hosts(self):
+        store = TimeSeriesStore(self.folder.name, ARCHIVES)
+        self.addCleanup(store.close)
+        for host in ('2001:db8::1', 'fe80::1%eth0', '10.0.0.1'):
+            store.record(host, 1.0, True, timestamp=1000)
+        store.close()
+        self.assertEqual(TimeSeriesStore(self.folder.name).keys(), ['10.0.0.1', '2001:db8::1', 'fe80::1%eth0'])
+        self.assertEqual(store.fetch('2001:db8::1', 990, 1010)[0][1], 1.0)
+
+    def test_version_1_files_are_still_read(self):
+        # Written as before the key was stored: header then archive descriptors
+        path = os.path.join(self.folder.name, '10.0.0.9.rrd')
+        offset = HEADER.size + ARCHIVE.size
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC_V1, 1))
+            f.write(ARCHIVE.pack(10, 60, offset, 0, 0.0, 0, 0, 0))
+            f.truncate(offset + 60 * ROW.size)
+        with RoundRobinDatabase(path) as database:
+            self.assertIsNone(database.key)
+            database.update(2.0, timestamp=1000)
+            self.assertEqual(database.fetch(990, 1010)[0][1], 2.0)
+        self.assertEqual(TimeSeriesStore(self.folder.name).keys(), ['10.0.0.9'])
+
+
+if __name__ == '__main__':
+    unittest.main()
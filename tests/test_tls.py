@@ -0,0 +1,49 @@
+import base64
+import os
+import sys
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.tls import parse_certificate
+
+# Self-signed P-256 certificate of test.local (subjectAltName: DNS test.local, IP 10.0.0.5)
+CERTIFICATE = base64.b64decode(
+    'MIIBwzCCAWigAwIBAgIUU18TqY5WoUexlKsWBqtsPSM9B+EwCgYIKoZIzj0EAwIwKDETMBEGA1UEAwwKdGVzdC5sb2NhbDERMA8GA1UE'
+    'CgwIU2VhaGF3a3MwHhcNMjYxMDE5MTkyNzQ5WhcNMzYxMDE2MTkyNzQ5WjAoMRMwEQYDVQQDDAp0ZXN0LmxvY2FsMREwDwYDVQQKDAhT'
+    'ZWFoYXdrczBZMBMGByqGSM49AgEGCCqGSM49AwEHA0IABOw8VRidG1+k6tIsc3gBtqwi7MScrBRaUZfNcF/ohK7tOdRDOc+HSV6mfnxr'
+    'hHqgP7mkh8BDSXBEJ286Ew6m+JijcDBuMB0GA1UdDgQWBBTBa+QDFn3PMbjd+kPZGGJdPUg3KDAfBgNVHSMEGDAWgBTBa+QDFn3PMbjd'
+    '+kPZGGJdPUg3KDAPBgNVHRMBAf8EBTADAQH/MBsGA1UdEQQUMBKCCnRlc3QubG9jYWyHBAoAAAUwCgYIKoZIzj0EAwIDSQAwRgIhALJ9'
+    '+JWnhaLfw+yES3+w/EONyy07VETTDFPe76OZ5HRkAiEAm96WNXWjrJkG16cJ1zPENGPG2JRymDfVO5sf+BHPYIo=')
+
+# Offset of the length of the public key's algorithm identifier
+KEY_ALGORITHM_LENGTH = 166
+
+
+class ParseCertificateTest(unittest.TestCase):
+    def test_fields(self):
+        certificate = parse_certificate(CERTIFICATE)
+        self.assertEqual(certificate['common_name'], 'test.local')
+        self.assertEqual(certificate['sans'], ['test.local', '10.0.0.5'])
+        self.assertEqual(certificate['not_after'], '2036-10-16T19:27:49Z')
+        self.assertEqual(certificate['key_type'], 'EC P-256')
+        self.assertTrue(certificate['self_signed'])
+
+    def test_truncated_certificates(self):
+        for length in range(len(CERTIFICATE)):
+            with self.assertRaises(ValueError):
+                parse_certificate(CERTIFICATE[:length])
+
+    def test_truncated_key_algorithm(self):
+        # The enclosing lengths still match: only the key decoding finds the identifier empty
+        der = bytearray(CERTIFICATE)
+        der[KEY_ALGORITHM_LENGTH] = 0
+        with self.assertRaises(ValueError):
+            parse_certificate(bytes(der))
+
+
+if __name__ == '__main__':
+    unittest.main()
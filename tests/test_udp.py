@@ -0,0 +1,86 @@
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+# Make the project importable when the tests are run from any folder
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from functionalities.udp import CLOSED, OPEN, OPEN_FILTERED, TokenBucket, UdpScanner
+
+
+def udp_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    return sock
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=100, burst=5)
+
+        async def take(count):
+            start = time.monotonic()
+            for _ in range(count):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        # The saved burst is spent at once, then one token every 10 ms
+        self.assertLess(asyncio.run(take(5)), 0.05)
+        self.assertGreaterEqual(asyncio.run(take(10)), 0.08)
+
+
+class UdpScannerTest(unittest.TestCase):
+    def setUp(self):
+        self.sockets = []
+        self.addCleanup(lambda: [sock.close() for sock in self.sockets])
+
+    def server(self, answer):
+        """A UDP port on localhost that answers every datagram (or stays silent); returns (port, datagrams)."""
+        sock = udp_socket()
+        sock.settimeout(0.1)
+        self.sockets.append(sock)
+        datagrams = []
+
+        def serve():
+            while True:
+                try:
+                    data, address = sock.recvfrom(2048)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    return
+                datagrams.append(data)
+                if answer:
+                    sock.sendto(b'pong', address)
+
+        threading.Thread(target=serve, daemon=True).start()
+        return sock.getsockname()[1], datagrams
+
+    def closed_port(self):
+        sock = udp_socket()
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_states_and_retransmits(self):
+        open_port, _ = self.server(answer=True)
+        silent_port, silent_datagrams = self.server(answer=False)
+        closed_port = self.closed_port()
+        scanner = UdpScanner([open_port, silent_port, closed_port], host_rate=1000, host_burst=10, timeout=0.2,
+                             retries=2)
+        results = scanner.scan(['127.0.0.1'])['127.0.0.1']
+        self.assertEqual(results[open_port][0], OPEN)
+        self.assertEqual(results[closed_port][0], CLOSED)
+        self.assertEqual(results[silent_port][0], OPEN_FILTERED)
+        # A silent port gets the first probe and both retries; an answered one only the first
+        self.assertEqual(len(silent_datagrams), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,3 +15,109 @@ def get_version():
     except requests.exceptions.RequestException as e:
         print(f"GitHub Error: {e}")
         return "Unknown"
+
+def draw_latency_graph(canvas, points, title=""):
+    """Draw a latency history (list of (timestamp, latency, availability)) on a Tk canvas."""
+    canvas.delete("all")
+    width = int(canvas.cget("width"))
+    height = int(canvas.cget("height"))
+    margin = 30
+
+    if title:
+        canvas.create_text(width // 2, 10, text=title, fill='white', font=("Helvetica", 9))
+
+    latencies = [latency for _, latency, _ in points if latency is not None]
+    if len(points) < 2 or not latencies:
+        canvas.create_text(width // 2, height // 2, text="No history yet", fill='white', font=("Helvetica", 10))
+        return
+
+    start, end = points[0][0], points[-1][0]
+    top = max(latencies) or 1.0
+    span = (end - start) or 1
+
+    def x_of(timestamp):
+        return margin + (timestamp - start) / span * (width - 2 * margin)
+
+    def y_of(latency):
+        return height - margin - latency / top * (height - 2 * margin)
+
+    # Axes and scale
+    canvas.create_line(margin, height - margin, width - margin, height - margin, fill='#888888')
+    canvas.create_line(margin, margin, margin, height - margin, fill='#888888')
+    canvas.create_text(margin - 2, margin, text=f"{top:.0f}", anchor="e", fill='white', font=("Helvetica", 8))
+    canvas.create_text(margin - 2, height - margin, text="0 ms", anchor="e", fill='white', font=("Helvetica", 8))
+
+    # Latency line, broken where the host did not answer; red ticks mark unavailability
+    segment = []
+    for timestamp, latency, availability in points:
+        if availability is not None and availability < 1:
+            x = x_of(timestamp)
+            canvas.create_line(x, height - margin, x, height - margin + 6, fill='#f44336')
+        if latency is None:
+            if len(segment) >= 4:
+                canvas.create_line(*segment, fill='#4CAF50', width=2)
+            segment = []
+            continue
+        segment.extend((x_of(timestamp), y_of(latency)))
+    if len(segment) >= 4:
+        canvas.create_line(*segment, fill='#4CAF50', width=2)
+
+def draw_topology_graph(canvas, topology, title=""):
+    """Draw a hop graph (functionalities.topology.Topology) on a Tk canvas, one column per hop."""
+    canvas.delete("all")
+    width = int(canvas.cget("width"))
+    height = int(canvas.cget("height"))
+    margin = 20
+
+    if title:
+        canvas.create_text(width // 2, 10, text=title, fill='white', font=("Helvetica", 9))
+    if topology is None or not topology.paths:
+        canvas.create_text(width // 2, height // 2, text="No topology yet", fill='white', font=("Helvetica", 10))
+        return
+
+    nodes = topology.nodes()
+    edges = topology.edges()
+
+    # Hosts are grouped by the hop before them: a subnet behind one router is drawn as a single node
+    groups = {}
+    for (parent, child) in edges:
+        if nodes[child]['kind'] == 'target':
+            groups.setdefault(parent, set()).add(child)
+    shown = {address: node['depth'] for address, node in nodes.items() if node['kind'] != 'target'}
+    for parent, members in groups.items():
+        shown[('hosts', parent)] = shown.get(parent, 0) + 1
+
+    columns = {}
+    for key, depth in sorted(shown.items(), key=lambda item: (item[1], str(item[0]))):
+        columns.setdefault(depth, []).append(key)
+    last = max(columns) or 1
+    max_rows = max(1, (height - 2 * margin) // 14)
+    positions = {}
+    for depth, keys in columns.items():
+        x = margin + depth / last * (width - 2 * margin)
+        visible = keys[:max_rows]
+        for row, key in enumerate(visible):
+            positions[key] = (x, margin + 10 + (row + 0.5) * (height - 2 * margin - 10) / len(visible))
+        if len(keys) > len(visible):
+            canvas.create_text(x, height - 6, text=f"+{len(keys) - len(visible)} more", fill='#888888',
+                               font=("Helvetica", 7))
+
+    # Links (dashed where the path was inferred from another target's trace)
+    links = {}
+    for (parent, child), edge in edges.items():
+        key = (parent, ('hosts', parent) if nodes[child]['kind'] == 'target' else child)
+        links[key] = links.get(key, True) and edge['inferred']
+    for (parent, child), inferred in links.items():
+        if parent in positions and child in positions:
+            canvas.create_line(*positions[parent], *positions[child], fill='#888888', dash=(3, 2) if inferred else None)
+
+    colors = {'source': '#2196F3', 'router': '#FF9800'}
+    for key, (x, y) in positions.items():
+        if isinstance(key, tuple):
+            count = len(groups[key[1]])
+            label = f"{count} hosts" if count > 1 else next(iter(groups[key[1]]))
+            color = '#4CAF50'
+        else:
+            label, color = key, colors.get(nodes[key]['kind'], '#4CAF50')
+        canvas.create_oval(x - 4, y - 4, x + 4, y + 4, fill=color, outline='')
+        canvas.create_text(x, y - 8, text=label, fill='white', font=("Helvetica", 7))